@@ -0,0 +1,83 @@
+"""
+Benchmark of PDF ingestion: wall-clock time, pages per second and peak memory.
+
+Run from the `src` directory against any local PDF (e.g. a 500-page document):
+
+```
+python -m api.benchmarks.document_ingestion_benchmark --pdf ./large.pdf --workers 4
+```
+"""
+import os
+import time
+import asyncio
+import argparse
+import resource
+import tempfile
+import multiprocessing
+
+from concurrent.futures import ProcessPoolExecutor
+
+from api.src.api_components.document_ingestion.document_ingestion import (
+    DocumentChunkCache,
+    count_pdf_pages,
+    ingest_pdf,
+    stage_upload,
+)
+
+
+async def _read_file(path: str, chunk_size: int = 64 * 1024):
+    with open(path, "rb") as file:
+        while chunk := file.read(chunk_size):
+            yield chunk
+
+
+async def run_benchmark(args):
+    cache_dir = tempfile.mkdtemp(prefix="ingestion-cache-")
+    cache = DocumentChunkCache(cache_dir)
+
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        for attempt in ("cold", "cached"):
+            started = time.perf_counter()
+            staged = await stage_upload(_read_file(args.pdf), max_bytes=os.path.getsize(args.pdf) + 1)
+
+            pages = 0
+            characters = 0
+            entry = cache.open_entry(staged.sha256)
+            if entry is not None:
+                for chunk in cache.iter_chunks(entry):
+                    pages += 1
+                    characters += len(chunk.text)
+            else:
+                page_count = await count_pdf_pages(staged.path, executor)
+                async for chunk in ingest_pdf(
+                    staged, page_count, executor, cache,
+                    pages_per_task=args.pages_per_task,
+                    max_pending_tasks=args.max_pending_tasks
+                ):
+                    pages += 1
+                    characters += len(chunk.text)
+            os.remove(staged.path)
+
+            elapsed = time.perf_counter() - started
+            print(
+                f"{attempt:>6}: {pages} pages, {characters} chars in {elapsed:.2f}s "
+                f"({pages / elapsed:.1f} pages/s)"
+            )
+
+    #NOTE: ru_maxrss is reported in kilobytes on Linux
+    parent_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    child_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    print(f"peak RSS: api process {parent_rss:.1f} MB, largest pool worker {child_rss:.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", required=True, help="Path to the PDF to ingest")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--pages-per-task", type=int, default=25)
+    parser.add_argument("--max-pending-tasks", type=int, default=4)
+    asyncio.run(run_benchmark(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Benchmark of the slide generation pipeline replayed from recorded LLM responses, offline.
+
+- **record**: generates `--decks` decks of `--slides` slides from synthetic source content
+  of `--content-tokens` tokens and stores every LLM response in `--fixtures` with
+  `RecordingChatModel`. Records from `--model` (needs the provider's API key) or, with
+  `--simulate`, from a local model streaming at `--simulate-first-token` seconds to the
+  first chunk and `--simulate-tokens-per-second`. The run's parameters are kept in
+  `run.json` next to the fixtures.
+- **replay**: generates the same decks from the fixtures with `ReplayChatModel`, through
+  the production wrappers (provider guard, usage metering), once per `--concurrency`.
+  Reports per run: deck wall-clock time, LLM calls, peak calls in flight, tokens and
+  credits. `--output` saves the results as JSON; `--baseline` compares with a saved run,
+  e.g. of the previous commit.
+
+Run from the `src` directory:
+
+```
+python -m api.benchmarks.generation_replay_benchmark record --fixtures /tmp/fixtures --model anthropic:claude-3-7-sonnet-latest
+python -m api.benchmarks.generation_replay_benchmark replay --fixtures /tmp/fixtures --concurrency 1 4 10 --output head.json --baseline base.json
+```
+"""
+import json
+import time
+import random
+import asyncio
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+
+from langchain_core.messages import AIMessageChunk
+
+from api.src.usage_metering import MICROCREDITS_PER_CREDIT, MeteredChatModel, get_usage_recorder
+from api.src.resilience import GuardedChatModel, get_dependency, llm_dependency_name
+from api.src.llm_recording import FixtureStore, RecordingChatModel, ReplayChatModel
+from api.src.api_components.slide_generation.slide_generation import build_slide_generation_graph, generate_slides
+from api.src.prompts import model_provider
+
+CHARS_PER_TOKEN = 4
+RUN_FILE = "run.json"
+INSTRUCTIONS = "Audience: the board. Keep it short."
+WORDS = ["revenue", "market", "quarter", "growth", "customer", "product", "strategy", "team", "launch", "risk"]
+
+
+def make_content(content_tokens: int, seed: int) -> str:
+    generator = random.Random(seed)
+    return " ".join(generator.choice(WORDS) for _ in range(content_tokens * CHARS_PER_TOKEN // 8))
+
+
+class SimulatedChatModel:
+    """
+    Local stand-in for a provider that streams answers with a fixed time to first chunk and token rate.
+    """
+
+    def __init__(self, first_token: float, tokens_per_second: float, seed: int = 0):
+        self.first_token = first_token
+        self.tokens_per_second = tokens_per_second
+        self._random = random.Random(seed)
+
+    async def astream(self, messages, config=None, **kwargs):
+        prompt = messages[-1].content
+        input_tokens = sum(len(str(message.content)) for message in messages) // CHARS_PER_TOKEN
+        if "Number of slides: " in prompt:
+            count = int(prompt.split("Number of slides: ", 1)[1].split("\n", 1)[0])
+            text = json.dumps([{"title": f"Slide {index + 1}", "brief": "Simulated"} for index in range(count)])
+        else:
+            body = " ".join(self._random.choice(WORDS) for _ in range(self._random.randint(200, 400)))
+            text = f"```tsx\nconst Slide = () => (\n    <div className=\"w-[1920px] h-[1080px]\">{body}</div>\n);\n```"
+
+        await asyncio.sleep(self.first_token)
+        pieces = [text[start:start + 64] for start in range(0, len(text), 64)]
+        for index, piece in enumerate(pieces):
+            await asyncio.sleep(len(piece) / CHARS_PER_TOKEN / self.tokens_per_second)
+            last = index == len(pieces) - 1
+            yield AIMessageChunk(content=piece, usage_metadata={
+                "input_tokens": input_tokens if index == 0 else 0,
+                "output_tokens": len(text) // CHARS_PER_TOKEN if last else 0,
+                "total_tokens": (input_tokens if index == 0 else 0) + (len(text) // CHARS_PER_TOKEN if last else 0),
+            })
+
+
+class InFlightCounter:
+    """
+    Counts the calls in flight through a chat model and keeps the peak.
+    """
+
+    def __init__(self, llm):
+        self.llm = llm
+        self.in_flight = 0
+        self.peak = 0
+
+    async def ainvoke(self, *args, **kwargs):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            return await self.llm.ainvoke(*args, **kwargs)
+        finally:
+            self.in_flight -= 1
+
+
+async def generate_decks(llm, run: dict, concurrency: int) -> list[float]:
+    graph = build_slide_generation_graph(llm, max_retries=run["max_retries"], provider=model_provider(run["model"]))
+    wall_clock = []
+    for deck in range(run["decks"]):
+        started = time.perf_counter()
+        await generate_slides(
+            graph,
+            content=make_content(run["content_tokens"], seed=deck),
+            instructions=INSTRUCTIONS,
+            slide_count=run["slides"],
+            max_concurrency=concurrency
+        )
+        wall_clock.append(time.perf_counter() - started)
+    return wall_clock
+
+
+async def record(args):
+    from langchain.chat_models import init_chat_model
+
+    fixtures_dir = Path(args.fixtures)
+    run = {"model": args.model, "decks": args.decks, "slides": args.slides, "content_tokens": args.content_tokens, "max_retries": args.max_retries}
+    if args.simulate:
+        chat_model = SimulatedChatModel(args.simulate_first_token, args.simulate_tokens_per_second)
+    else:
+        chat_model = init_chat_model(args.model, max_retries=0)
+    llm = MeteredChatModel(RecordingChatModel(chat_model, args.model, FixtureStore(fixtures_dir)), args.model)
+
+    wall_clock = await generate_decks(llm, run, args.concurrency)
+    get_usage_recorder()._buffer.clear()
+    (fixtures_dir / RUN_FILE).write_text(json.dumps(run, indent=2))
+    print(f"recorded {args.decks} decks of {args.slides} slides from {args.model} into {fixtures_dir}, "
+          f"deck p50 {statistics.median(wall_clock):.2f}s")
+
+
+async def replay_once(run: dict, store: FixtureStore, args, concurrency: int) -> dict:
+    counter = InFlightCounter(ReplayChatModel(run["model"], store, speed=args.speed, first_token_seconds=args.first_token))
+    llm = MeteredChatModel(GuardedChatModel(counter, get_dependency(llm_dependency_name(run["model"]))), run["model"])
+
+    recorder = get_usage_recorder()
+    recorder._buffer.clear()
+    wall_clock = await generate_decks(llm, run, concurrency)
+    events = list(recorder._buffer)
+    recorder._buffer.clear()
+
+    return {
+        "concurrency": concurrency,
+        "deck_p50_seconds": statistics.median(wall_clock),
+        "deck_max_seconds": max(wall_clock),
+        "llm_calls": len(events),
+        "peak_in_flight": counter.peak,
+        "input_tokens": sum(event[2] for event in events),
+        "output_tokens": sum(event[3] for event in events),
+        "credits": sum(event[4] for event in events) / MICROCREDITS_PER_CREDIT,
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results: list[dict], baseline: dict | None):
+    print(f"{'concurrency':>11} | {'deck p50 (s)':>12} | {'deck max (s)':>12} | {'calls':>5} | {'peak':>4} | {'input':>9} | {'output':>7} | {'credits':>8}")
+    for result in results:
+        print(f"{result['concurrency']:>11} | {result['deck_p50_seconds']:>12.2f} | {result['deck_max_seconds']:>12.2f} | "
+              f"{result['llm_calls']:>5} | {result['peak_in_flight']:>4} | {result['input_tokens']:>9,} | "
+              f"{result['output_tokens']:>7,} | {result['credits']:>8.2f}")
+        previous = baseline and next((row for row in baseline["results"] if row["concurrency"] == result["concurrency"]), None)
+        if previous:
+            change = (result["deck_p50_seconds"] / previous["deck_p50_seconds"] - 1) * 100
+            print(f"{'vs ' + str(baseline.get('commit') or 'baseline'):>11} | {change:>+11.1f}% | {'':>12} | "
+                  f"{result['llm_calls'] - previous['llm_calls']:>+5} | {result['peak_in_flight'] - previous['peak_in_flight']:>+4} | "
+                  f"{result['input_tokens'] - previous['input_tokens']:>+9,} | {result['output_tokens'] - previous['output_tokens']:>+7,} | "
+                  f"{result['credits'] - previous['credits']:>+8.2f}")
+
+
+async def replay(args):
+    fixtures_dir = Path(args.fixtures)
+    run = json.loads((fixtures_dir / RUN_FILE).read_text())
+    print(f"replaying {run['decks']} decks of {run['slides']} slides recorded from {run['model']}, speed {args.speed}")
+
+    results = []
+    for concurrency in args.concurrency:
+        #NOTE: A fresh store per run, so requests seen several times replay their responses from the first
+        results.append(await replay_once(run, FixtureStore(fixtures_dir), args, concurrency))
+
+    baseline = json.loads(Path(args.baseline).read_text()) if args.baseline else None
+    print_results(results, baseline)
+    if args.output:
+        Path(args.output).write_text(json.dumps({"commit": git_commit(), "run": run, "speed": args.speed, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = commands.add_parser("record")
+    record_parser.add_argument("--fixtures", required=True)
+    record_parser.add_argument("--model", default="anthropic:claude-3-7-sonnet-latest")
+    record_parser.add_argument("--decks", type=int, default=3)
+    record_parser.add_argument("--slides", type=int, default=10)
+    record_parser.add_argument("--content-tokens", type=int, default=4000)
+    record_parser.add_argument("--concurrency", type=int, default=4)
+    record_parser.add_argument("--max-retries", type=int, default=2)
+    record_parser.add_argument("--simulate", action="store_true", help="Record from a local simulated model instead of the provider")
+    record_parser.add_argument("--simulate-first-token", type=float, default=0.8)
+    record_parser.add_argument("--simulate-tokens-per-second", type=float, default=60.0)
+
+    replay_parser = commands.add_parser("replay")
+    replay_parser.add_argument("--fixtures", required=True)
+    replay_parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 10])
+    replay_parser.add_argument("--speed", type=float, default=1.0, help="Recorded delays are divided by this; 0 replays without delay")
+    replay_parser.add_argument("--first-token", type=float, default=None, help="Time to the first chunk instead of the recorded one")
+    replay_parser.add_argument("--output", help="Save the results as JSON")
+    replay_parser.add_argument("--baseline", help="Results saved by an earlier run to compare with")
+
+    args = parser.parse_args()
+    asyncio.run(record(args) if args.command == "record" else replay(args))
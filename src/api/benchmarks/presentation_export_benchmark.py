@@ -0,0 +1,100 @@
+"""
+Benchmark of PPTX export for 10-, 50- and 200-slide decks.
+
+Measures the first build in a fresh worker (template parse included), warm builds
+with the cached template, and repeated downloads served from the export cache.
+First checks the extracted title of slides whose text sits next to `{expressions}`.
+Run from the `src` directory:
+
+```
+python -m api.benchmarks.presentation_export_benchmark --slide-counts 10 50 200
+```
+"""
+import time
+import shutil
+import asyncio
+import argparse
+import tempfile
+import multiprocessing
+
+from concurrent.futures import ProcessPoolExecutor
+
+from common.utils import extract_slide_title_and_body
+from api.src.api_components.presentation_export.presentation_export import PresentationExporter
+
+SLIDE_CODE = """
+const Slide = () => {
+    return (
+        <div className="w-[1920px] h-[1080px] bg-[#0038FF] text-white relative">
+            <h1 className="font-['Inter_Tight'] text-[110px]">Quarterly review {INDEX}</h1>
+            <p className="text-[32px]">Revenue grew across all regions compared to the previous quarter.</p>
+            <ul>
+                <li>Enterprise pipeline up 24%</li>
+                <li>Churn reduced to 2.1%</li>
+                <li>Two new markets launched</li>
+            </ul>
+        </div>
+    );
+};
+"""
+
+
+def _deck(slide_count: int, revision: int) -> list[dict]:
+    return [
+        {"id": f"slide-{index + 1}", "code": SLIDE_CODE.replace("{INDEX}", f"{index + 1}.{revision}")}
+        for index in range(slide_count)
+    ]
+
+
+def check_extraction():
+    """
+    Checks the text exported for slides whose text sits next to `{expressions}`.
+    """
+    title, body = extract_slide_title_and_body("<h1 className=\"text-5xl\">Q3 {year} Results</h1><p>Up {pct}% on last year</p>")
+    assert title == "Q3 Results", title
+    assert body == ["Up", "% on last year"], body
+    title, _ = extract_slide_title_and_body(SLIDE_CODE)
+    assert title == "Quarterly review", title
+
+
+async def run_benchmark(args):
+    check_extraction()
+    cache_dir = tempfile.mkdtemp(prefix="export-cache-")
+    print(f"{'slides':>6} | {'cold build (s)':>14} | {'warm build (s)':>14} | {'cache hit (ms)':>14}")
+    print("-" * 58)
+
+    try:
+        for slide_count in args.slide_counts:
+            #NOTE: A fresh pool per size so the cold build includes the template parse
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+                exporter = PresentationExporter(cache_dir, executor)
+
+                started = time.perf_counter()
+                await exporter.export("Benchmark", _deck(slide_count, revision=0))
+                cold = time.perf_counter() - started
+
+                warm_runs = []
+                for revision in range(1, args.repeats + 1):
+                    started = time.perf_counter()
+                    await exporter.export("Benchmark", _deck(slide_count, revision=revision))
+                    warm_runs.append(time.perf_counter() - started)
+
+                started = time.perf_counter()
+                _, cached = await exporter.export("Benchmark", _deck(slide_count, revision=0))
+                cache_hit = (time.perf_counter() - started) * 1000
+                assert cached
+
+            print(f"{slide_count:>6} | {cold:>14.3f} | {min(warm_runs):>14.3f} | {cache_hit:>14.2f}")
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--slide-counts", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--repeats", type=int, default=3, help="Warm builds per deck size")
+    asyncio.run(run_benchmark(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
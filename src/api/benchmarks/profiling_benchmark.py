@@ -0,0 +1,127 @@
+"""
+Benchmark of the overhead of the profiling middleware per request.
+
+A FastAPI app with two routes is driven directly over ASGI, `--concurrency` requests
+at a time, under each profiling mode:
+
+- **off**: the middleware is not installed (the default)
+- **idle**: installed with a secret, but the request is not profiled (a header lookup)
+- **continuous**: `--continuous-rate` of requests profiled at the coarse 10 ms interval,
+  stacks summed per route
+- **token**: every request profiled at 1 ms and stored as a session file
+
+Routes: `/small` returns a tiny JSON object; `/work` encodes about 2 ms worth of JSON
+and awaits 2 ms, like a handler with one database query. Reported per mode: CPU time
+per request (the cost that matters), throughput, and p50/p99 latency. Run from the
+`src` directory:
+
+```
+python -m api.benchmarks.profiling_benchmark --requests 5000 --continuous-rate 0.01
+```
+"""
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+
+from fastapi import FastAPI
+
+from api.src.profiling import HotStacks, ProfileStore, ProfilingMiddleware, sign_token
+
+SECRET = "benchmark-secret"
+PAYLOAD = [{"id": index, "title": f"Slide {index}", "tags": ["revenue", "growth", "roadmap"] * 4} for index in range(300)]
+
+
+def make_app(mode: str, directory: str, continuous_rate: float) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/small")
+    async def small():
+        return {"ok": True}
+
+    @app.get("/work")
+    async def work():
+        encoded = ""
+        for _ in range(8):
+            encoded = json.dumps(PAYLOAD)
+        await asyncio.sleep(0.002)
+        return {"bytes": len(encoded)}
+
+    if mode != "off":
+        app.add_middleware(
+            ProfilingMiddleware,
+            store=ProfileStore(directory, max_profiles=100),
+            hot_stacks=HotStacks(),
+            secret=SECRET,
+            continuous_rate=continuous_rate if mode == "continuous" else 0.0
+        )
+    return app
+
+
+async def call(app, path: str, headers: list[tuple[bytes, bytes]]) -> float:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+        "root_path": "", "headers": headers, "client": ("127.0.0.1", 1), "server": ("test", 80)
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    started = time.perf_counter()
+    await app(scope, receive, send)
+    return time.perf_counter() - started
+
+
+async def run_mode(mode: str, path: str, args) -> str:
+    with tempfile.TemporaryDirectory(prefix="profiling-benchmark-") as directory:
+        app = make_app(mode, directory, args.continuous_rate)
+        headers = [(b"host", b"test")]
+        if mode == "token":
+            headers.append((b"x-profile-token", sign_token(SECRET, int(time.time()) + 3600).encode()))
+        for _ in range(20):
+            await call(app, path, headers)
+
+        semaphore = asyncio.Semaphore(args.concurrency)
+        latencies = []
+
+        async def one():
+            async with semaphore:
+                latencies.append(await call(app, path, headers))
+
+        cpu_started, started = time.process_time(), time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(args.requests)))
+        elapsed, cpu = time.perf_counter() - started, time.process_time() - cpu_started
+        #NOTE: Stored sessions are written by threads after each response
+        await asyncio.sleep(0.1)
+
+    latencies.sort()
+    return (
+        f"{path:>6} {mode:>10} | CPU {cpu / args.requests * 1e6:>7.0f} us/req | {args.requests / elapsed:>7.0f} req/s | "
+        f"p50 {statistics.median(latencies) * 1000:>6.2f} ms | p99 {latencies[int(len(latencies) * 0.99)] * 1000:>6.2f} ms"
+    )
+
+
+async def run_benchmark(args):
+    for path in ("/small", "/work"):
+        for mode in args.modes:
+            print(await run_mode(mode, path, args))
+        print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--continuous-rate", type=float, default=0.01)
+    parser.add_argument("--modes", nargs="+", choices=["off", "idle", "continuous", "token"], default=["off", "idle", "continuous", "token"])
+    asyncio.run(run_benchmark(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Benchmark of prompt prefix caching in deck generation, against a fake provider.
+
+The fake provider models a provider's prefix cache and its effect on latency and price:
+
+- **explicit** (Anthropic): prefixes ending at a `cache_control` breakpoint are cached
+  once the call that sent them starts answering; a later prompt reads the longest
+  cached breakpoint. Writes are billed at the `cache_write` rate
+- **automatic** (OpenAI, Gemini): every prompt's prefixes are cached in 128-token steps
+  past the first 1,024 tokens; a later prompt reads the longest match
+- **off**: nothing is cached, the cost of the same prompts without caching
+
+Time to first token is `--base-latency` plus `--prefill-ms` per 1,000 uncached input
+tokens; cached tokens take `--cached-prefill-ratio` of that. Output streams at
+`--output-ms` per 1,000 tokens. Decks of `--slides` slides are generated from source
+content of `--content-tokens` tokens through `build_slide_generation_graph`, `--decks`
+times per mode. Reported per mode and stage: input tokens read from cache, written to it
+and uncached; the credits charged (`LLM_CREDIT_RATES` via `price_usage`) and the deck's
+wall-clock time. Run from the `src` directory:
+
+```
+python -m api.benchmarks.prompt_cache_benchmark --slides 10 --content-tokens 20000
+```
+"""
+import time
+import random
+import asyncio
+import hashlib
+import argparse
+import statistics
+from dataclasses import dataclass, field
+
+from langchain_core.messages import AIMessage
+
+from api.src.prompts import model_provider
+from api.src.usage_metering import PROMPT_CACHE_TOKENS, MeteredChatModel, get_usage_recorder
+from api.src.api_components.slide_generation.slide_generation import (
+    OUTLINE_PROMPT,
+    SLIDE_PROMPT,
+    build_slide_generation_graph,
+    generate_slides,
+)
+
+CHARS_PER_TOKEN = 4
+MIN_CACHEABLE_TOKENS = 1024
+AUTOMATIC_CACHE_STEP_TOKENS = 128
+
+MODES = {
+    "off": {"model": "anthropic:claude-3-7-sonnet-latest", "cache": None},
+    "explicit": {"model": "anthropic:claude-3-7-sonnet-latest", "cache": "explicit"},
+    "automatic": {"model": "openai:gpt-4.1", "cache": "automatic"},
+}
+
+FAKE_SLIDE_CODE = "```tsx\nconst Slide = () => (\n    <div className=\"w-[1920px] h-[1080px]\">{0}</div>\n);\n```"
+
+
+def tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN
+
+
+def flatten(messages) -> list[tuple[str, bool]]:
+    """
+    Returns the prompt as text blocks in order, each with whether it ends at a cache breakpoint.
+    """
+    blocks = []
+    for message in messages:
+        content = message.content
+        if isinstance(content, str):
+            blocks.append((content, False))
+            continue
+        for block in content:
+            blocks.append((block["text"], "cache_control" in block))
+    return blocks
+
+
+@dataclass
+class FakeCachingProvider:
+    cache: str | None
+    base_latency: float
+    prefill_seconds_per_token: float
+    cached_prefill_ratio: float
+    output_seconds_per_token: float
+    cached_prefixes: set = field(default_factory=set)
+
+    def _lookup(self, blocks: list[tuple[str, bool]]) -> tuple[int, list[tuple[str, int]]]:
+        """
+        Returns the cached tokens the prompt reads and the prefixes it writes, as (hash, tokens).
+        """
+        candidates = []
+        if self.cache == "explicit":
+            text = ""
+            for block, breakpoint in blocks:
+                text += block
+                if breakpoint and tokens(text) >= MIN_CACHEABLE_TOKENS:
+                    candidates.append((hashlib.sha256(text.encode()).hexdigest(), tokens(text)))
+        elif self.cache == "automatic":
+            text = "".join(block for block, _ in blocks)
+            for length in range(MIN_CACHEABLE_TOKENS, tokens(text) + 1, AUTOMATIC_CACHE_STEP_TOKENS):
+                prefix = text[:length * CHARS_PER_TOKEN]
+                candidates.append((hashlib.sha256(prefix.encode()).hexdigest(), length))
+
+        cached = max((length for key, length in candidates if key in self.cached_prefixes), default=0)
+        writes = [(key, length) for key, length in candidates if key not in self.cached_prefixes]
+        return cached, writes
+
+    async def ainvoke(self, messages, **kwargs):
+        blocks = flatten(messages)
+        input_tokens = sum(tokens(block) for block, _ in blocks)
+        cached, writes = self._lookup(blocks)
+        #NOTE: Explicit caching bills the newly cached span as a write; automatic caching writes for free
+        written = max((length for _, length in writes), default=cached) - cached if self.cache == "explicit" else 0
+
+        uncached = input_tokens - cached
+        await asyncio.sleep(self.base_latency + self.prefill_seconds_per_token * (uncached + cached * self.cached_prefill_ratio))
+        #NOTE: The prefix is readable by other calls once this one starts answering
+        self.cached_prefixes.update(key for key, _ in writes)
+
+        prompt = blocks[-1][0]
+        if "Number of slides:" in prompt:
+            count = int(prompt.split("Number of slides: ", 1)[1].split("\n", 1)[0])
+            text = "[" + ",".join(f'{{"title": "Slide {index + 1}", "brief": "Brief"}}' for index in range(count)) + "]"
+        else:
+            text = FAKE_SLIDE_CODE.format("x" * random.randint(2000, 4000))
+        output_tokens = tokens(text)
+        await asyncio.sleep(self.output_seconds_per_token * output_tokens)
+
+        return AIMessage(content=text, usage_metadata={
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+            "input_token_details": {"cache_read": cached, "cache_creation": written},
+        })
+
+
+def make_content(content_tokens: int, seed: int) -> str:
+    generator = random.Random(seed)
+    words = ["revenue", "market", "quarter", "growth", "customer", "product", "strategy", "team", "launch", "risk"]
+    text = []
+    while tokens(" ".join(text)) < content_tokens:
+        text.append(generator.choice(words))
+    return " ".join(text)
+
+
+async def run_mode(args, mode: str) -> dict:
+    config = MODES[mode]
+    provider = FakeCachingProvider(
+        cache=config["cache"],
+        base_latency=args.base_latency,
+        prefill_seconds_per_token=args.prefill_ms / 1000 / 1000,
+        cached_prefill_ratio=args.cached_prefill_ratio,
+        output_seconds_per_token=args.output_ms / 1000 / 1000
+    )
+    llm = MeteredChatModel(provider, config["model"])
+    #NOTE: With caching off the prompts carry no breakpoints, as for a provider without explicit caching
+    cache_provider = model_provider(config["model"]) if config["cache"] else None
+    graph = build_slide_generation_graph(llm, max_retries=0, provider=cache_provider)
+
+    recorder = get_usage_recorder()
+    recorder._buffer.clear()
+    wall_clock = []
+    for deck in range(args.decks):
+        started = time.perf_counter()
+        await generate_slides(
+            graph,
+            content=make_content(args.content_tokens, seed=deck),
+            instructions="Audience: the board. Keep it short.",
+            slide_count=args.slides,
+            max_concurrency=args.slides
+        )
+        wall_clock.append(time.perf_counter() - started)
+
+    events = list(recorder._buffer)
+    recorder._buffer.clear()
+    return {"model": config["model"], "events": events, "wall_clock": wall_clock}
+
+
+def print_results(args, results: dict):
+    print(f"{args.decks} decks of {args.slides} slides from {args.content_tokens:,} content tokens")
+    print(f"{'mode':<10} {'model':<36} {'stage':<28} {'read':>10} {'write':>10} {'uncached':>10}")
+    for mode, result in results.items():
+        for stage in (OUTLINE_PROMPT.stage, SLIDE_PROMPT.stage):
+            counts = [result["cache_tokens"][stage][outcome] for outcome in ("read", "write", "uncached")]
+            print(f"{mode:<10} {result['model']:<36} {stage:<28} {counts[0]:>10,.0f} {counts[1]:>10,.0f} {counts[2]:>10,.0f}")
+
+    print()
+    print(f"{'mode':<10} {'credits per deck':>16} {'deck p50 (s)':>13} {'deck max (s)':>13}")
+    for mode, result in results.items():
+        credits = sum(cost for _, _, _, _, cost, _ in result["events"]) / 1_000_000 / args.decks
+        print(f"{mode:<10} {credits:>16.2f} {statistics.median(result['wall_clock']):>13.2f} {max(result['wall_clock']):>13.2f}")
+
+
+async def main(args):
+    results = {}
+    for mode in args.modes:
+        before = {
+            stage: {outcome: PROMPT_CACHE_TOKENS.value(stage=stage, outcome=outcome) for outcome in ("read", "write", "uncached")}
+            for stage in (OUTLINE_PROMPT.stage, SLIDE_PROMPT.stage)
+        }
+        result = await run_mode(args, mode)
+        result["cache_tokens"] = {
+            stage: {outcome: PROMPT_CACHE_TOKENS.value(stage=stage, outcome=outcome) - before[stage][outcome] for outcome in outcomes}
+            for stage, outcomes in before.items()
+        }
+        results[mode] = result
+    print_results(args, results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    parser.add_argument("--decks", type=int, default=5)
+    parser.add_argument("--slides", type=int, default=10)
+    parser.add_argument("--content-tokens", type=int, default=20000)
+    parser.add_argument("--base-latency", type=float, default=0.4, help="Time to first token of an empty prompt, in seconds")
+    parser.add_argument("--prefill-ms", type=float, default=100.0, help="Prefill time per 1,000 uncached input tokens")
+    parser.add_argument("--cached-prefill-ratio", type=float, default=0.1, help="Prefill time of a cached token relative to an uncached one")
+    parser.add_argument("--output-ms", type=float, default=20000.0, help="Generation time per 1,000 output tokens")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,117 @@
+"""
+Benchmark of circuit breakers and bulkheads against a faulty dependency.
+
+A local fake dependency serves HTTP and injects faults in three phases:
+
+- **healthy**: answers in `--latency` seconds
+- **failing**: answers 500 after `--latency` seconds
+- **hanging**: answers only after `--hang` seconds, beyond the client timeout
+
+Each phase sends `--requests` calls, `--concurrency` at a time, once unguarded (a plain
+httpx call with `--timeout`) and once inside `Dependency.guard()` with the given policy.
+Reported per phase: p50/p99 latency of the callers, calls that reached the dependency,
+and how calls ended. Run from the `src` directory:
+
+```
+python -m api.benchmarks.resilience_benchmark --requests 400 --concurrency 50
+```
+"""
+import time
+import asyncio
+import argparse
+import statistics
+from collections import Counter
+
+import httpx
+
+from api.src.resilience import Dependency, DependencyPolicy
+
+FAULTS = {"calls": 0, "mode": "healthy"}
+
+
+async def serve_dependency(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, args):
+    try:
+        await reader.readuntil(b"\r\n\r\n")
+        FAULTS["calls"] += 1
+        if FAULTS["mode"] == "hanging":
+            await asyncio.sleep(args.hang)
+        else:
+            await asyncio.sleep(args.latency)
+        status = b"500 Internal Server Error" if FAULTS["mode"] == "failing" else b"200 OK"
+        writer.write(b"HTTP/1.1 " + status + b"\r\ncontent-length: 2\r\nconnection: close\r\n\r\n{}")
+        await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+        #NOTE: Callers that timed out hang up; hanging responses still pending at exit are cancelled
+        pass
+    finally:
+        writer.close()
+
+
+async def run_phase(mode: str, guarded: bool, client: httpx.AsyncClient, url: str, args) -> str:
+    FAULTS["mode"], FAULTS["calls"] = mode, 0
+    dependency = Dependency(f"benchmark-{mode}", DependencyPolicy(
+        window_seconds=10.0,
+        min_calls=args.min_calls,
+        slow_call_seconds=args.timeout,
+        open_seconds=60.0,
+        max_concurrent=args.max_concurrent,
+        max_wait_seconds=args.max_wait,
+        timeout_seconds=args.timeout
+    ))
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies, outcomes = [], Counter()
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                if guarded:
+                    async with dependency.guard():
+                        response = await client.get(url)
+                        response.raise_for_status()
+                else:
+                    response = await client.get(url)
+                    response.raise_for_status()
+                outcomes["ok"] += 1
+            except Exception as e:
+                outcomes[type(e).__name__] += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return (
+        f"{mode:>8} {'guarded' if guarded else 'unguarded':>9} | {elapsed:>6.2f} s | "
+        f"p50 {statistics.median(latencies) * 1000:>7.1f} ms | p99 {latencies[int(len(latencies) * 0.99)] * 1000:>7.1f} ms | "
+        f"upstream calls {FAULTS['calls']:>4} | {dict(outcomes.most_common())}"
+    )
+
+
+async def run_benchmark(args):
+    server = await asyncio.start_server(lambda reader, writer: serve_dependency(reader, writer, args), "127.0.0.1", 0)
+    url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/"
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with server, httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        for mode in ("healthy", "failing", "hanging"):
+            for guarded in (False, True):
+                print(await run_phase(mode, guarded, client, url, args))
+            print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.02, help="Response time of the dependency")
+    parser.add_argument("--hang", type=float, default=5.0, help="Response time of the hanging dependency")
+    parser.add_argument("--timeout", type=float, default=1.0, help="Client timeout per call")
+    parser.add_argument("--min-calls", type=int, default=20)
+    parser.add_argument("--max-concurrent", type=int, default=16)
+    parser.add_argument("--max-wait", type=float, default=0.5)
+    asyncio.run(run_benchmark(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
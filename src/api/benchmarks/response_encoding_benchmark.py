@@ -0,0 +1,132 @@
+"""
+Benchmark of response encoding and compression for deck payloads from 1 KB to 5 MB.
+
+Encoders compared for a `GenerateSlidesResponse`:
+
+- **default**: FastAPI's path for a returned model (`dump_python(mode="json")` + `json.dumps`)
+- **orjson**: the same dump, encoded by `ORJSONResponse`
+- **direct**: `PydanticResponse` (`model_dump()` encoded by orjson, no re-validation)
+- **to_json**: pydantic-core's own serializer, for reference
+
+Then bytes on the wire and compression time for gzip and brotli at the configured
+levels. Run from the `src` directory:
+
+```
+python -m api.benchmarks.response_encoding_benchmark --sizes 1000 100000 1000000 5000000
+```
+"""
+import json
+import time
+import random
+import argparse
+
+from pydantic import TypeAdapter
+from fastapi.responses import ORJSONResponse
+
+from api.src.compression import brotli, compress_body
+from api.src.responses import PydanticResponse
+from api.src.api_components.slide_generation.models import GenerateSlidesResponse, SlideData
+
+WORDS = (
+    "revenue growth market strategy customer product roadmap quarter launch team "
+    "platform pricing retention analytics design research partner vision hiring"
+).split()
+
+SLIDE_TEMPLATE = """const Slide = () => {{
+    return (
+        <div className="w-[1920px] h-[1080px] bg-[#0038FF] text-white flex flex-col justify-center px-[200px]">
+            <h1 className="font-['Inter_Tight'] text-[110px] font-bold">{title}</h1>
+            <ul className="mt-[60px] space-y-[24px] text-[36px]">
+{bullets}
+            </ul>
+        </div>
+    );
+}};
+"""
+
+
+def _make_slide(index: int, rng: random.Random) -> SlideData:
+    title = " ".join(rng.choice(WORDS) for _ in range(4)).title()
+    bullets = "\n".join(
+        f"                <li>{' '.join(rng.choice(WORDS) for _ in range(rng.randint(6, 14)))}</li>"
+        for _ in range(rng.randint(3, 6))
+    )
+    return SlideData(id=f"slide-{index}", code=SLIDE_TEMPLATE.format(title=title, bullets=bullets))
+
+
+def make_payload(target_bytes: int) -> GenerateSlidesResponse:
+    rng = random.Random(target_bytes)
+    slides = []
+    size = 0
+    while size < target_bytes:
+        slide = _make_slide(len(slides), rng)
+        slides.append(slide)
+        size += len(slide.code) + 40
+    return GenerateSlidesResponse(slides=slides)
+
+
+def _time(function, repeat: int) -> tuple[float, bytes]:
+    """Returns the fastest of `repeat` runs in milliseconds, and the last result."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000, result
+
+
+def run_benchmark(args):
+    adapter = TypeAdapter(GenerateSlidesResponse)
+
+    def default_encode(model):
+        content = adapter.dump_python(model, mode="json")
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+    def orjson_encode(model):
+        return ORJSONResponse(adapter.dump_python(model, mode="json")).body
+
+    def direct_encode(model):
+        return PydanticResponse(model).body
+
+    def to_json_encode(model):
+        return model.__pydantic_serializer__.to_json(model)
+
+    print(
+        f"{'payload':>9} | {'default (ms)':>12} | {'orjson (ms)':>11} | {'direct (ms)':>11} | {'to_json (ms)':>12} | "
+        f"{'gzip bytes':>10} | {'gzip (ms)':>9} | {'br bytes':>9} | {'br (ms)':>7}"
+    )
+    print("-" * 115)
+
+    for size in args.sizes:
+        model = make_payload(size)
+        repeat = max(5, min(200, 3_000_000 // size))
+
+        default_ms, body = _time(lambda: default_encode(model), repeat)
+        orjson_ms, _ = _time(lambda: orjson_encode(model), repeat)
+        direct_ms, direct_body = _time(lambda: direct_encode(model), repeat)
+        to_json_ms, _ = _time(lambda: to_json_encode(model), repeat)
+        assert json.loads(direct_body) == json.loads(body)
+
+        gzip_ms, gzip_body = _time(lambda: compress_body(body, "gzip", gzip_level=args.gzip_level), repeat)
+        if brotli is not None:
+            br_ms, br_body = _time(lambda: compress_body(body, "br", brotli_quality=args.brotli_quality), repeat)
+            br_columns = f"{len(br_body):>9} | {br_ms:>7.2f}"
+        else:
+            br_columns = f"{'n/a':>9} | {'n/a':>7}"
+
+        print(
+            f"{len(body):>9} | {default_ms:>12.2f} | {orjson_ms:>11.2f} | {direct_ms:>11.2f} | {to_json_ms:>12.2f} | "
+            f"{len(gzip_body):>10} | {gzip_ms:>9.2f} | {br_columns}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000, 5_000_000])
+    parser.add_argument("--gzip-level", type=int, default=6)
+    parser.add_argument("--brotli-quality", type=int, default=6)
+    run_benchmark(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
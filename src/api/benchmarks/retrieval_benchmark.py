@@ -0,0 +1,161 @@
+"""
+Benchmark of retrieval over long source content: index build, cache reuse, search latency
+and how much smaller slide prompts get.
+
+The corpus is `--pages` synthetic pages of about 500 tokens in `--topics` sections, each
+section mixing common words with its own vocabulary. Phases:
+
+- **build**: chunk and embed the corpus with `DocumentRetriever.get_index` in a process pool
+  of `--workers`, and store the index
+- **reuse**: the same content again, from the worker's memory and from disk (a new worker)
+- **search**: `slide_excerpts` for `--queries` slide titles and briefs, each about one
+  section; precision is the share of retrieved chunks from that section
+- **prompt size**: estimated source tokens per deck of `--slides` slides, whole content
+  in every prompt versus outline and slide excerpts
+
+Run from the `src` directory:
+
+```
+python -m api.benchmarks.retrieval_benchmark --pages 1000 --workers 4
+```
+
+Indexes are written to a temporary directory that is deleted afterwards.
+"""
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import statistics
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from api.src.api_components.slide_generation.retrieval import (
+    DocumentIndexCache,
+    DocumentRetriever,
+    LocalHashingEmbeddings,
+    estimate_tokens,
+)
+
+COMMON_WORDS = 400
+TOPIC_WORDS = 60
+WORDS_PER_PAGE = 250
+
+
+def make_word(generator: random.Random) -> str:
+    syllables = ["ka", "lo", "mi", "ren", "sa", "tor", "vel", "qui", "dan", "ph", "ex", "ul", "zo", "bri", "ne"]
+    return "".join(generator.choice(syllables) for _ in range(generator.randint(2, 4)))
+
+
+def make_corpus(pages: int, topics: int, seed: int = 0) -> tuple[str, list[list[str]]]:
+    """
+    Returns the corpus and each topic's vocabulary.
+    """
+    generator = random.Random(seed)
+    common = [make_word(generator) for _ in range(COMMON_WORDS)]
+    vocabularies = [[make_word(generator) for _ in range(TOPIC_WORDS)] for _ in range(topics)]
+
+    paragraphs = []
+    for page in range(pages):
+        topic = page * topics // pages
+        for _ in range(3):
+            words = [
+                generator.choice(vocabularies[topic]) if generator.random() < 0.3 else generator.choice(common)
+                for _ in range(WORDS_PER_PAGE // 3)
+            ]
+            paragraphs.append(". ".join(" ".join(words[start:start + 12]) for start in range(0, len(words), 12)) + ".")
+    return "\n\n".join(paragraphs), vocabularies
+
+
+def chunk_topic(chunk: str, vocabularies: list[set[str]]) -> int:
+    words = chunk.replace(".", " ").split()
+    return max(range(len(vocabularies)), key=lambda topic: sum(word in vocabularies[topic] for word in words))
+
+
+def make_retriever(args, executor, directory: str) -> DocumentRetriever:
+    return DocumentRetriever(
+        LocalHashingEmbeddings(args.dimensions, get_executor=lambda: executor),
+        embedding_model=f"local:{args.dimensions}",
+        cache=DocumentIndexCache(directory),
+        min_content_tokens=1,
+        chunk_tokens=args.chunk_tokens,
+        batch_size=args.batch_size,
+        max_concurrent_batches=args.workers,
+        top_k=args.top_k,
+        outline_chunks=args.outline_chunks
+    )
+
+
+def percentiles(latencies: list[float]) -> str:
+    latencies = sorted(latencies)
+    return f"p50 {statistics.median(latencies):7.2f} ms  p99 {latencies[int(len(latencies) * 0.99) - 1]:7.2f} ms"
+
+
+async def main(args):
+    content, vocabularies = make_corpus(args.pages, args.topics)
+    vocabulary_sets = [set(vocabulary) for vocabulary in vocabularies]
+    print(f"corpus: {args.pages} pages, {estimate_tokens(content):,} tokens, {len(content) / 1e6:.1f} MB")
+
+    executor = ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context("spawn"))
+    with tempfile.TemporaryDirectory() as directory:
+        retriever = make_retriever(args, executor, directory)
+        #NOTE: Starts the pool's workers, so the build below does not count process startup
+        await retriever.embeddings.aembed_documents(["warm up"] * args.workers)
+
+        started = time.perf_counter()
+        index = await retriever.get_index(content)
+        print(f"build                {time.perf_counter() - started:8.2f} s   {len(index.chunks):,} chunks, "
+              f"{index.matrix.nbytes / 1e6:.1f} MB matrix")
+
+        started = time.perf_counter()
+        await retriever.get_index(content)
+        print(f"reuse, memory        {(time.perf_counter() - started) * 1000:8.2f} ms  (hashes the content)")
+
+        started = time.perf_counter()
+        reloaded = await make_retriever(args, executor, directory).get_index(content)
+        print(f"reuse, disk          {(time.perf_counter() - started) * 1000:8.2f} ms  (new worker, memory-mapped)")
+
+        generator = random.Random(1)
+        search_latencies, query_latencies, precisions = [], [], []
+        for _ in range(args.queries):
+            topic = generator.randrange(args.topics)
+            title = " ".join(generator.sample(vocabularies[topic], 3))
+            brief = " ".join(generator.sample(vocabularies[topic], 6))
+
+            started = time.perf_counter()
+            query = await retriever._query(f"{title}\n{brief}")
+            positions = reloaded.search(query, args.top_k)
+            query_latencies.append((time.perf_counter() - started) * 1000)
+
+            started = time.perf_counter()
+            reloaded.search(query, args.top_k)
+            search_latencies.append((time.perf_counter() - started) * 1000)
+            precisions.append(sum(chunk_topic(reloaded.chunks[position], vocabulary_sets) == topic for position in positions) / len(positions))
+
+        print(f"search               {percentiles(search_latencies)}  (matrix-vector product and top {args.top_k})")
+        print(f"embed query + search {percentiles(query_latencies)}")
+        print(f"precision@{args.top_k}          {statistics.mean(precisions):8.2f}")
+
+        outline = await retriever.outline_excerpts(index, "Focus on the risks")
+        slide = await retriever.slide_excerpts(index, title, brief)
+        whole = estimate_tokens(content) * (args.slides + 1)
+        retrieved = estimate_tokens(outline) + estimate_tokens(slide) * args.slides
+        print(f"prompt size          whole content {whole:,} source tokens per deck of {args.slides} slides, "
+              f"with retrieval {retrieved:,} ({whole / retrieved:,.0f}x smaller)")
+        print(f"                     outline {estimate_tokens(outline):,} tokens, slide {estimate_tokens(slide):,} tokens")
+    executor.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--topics", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--dimensions", type=int, default=2048)
+    parser.add_argument("--chunk-tokens", type=int, default=400)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--top-k", type=int, default=8)
+    parser.add_argument("--outline-chunks", type=int, default=24)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--slides", type=int, default=10)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,103 @@
+"""
+Benchmark of the slide generation graph against a fake LLM backend.
+
+Shows how deck wall-clock time scales with slide count for different
+parallelism limits. Run from the `src` directory:
+
+```
+python -m api.benchmarks.slide_generation_benchmark --latency 0.5 --slide-counts 5 10 20 40
+```
+"""
+import re
+import json
+import time
+import random
+import asyncio
+import argparse
+
+from langchain_core.messages import AIMessage
+
+from api.src.api_components.slide_generation.slide_generation import (
+    build_slide_generation_graph,
+    generate_slides,
+)
+
+SLIDE_COUNT_PATTERN = re.compile(r"Number of slides: (\d+)")
+
+FAKE_SLIDE_CODE = """```tsx
+const Slide = () => {
+    return (
+        <div className="w-[1920px] h-[1080px] bg-white">
+            <h1 className="text-[96px]">Benchmark slide</h1>
+        </div>
+    );
+};
+```"""
+
+
+class FakeChatModel:
+    """Chat model stand-in with a fixed latency per call and optional invalid outputs."""
+
+    def __init__(self, latency: float, jitter: float = 0.0, invalid_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.invalid_rate = invalid_rate
+        self.calls = 0
+        self._random = random.Random(seed)
+
+    async def ainvoke(self, messages, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency + self._random.uniform(0, self.jitter))
+
+        prompt = messages[-1].content
+        match = SLIDE_COUNT_PATTERN.search(prompt)
+        if match:
+            outline = [
+                {"title": f"Slide {index + 1}", "brief": "Benchmark content"}
+                for index in range(int(match.group(1)))
+            ]
+            return AIMessage(content=json.dumps(outline))
+
+        if self._random.random() < self.invalid_rate:
+            return AIMessage(content="I could not create this slide.")
+        return AIMessage(content=FAKE_SLIDE_CODE)
+
+
+async def run_benchmark(args):
+    print(f"fake LLM latency={args.latency}s jitter={args.jitter}s invalid_rate={args.invalid_rate}")
+    print(f"{'slides':>6} | {'concurrency':>11} | {'llm calls':>9} | {'wall clock (s)':>14} | {'sequential est. (s)':>19}")
+    print("-" * 72)
+
+    for slide_count in args.slide_counts:
+        for concurrency in args.concurrency:
+            llm = FakeChatModel(args.latency, args.jitter, args.invalid_rate)
+            graph = build_slide_generation_graph(llm, max_retries=args.max_retries)
+
+            started = time.perf_counter()
+            slides = await generate_slides(
+                graph,
+                content="Benchmark content",
+                instructions=None,
+                slide_count=slide_count,
+                max_concurrency=concurrency
+            )
+            elapsed = time.perf_counter() - started
+
+            assert [slide.id for slide in slides] == [f"slide-{i + 1}" for i in range(slide_count)]
+            sequential = (slide_count + 1) * args.latency
+            print(f"{slide_count:>6} | {concurrency:>11} | {llm.calls:>9} | {elapsed:>14.2f} | {sequential:>19.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.5, help="Fake LLM latency per call in seconds")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Random extra latency per call in seconds")
+    parser.add_argument("--invalid-rate", type=float, default=0.0, help="Share of slide outputs that fail validation")
+    parser.add_argument("--max-retries", type=int, default=2)
+    parser.add_argument("--slide-counts", type=int, nargs="+", default=[5, 10, 20, 40])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    asyncio.run(run_benchmark(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
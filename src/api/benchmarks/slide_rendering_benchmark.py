@@ -0,0 +1,73 @@
+"""
+Benchmark of server-side slide thumbnail rendering with a warm browser pool.
+
+Reports slides rendered per second with 1, 4 and 8 pooled contexts. Every slide
+is unique, so the thumbnail cache is bypassed. Run from the `src` directory inside
+the API image (Chromium and the vendor bundles are installed there):
+
+```
+python -m api.benchmarks.slide_rendering_benchmark --slides 96 --contexts 1 4 8
+```
+"""
+import time
+import asyncio
+import argparse
+
+from api.src.api_components.slide_rendering.slide_rendering import SlideRenderPool
+
+SLIDE_CODE = """
+const Slide = () => {
+    return (
+        <div className="w-[1920px] h-[1080px] bg-[#0038FF] text-white flex flex-col justify-center px-[200px]">
+            <h1 className="font-['Inter_Tight'] text-[110px] font-bold">Benchmark slide {INDEX}</h1>
+            <p className="text-[32px] opacity-80">Server-side rendering throughput test.</p>
+        </div>
+    );
+};
+"""
+
+
+async def run_benchmark(args):
+    print(f"{'contexts':>8} | {'batch size':>10} | {'slides':>6} | {'wall clock (s)':>14} | {'slides/s':>8}")
+    print("-" * 60)
+
+    for contexts in args.contexts:
+        pool = SlideRenderPool(
+            vendor_dir=args.vendor_dir,
+            browsers=args.browsers,
+            contexts_per_browser=max(1, contexts // args.browsers),
+            batch_size=args.batch_size,
+            max_waiters=args.slides,
+            acquire_timeout=600
+        )
+        await pool.start()
+        try:
+            #NOTE: Warm-up render so browser start-up is not counted
+            await pool.render_thumbnails([SLIDE_CODE.replace("{INDEX}", "warm-up")], width=args.width)
+
+            codes = [SLIDE_CODE.replace("{INDEX}", f"{contexts}-{index}") for index in range(args.slides)]
+            started = time.perf_counter()
+            results = await pool.render_thumbnails(codes, width=args.width)
+            elapsed = time.perf_counter() - started
+
+            failed = sum(1 for image, _ in results if image is None)
+            if failed:
+                print(f"warning: {failed} slides failed to render")
+            print(f"{pool.size:>8} | {args.batch_size:>10} | {args.slides:>6} | {elapsed:>14.2f} | {args.slides / elapsed:>8.1f}")
+        finally:
+            await pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vendor-dir", default="/app/static/vendor")
+    parser.add_argument("--slides", type=int, default=96)
+    parser.add_argument("--contexts", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--browsers", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=12)
+    parser.add_argument("--width", type=int, default=480)
+    asyncio.run(run_benchmark(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+"""
+Admission control: per-user/per-route rate limits and concurrency caps.
+
+Every non-exempt request is checked before it reaches a route handler (and before it
+can take a database connection):
+
+1. **Concurrency caps**: a worker-wide cap (`ADMISSION_MAX_IN_FLIGHT`, sized below the
+   database pools) and optional per-route caps. A full cap sheds the request with
+   429 and `Retry-After` immediately instead of queueing it.
+2. **Rate limits**: token buckets (in their GCRA form: one timestamp per bucket) keyed
+   by route and by the JWT `sub`, or by client IP for unauthenticated requests.
+   Routes listed in `ROUTE_LIMITS` are enforced across all uvicorn workers via the
+   `rate_limit_buckets` table; every other route gets a per-worker default bucket.
+"""
+import json
+import math
+import time
+import asyncio
+
+from loguru import logger
+from dataclasses import dataclass
+from collections import OrderedDict
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from starlette.routing import compile_path
+
+from common.database import pool_options
+from api.src.metrics import REGISTRY
+from api.src.background_tasks import spawn_background_task
+from api.src.api_components.token_validator.token_validator import decode_token
+
+ADMISSION_DECISIONS = REGISTRY.counter(
+    "admission_decisions_total",
+    "Admission decisions by rule, outcome and deciding backend",
+    ("rule", "decision", "source")
+)
+ADMISSION_IN_FLIGHT = REGISTRY.gauge(
+    "admission_in_flight",
+    "Requests currently admitted, per concurrency cap",
+    ("cap",)
+)
+RATE_LIMIT_BACKEND_SECONDS = REGISTRY.histogram(
+    "rate_limit_backend_seconds",
+    "Latency of shared rate limit checks"
+)
+RATE_LIMIT_BACKEND_ERRORS = REGISTRY.counter(
+    "rate_limit_backend_errors_total",
+    "Shared rate limit checks that failed open"
+)
+
+ACQUIRE_BUCKET_SQL = text("""
+INSERT INTO rate_limit_buckets AS b (key, tat, admitted)
+VALUES (:key, now() + make_interval(secs => :interval), true)
+ON CONFLICT (key) DO UPDATE SET
+    admitted = greatest(b.tat, now()) + make_interval(secs => :interval) <= now() + make_interval(secs => :tolerance),
+    tat = CASE
+        WHEN greatest(b.tat, now()) + make_interval(secs => :interval) <= now() + make_interval(secs => :tolerance)
+        THEN greatest(b.tat, now()) + make_interval(secs => :interval)
+        ELSE b.tat
+    END
+RETURNING admitted, extract(epoch FROM greatest(tat, now()) + make_interval(secs => :interval) - now()) - :tolerance
+""")
+
+PRUNE_BUCKETS_SQL = text("DELETE FROM rate_limit_buckets WHERE tat < now() - interval '1 hour'")
+
+
+# ===============
+# Rules
+# ===============
+
+@dataclass(frozen=True)
+class RouteLimit:
+    name: str
+    methods: frozenset[str]
+    path: str
+    rate: float
+    burst: int
+    max_in_flight: int | None = None
+    long_lived: bool = False
+
+    @classmethod
+    def from_config(cls, config: dict) -> "RouteLimit":
+        return cls(
+            name=config["name"],
+            methods=frozenset(method.upper() for method in config["methods"]),
+            path=config["path"],
+            rate=config["rate"],
+            burst=config["burst"],
+            max_in_flight=config.get("max_in_flight"),
+            long_lived=config.get("long_lived", False)
+        )
+
+    def __post_init__(self):
+        object.__setattr__(self, "_pattern", compile_path(self.path)[0])
+
+    def matches(self, method: str, path: str) -> bool:
+        return method in self.methods and self._pattern.match(path) is not None
+
+
+# ===============
+# Rate Limiters
+# ===============
+
+class LocalRateLimiter:
+    """
+    Token buckets in process memory. Holds at most `max_keys` buckets; the least
+    recently used are dropped first (a dropped bucket is simply full again).
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._tats: OrderedDict[str, float] = OrderedDict()
+
+    def acquire_now(self, key: str, rate: float, burst: int) -> float:
+        """
+        Takes one token. Returns 0.0 if admitted, otherwise the seconds until a token is available.
+        """
+        now = time.monotonic()
+        interval = 1.0 / rate
+        tolerance = burst * interval
+
+        next_tat = max(self._tats.get(key, now), now) + interval
+        if next_tat - now > tolerance:
+            return next_tat - now - tolerance
+
+        self._tats[key] = next_tat
+        self._tats.move_to_end(key)
+        if len(self._tats) > self.max_keys:
+            self._tats.popitem(last=False)
+        return 0.0
+
+    async def acquire(self, key: str, rate: float, burst: int) -> tuple[float, str]:
+        return self.acquire_now(key, rate, burst), "local"
+
+    async def close(self):
+        pass
+
+
+class PostgresRateLimiter:
+    """
+    Token buckets shared by all workers in the `rate_limit_buckets` table.
+
+    Each check is one atomic upsert. Two in-process fast paths avoid the round trip:
+    a local bucket with the same limits rejects requests this worker alone already
+    exceeds, and a rejected key is remembered until its `Retry-After` has passed, so
+    a client hammering a route is turned away without touching the database. If the
+    database is slow or unavailable the check fails open.
+    """
+
+    def __init__(self, engine: AsyncEngine, timeout: float = 0.25, prune_interval: float = 600.0):
+        self.engine = engine
+        self.timeout = timeout
+        self.prune_interval = prune_interval
+        self.local = LocalRateLimiter()
+        self._denied_until: dict[str, float] = {}
+        self._next_prune = time.monotonic() + prune_interval
+
+    async def acquire(self, key: str, rate: float, burst: int) -> tuple[float, str]:
+        now = time.monotonic()
+        denied_until = self._denied_until.get(key)
+        if denied_until is not None:
+            if denied_until > now:
+                return denied_until - now, "local"
+            del self._denied_until[key]
+
+        retry_after = self.local.acquire_now(key, rate, burst)
+        if retry_after > 0:
+            return retry_after, "local"
+
+        started = time.perf_counter()
+        try:
+            admitted, retry_after = await asyncio.wait_for(self._acquire_shared(key, rate, burst), self.timeout)
+        except Exception as e:
+            RATE_LIMIT_BACKEND_ERRORS.inc()
+            logger.warning(f"Shared rate limit check failed open for {key}: {e}")
+            return 0.0, "fail_open"
+        finally:
+            RATE_LIMIT_BACKEND_SECONDS.observe(time.perf_counter() - started)
+
+        if now > self._next_prune:
+            self._next_prune = now + self.prune_interval
+            spawn_background_task(self._prune(), name="rate-limit-prune")
+
+        if admitted:
+            return 0.0, "shared"
+
+        retry_after = max(float(retry_after), 0.001)
+        if len(self._denied_until) > self.local.max_keys:
+            self._denied_until = {k: v for k, v in self._denied_until.items() if v > now}
+        self._denied_until[key] = now + retry_after
+        return retry_after, "shared"
+
+    async def _acquire_shared(self, key: str, rate: float, burst: int) -> tuple[bool, float]:
+        interval = 1.0 / rate
+        async with self.engine.begin() as connection:
+            row = (await connection.execute(ACQUIRE_BUCKET_SQL, {
+                "key": key,
+                "interval": interval,
+                "tolerance": burst * interval,
+            })).one()
+        return row[0], row[1]
+
+    async def close(self):
+        await self.engine.dispose()
+
+    async def _prune(self):
+        try:
+            async with self.engine.begin() as connection:
+                await connection.execute(PRUNE_BUCKETS_SQL)
+        except Exception as e:
+            logger.warning(f"Pruning rate limit buckets failed: {e}")
+
+
+def create_postgres_rate_limiter(database_url: str, pool_size: int, timeout: float) -> PostgresRateLimiter:
+    """
+    Creates a shared limiter with its own small pool, so limit checks never wait on
+    (or add to) the application's database pool.
+    """
+    engine = create_async_engine(
+        database_url,
+        **pool_options(pool_size=pool_size, max_overflow=0, pool_timeout=timeout),
+        pool_pre_ping=True,
+        connect_args={"statement_cache_size": 0}
+    )
+    return PostgresRateLimiter(engine, timeout=timeout)
+
+
+# ===============
+# Middleware
+# ===============
+
+class AdmissionControlMiddleware:
+    """
+    ASGI middleware applying concurrency caps and rate limits before routing.
+    """
+
+    def __init__(
+        self,
+        app,
+        route_limiter: PostgresRateLimiter | LocalRateLimiter,
+        route_limits: list[RouteLimit],
+        default_rate: float,
+        default_burst: int,
+        max_in_flight: int,
+        exempt_paths: set[str] = frozenset(),
+        path_prefixes: tuple[str, ...] = ("/v1", "/latest")
+    ):
+        self.app = app
+        self.route_limiter = route_limiter
+        self.default_limiter = LocalRateLimiter()
+        self.route_limits = route_limits
+        self.default_rate = default_rate
+        self.default_burst = default_burst
+        self.max_in_flight = max_in_flight
+        self.exempt_paths = exempt_paths
+        self.path_prefixes = path_prefixes
+        self._in_flight: dict[str, int] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = self._strip_prefix(scope["path"])
+        if path in self.exempt_paths or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        rule = next((limit for limit in self.route_limits if limit.matches(scope["method"], path)), None)
+        rule_name = rule.name if rule is not None else "default"
+
+        #NOTE: Long-lived streams hold no database connection, so they do not count against the worker-wide cap
+        caps = [] if rule is not None and rule.long_lived else [("global", self.max_in_flight)]
+        if rule is not None and rule.max_in_flight is not None:
+            caps.append((rule.name, rule.max_in_flight))
+        for cap, limit in caps:
+            if self._in_flight.get(cap, 0) >= limit:
+                ADMISSION_DECISIONS.inc(rule=rule_name, decision="concurrency_limited", source=cap)
+                await self._reject(send, "CONCURRENCY_LIMITED", "Server is busy, retry shortly.", 1.0)
+                return
+
+        #NOTE: Slots are taken before the (possibly awaiting) rate limit check so concurrent requests cannot overshoot a cap
+        self._enter(caps)
+        try:
+            subject = self._subject(scope)
+            if rule is not None:
+                retry_after, source = await self.route_limiter.acquire(f"{rule.name}:{subject}", rule.rate, rule.burst)
+            else:
+                retry_after, source = self.default_limiter.acquire_now(f"default:{subject}", self.default_rate, self.default_burst), "local"
+
+            if retry_after > 0:
+                ADMISSION_DECISIONS.inc(rule=rule_name, decision="rate_limited", source=source)
+                await self._reject(send, "RATE_LIMITED", "Too many requests, retry later.", retry_after)
+                return
+
+            ADMISSION_DECISIONS.inc(rule=rule_name, decision="admitted", source=source)
+            await self.app(scope, receive, send)
+        finally:
+            self._leave(caps)
+
+    def _enter(self, caps: list[tuple[str, int]]):
+        for cap, _ in caps:
+            self._in_flight[cap] = self._in_flight.get(cap, 0) + 1
+            ADMISSION_IN_FLIGHT.inc(cap=cap)
+
+    def _leave(self, caps: list[tuple[str, int]]):
+        for cap, _ in caps:
+            self._in_flight[cap] -= 1
+            ADMISSION_IN_FLIGHT.dec(cap=cap)
+
+    def _strip_prefix(self, path: str) -> str:
+        for prefix in self.path_prefixes:
+            if path == prefix or path.startswith(prefix + "/"):
+                return path[len(prefix):] or "/"
+        return path
+
+    def _subject(self, scope) -> str:
+        """
+        Returns `user:<sub>` for a valid bearer token, otherwise `ip:<client address>`.
+        The verified payload is stored on the request so `validate_token` does not decode it again.
+        """
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                if scheme.lower() == "bearer" and token:
+                    try:
+                        payload = decode_token(token)
+                    except Exception:
+                        break
+                    if payload.get("sub"):
+                        scope.setdefault("state", {})["verified_token"] = (token, payload)
+                        return f"user:{payload['sub']}"
+                break
+
+        client = scope.get("client")
+        return f"ip:{client[0] if client else 'unknown'}"
+
+    async def _reject(self, send, error_type: str, message: str, retry_after: float):
+        body = json.dumps({"detail": {"message": message, "error_type": error_type}}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("ascii")),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode("ascii")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
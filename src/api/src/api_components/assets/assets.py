@@ -0,0 +1,437 @@
+"""
+Image assets (avatars, slide images): streamed to S3-compatible storage, deduplicated by
+content hash, resized in the process pool and delivered through signed URLs.
+
+1. The request body is hashed, spooled to a temporary file for resizing and streamed to
+   the bucket at the same time. Once `part_size` bytes have arrived a multipart upload
+   starts, with at most one part uploading while the next fills, so an upload never holds
+   more than about two parts in memory. Smaller files are sent with one `PutObject`.
+2. When the body ends its SHA-256 is known. If an asset with that hash exists it is
+   returned and the multipart upload is aborted; nothing new is stored.
+3. Otherwise the process pool decodes the temporary file into WebP variants while the
+   original finishes uploading, and the variants are stored next to it.
+"""
+import os
+import uuid
+import asyncio
+import hashlib
+import tempfile
+
+from loguru import logger
+from dataclasses import dataclass
+from concurrent.futures import Executor
+from typing import Any, AsyncIterator
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from common.models.asset import Asset
+from api.src.metrics import REGISTRY
+from api.src.utils import ExceptionWithErrorType
+from api.src.api_components.assets.images import InvalidImageError, make_variants
+from api.src.api_components.document_ingestion.document_ingestion import remove_staged_file
+
+ORIGINAL_VARIANT = "original"
+VARIANT_CONTENT_TYPE = "image/webp"
+#NOTE: Object keys are never reused for other content, so caches may keep them forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+IMAGE_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+SNIFF_BYTES = 12
+#NOTE: Upload chunks are small; writing them to disk in batches keeps thread hand-offs few
+STAGE_WRITE_BYTES = 1024 * 1024
+
+ASSET_UPLOADS = REGISTRY.counter(
+    "asset_uploads_total",
+    "Asset uploads by outcome: `stored`, `deduplicated` or `rejected`",
+    ("outcome",)
+)
+ASSET_UPLOAD_BUFFERED_BYTES = REGISTRY.gauge(
+    "asset_upload_buffered_bytes",
+    "Upload bytes held in memory for S3 parts, across all uploads of the worker"
+)
+
+
+def sniff_image_type(header: bytes) -> str | None:
+    """
+    Returns the content type of a PNG, JPEG, GIF or WebP file from its first bytes.
+    """
+    for signature, content_type in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return content_type
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+# ===============
+# Streaming Upload
+# ===============
+
+class S3ObjectWriter:
+    """
+    Streams one object to S3. Up to `part_size` bytes are buffered; a larger object becomes a
+    multipart upload with one part in flight while the next fills. Nothing is visible in
+    the bucket until `complete()`.
+    """
+
+    def __init__(self, client, bucket: str, key: str, part_size: int, content_type: str | None = None):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self.content_type = content_type
+        self.upload_id: str | None = None
+        self._buffer = bytearray()
+        self._parts: list[dict[str, Any]] = []
+        self._pending: asyncio.Future | None = None
+        self._completed = False
+
+    async def write(self, chunk: bytes):
+        self._buffer += chunk
+        ASSET_UPLOAD_BUFFERED_BYTES.inc(len(chunk))
+        if len(self._buffer) >= self.part_size:
+            #NOTE: Hands the buffer over instead of slicing it, so a part is never copied
+            part, self._buffer = self._buffer, bytearray()
+            await self._start_part(part)
+
+    async def _start_part(self, body: bytearray):
+        if self.upload_id is None:
+            response = await asyncio.to_thread(
+                self.client.create_multipart_upload,
+                Bucket=self.bucket,
+                Key=self.key,
+                ContentType=self.content_type,
+                CacheControl=IMMUTABLE_CACHE_CONTROL
+            )
+            self.upload_id = response["UploadId"]
+        if self._pending is not None:
+            await self._pending
+        self._pending = asyncio.ensure_future(asyncio.to_thread(self._upload_part, len(self._parts) + 1, body))
+
+    def _upload_part(self, number: int, body: bytearray):
+        try:
+            response = self.client.upload_part(
+                Bucket=self.bucket,
+                Key=self.key,
+                UploadId=self.upload_id,
+                PartNumber=number,
+                Body=body
+            )
+        finally:
+            ASSET_UPLOAD_BUFFERED_BYTES.dec(len(body))
+        #NOTE: Parts upload one at a time, so appending from the thread keeps them in order
+        self._parts.append({"PartNumber": number, "ETag": response["ETag"]})
+
+    async def complete(self):
+        if self.upload_id is None:
+            body, self._buffer = self._buffer, bytearray()
+            try:
+                await asyncio.to_thread(
+                    self.client.put_object,
+                    Bucket=self.bucket,
+                    Key=self.key,
+                    Body=body,
+                    ContentType=self.content_type,
+                    CacheControl=IMMUTABLE_CACHE_CONTROL
+                )
+            finally:
+                ASSET_UPLOAD_BUFFERED_BYTES.dec(len(body))
+            self._completed = True
+            return
+
+        if self._buffer:
+            part, self._buffer = self._buffer, bytearray()
+            await self._start_part(part)
+        await self._pending
+        await asyncio.to_thread(
+            self.client.complete_multipart_upload,
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            MultipartUpload={"Parts": self._parts}
+        )
+        self._completed = True
+
+    async def abort(self):
+        """
+        Discards the object unless it was completed. A failed abort leaves parts that the
+        bucket's `AbortIncompleteMultipartUpload` lifecycle rule removes.
+        """
+        if self._completed:
+            return
+        ASSET_UPLOAD_BUFFERED_BYTES.dec(len(self._buffer))
+        self._buffer = bytearray()
+        if self._pending is not None:
+            try:
+                await self._pending
+            except Exception:
+                pass
+        if self.upload_id is not None:
+            upload_id, self.upload_id = self.upload_id, None
+            try:
+                await asyncio.to_thread(
+                    self.client.abort_multipart_upload,
+                    Bucket=self.bucket,
+                    Key=self.key,
+                    UploadId=upload_id
+                )
+            except Exception as e:
+                logger.warning(f"Could not abort multipart upload of {self.key}: {e}")
+
+
+@dataclass
+class ReceivedUpload:
+    path: str
+    sha256: str
+    size_bytes: int
+    writer: S3ObjectWriter
+
+
+def _write_staged(file, digest, data: bytearray):
+    digest.update(data)
+    file.write(data)
+
+
+async def _write_pending(file, digest, writer: S3ObjectWriter, pending: bytearray):
+    await asyncio.to_thread(_write_staged, file, digest, pending)
+    await writer.write(pending)
+    pending.clear()
+
+
+async def receive_upload(
+    chunks: AsyncIterator[bytes],
+    writer: S3ObjectWriter,
+    max_bytes: int,
+    directory: str | None = None
+) -> ReceivedUpload:
+    """
+    Streams an upload into `writer` and a temporary file while hashing it; disk writes and
+    hashing run in a thread. The writer's content type is set from the file's first bytes.
+
+    Raises:
+        ExceptionWithErrorType: RESOURCE_LIMIT_EXCEEDED if the upload is larger than `max_bytes`,
+            UNSUPPORTED_ASSET_TYPE if it is not a PNG, JPEG, GIF or WebP image.
+    """
+    digest = hashlib.sha256()
+    header = b""
+    size = 0
+    pending = bytearray()
+
+    fd, path = tempfile.mkstemp(prefix="asset-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as file:
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ExceptionWithErrorType(
+                        error_type="RESOURCE_LIMIT_EXCEEDED",
+                        message=f"Upload exceeds the maximum size of {max_bytes} bytes.",
+                        status_code=413
+                    )
+
+                if len(header) < SNIFF_BYTES:
+                    header += chunk[:SNIFF_BYTES - len(header)]
+                    if len(header) == SNIFF_BYTES:
+                        writer.content_type = _require_image_type(header)
+                pending += chunk
+                if len(pending) >= STAGE_WRITE_BYTES:
+                    await _write_pending(file, digest, writer, pending)
+
+            if pending:
+                await _write_pending(file, digest, writer, pending)
+
+        if writer.content_type is None:
+            writer.content_type = _require_image_type(header)
+
+    except BaseException:
+        remove_staged_file(path)
+        await writer.abort()
+        raise
+
+    return ReceivedUpload(path=path, sha256=digest.hexdigest(), size_bytes=size, writer=writer)
+
+
+def _require_image_type(header: bytes) -> str:
+    content_type = sniff_image_type(header)
+    if content_type is None:
+        raise ExceptionWithErrorType(
+            error_type="UNSUPPORTED_ASSET_TYPE",
+            message="Uploaded file is not a PNG, JPEG, GIF or WebP image.",
+            status_code=415
+        )
+    return content_type
+
+
+# ===============
+# Store & Deliver
+# ===============
+
+async def store_asset(
+    db: AsyncSession,
+    chunks: AsyncIterator[bytes],
+    user_uuid: uuid.UUID | None,
+    client,
+    bucket: str,
+    executor: Executor,
+    variant_sizes: dict[str, int],
+    max_bytes: int,
+    part_size: int,
+    max_pixels: int,
+    quality: int = 80,
+    directory: str | None = None
+) -> tuple[Asset, bool]:
+    """
+    Stores an uploaded image and its variants. Returns the asset and whether an identical
+    upload already existed (in which case nothing was stored).
+
+    Raises:
+        ExceptionWithErrorType: RESOURCE_LIMIT_EXCEEDED, UNSUPPORTED_ASSET_TYPE (see `receive_upload`),
+            INVALID_ASSET if the image cannot be decoded or has more than `max_pixels` pixels.
+    """
+    asset_id = uuid.uuid4()
+    prefix = f"assets/{asset_id}"
+    writer = S3ObjectWriter(client, bucket, f"{prefix}/{ORIGINAL_VARIANT}", part_size)
+    try:
+        upload = await receive_upload(chunks, writer, max_bytes, directory)
+    except ExceptionWithErrorType:
+        ASSET_UPLOADS.inc(outcome="rejected")
+        raise
+
+    keys = [writer.key]
+    try:
+        existing = await db.scalar(select(Asset).where(Asset.sha256 == upload.sha256))
+        if existing is not None:
+            await writer.abort()
+            ASSET_UPLOADS.inc(outcome="deduplicated")
+            return existing, True
+
+        loop = asyncio.get_running_loop()
+        try:
+            width, height, variants = await loop.run_in_executor(
+                executor, make_variants, upload.path, variant_sizes, max_pixels, quality
+            )
+        except InvalidImageError as e:
+            ASSET_UPLOADS.inc(outcome="rejected")
+            logger.info(f"Rejected asset upload {upload.sha256}: {e}")
+            raise ExceptionWithErrorType(
+                error_type="INVALID_ASSET",
+                message=f"The image could not be processed: {e}",
+                status_code=422
+            )
+
+        keys += [f"{prefix}/{name}.webp" for name in variants]
+        await asyncio.gather(
+            writer.complete(),
+            *(
+                asyncio.to_thread(
+                    client.put_object,
+                    Bucket=bucket,
+                    Key=f"{prefix}/{name}.webp",
+                    Body=body,
+                    ContentType=VARIANT_CONTENT_TYPE,
+                    CacheControl=IMMUTABLE_CACHE_CONTROL
+                )
+                for name, (body, _, _) in variants.items()
+            )
+        )
+
+        asset = await db.scalar(
+            pg_insert(Asset)
+            .values(
+                id=asset_id,
+                sha256=upload.sha256,
+                content_type=writer.content_type,
+                size_bytes=upload.size_bytes,
+                width=width,
+                height=height,
+                storage_key=writer.key,
+                variants={
+                    name: {
+                        "key": f"{prefix}/{name}.webp",
+                        "content_type": VARIANT_CONTENT_TYPE,
+                        "width": variant_width,
+                        "height": variant_height,
+                        "size_bytes": len(body)
+                    }
+                    for name, (body, variant_width, variant_height) in variants.items()
+                },
+                created_by=user_uuid
+            )
+            .on_conflict_do_nothing(index_elements=["sha256"])
+            .returning(Asset)
+        )
+        await db.commit()
+    except BaseException:
+        await writer.abort()
+        if len(keys) > 1:
+            await delete_objects(client, bucket, keys)
+        raise
+    finally:
+        remove_staged_file(upload.path)
+
+    if asset is None:
+        #NOTE: An identical upload finished first; keep its objects and drop ours
+        await delete_objects(client, bucket, keys)
+        ASSET_UPLOADS.inc(outcome="deduplicated")
+        return await db.scalar(select(Asset).where(Asset.sha256 == upload.sha256)), True
+
+    ASSET_UPLOADS.inc(outcome="stored")
+    return asset, False
+
+
+async def delete_objects(client, bucket: str, keys: list[str]):
+    try:
+        await asyncio.to_thread(
+            client.delete_objects,
+            Bucket=bucket,
+            Delete={"Objects": [{"Key": key} for key in keys], "Quiet": True}
+        )
+    except Exception as e:
+        logger.warning(f"Could not delete asset objects {keys}: {e}")
+
+
+async def get_asset(db: AsyncSession, asset_id: uuid.UUID) -> Asset:
+    """
+    Raises:
+        ExceptionWithErrorType: ASSET_NOT_FOUND if the asset does not exist.
+    """
+    asset = await db.get(Asset, asset_id)
+    if asset is None:
+        raise ExceptionWithErrorType(
+            error_type="ASSET_NOT_FOUND",
+            message="No asset found with the provided ID.",
+            status_code=404
+        )
+    return asset
+
+
+def variant_key(asset: Asset, variant: str) -> str:
+    """
+    Raises:
+        ExceptionWithErrorType: ASSET_NOT_FOUND if the asset has no such variant.
+    """
+    if variant == ORIGINAL_VARIANT:
+        return asset.storage_key
+    if variant not in asset.variants:
+        raise ExceptionWithErrorType(
+            error_type="ASSET_NOT_FOUND",
+            message=f"The asset has no variant '{variant}'.",
+            status_code=404
+        )
+    return asset.variants[variant]["key"]
+
+
+def signed_url(client, bucket: str, key: str, ttl: int) -> str:
+    """
+    Returns a time-limited GET URL for an object. Computed locally; no request is made.
+    """
+    return client.generate_presigned_url("get_object", Params={"Bucket": bucket, "Key": key}, ExpiresIn=ttl)
@@ -0,0 +1,65 @@
+"""
+Image decoding and resizing for uploaded assets, run in the shared process pool.
+
+Must not import `api.src.settings` (see `api.src.process_pool`).
+"""
+import io
+
+from PIL import Image, ImageOps
+
+#NOTE: EXIF orientations that rotate by 90 or 270 degrees, swapping width and height
+TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+EXIF_ORIENTATION = 0x0112
+
+
+class InvalidImageError(ValueError):
+    """
+    The file cannot be decoded, or is too large to decode.
+    """
+
+
+def make_variants(
+    path: str,
+    sizes: dict[str, int],
+    max_pixels: int,
+    quality: int = 80
+) -> tuple[int, int, dict[str, tuple[bytes, int, int]]]:
+    """
+    Returns the upright width and height of the image at `path` and a WebP copy per entry of
+    `sizes`, fitted into a square of that many pixels (never enlarged).
+
+    Raises:
+        InvalidImageError: if the image cannot be decoded or has more than `max_pixels` pixels;
+            the pixel count is checked from the header, before anything is decoded.
+    """
+    try:
+        return _make_variants(path, sizes, max_pixels, quality)
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError) as e:
+        #NOTE: PIL reports truncated and malformed files with any of these
+        raise InvalidImageError(str(e) or type(e).__name__) from None
+
+
+def _make_variants(path: str, sizes: dict[str, int], max_pixels: int, quality: int):
+    with Image.open(path) as image:
+        width, height = image.size
+        if width * height > max_pixels:
+            raise InvalidImageError(f"Image has {width}x{height} pixels, more than the maximum of {max_pixels}.")
+        if image.getexif().get(EXIF_ORIENTATION, 1) in TRANSPOSED_ORIENTATIONS:
+            width, height = height, width
+
+        #NOTE: JPEGs are decoded at the smallest scale (1/2, 1/4, 1/8) still covering the largest variant
+        largest = max(sizes.values())
+        image.draft("RGB", (largest, largest))
+        current = ImageOps.exif_transpose(image)
+        has_alpha = current.mode in ("RGBA", "LA", "PA") or "transparency" in current.info
+        current = current.convert("RGBA" if has_alpha else "RGB")
+
+    variants = {}
+    #NOTE: Largest first, each variant resized from the previous one rather than from the full image
+    for name, size in sorted(sizes.items(), key=lambda item: item[1], reverse=True):
+        current = current.copy()
+        current.thumbnail((size, size), Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        current.save(buffer, format="WEBP", quality=quality, method=4)
+        variants[name] = (buffer.getvalue(), current.width, current.height)
+    return width, height, variants
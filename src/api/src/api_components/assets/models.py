@@ -0,0 +1,21 @@
+import uuid
+from datetime import datetime
+from pydantic import BaseModel, Field
+
+
+class AssetVariantResponse(BaseModel):
+    url: str = Field(..., description="Signed URL of the object, valid until `urls_expire_at`")
+    link: str = Field(..., description="Stable URL that redirects to a fresh signed URL; safe to store")
+    content_type: str = Field(..., description="MIME type of the object")
+    width: int = Field(..., description="Width in pixels")
+    height: int = Field(..., description="Height in pixels")
+    size_bytes: int = Field(..., description="Size of the object in bytes")
+
+
+class AssetResponse(BaseModel):
+    id: uuid.UUID = Field(..., description="Asset ID")
+    sha256: str = Field(..., description="SHA-256 of the uploaded file")
+    deduplicated: bool = Field(False, description="Whether an identical file was already stored and is returned instead")
+    variants: dict[str, AssetVariantResponse] = Field(..., description="The uploaded `original` and its resized WebP copies, by name")
+    urls_expire_at: datetime = Field(..., description="When the signed URLs stop working")
+    created_at: datetime = Field(..., description="When the asset was first uploaded")
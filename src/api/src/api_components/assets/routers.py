@@ -0,0 +1,187 @@
+import uuid
+import functools
+
+from loguru import logger
+from datetime import datetime, timedelta, timezone
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import RedirectResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from common.models.asset import Asset
+from common.database import get_async_db, get_async_read_db, mark_write
+from api.src.globals import ASSET_VARIANTS
+from api.src.process_pool import get_process_pool
+from api.src.api_components.assets.assets import (
+    ORIGINAL_VARIANT,
+    get_asset,
+    signed_url,
+    store_asset,
+    variant_key,
+)
+from api.src.api_components.assets.models import AssetResponse, AssetVariantResponse
+from api.src.api_components.presentations.presentations import parse_user_uuid
+from api.src.api_components.token_validator.token_validator import validate_token
+from api.src.responses import PydanticResponse
+from api.src.settings import settings
+
+
+router = APIRouter()
+
+
+def _s3_client(endpoint_url: str | None):
+    #NOTE: Imported on first use, so serverless cold starts that never touch assets skip boto3
+    import boto3
+    from botocore.config import Config
+
+    return boto3.client(
+        "s3",
+        region_name=settings.AWS_DEFAULT_REGION,
+        endpoint_url=endpoint_url,
+        config=Config(
+            max_pool_connections=settings.ASSET_S3_MAX_CONNECTIONS,
+            retries={"mode": "standard", "max_attempts": 3},
+            #NOTE: LocalStack and most S3-compatible stores do not resolve bucket subdomains
+            s3={"addressing_style": "path"} if endpoint_url else None
+        )
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def get_s3_client():
+    return _s3_client(settings.ASSET_S3_ENDPOINT_URL)
+
+
+@functools.lru_cache(maxsize=1)
+def get_signing_client():
+    """
+    Client that signs URLs for the host clients reach storage under. Only differs from
+    `get_s3_client` when `ASSET_PUBLIC_ENDPOINT_URL` is set.
+    """
+    if not settings.ASSET_PUBLIC_ENDPOINT_URL:
+        return get_s3_client()
+    return _s3_client(settings.ASSET_PUBLIC_ENDPOINT_URL)
+
+
+def build_asset_response(request: Request, asset: Asset, deduplicated: bool = False) -> AssetResponse:
+    client = get_signing_client()
+    ttl = settings.ASSET_URL_TTL_SECONDS
+    objects = {
+        ORIGINAL_VARIANT: {
+            "key": asset.storage_key,
+            "content_type": asset.content_type,
+            "width": asset.width,
+            "height": asset.height,
+            "size_bytes": asset.size_bytes
+        },
+        **asset.variants
+    }
+    return AssetResponse(
+        id=asset.id,
+        sha256=asset.sha256,
+        deduplicated=deduplicated,
+        variants={
+            name: AssetVariantResponse(
+                url=signed_url(client, settings.ASSET_BUCKET, item["key"], ttl),
+                link=str(request.url_for("redirect_to_asset_variant", asset_id=str(asset.id), variant=name)),
+                content_type=item["content_type"],
+                width=item["width"],
+                height=item["height"],
+                size_bytes=item["size_bytes"]
+            )
+            for name, item in objects.items()
+        },
+        urls_expire_at=datetime.now(timezone.utc) + timedelta(seconds=ttl),
+        created_at=asset.created_at
+    )
+
+
+# ===============
+# Upload
+# ===============
+
+@router.post(
+    "/assets",
+    response_model=AssetResponse,
+    status_code=201,
+    tags=["Assets"]
+)
+async def upload_asset(
+    request: Request,
+    token_payload: dict = Depends(validate_token),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Upload a PNG, JPEG, GIF or WebP image as the raw request body.
+
+    The image is streamed to storage while it arrives and resized into WebP variants
+    (`thumbnail`, `medium`). Uploading a file that is already stored returns the existing
+    asset with `deduplicated: true` and status 200.
+    """
+    user_uuid = parse_user_uuid(token_payload)
+    asset, deduplicated = await store_asset(
+        db,
+        request.stream(),
+        user_uuid,
+        client=get_s3_client(),
+        bucket=settings.ASSET_BUCKET,
+        executor=get_process_pool(),
+        variant_sizes=ASSET_VARIANTS,
+        max_bytes=settings.ASSET_MAX_UPLOAD_BYTES,
+        part_size=settings.ASSET_PART_SIZE_BYTES,
+        max_pixels=settings.ASSET_MAX_PIXELS,
+        quality=settings.ASSET_VARIANT_QUALITY,
+        directory=settings.DOCUMENT_UPLOAD_DIR
+    )
+    await mark_write(db, user_uuid)
+    logger.info(f"Asset {asset.id} {'deduplicated' if deduplicated else 'stored'} (user_id={user_uuid})")
+
+    return PydanticResponse(build_asset_response(request, asset, deduplicated), status_code=200 if deduplicated else 201)
+
+
+# ===============
+# Delivery
+# ===============
+
+@router.get(
+    "/assets/{asset_id}",
+    response_model=AssetResponse,
+    tags=["Assets"]
+)
+async def get_asset_urls(
+    asset_id: uuid.UUID,
+    request: Request,
+    token_payload: dict = Depends(validate_token),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Get an asset's dimensions and fresh signed URLs for the original and every variant.
+    """
+    asset = await get_asset(db, asset_id)
+    return PydanticResponse(build_asset_response(request, asset))
+
+
+@router.get(
+    "/assets/{asset_id}/{variant}",
+    response_class=RedirectResponse,
+    status_code=307,
+    tags=["Assets"]
+)
+async def redirect_to_asset_variant(
+    asset_id: uuid.UUID,
+    variant: str,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Redirect to a signed URL of the original or a variant.
+
+    Needs no token, so the link can be used in `<img>` tags and stored as an avatar URL;
+    the random asset ID is what grants access. Browsers may reuse the redirect for half
+    the URL lifetime.
+    """
+    asset = await get_asset(db, asset_id)
+    url = signed_url(get_signing_client(), settings.ASSET_BUCKET, variant_key(asset, variant), settings.ASSET_URL_TTL_SECONDS)
+    return RedirectResponse(
+        url,
+        status_code=307,
+        headers={"Cache-Control": f"private, max-age={settings.ASSET_URL_TTL_SECONDS // 2}"}
+    )
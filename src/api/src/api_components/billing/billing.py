@@ -1,6 +1,7 @@
 import os
 import traceback
 import uuid
+import stripe
 
 from typing import Dict
 from loguru import logger
@@ -11,9 +12,47 @@ from common import database
 from api.src.utils import ExceptionWithErrorType
 from sqlalchemy.exc import IntegrityError
 from common.models.transaction import Transaction
+from api.src.api_components.notifications.notifications import notify_user_changed
 
 from api.src.settings import settings
 
+_stripe_http_client: stripe.HTTPXClient | None = None
+_stripe_client: stripe.StripeClient | None = None
+
+
+# ===============
+# Stripe Client
+# ===============
+
+def get_stripe_client() -> stripe.StripeClient:
+    """
+    Returns the worker-wide Stripe client, creating it on first use.
+    Requests go through a pooled httpx client, so the `*_async` methods do not block the event loop.
+    """
+    global _stripe_http_client, _stripe_client
+
+    if _stripe_client is None:
+        _stripe_http_client = stripe.HTTPXClient(timeout=settings.STRIPE_TIMEOUT_SECONDS)
+        _stripe_client = stripe.StripeClient(
+            settings.STRIPE_SECRET_KEY.get_secret_value(),
+            http_client=_stripe_http_client,
+            max_network_retries=2
+        )
+
+    return _stripe_client
+
+
+async def close_stripe_client():
+    """
+    Closes the Stripe client's connections if it was created.
+    """
+    global _stripe_http_client, _stripe_client
+
+    if _stripe_http_client is not None:
+        await _stripe_http_client.close_async()
+        _stripe_http_client = None
+        _stripe_client = None
+
 
 # ===============
 # Process Successful Payment
@@ -74,6 +113,8 @@ async def process_successful_payment(session: Dict):
                     user.stripe_customer_id = stripe_customer_id
                     logger.info(f"Linked new Stripe Customer {stripe_customer_id} to user {user_id_str}")
 
+                await notify_user_changed(db, user_uuid, "credits_balance", "stripe_customer_id")
+
                 logger.info(
                     "Transaction processed successfully",
                     extra={
@@ -84,6 +125,8 @@ async def process_successful_payment(session: Dict):
                     }
                 )
 
+            await database.mark_write(db, user_uuid)
+
         except IntegrityError as ie:
             if "stripe_session_id" in str(ie.orig):
                 logger.info(f"Duplicate webhook for session {session_id}, idempotently ignored")
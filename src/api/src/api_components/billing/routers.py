@@ -10,9 +10,11 @@ from fastapi import APIRouter, Depends, Request, Header
 
 from common.models.user import User
 from api.src.globals import CREDIT_OPTIONS
-from common.database import get_async_db
+from common.database import get_async_read_db
 from api.src.utils import ExceptionWithErrorType
-from api.src.api_components.billing.billing import process_successful_payment
+from api.src.resilience import get_dependency
+from api.src.idempotency import IdempotencyClaim, idempotent
+from api.src.api_components.billing.billing import get_stripe_client, process_successful_payment
 from api.src.api_components.token_validator.token_validator import validate_token
 from api.src.api_components.billing.models import (
     CheckoutSessionRequest,
@@ -23,7 +25,6 @@ from api.src.settings import settings
 
 
 router = APIRouter()
-stripe.api_key = settings.STRIPE_SECRET_KEY.get_secret_value()
 
 
 # ===============
@@ -38,8 +39,13 @@ stripe.api_key = settings.STRIPE_SECRET_KEY.get_secret_value()
 async def create_checkout_session(
     request: CheckoutSessionRequest,
     token_payload: Dict = Depends(validate_token),
-    db: AsyncSession = Depends(get_async_db)
+    idempotency: IdempotencyClaim | None = Depends(idempotent("checkout")),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
+    """
+    Creates a Stripe Checkout session for a credit package.
+    Send an `Idempotency-Key` header so retries and double-clicks return the same session.
+    """
     credit_option = request.credit_option
     credit = CREDIT_OPTIONS[credit_option]
 
@@ -59,42 +65,47 @@ async def create_checkout_session(
             message="User not found in the database."
         )
 
+    customer_kwargs = {}
+    if user.stripe_customer_id:
+        customer_kwargs["customer"] = user.stripe_customer_id
+    else:
+        customer_kwargs["customer_email"] = user.email
+        customer_kwargs["customer_creation"] = "always"
+    #NOTE: Return the connection before calling Stripe, so a slow Stripe does not drain the pool
+    await db.close()
+
     try:
-        customer_kwargs = {}
-
-        if user.stripe_customer_id:
-            customer_kwargs["customer"] = user.stripe_customer_id
-        else:
-            customer_kwargs["customer_email"] = user.email
-            customer_kwargs["customer_creation"] = "always"
-
-        checkout_session = stripe.checkout.Session.create(
-            payment_method_types=["card"],
-            line_items=[{
-                "price_data": {
-                    "currency": "usd",
-                    "product_data": {
-                        "name": f"{credit['credits']} AI Credits",
+        async with get_dependency("stripe").guard():
+            checkout_session = await get_stripe_client().v1.checkout.sessions.create_async(params={
+                "payment_method_types": ["card"],
+                "line_items": [{
+                    "price_data": {
+                        "currency": "usd",
+                        "product_data": {
+                            "name": f"{credit['credits']} AI Credits",
+                        },
+                        "unit_amount": credit["price_in_cents"],
                     },
-                    "unit_amount": credit["price_in_cents"],
+                    "quantity": 1,
+                }],
+                "mode": "payment",
+                **customer_kwargs,
+                "metadata": {
+                    "user_id": str(user.id),
+                    "credits": str(credit["credits"]),
+                    "package_id": credit_option,
+                    "env": settings.ENV
                 },
-                "quantity": 1,
-            }],
-            mode="payment",
-            **customer_kwargs,
-            metadata={
-                "user_id": str(user.id),
-                "credits": str(credit["credits"]),
-                "package_id": credit_option,
-                "env": settings.ENV
-            },
-            
-            success_url=f"{settings.APP_URL}/settings/billing?payment=success",
-            cancel_url=f"{settings.APP_URL}/settings/billing?payment=cancelled",
-        )
+
+                "success_url": f"{settings.APP_URL}/settings/billing?payment=success",
+                "cancel_url": f"{settings.APP_URL}/settings/billing?payment=cancelled",
+            }, options={"idempotency_key": idempotency.key} if idempotency else None)
         
         return CheckoutSessionResponse(url=checkout_session.url)
 
+    except ExceptionWithErrorType:
+        raise
+
     except stripe.error.StripeError as e:
         raise ExceptionWithErrorType(
             error_type="STRIPE_GATEWAY_ERROR",
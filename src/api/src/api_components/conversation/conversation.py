@@ -0,0 +1,333 @@
+import math
+import uuid
+import base64
+import binascii
+
+from loguru import logger
+from datetime import datetime
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Sequence
+from sqlalchemy import func, insert, select, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+from common.models.conversation import ChatMessage, ConversationSummary
+from api.src.utils import ExceptionWithErrorType, extract_text_from_response
+from api.src.prompts import PromptTemplate, register_prompt
+
+#NOTE: Role/framing overhead added by providers per message
+TOKENS_PER_MESSAGE_OVERHEAD = 4
+
+SUMMARY_PROMPT = register_prompt(PromptTemplate(
+    name="conversation.summary",
+    version=1,
+    system=(
+        "You maintain a running summary of a conversation between a user and an AI slide editor. "
+        "Merge the previous summary with the new messages. Keep decisions, requested changes, "
+        "open questions and facts about the deck; drop pleasantries. "
+        "Write at most {max_tokens} tokens of plain prose."
+    ),
+    suffix=(
+        "Previous summary:\n{previous_summary}\n\n"
+        "New messages:\n{transcript}"
+    )
+))
+
+Summarizer = Callable[[str | None, Sequence["ContextMessage"]], Awaitable[str]]
+
+
+# ===============
+# Token Counting
+# ===============
+
+def estimate_tokens(text: str) -> int:
+    """
+    Approximates the prompt tokens of a message (about four characters per token).
+    Stored per message on insert, so history is never re-counted.
+    """
+    return math.ceil(len(text) / 4) + TOKENS_PER_MESSAGE_OVERHEAD
+
+
+# ===============
+# Keyset Cursors
+# ===============
+
+def encode_cursor(created_at: datetime, message_id: uuid.UUID) -> str:
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{message_id}".encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    """
+    Raises:
+        ExceptionWithErrorType: INVALID_CURSOR if the cursor was not produced by `encode_cursor`.
+    """
+    try:
+        created_at, message_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|", 1)
+        return datetime.fromisoformat(created_at), uuid.UUID(message_id)
+    except (ValueError, UnicodeError, binascii.Error):
+        raise ExceptionWithErrorType(
+            error_type="INVALID_CURSOR",
+            message="The pagination cursor is invalid.",
+            status_code=400
+        )
+
+
+# ===============
+# Message Storage
+# ===============
+
+async def add_message(
+    db: AsyncSession,
+    presentation_id: uuid.UUID,
+    user_id: uuid.UUID,
+    role: str,
+    content: str
+) -> ChatMessage:
+    """
+    Stores a chat message together with its token count and commits.
+    """
+    result = await db.execute(
+        insert(ChatMessage)
+        .values(
+            presentation_id=presentation_id,
+            user_id=user_id,
+            role=role,
+            content=content,
+            token_count=estimate_tokens(content)
+        )
+        .returning(ChatMessage)
+    )
+    message = result.scalar_one()
+    await db.commit()
+    return message
+
+
+async def list_messages(
+    db: AsyncSession,
+    presentation_id: uuid.UUID,
+    before: str | None,
+    limit: int
+) -> tuple[list[ChatMessage], str | None]:
+    """
+    Returns one page of messages older than the `before` cursor in chronological order,
+    plus the cursor of the next (older) page if there is one.
+    """
+    query = (
+        select(ChatMessage)
+        .where(ChatMessage.presentation_id == presentation_id)
+        .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+        .limit(limit + 1)
+    )
+    if before:
+        created_at, message_id = decode_cursor(before)
+        query = query.where(tuple_(ChatMessage.created_at, ChatMessage.id) < tuple_(created_at, message_id))
+
+    rows = list((await db.execute(query)).scalars())
+    next_cursor = encode_cursor(rows[limit - 1].created_at, rows[limit - 1].id) if len(rows) > limit else None
+    return list(reversed(rows[:limit])), next_cursor
+
+
+# ===============
+# Context Assembly
+# ===============
+
+@dataclass
+class ContextMessage:
+    id: uuid.UUID
+    created_at: datetime
+    role: str
+    content: str
+    token_count: int
+
+
+@dataclass
+class ConversationContext:
+    summary: str | None
+    messages: list[ContextMessage] = field(default_factory=list)
+    token_count: int = 0
+
+    def to_langchain_messages(self) -> list[BaseMessage]:
+        messages: list[BaseMessage] = []
+        if self.summary:
+            messages.append(SystemMessage(content=f"Summary of the earlier conversation:\n{self.summary}"))
+        for message in self.messages:
+            message_class = HumanMessage if message.role == "human" else AIMessage
+            messages.append(message_class(content=message.content))
+        return messages
+
+
+def _context_columns():
+    return (ChatMessage.id, ChatMessage.created_at, ChatMessage.role, ChatMessage.content, ChatMessage.token_count)
+
+
+async def _load_newest_within_budget(
+    db: AsyncSession,
+    presentation_id: uuid.UUID,
+    summary: ConversationSummary | None,
+    budget: int,
+    page_size: int
+) -> tuple[list[ContextMessage], ContextMessage | None]:
+    """
+    Walks unsummarized messages from newest to oldest until `budget` is used up.
+    Returns the fitting messages (newest first) and the first message that did not fit, if any.
+    The newest message is always in the window, even if it alone exceeds `budget`.
+    """
+    window: list[ContextMessage] = []
+    used = 0
+    cursor = None
+
+    while True:
+        query = (
+            select(*_context_columns())
+            .where(ChatMessage.presentation_id == presentation_id)
+            .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+            .limit(page_size)
+        )
+        if summary is not None:
+            query = query.where(
+                tuple_(ChatMessage.created_at, ChatMessage.id)
+                > tuple_(summary.covered_until_created_at, summary.covered_until_message_id)
+            )
+        if cursor is not None:
+            query = query.where(tuple_(ChatMessage.created_at, ChatMessage.id) < cursor)
+
+        rows = [ContextMessage(*row) for row in (await db.execute(query)).all()]
+        for row in rows:
+            if window and used + row.token_count > budget:
+                return window, row
+            window.append(row)
+            used += row.token_count
+
+        if len(rows) < page_size:
+            return window, None
+        cursor = tuple_(rows[-1].created_at, rows[-1].id)
+
+
+async def _fold_into_summary(
+    db: AsyncSession,
+    presentation_id: uuid.UUID,
+    summary: ConversationSummary | None,
+    fold_until: ContextMessage,
+    summarize: Summarizer,
+    page_size: int
+) -> ConversationSummary:
+    """
+    Extends the rolling summary with every unsummarized message up to `fold_until`,
+    one bounded page at a time, and persists the result.
+    """
+    summary_text = summary.summary if summary is not None else None
+    covered = (summary.covered_until_created_at, summary.covered_until_message_id) if summary is not None else None
+    covered_count = (summary.covered_message_count or 0) if summary is not None else 0
+
+    while True:
+        query = (
+            select(*_context_columns())
+            .where(
+                ChatMessage.presentation_id == presentation_id,
+                tuple_(ChatMessage.created_at, ChatMessage.id) <= tuple_(fold_until.created_at, fold_until.id)
+            )
+            .order_by(ChatMessage.created_at, ChatMessage.id)
+            .limit(page_size)
+        )
+        if covered is not None:
+            query = query.where(tuple_(ChatMessage.created_at, ChatMessage.id) > tuple_(*covered))
+
+        batch = [ContextMessage(*row) for row in (await db.execute(query)).all()]
+        if not batch:
+            break
+
+        summary_text = await summarize(summary_text, batch)
+        covered = (batch[-1].created_at, batch[-1].id)
+        covered_count += len(batch)
+
+    values = {
+        "presentation_id": presentation_id,
+        "summary": summary_text,
+        "token_count": estimate_tokens(summary_text),
+        "covered_until_created_at": covered[0],
+        "covered_until_message_id": covered[1],
+        "covered_message_count": covered_count,
+    }
+    statement = pg_insert(ConversationSummary).values(**values)
+    statement = statement.on_conflict_do_update(
+        index_elements=[ConversationSummary.presentation_id],
+        set_={
+            **{key: statement.excluded[key] for key in values if key != "presentation_id"},
+            "updated_at": func.now(),
+        },
+        #NOTE: A concurrent request may already have folded further; never move the summary backwards
+        where=ConversationSummary.covered_until_created_at < statement.excluded.covered_until_created_at
+    )
+    await db.execute(statement)
+    await db.commit()
+
+    logger.info(f"Conversation summary for presentation {presentation_id} now covers {covered_count} messages")
+    return ConversationSummary(**values)
+
+
+async def assemble_context(
+    db: AsyncSession,
+    presentation_id: uuid.UUID,
+    token_budget: int,
+    summarize: Summarizer,
+    retain_ratio: float = 0.5,
+    page_size: int = 50
+) -> ConversationContext:
+    """
+    Builds the prompt history for a presentation's editor chat within `token_budget`.
+
+    The newest messages are kept verbatim; everything older is represented by a rolling
+    summary that is computed incrementally and stored. When the verbatim window overflows,
+    it is folded down to `retain_ratio` of the budget so summarization runs once per
+    `(1 - retain_ratio) * token_budget` tokens of new conversation, not on every turn.
+    Only the window and the stored summary are read, so prompt size and latency stay
+    flat as the conversation grows.
+    """
+    summary = await db.get(ConversationSummary, presentation_id)
+    summary_tokens = summary.token_count if summary is not None else 0
+
+    window, first_overflow = await _load_newest_within_budget(
+        db, presentation_id, summary, token_budget - summary_tokens, page_size
+    )
+
+    if first_overflow is not None:
+        #NOTE: The newest message is the turn being answered; it is never folded into the summary
+        retained: list[ContextMessage] = window[:1]
+        retained_tokens = window[0].token_count
+        for message in window[1:]:
+            if retained_tokens + message.token_count > token_budget * retain_ratio:
+                break
+            retained.append(message)
+            retained_tokens += message.token_count
+
+        #NOTE: Fold everything older than the retained messages, not just the overflow
+        fold_until = window[len(retained)] if len(retained) < len(window) else first_overflow
+        summary = await _fold_into_summary(db, presentation_id, summary, fold_until, summarize, page_size)
+        window = retained
+
+    window.reverse()
+    return ConversationContext(
+        summary=summary.summary if summary is not None else None,
+        messages=window,
+        token_count=(summary.token_count if summary is not None else 0) + sum(m.token_count for m in window)
+    )
+
+
+def make_llm_summarizer(llm, max_tokens: int, provider: str | None = None) -> Summarizer:
+    """
+    Returns a summarizer that merges the previous summary and new messages with `llm`.
+    """
+
+    async def summarize(previous_summary: str | None, messages: Sequence[ContextMessage]) -> str:
+        transcript = "\n".join(f"{message.role}: {message.content}" for message in messages)
+        prompt = SUMMARY_PROMPT.render(
+            provider,
+            max_tokens=max_tokens,
+            previous_summary=previous_summary or "None",
+            transcript=transcript
+        )
+        response = await llm.ainvoke(prompt, stage=SUMMARY_PROMPT.stage)
+        return extract_text_from_response(response, context="conversation.summary")
+
+    return summarize
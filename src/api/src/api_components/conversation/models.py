@@ -0,0 +1,25 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+
+
+class ChatMessageResponse(BaseModel):
+    """A chat message in the format returned by `common.utils.preprocess_messages`."""
+    id: str = Field(..., description="Message identifier")
+    content: str = Field(..., description="Message text")
+    type: str = Field(..., description="human/assistant")
+    role: str = Field(..., description="user/assistant, as used by the frontend ChatInterface")
+    timestamp: str = Field(..., description="ISO 8601 creation time")
+
+
+class ChatHistoryResponse(BaseModel):
+    messages: list[ChatMessageResponse] = Field(..., description="Messages of this page in chronological order")
+    next_cursor: Optional[str] = Field(None, description="Cursor for the next (older) page; null when there is none")
+
+
+class ChatRequest(BaseModel):
+    content: str = Field(..., min_length=1, max_length=20000, description="Message from the user to the slide editor")
+
+
+class ChatResponse(BaseModel):
+    message: ChatMessageResponse = Field(..., description="Assistant reply")
+    context_tokens: int = Field(..., description="Estimated tokens of history sent with the request")
@@ -0,0 +1,166 @@
+import uuid
+import functools
+
+from loguru import logger
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from common.database import get_async_db, get_async_read_db, mark_write
+from common.utils import preprocess_messages
+from api.src.api_components.conversation.conversation import (
+    add_message,
+    assemble_context,
+    estimate_tokens,
+    list_messages,
+    make_llm_summarizer,
+)
+from api.src.api_components.conversation.models import (
+    ChatHistoryResponse,
+    ChatMessageResponse,
+    ChatRequest,
+    ChatResponse,
+)
+from api.src.api_components.presentations.presentations import get_user_presentation, parse_user_uuid
+from api.src.api_components.slide_generation.slide_generation import create_generation_llm
+from api.src.api_components.token_validator.token_validator import validate_token
+from api.src.utils import ExceptionWithErrorType, extract_text_from_response
+from api.src.prompts import PromptTemplate, model_provider, register_prompt
+from api.src.responses import PydanticResponse
+from api.src.usage_metering import usage_user
+from api.src.settings import settings
+
+
+router = APIRouter()
+
+#NOTE: The history follows the deck facts and only grows at its end, so each turn reads the
+# previous turn's prompt from the provider's cache
+EDITOR_PROMPT = register_prompt(PromptTemplate(
+    name="conversation.chat",
+    version=1,
+    system="You are the assistant of a slide editor. Answer questions and propose concrete edits.",
+    prefix="The user is working on the presentation \"{title}\" with {slide_count} slides."
+))
+
+
+@functools.lru_cache(maxsize=1)
+def get_chat_llm():
+    return create_generation_llm(settings.CONVERSATION_MODEL, timeout=settings.CONVERSATION_TIMEOUT_SECONDS)
+
+
+@functools.lru_cache(maxsize=1)
+def get_summarizer():
+    llm = create_generation_llm(settings.CONVERSATION_SUMMARY_MODEL, timeout=settings.CONVERSATION_TIMEOUT_SECONDS)
+    return make_llm_summarizer(
+        llm,
+        max_tokens=settings.CONVERSATION_SUMMARY_MAX_TOKENS,
+        provider=model_provider(settings.CONVERSATION_SUMMARY_MODEL)
+    )
+
+
+def _to_response(messages) -> list[ChatMessageResponse]:
+    processed = preprocess_messages([
+        {
+            "id": message.id,
+            "role": message.role,
+            "content": message.content,
+            "created_at": message.created_at.isoformat(),
+        }
+        for message in messages
+    ])
+    return [ChatMessageResponse(**message) for message in processed]
+
+
+# ===============
+# Chat History
+# ===============
+
+@router.get(
+    "/presentations/{presentation_id}/messages",
+    response_model=ChatHistoryResponse,
+    tags=["Conversation"]
+)
+async def get_chat_history(
+    presentation_id: uuid.UUID,
+    before: str | None = Query(None, description="Cursor returned as `next_cursor` by the previous page"),
+    limit: int = Query(50, ge=1, le=200),
+    token_payload: dict = Depends(validate_token),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Page backwards through a presentation's chat history, newest page first.
+    """
+    user_uuid = parse_user_uuid(token_payload)
+    await get_user_presentation(db, presentation_id, user_uuid)
+
+    messages, next_cursor = await list_messages(db, presentation_id, before=before, limit=limit)
+    return PydanticResponse(ChatHistoryResponse(messages=_to_response(messages), next_cursor=next_cursor))
+
+
+# ===============
+# Chat
+# ===============
+
+@router.post(
+    "/presentations/{presentation_id}/chat",
+    response_model=ChatResponse,
+    tags=["Conversation"]
+)
+async def chat_with_editor(
+    presentation_id: uuid.UUID,
+    request: ChatRequest,
+    token_payload: dict = Depends(validate_token),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Send a message to the slide editor assistant.
+
+    The prompt carries a rolling summary of older turns plus the newest messages,
+    bounded by `CONVERSATION_TOKEN_BUDGET` regardless of conversation length.
+    """
+    #NOTE: A message must fit the verbatim share of the budget, so it is always sent as a turn of its own
+    max_message_tokens = int(settings.CONVERSATION_TOKEN_BUDGET * settings.CONVERSATION_RETAIN_RATIO)
+    if estimate_tokens(request.content) > max_message_tokens:
+        raise ExceptionWithErrorType(
+            error_type="RESOURCE_LIMIT_EXCEEDED",
+            message=f"Message is too long for the conversation context (at most about {max_message_tokens * 4} characters).",
+            status_code=413
+        )
+
+    user_uuid = parse_user_uuid(token_payload)
+    presentation = await get_user_presentation(db, presentation_id, user_uuid)
+    title, slide_count = presentation.title, len(presentation.slides or [])
+
+    await add_message(db, presentation_id, user_uuid, role="human", content=request.content)
+
+    #NOTE: Folding older turns into the summary is charged to the user too
+    with usage_user(user_uuid):
+        context = await assemble_context(
+            db,
+            presentation_id,
+            token_budget=settings.CONVERSATION_TOKEN_BUDGET,
+            summarize=get_summarizer(),
+            retain_ratio=settings.CONVERSATION_RETAIN_RATIO
+        )
+        #NOTE: End the read transaction so the connection is back in the pool while the model answers
+        await db.commit()
+        prompt = EDITOR_PROMPT.render(
+            model_provider(settings.CONVERSATION_MODEL),
+            history=context.to_langchain_messages(),
+            title=title,
+            slide_count=slide_count
+        )
+        response = await get_chat_llm().ainvoke(prompt, stage=EDITOR_PROMPT.stage)
+    reply = await add_message(
+        db,
+        presentation_id,
+        user_uuid,
+        role="assistant",
+        content=extract_text_from_response(response, context="conversation.chat")
+    )
+    await mark_write(db, user_uuid)
+
+    logger.info(
+        f"Chat turn for presentation {presentation_id}: {len(context.messages)} messages, "
+        f"{context.token_count} context tokens"
+    )
+    return PydanticResponse(ChatResponse(message=_to_response([reply])[0], context_tokens=context.token_count))
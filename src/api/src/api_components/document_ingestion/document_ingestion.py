@@ -0,0 +1,276 @@
+import os
+import uuid
+import asyncio
+import hashlib
+import tempfile
+
+from loguru import logger
+from collections import deque
+from concurrent.futures import Executor
+from typing import AsyncIterator, Iterator, TextIO
+from pypdf import PdfReader
+
+from api.src.utils import ExceptionWithErrorType, prune_cache_directory, touch_file_quietly
+from api.src.api_components.document_ingestion.models import DocumentChunk, StagedDocument
+
+PDF_MAGIC = b"%PDF-"
+#NOTE: Upload chunks are small; writing them in batches keeps thread hand-offs few
+STAGE_WRITE_BYTES = 1024 * 1024
+
+
+# ===============
+# Upload Staging
+# ===============
+
+async def stage_upload(
+    chunks: AsyncIterator[bytes],
+    max_bytes: int,
+    directory: str | None = None
+) -> StagedDocument:
+    """
+    Streams an upload to a temporary file while hashing it, without holding the file in memory.
+    Writes and hashing run in a thread, off the event loop.
+
+    Raises:
+        ExceptionWithErrorType: RESOURCE_LIMIT_EXCEEDED if the upload is larger than `max_bytes`,
+            INVALID_DOCUMENT if the upload is empty or not a PDF.
+    """
+    digest = hashlib.sha256()
+    header = b""
+    size = 0
+    pending = bytearray()
+
+    fd, path = tempfile.mkstemp(prefix="upload-", suffix=".pdf", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as file:
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ExceptionWithErrorType(
+                        error_type="RESOURCE_LIMIT_EXCEEDED",
+                        message=f"Upload exceeds the maximum size of {max_bytes} bytes.",
+                        status_code=413
+                    )
+
+                if len(header) < len(PDF_MAGIC):
+                    header += chunk[:len(PDF_MAGIC)]
+                pending += chunk
+                if len(pending) >= STAGE_WRITE_BYTES:
+                    await asyncio.to_thread(_write_staged, file, digest, pending)
+                    pending.clear()
+
+            if pending:
+                await asyncio.to_thread(_write_staged, file, digest, pending)
+
+        if not header.startswith(PDF_MAGIC):
+            raise ExceptionWithErrorType(
+                error_type="INVALID_DOCUMENT",
+                message="Uploaded file is not a PDF document.",
+                status_code=415
+            )
+
+    except BaseException:
+        remove_staged_file(path)
+        raise
+
+    return StagedDocument(path=path, sha256=digest.hexdigest(), size_bytes=size)
+
+
+def _write_staged(file, digest, data: bytearray):
+    digest.update(data)
+    file.write(data)
+
+
+def remove_staged_file(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+# ===============
+# Process Pool Workers
+# ===============
+
+def _count_pages(path: str) -> int:
+    reader = PdfReader(path)
+    if reader.is_encrypted and not reader.decrypt(""):
+        raise ValueError("Document is password protected.")
+    return len(reader.pages)
+
+
+def _extract_page_range(path: str, start: int, stop: int) -> list[tuple[int, str]]:
+    #NOTE: Each task opens the file itself, so only its page range is ever parsed in memory
+    reader = PdfReader(path)
+    if reader.is_encrypted:
+        reader.decrypt("")
+    return [
+        (page_index + 1, (reader.pages[page_index].extract_text() or "").strip())
+        for page_index in range(start, stop)
+    ]
+
+
+# ===============
+# Page Extraction
+# ===============
+
+async def count_pdf_pages(path: str, executor: Executor) -> int:
+    """
+    Opens the PDF in the process pool and returns its page count.
+
+    Raises:
+        ExceptionWithErrorType: INVALID_DOCUMENT if the PDF cannot be read.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(executor, _count_pages, path)
+    except Exception as e:
+        logger.error(f"Failed to open PDF document: {type(e).__name__}: {e}")
+        raise ExceptionWithErrorType(
+            error_type="INVALID_DOCUMENT",
+            message=f"PDF document could not be read: {e}",
+            status_code=422
+        )
+
+
+async def iter_pdf_chunks(
+    path: str,
+    page_count: int,
+    executor: Executor,
+    pages_per_task: int = 25,
+    max_pending_tasks: int = 4
+) -> AsyncIterator[DocumentChunk]:
+    """
+    Yields page chunks in page order while extracting text in the process pool.
+
+    At most `max_pending_tasks` page ranges are in flight, so memory stays bounded by
+    `max_pending_tasks * pages_per_task` pages regardless of the document length.
+    """
+    loop = asyncio.get_running_loop()
+    page_ranges = iter(
+        (start, min(start + pages_per_task, page_count))
+        for start in range(0, page_count, pages_per_task)
+    )
+
+    def submit_next(pending: deque) -> None:
+        page_range = next(page_ranges, None)
+        if page_range is not None:
+            pending.append(loop.run_in_executor(executor, _extract_page_range, path, *page_range))
+
+    pending = deque()
+    for _ in range(max_pending_tasks):
+        submit_next(pending)
+
+    try:
+        while pending:
+            pages = await pending.popleft()
+            submit_next(pending)
+            for page_number, text in pages:
+                yield DocumentChunk(page_number=page_number, text=text)
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+# ===============
+# Content-Hash Cache
+# ===============
+
+class DocumentChunkCache:
+    """
+    Disk cache of extracted page chunks keyed by the SHA-256 of the uploaded file.
+    Entries are NDJSON files, written to a temporary name and renamed once complete.
+
+    Opening an entry touches it, so its mtime is when it was last served. After each new
+    entry, entries unused for `max_age_seconds` are removed, then the least recently used
+    ones until the directory holds at most `max_bytes`.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 1024 ** 3, max_age_seconds: float = 7 * 24 * 3600):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, sha256: str) -> str:
+        return os.path.join(self.directory, f"{sha256}.ndjson")
+
+    def open_entry(self, sha256: str) -> TextIO | None:
+        """
+        Opens a cached entry, or returns None. An open entry stays readable if it is pruned.
+        """
+        try:
+            file = open(self._path(sha256), "r", encoding="utf-8")
+        except FileNotFoundError:
+            return None
+        touch_file_quietly(self._path(sha256))
+        return file
+
+    @staticmethod
+    def iter_chunks(file: TextIO) -> Iterator[DocumentChunk]:
+        with file:
+            for line in file:
+                yield DocumentChunk.model_validate_json(line)
+
+    def prune(self, keep: str | None = None) -> int:
+        return prune_cache_directory(
+            self.directory,
+            ".ndjson",
+            self.max_bytes,
+            self.max_age_seconds,
+            keep=f"{keep}.ndjson" if keep else None
+        )
+
+    def open_writer(self, sha256: str) -> "_CacheEntryWriter":
+        return _CacheEntryWriter(self._path(sha256))
+
+
+class _CacheEntryWriter:
+
+    def __init__(self, path: str):
+        self.path = path
+        self.temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        self._file = open(self.temp_path, "w", encoding="utf-8")
+
+    def write(self, chunk: DocumentChunk):
+        self._file.write(chunk.model_dump_json() + "\n")
+
+    def commit(self):
+        self._file.close()
+        os.replace(self.temp_path, self.path)
+
+    def discard(self):
+        self._file.close()
+        remove_staged_file(self.temp_path)
+
+
+async def ingest_pdf(
+    staged: StagedDocument,
+    page_count: int,
+    executor: Executor,
+    cache: DocumentChunkCache,
+    pages_per_task: int = 25,
+    max_pending_tasks: int = 4
+) -> AsyncIterator[DocumentChunk]:
+    """
+    Extracts page chunks from a staged PDF and writes them to the cache as they are yielded.
+    The cache entry is only published if the whole document was extracted.
+    """
+    writer = cache.open_writer(staged.sha256)
+    completed = False
+    try:
+        async for chunk in iter_pdf_chunks(staged.path, page_count, executor, pages_per_task, max_pending_tasks):
+            writer.write(chunk)
+            yield chunk
+        completed = True
+    finally:
+        if completed:
+            writer.commit()
+            logger.info(f"Cached {page_count} pages for document {staged.sha256}")
+        else:
+            writer.discard()
+    #NOTE: Off the event loop; the directory may hold thousands of entries
+    await asyncio.to_thread(cache.prune, staged.sha256)
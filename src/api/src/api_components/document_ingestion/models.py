@@ -0,0 +1,14 @@
+from pydantic import BaseModel, Field
+
+
+class DocumentChunk(BaseModel):
+    """Text extracted from a single page of an uploaded document."""
+    page_number: int = Field(..., ge=1, description="One-based page number")
+    text: str = Field(..., description="Extracted page text")
+
+
+class StagedDocument(BaseModel):
+    """An uploaded document that has been streamed to a temporary file."""
+    path: str = Field(..., description="Temporary file path of the upload")
+    sha256: str = Field(..., description="SHA-256 hex digest of the file contents")
+    size_bytes: int = Field(..., ge=0, description="Size of the upload in bytes")
@@ -0,0 +1,99 @@
+import functools
+
+from loguru import logger
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+
+from api.src.process_pool import get_process_pool
+from api.src.api_components.document_ingestion.document_ingestion import (
+    DocumentChunkCache,
+    count_pdf_pages,
+    ingest_pdf,
+    remove_staged_file,
+    stage_upload,
+)
+from api.src.api_components.token_validator.token_validator import validate_token
+from api.src.settings import settings
+
+
+router = APIRouter()
+
+
+@functools.lru_cache(maxsize=1)
+def _get_document_cache() -> DocumentChunkCache:
+    return DocumentChunkCache(
+        settings.DOCUMENT_CACHE_DIR,
+        max_bytes=settings.DOCUMENT_CACHE_MAX_BYTES,
+        max_age_seconds=settings.DOCUMENT_CACHE_MAX_AGE_SECONDS
+    )
+
+
+# ===============
+# Ingest Document
+# ===============
+
+@router.post(
+    "/documents/ingest",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/x-ndjson": {}}}},
+    tags=["Documents"]
+)
+async def ingest_document(
+    request: Request,
+    token_payload: dict = Depends(validate_token)
+):
+    """
+    Ingest a PDF sent as the raw request body (`Content-Type: application/pdf`).
+
+    Returns newline-delimited JSON, one `{"page_number", "text"}` object per page.
+    Documents that were already ingested are served from the content-hash cache.
+    """
+    cache = _get_document_cache()
+    staged = await stage_upload(
+        request.stream(),
+        max_bytes=settings.DOCUMENT_MAX_UPLOAD_BYTES,
+        directory=settings.DOCUMENT_UPLOAD_DIR
+    )
+    headers = {"X-Document-Hash": staged.sha256}
+
+    entry = cache.open_entry(staged.sha256)
+    if entry is not None:
+        remove_staged_file(staged.path)
+        logger.info(f"Document cache hit for {staged.sha256} (user_id={token_payload.get('sub')})")
+
+        def cached_body():
+            for chunk in cache.iter_chunks(entry):
+                yield chunk.model_dump_json() + "\n"
+
+        headers["X-Document-Cache"] = "HIT"
+        return StreamingResponse(cached_body(), media_type="application/x-ndjson", headers=headers)
+
+    executor = get_process_pool()
+    try:
+        page_count = await count_pdf_pages(staged.path, executor)
+    except BaseException:
+        remove_staged_file(staged.path)
+        raise
+
+    logger.info(
+        f"Ingesting document {staged.sha256} ({staged.size_bytes} bytes, {page_count} pages) "
+        f"for user_id={token_payload.get('sub')}"
+    )
+
+    async def body():
+        try:
+            async for chunk in ingest_pdf(
+                staged,
+                page_count,
+                executor,
+                cache,
+                pages_per_task=settings.DOCUMENT_PAGES_PER_TASK,
+                max_pending_tasks=settings.DOCUMENT_MAX_PENDING_TASKS
+            ):
+                yield chunk.model_dump_json() + "\n"
+        finally:
+            remove_staged_file(staged.path)
+
+    headers["X-Document-Cache"] = "MISS"
+    headers["X-Document-Page-Count"] = str(page_count)
+    return StreamingResponse(body(), media_type="application/x-ndjson", headers=headers)
@@ -0,0 +1,294 @@
+"""
+Dependency health checks evaluated in the background.
+
+Probes never touch a dependency themselves: a background task runs the registered
+checks every `HEALTH_CHECK_INTERVAL_SECONDS` and pre-renders the readiness and liveness
+bodies, so `/health/ready` and `/health/live` only compare a timestamp and return bytes.
+"""
+import os
+import time
+import asyncio
+import traceback
+
+import orjson
+from loguru import logger
+from datetime import datetime, timezone
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+from pydantic import SecretStr, TypeAdapter
+from sqlalchemy import Engine, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from common.read_replicas import ReplicaRouter
+from api.src.metrics import REGISTRY
+from api.src.settings import SSMSettingsSource, Settings
+from api.src.resilience import get_dependency
+from api.src.api_components.jobs.jobs import get_queue_lag
+from api.src.api_components.health.models import HealthCheckStatus, LivenessResponse, ReadinessResponse
+
+HEALTH_CHECK_HEALTHY = REGISTRY.gauge(
+    "health_check_healthy",
+    "1 if the dependency check passes, 0 if it fails",
+    ("check",)
+)
+HEALTH_READY = REGISTRY.gauge("health_ready", "1 if this worker reports ready")
+
+# A check returns (healthy, detail); raising counts as unhealthy with the exception as detail
+CheckFunction = Callable[[], Awaitable[tuple[bool, str]]]
+
+
+@dataclass
+class HealthCheck:
+    name: str
+    check: CheckFunction
+    critical: bool = True
+    interval: float | None = None
+
+    healthy: bool | None = None
+    detail: str = "Not checked yet"
+    latency_ms: float = 0.0
+    checked_at: datetime | None = None
+    consecutive_failures: int = 0
+    has_passed: bool = False
+    next_run: float = 0.0
+
+    def is_passing(self, failure_threshold: int) -> bool:
+        """
+        A check that has passed before tolerates `failure_threshold - 1` consecutive failures,
+        so a single slow ping does not take the worker out of rotation.
+        """
+        if self.healthy:
+            return True
+        return self.has_passed and self.consecutive_failures < failure_threshold
+
+
+class HealthMonitor:
+    """
+    Registry of dependency checks and the cached probe responses built from them.
+
+    Readiness is 503 while starting, draining, when the last evaluation is older than
+    `stale_after`, or when a critical check fails `failure_threshold` times in a row.
+    Failing non-critical checks report `degraded` but keep the worker ready.
+    """
+
+    def __init__(self, interval: float, timeout: float, failure_threshold: int, stale_after: float):
+        self.interval = interval
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.stale_after = stale_after
+        self.checks: dict[str, HealthCheck] = {}
+
+        self._draining = False
+        self._stop = asyncio.Event()
+        self._evaluated_at: float | None = None
+        self._ready_status_code = 503
+        self._ready_body = self._render(ReadinessResponse(status="starting", checks={}))
+        self._stale_body = self._render(ReadinessResponse(status="stale", checks={}))
+        self._live_body = self._render(LivenessResponse(status="ok"))
+        self._dead_body = self._render(LivenessResponse(status="stale"))
+
+    def register(self, name: str, check: CheckFunction, critical: bool = True, interval: float | None = None):
+        self.checks[name] = HealthCheck(name=name, check=check, critical=critical, interval=interval)
+
+    # ===============
+    # Probes
+    # ===============
+
+    def readiness(self) -> tuple[int, bytes]:
+        if self._is_stale():
+            return 503, self._stale_body
+        return self._ready_status_code, self._ready_body
+
+    def liveness(self) -> tuple[int, bytes]:
+        #NOTE: Only a stalled monitor fails liveness; dependency outages are a readiness concern
+        if self._is_stale():
+            return 503, self._dead_body
+        return 200, self._live_body
+
+    def _is_stale(self) -> bool:
+        return (
+            self._evaluated_at is not None
+            and not self._draining
+            and time.monotonic() - self._evaluated_at > self.stale_after
+        )
+
+    # ===============
+    # Evaluation
+    # ===============
+
+    async def run_once(self):
+        now = time.monotonic()
+        due = [check for check in self.checks.values() if check.next_run <= now]
+        await asyncio.gather(*(self._evaluate(check) for check in due))
+        self._evaluated_at = time.monotonic()
+        self._publish()
+
+    async def run(self):
+        """
+        Evaluates checks every `interval` seconds until `stop()` is called.
+        """
+        while not self._stop.is_set():
+            try:
+                await self.run_once()
+            except Exception as e:
+                error_traceback = traceback.format_exc()
+                logger.error(f"Health evaluation failed: {e}\n{error_traceback}")
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def stop(self):
+        """
+        Marks the worker as draining (readiness 503) and ends the evaluation loop.
+        """
+        self._draining = True
+        self._stop.set()
+        self._publish()
+
+    async def _evaluate(self, check: HealthCheck):
+        started = time.perf_counter()
+        try:
+            healthy, detail = await asyncio.wait_for(check.check(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            healthy, detail = False, f"Timed out after {self.timeout:g}s"
+        except Exception as e:
+            healthy, detail = False, f"{type(e).__name__}: {e}"
+
+        if check.healthy and not healthy:
+            logger.warning(f"Health check {check.name} failed: {detail}")
+        elif check.healthy is False and healthy:
+            logger.info(f"Health check {check.name} recovered")
+
+        check.healthy = healthy
+        check.detail = detail
+        check.latency_ms = round((time.perf_counter() - started) * 1000, 2)
+        check.checked_at = datetime.now(timezone.utc)
+        check.consecutive_failures = 0 if healthy else check.consecutive_failures + 1
+        check.has_passed = check.has_passed or healthy
+        check.next_run = time.monotonic() + (check.interval or 0)
+        HEALTH_CHECK_HEALTHY.set(1 if healthy else 0, check=check.name)
+
+    def _publish(self):
+        passing = {name: check.is_passing(self.failure_threshold) for name, check in self.checks.items()}
+        if self._draining:
+            status = "draining"
+        elif self._evaluated_at is None:
+            status = "starting"
+        elif not all(passing[name] for name, check in self.checks.items() if check.critical):
+            status = "not_ready"
+        elif not all(passing.values()):
+            status = "degraded"
+        else:
+            status = "ready"
+
+        self._ready_status_code = 200 if status in ("ready", "degraded") else 503
+        self._ready_body = self._render(ReadinessResponse(
+            status=status,
+            checks={
+                name: HealthCheckStatus(
+                    healthy=check.healthy,
+                    critical=check.critical,
+                    detail=check.detail,
+                    latency_ms=check.latency_ms,
+                    checked_at=check.checked_at
+                )
+                for name, check in self.checks.items()
+            }
+        ))
+        HEALTH_READY.set(1 if self._ready_status_code == 200 else 0)
+
+    @staticmethod
+    def _render(model) -> bytes:
+        return orjson.dumps(model.model_dump(), option=orjson.OPT_UTC_Z)
+
+
+# ===============
+# Checks
+# ===============
+
+def async_database_ping(engine: AsyncEngine) -> CheckFunction:
+    async def check() -> tuple[bool, str]:
+        async with engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+        return True, "ok"
+    return check
+
+
+def database_ping(engine: Engine) -> CheckFunction:
+    def ping():
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+
+    async def check() -> tuple[bool, str]:
+        await asyncio.to_thread(ping)
+        return True, "ok"
+    return check
+
+
+def pool_saturation(engines: dict[str, Engine | AsyncEngine], threshold: float) -> CheckFunction:
+    """
+    Fails once any pool has `threshold` of its connections (pool size plus overflow) checked
+    out, so the load balancer shifts traffic before requests start waiting for connections.
+    """
+    async def check() -> tuple[bool, str]:
+        details, healthy = [], True
+        for name, engine in engines.items():
+            pool = engine.pool
+            capacity = pool.size() + max(pool._max_overflow, 0)
+            checked_out = pool.checkedout()
+            healthy = healthy and checked_out < threshold * capacity
+            details.append(f"{name} {checked_out}/{capacity}")
+        return healthy, ", ".join(details)
+    return check
+
+
+def replica_lag(router: ReplicaRouter) -> CheckFunction:
+    """
+    Reports the lag measured by the router; fails while any replica is out of rotation.
+    """
+    async def check() -> tuple[bool, str]:
+        details = [
+            f"{replica.name} " + ("unreachable" if replica.lag_seconds is None else f"{replica.lag_seconds:.2f}s")
+            + ("" if replica.available else " (primary fallback)")
+            for replica in router.replicas
+        ]
+        return all(replica.available for replica in router.replicas) and router.listening, ", ".join(details)
+    return check
+
+
+def job_queue_lag(engine: AsyncEngine, max_lag_seconds: float) -> CheckFunction:
+    async def check() -> tuple[bool, str]:
+        lag = await get_queue_lag(engine)
+        return lag <= max_lag_seconds, f"Oldest runnable job waiting {lag:.0f}s (limit {max_lag_seconds:g}s)"
+    return check
+
+
+def find_stale_settings(current: Settings) -> list[str]:
+    """
+    Returns the settings whose SSM parameter changed since `current` was loaded.
+    Keys overridden by the environment are skipped, since SSM does not apply to them.
+    """
+    fetched = SSMSettingsSource(type(current)).fetch_parameters()
+    stale = []
+    for key, raw_value in fetched.items():
+        field = type(current).model_fields.get(key)
+        if field is None or key in os.environ:
+            continue
+        loaded, value = getattr(current, key), TypeAdapter(field.annotation).validate_python(raw_value)
+        if isinstance(loaded, SecretStr):
+            loaded, value = loaded.get_secret_value(), value.get_secret_value()
+        if loaded != value:
+            stale.append(key)
+    return sorted(stale)
+
+
+def settings_freshness(current: Settings) -> CheckFunction:
+    async def check() -> tuple[bool, str]:
+        #NOTE: The guard bounds a hanging SSM call and skips it while SSM keeps failing
+        async with get_dependency("ssm").guard():
+            stale = await asyncio.to_thread(find_stale_settings, current)
+        if stale:
+            return False, f"Changed in SSM since startup, restart to apply: {', '.join(stale)}"
+        return True, "ok"
+    return check
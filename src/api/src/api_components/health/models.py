@@ -0,0 +1,23 @@
+from datetime import datetime
+from typing import Literal, Optional
+from pydantic import BaseModel, Field
+
+
+class HealthCheckStatus(BaseModel):
+    healthy: Optional[bool] = Field(None, description="Result of the last evaluation; null before the first one")
+    critical: bool = Field(..., description="Whether a failure makes the worker not ready")
+    detail: str = Field(..., description="Result details or the error of the last evaluation")
+    latency_ms: float = Field(..., description="Duration of the last evaluation")
+    checked_at: Optional[datetime] = None
+
+
+class ReadinessResponse(BaseModel):
+    status: Literal["starting", "ready", "degraded", "not_ready", "draining", "stale"] = Field(
+        ...,
+        description="`ready` and `degraded` return 200, everything else 503"
+    )
+    checks: dict[str, HealthCheckStatus] = Field(default_factory=dict)
+
+
+class LivenessResponse(BaseModel):
+    status: Literal["ok", "stale"]
@@ -0,0 +1,89 @@
+import functools
+
+from fastapi import APIRouter, Response
+
+import common.database as database
+from api.src.api_components.health.health import (
+    HealthMonitor,
+    async_database_ping,
+    database_ping,
+    job_queue_lag,
+    pool_saturation,
+    replica_lag,
+    settings_freshness,
+)
+from api.src.api_components.health.models import LivenessResponse, ReadinessResponse
+from api.src.settings import settings
+
+
+router = APIRouter()
+
+
+@functools.lru_cache(maxsize=1)
+def get_health_monitor() -> HealthMonitor:
+    """
+    Builds the worker's monitor with the default checks. Call after the database engines exist.
+    """
+    monitor = HealthMonitor(
+        interval=settings.HEALTH_CHECK_INTERVAL_SECONDS,
+        timeout=settings.HEALTH_CHECK_TIMEOUT_SECONDS,
+        failure_threshold=settings.HEALTH_FAILURE_THRESHOLD,
+        stale_after=settings.HEALTH_STALE_AFTER_SECONDS
+    )
+    monitor.register("database", async_database_ping(database.async_engine))
+    monitor.register("database_sync", database_ping(database.sync_engine))
+    monitor.register(
+        "database_pools",
+        pool_saturation(
+            {"async": database.async_engine, "sync": database.sync_engine},
+            threshold=settings.HEALTH_POOL_SATURATION_THRESHOLD
+        )
+    )
+    if database.replica_router.replicas:
+        #NOTE: Non-critical: lagging replicas only shift reads to the primary
+        monitor.register("read_replicas", replica_lag(database.replica_router), critical=False)
+    monitor.register(
+        "job_queue_lag",
+        job_queue_lag(database.async_engine, max_lag_seconds=settings.HEALTH_JOB_QUEUE_MAX_LAG_SECONDS),
+        critical=False
+    )
+    #NOTE: Non-critical: every worker goes stale at once, and failing all of them would take the service down
+    monitor.register(
+        "settings",
+        settings_freshness(settings),
+        critical=False,
+        interval=settings.HEALTH_SETTINGS_CHECK_INTERVAL_SECONDS
+    )
+    return monitor
+
+
+# ===============
+# Probes
+# ===============
+
+@router.get(
+    "/health/ready",
+    response_model=ReadinessResponse,
+    responses={503: {"model": ReadinessResponse, "description": "Not ready"}},
+    tags=["Health"]
+)
+async def readiness():
+    """
+    Whether this worker should receive traffic, from the last background evaluation.
+    """
+    status_code, body = get_health_monitor().readiness()
+    return Response(content=body, status_code=status_code, media_type="application/json")
+
+
+@router.get(
+    "/health/live",
+    response_model=LivenessResponse,
+    responses={503: {"model": LivenessResponse, "description": "Health evaluation has stalled"}},
+    tags=["Health"]
+)
+async def liveness():
+    """
+    Whether this worker is running; fails only if the background evaluation has stalled.
+    """
+    status_code, body = get_health_monitor().liveness()
+    return Response(content=body, status_code=status_code, media_type="application/json")
@@ -0,0 +1,48 @@
+"""
+Job handlers run by `api.src.job_worker`, keyed by job kind.
+"""
+import uuid
+from typing import Any
+from dataclasses import asdict
+
+import common.database as database
+from api.src.api_components.jobs.jobs import JobHandler
+from api.src.api_components.presentation_revisions.presentation_revisions import compact_presentation
+from api.src.api_components.slide_generation.models import GenerateSlidesRequest
+from api.src.api_components.slide_generation.routers import get_generation_graph
+from api.src.api_components.slide_generation.slide_generation import generate_slides
+from api.src.settings import settings
+
+JOB_HANDLERS: dict[str, JobHandler] = {}
+
+
+def job_handler(kind: str):
+    def register(handler: JobHandler) -> JobHandler:
+        JOB_HANDLERS[kind] = handler
+        return handler
+    return register
+
+
+@job_handler("slide_generation")
+async def run_slide_generation(payload: dict[str, Any]) -> dict[str, Any]:
+    request = GenerateSlidesRequest.model_validate(payload)
+    slides = await generate_slides(
+        get_generation_graph(),
+        content=request.content,
+        instructions=request.instructions,
+        slide_count=request.slide_count,
+        max_concurrency=settings.SLIDE_GENERATION_MAX_CONCURRENCY
+    )
+    return {"slides": [slide.model_dump() for slide in slides]}
+
+
+@job_handler("presentation_compaction")
+async def run_presentation_compaction(payload: dict[str, Any]) -> dict[str, Any]:
+    async with database.async_session_local() as db:
+        result = await compact_presentation(
+            db,
+            uuid.UUID(payload["presentation_id"]),
+            max_depth=settings.PRESENTATION_REVISION_MAX_DELTA_DEPTH,
+            delta_ratio=settings.PRESENTATION_REVISION_DELTA_RATIO
+        )
+    return asdict(result)
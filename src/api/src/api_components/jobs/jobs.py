@@ -0,0 +1,400 @@
+import os
+import json
+import uuid
+import socket
+import asyncio
+import asyncpg
+import traceback
+
+from loguru import logger
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from common.models.job import Job
+from api.src.utils import ExceptionWithErrorType
+from api.src.usage_metering import usage_user
+
+JOB_CHANNEL = "jobs"
+
+JobHandler = Callable[[dict[str, Any]], Awaitable[dict[str, Any] | None]]
+
+LOCK_CANDIDATES_SQL = text("""
+SELECT j.id, j.user_id
+FROM jobs j
+WHERE j.status = 'queued'
+  AND j.run_after <= now()
+  AND (
+      j.user_id IS NULL
+      OR (SELECT count(*) FROM jobs r WHERE r.user_id = j.user_id AND r.status = 'running') < :per_user_limit
+  )
+ORDER BY j.priority DESC, j.run_after, j.created_at
+LIMIT :scan_limit
+FOR UPDATE SKIP LOCKED
+""")
+
+#NOTE: Sorted by key so workers locking overlapping users cannot deadlock
+LOCK_JOB_USERS_SQL = text("""
+SELECT pg_advisory_xact_lock(key)
+FROM (
+    SELECT DISTINCT hashtext('jobs_user:' || CAST(user_id AS text)) AS key
+    FROM unnest(CAST(:user_ids AS uuid[])) AS user_id
+    ORDER BY key
+) AS keys
+""")
+
+CLAIM_JOBS_SQL = text("""
+WITH ranked AS (
+    SELECT
+        j.id, j.user_id, j.priority, j.run_after, j.created_at,
+        row_number() OVER (PARTITION BY j.user_id ORDER BY j.priority DESC, j.run_after, j.created_at) AS user_rank,
+        (SELECT count(*) FROM jobs r WHERE r.user_id = j.user_id AND r.status = 'running') AS user_running
+    FROM jobs j
+    WHERE j.id = ANY(CAST(:ids AS uuid[]))
+),
+chosen AS (
+    SELECT id FROM ranked
+    WHERE user_id IS NULL OR user_running + user_rank <= :per_user_limit
+    ORDER BY priority DESC, run_after, created_at
+    LIMIT :limit
+)
+UPDATE jobs
+SET status = 'running',
+    locked_by = :worker_id,
+    attempts = jobs.attempts + 1,
+    started_at = clock_timestamp(),
+    heartbeat_at = clock_timestamp()
+FROM chosen
+WHERE jobs.id = chosen.id
+RETURNING jobs.id, jobs.kind, jobs.payload, jobs.attempts, jobs.max_attempts, jobs.user_id
+""")
+
+COMPLETE_JOB_SQL = text("""
+UPDATE jobs
+SET status = 'succeeded', result = CAST(:result AS JSONB), error = NULL,
+    locked_by = NULL, finished_at = clock_timestamp()
+WHERE id = :id AND locked_by = :worker_id
+""")
+
+FAIL_JOB_SQL = text("""
+UPDATE jobs
+SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,
+    run_after = clock_timestamp() + make_interval(secs => :retry_delay),
+    finished_at = CASE WHEN attempts >= max_attempts THEN clock_timestamp() END,
+    error = :error,
+    locked_by = NULL
+WHERE id = :id AND locked_by = :worker_id
+RETURNING status
+""")
+
+HEARTBEAT_SQL = text("""
+UPDATE jobs SET heartbeat_at = clock_timestamp()
+WHERE locked_by = :worker_id AND status = 'running' AND id = ANY(:ids)
+""")
+
+RECLAIM_STALE_JOBS_SQL = text("""
+UPDATE jobs
+SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,
+    finished_at = CASE WHEN attempts >= max_attempts THEN clock_timestamp() END,
+    error = 'Worker stopped sending heartbeats',
+    locked_by = NULL
+WHERE status = 'running' AND heartbeat_at < clock_timestamp() - make_interval(secs => :stale_after)
+RETURNING id
+""")
+
+QUEUE_LAG_SQL = text("""
+SELECT coalesce(extract(epoch FROM now() - min(run_after)), 0)
+FROM jobs
+WHERE status = 'queued' AND run_after <= now()
+""")
+
+
+# ===============
+# Enqueue & Status
+# ===============
+
+async def enqueue_job(
+    db: AsyncSession,
+    kind: str,
+    payload: dict[str, Any],
+    user_id: uuid.UUID | None = None,
+    priority: int = 0,
+    max_attempts: int = 3
+) -> Job:
+    """
+    Inserts a job and notifies listening workers. The notification is delivered on commit,
+    so workers never wake for a job they cannot see yet.
+    """
+    job = Job(kind=kind, payload=payload, user_id=user_id, priority=priority, max_attempts=max_attempts)
+    db.add(job)
+    await db.flush()
+    await db.execute(text("SELECT pg_notify(:channel, :kind)"), {"channel": JOB_CHANNEL, "kind": kind})
+    await db.commit()
+    await db.refresh(job)
+    return job
+
+
+async def get_user_job(db: AsyncSession, job_id: uuid.UUID, user_uuid: uuid.UUID) -> Job:
+    """
+    Raises:
+        ExceptionWithErrorType: JOB_NOT_FOUND if the job does not exist or belongs to another user.
+    """
+    job = await db.get(Job, job_id)
+    if job is None or job.user_id != user_uuid:
+        raise ExceptionWithErrorType(
+            error_type="JOB_NOT_FOUND",
+            message="Job not found.",
+            status_code=404
+        )
+    return job
+
+
+async def get_queue_lag(engine: AsyncEngine) -> float:
+    """
+    Returns how long, in seconds, the oldest runnable queued job has been waiting (0 when none is).
+    """
+    async with engine.connect() as connection:
+        return float((await connection.execute(QUEUE_LAG_SQL)).scalar_one())
+
+
+# ===============
+# Worker
+# ===============
+
+@dataclass
+class ClaimedJob:
+    id: uuid.UUID
+    kind: str
+    payload: dict[str, Any]
+    attempts: int
+    max_attempts: int
+    user_id: uuid.UUID | None
+
+
+class JobWorker:
+    """
+    Runs jobs from the `jobs` table with up to `concurrency` jobs in flight.
+
+    Workers claim with `FOR UPDATE SKIP LOCKED`, so any number of them can share the
+    table without blocking each other. An idle worker sleeps on a `LISTEN` connection
+    and wakes as soon as a job is enqueued; `poll_interval` is only a safety net for
+    missed notifications. Running jobs are heartbeated, and jobs whose worker died are
+    put back in the queue (or failed once out of attempts) after `stale_after` seconds.
+
+    If the `LISTEN` connection drops, the worker keeps polling and reconnects with
+    exponential backoff, from `reconnect_interval` up to `max_reconnect_interval`.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        listen_dsn: str,
+        handlers: dict[str, JobHandler],
+        concurrency: int = 4,
+        per_user_limit: int = 2,
+        heartbeat_interval: float = 10.0,
+        stale_after: float = 60.0,
+        poll_interval: float = 30.0,
+        retry_base_delay: float = 5.0,
+        reconnect_interval: float = 1.0,
+        max_reconnect_interval: float = 30.0,
+        connect_timeout: float = 5.0,
+        worker_id: str | None = None
+    ):
+        self.engine = engine
+        self.listen_dsn = listen_dsn
+        self.handlers = handlers
+        self.concurrency = concurrency
+        self.per_user_limit = per_user_limit
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_after = stale_after
+        self.poll_interval = poll_interval
+        self.retry_base_delay = retry_base_delay
+        self.reconnect_interval = reconnect_interval
+        self.max_reconnect_interval = max_reconnect_interval
+        self.connect_timeout = connect_timeout
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self._running: dict[uuid.UUID, asyncio.Task] = {}
+        self._wakeup = asyncio.Event()
+
+    async def run(self, stop: asyncio.Event):
+        """
+        Claims and runs jobs until `stop` is set, then waits for in-flight jobs to finish.
+        """
+        maintenance = [
+            asyncio.create_task(self._listen_loop()),
+            asyncio.create_task(self._heartbeat_loop()),
+            asyncio.create_task(self._reclaim_loop()),
+        ]
+        stop_waiter = asyncio.create_task(stop.wait())
+        logger.info(f"Job worker {self.worker_id} started with concurrency={self.concurrency}")
+
+        try:
+            while not stop.is_set():
+                #NOTE: Cleared before claiming so a notification that arrives mid-claim is not lost
+                self._wakeup.clear()
+
+                free_slots = self.concurrency - len(self._running)
+                if free_slots > 0:
+                    try:
+                        claimed = await self._claim(free_slots)
+                    except Exception as e:
+                        logger.warning(f"Job worker {self.worker_id} failed to claim jobs: {e}")
+                        await asyncio.sleep(1.0)
+                        continue
+                    for job in claimed:
+                        self._start(job)
+                    if len(claimed) == free_slots:
+                        continue
+
+                wakeup = asyncio.create_task(self._wakeup.wait())
+                await asyncio.wait({wakeup, stop_waiter}, timeout=self.poll_interval, return_when=asyncio.FIRST_COMPLETED)
+                wakeup.cancel()
+        finally:
+            stop_waiter.cancel()
+            if self._running:
+                logger.info(f"Job worker {self.worker_id} waiting for {len(self._running)} running jobs")
+                await asyncio.gather(*self._running.values(), return_exceptions=True)
+            for task in maintenance:
+                task.cancel()
+            await asyncio.gather(*maintenance, return_exceptions=True)
+            logger.info(f"Job worker {self.worker_id} stopped")
+
+    def _on_notify(self, connection, pid, channel, payload):
+        self._wakeup.set()
+
+    async def _listen_loop(self):
+        interval = self.reconnect_interval
+        while True:
+            try:
+                listener = await asyncpg.connect(self.listen_dsn, timeout=self.connect_timeout)
+            except Exception as e:
+                logger.warning(f"Job worker {self.worker_id} could not listen for {JOB_CHANNEL}, retrying in {interval:g}s: {e}")
+                await asyncio.sleep(interval)
+                interval = min(interval * 2, self.max_reconnect_interval)
+                continue
+
+            lost = asyncio.Event()
+            try:
+                await listener.add_listener(JOB_CHANNEL, self._on_notify)
+                listener.add_termination_listener(lambda connection: lost.set())
+                interval = self.reconnect_interval
+                #NOTE: Jobs enqueued while the listener was down sent notifications nobody heard
+                self._wakeup.set()
+                await lost.wait()
+                logger.warning(f"Job worker {self.worker_id} lost its {JOB_CHANNEL} listener, reconnecting")
+            except Exception as e:
+                logger.warning(f"Job worker {self.worker_id} could not listen for {JOB_CHANNEL}, retrying in {interval:g}s: {e}")
+                await asyncio.sleep(interval)
+                interval = min(interval * 2, self.max_reconnect_interval)
+            finally:
+                if not listener.is_closed():
+                    listener.terminate()
+
+    async def _claim(self, limit: int) -> list[ClaimedJob]:
+        async with self.engine.begin() as connection:
+            candidates = (await connection.execute(LOCK_CANDIDATES_SQL, {
+                "scan_limit": limit * 4,
+                "per_user_limit": self.per_user_limit,
+            })).all()
+            if not candidates:
+                return []
+            user_ids = list({user_id for _, user_id in candidates if user_id is not None})
+            if user_ids:
+                #NOTE: Held until commit, so the running count below sees other workers' claims for these users
+                await connection.execute(LOCK_JOB_USERS_SQL, {"user_ids": user_ids})
+            rows = (await connection.execute(CLAIM_JOBS_SQL, {
+                "ids": [job_id for job_id, _ in candidates],
+                "worker_id": self.worker_id,
+                "limit": limit,
+                "per_user_limit": self.per_user_limit,
+            })).all()
+        return [ClaimedJob(*row) for row in rows]
+
+    def _start(self, job: ClaimedJob):
+        task = asyncio.create_task(self._execute(job))
+        self._running[job.id] = task
+
+        def _done(_):
+            self._running.pop(job.id, None)
+            #NOTE: A freed slot is a reason to claim again
+            self._wakeup.set()
+
+        task.add_done_callback(_done)
+
+    async def _execute(self, job: ClaimedJob):
+        handler = self.handlers.get(job.kind)
+        try:
+            if handler is None:
+                raise ExceptionWithErrorType(
+                    error_type="UNKNOWN_JOB_KIND",
+                    message=f"No handler registered for job kind '{job.kind}'."
+                )
+            #NOTE: LLM usage of the job is charged to the user who queued it
+            with usage_user(job.user_id):
+                result = await handler(job.payload)
+        except Exception as e:
+            await self._fail(job, e)
+            return
+
+        try:
+            async with self.engine.begin() as connection:
+                await connection.execute(COMPLETE_JOB_SQL, {
+                    "id": job.id,
+                    "worker_id": self.worker_id,
+                    "result": json.dumps(result) if result is not None else None,
+                })
+        except Exception as e:
+            #NOTE: The job stops being heartbeated and is retried by stale-job reclaim
+            logger.error(f"Job {job.id} ({job.kind}) finished but could not be marked succeeded: {e}")
+
+    async def _fail(self, job: ClaimedJob, error: Exception):
+        retry_delay = self.retry_base_delay * (2 ** (job.attempts - 1))
+        #NOTE: An open circuit breaker says when the dependency may be back; retrying sooner only fails again
+        retry_delay = max(retry_delay, getattr(error, "retry_after", 0))
+        try:
+            async with self.engine.begin() as connection:
+                status = (await connection.execute(FAIL_JOB_SQL, {
+                    "id": job.id,
+                    "worker_id": self.worker_id,
+                    "retry_delay": retry_delay,
+                    "error": f"{type(error).__name__}: {error}",
+                })).scalar_one_or_none()
+        except Exception as e:
+            logger.error(f"Job {job.id} ({job.kind}) failed and could not be rescheduled: {e}")
+            return
+
+        if status == "queued":
+            logger.warning(f"Job {job.id} ({job.kind}) failed attempt {job.attempts}, retrying in {retry_delay:.1f}s: {error}")
+            asyncio.get_running_loop().call_later(retry_delay, self._wakeup.set)
+        else:
+            logger.error(f"Job {job.id} ({job.kind}) failed permanently: {traceback.format_exception_only(error)[-1].strip()}")
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            if not self._running:
+                continue
+            try:
+                async with self.engine.begin() as connection:
+                    await connection.execute(HEARTBEAT_SQL, {
+                        "worker_id": self.worker_id,
+                        "ids": list(self._running),
+                    })
+            except Exception as e:
+                logger.warning(f"Job worker {self.worker_id} heartbeat failed: {e}")
+
+    async def _reclaim_loop(self):
+        while True:
+            await asyncio.sleep(self.stale_after / 2)
+            try:
+                async with self.engine.begin() as connection:
+                    reclaimed = (await connection.execute(RECLAIM_STALE_JOBS_SQL, {"stale_after": self.stale_after})).all()
+                    if reclaimed:
+                        await connection.execute(text("SELECT pg_notify(:channel, 'reclaimed')"), {"channel": JOB_CHANNEL})
+                if reclaimed:
+                    logger.warning(f"Reclaimed {len(reclaimed)} stale jobs")
+            except Exception as e:
+                logger.warning(f"Job worker {self.worker_id} stale-job reclaim failed: {e}")
@@ -0,0 +1,20 @@
+import uuid
+
+from datetime import datetime
+from typing import Any, Optional
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class JobResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: uuid.UUID = Field(..., description="Job identifier")
+    kind: str = Field(..., description="Job type, e.g. slide_generation")
+    status: str = Field(..., description="queued, running, succeeded or failed")
+    attempts: int = Field(..., description="Attempts started so far")
+    max_attempts: int = Field(..., description="Attempts before the job is marked failed")
+    result: Optional[dict[str, Any]] = Field(None, description="Handler result once the job succeeded")
+    error: Optional[str] = Field(None, description="Error of the last failed attempt")
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
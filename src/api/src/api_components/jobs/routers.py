@@ -0,0 +1,36 @@
+import uuid
+
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from common.database import get_async_db
+from api.src.api_components.jobs.jobs import get_user_job
+from api.src.api_components.jobs.models import JobResponse
+from api.src.api_components.presentations.presentations import parse_user_uuid
+from api.src.api_components.token_validator.token_validator import validate_token
+from api.src.responses import PydanticResponse
+
+
+router = APIRouter()
+
+
+# ===============
+# Job Status
+# ===============
+
+@router.get(
+    "/jobs/{job_id}",
+    response_model=JobResponse,
+    tags=["Jobs"]
+)
+async def get_job_status(
+    job_id: uuid.UUID,
+    token_payload: dict = Depends(validate_token),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get the status, and once finished the result or error, of one of the user's jobs.
+    """
+    user_uuid = parse_user_uuid(token_payload)
+    job = await get_user_job(db, job_id, user_uuid)
+    return PydanticResponse(JobResponse.model_validate(job))
@@ -0,0 +1,415 @@
+"""
+Realtime user state (credit balance and profile) pushed over Server-Sent Events.
+
+Writers call `notify_user_changed` in the transaction that changes a user; Postgres
+delivers the `NOTIFY` to every worker when it commits, and not at all if it rolls back.
+Each worker holds one `LISTEN` connection (`NotificationHub`) and fans notifications out
+to that user's streams open on it, so an idle stream costs a parked coroutine and a few
+small objects, not a database connection or a poll.
+
+A notification names the user and the changed fields, not their values: a `NOTIFY`
+payload is limited to 8000 bytes, which `preferences` alone can exceed. A worker re-reads
+the changed users that have streams open on it, batching the notifications that arrive
+while a read is in flight.
+
+Slow clients cannot build a backlog: a stream holds at most one pending update, into
+which later changes are merged, and a stream whose write blocks for `send_timeout` is
+dropped. The client reconnects and starts from a fresh snapshot.
+"""
+import time
+import uuid
+import asyncio
+
+import orjson
+import asyncpg
+from loguru import logger
+from typing import Awaitable, Callable
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from starlette.responses import Response
+
+from common.models.user import User
+from api.src.metrics import REGISTRY
+from api.src.utils import ExceptionWithErrorType
+
+USER_EVENTS_CHANNEL = "user_events"
+USER_EVENT = "user"
+#NOTE: Tells EventSource-style clients how long to wait before reconnecting
+RETRY_MILLISECONDS = 3000
+RESYNC_BATCH_SIZE = 1000
+
+NOTIFY_SQL = text("SELECT pg_notify(:channel, :payload)")
+
+#NOTE: The fields the billing and settings pages render; keep in step with `notify_user_changed` callers
+STATE_COLUMNS = {
+    "credits_balance": User.credits_balance,
+    "first_name": User.first_name,
+    "last_name": User.last_name,
+    "profile_image_url": User.profile_image_url,
+    "stripe_customer_id": User.stripe_customer_id,
+    "preferences": User.preferences,
+}
+
+EVENT_STREAM_HEADERS = {
+    "Cache-Control": "no-cache",
+    #NOTE: Stops nginx-style proxies from buffering the stream
+    "X-Accel-Buffering": "no",
+}
+
+NOTIFICATION_STREAMS = REGISTRY.gauge("notification_streams", "Open event streams in this worker")
+NOTIFICATIONS_RECEIVED = REGISTRY.counter(
+    "notifications_received_total",
+    "User change notifications received by this worker's listener"
+)
+NOTIFICATION_EVENTS_SENT = REGISTRY.counter(
+    "notification_events_sent_total",
+    "Events written to streams, by kind: `snapshot`, `update` or `heartbeat`",
+    ("kind",)
+)
+NOTIFICATION_STREAMS_CLOSED = REGISTRY.counter(
+    "notification_streams_closed_total",
+    "Closed event streams by reason",
+    ("reason",)
+)
+
+
+async def notify_user_changed(db: AsyncSession, user_id: uuid.UUID, *fields: str):
+    """
+    Queues a notification that the user's `fields` (keys of `STATE_COLUMNS`) changed.
+    Call inside the writing transaction; it is delivered when that transaction commits.
+    """
+    payload = orjson.dumps({"user_id": str(user_id), "fields": fields}).decode()
+    await db.execute(NOTIFY_SQL, {"channel": USER_EVENTS_CHANNEL, "payload": payload})
+
+
+async def load_user_states(engine: AsyncEngine, user_ids: list[str]) -> dict[str, dict]:
+    """
+    Returns the current state of each existing user, keyed by user ID.
+    """
+    states = {}
+    async with engine.connect() as connection:
+        for start in range(0, len(user_ids), RESYNC_BATCH_SIZE):
+            batch = [uuid.UUID(user_id) for user_id in user_ids[start:start + RESYNC_BATCH_SIZE]]
+            rows = await connection.execute(select(User.id, *STATE_COLUMNS.values()).where(User.id.in_(batch)))
+            for user_id, *values in rows:
+                states[str(user_id)] = dict(zip(STATE_COLUMNS, values))
+    return states
+
+
+def format_event(data: dict) -> bytes:
+    return b"event: " + USER_EVENT.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+
+
+# ===============
+# Subscriptions
+# ===============
+
+class Subscription:
+    """
+    One open stream. Holds at most one pending update; updates arriving before it is
+    written are merged into it, so memory per stream stays constant however slow the client.
+    """
+    __slots__ = ("user_id", "pending", "closed", "_waiter")
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.pending: dict | None = None
+        self.closed: str | None = None
+        self._waiter: asyncio.Future | None = None
+
+    def push(self, changes: dict):
+        if self.pending is None:
+            self.pending = dict(changes)
+        else:
+            self.pending.update(changes)
+        self._wake()
+
+    def take(self) -> dict | None:
+        pending, self.pending = self.pending, None
+        return pending
+
+    def close(self, reason: str):
+        if self.closed is None:
+            self.closed = reason
+        self._wake()
+
+    async def wait(self, timeout: float):
+        """
+        Returns when an update is pending, the stream is closed, or `timeout` passes.
+        """
+        if self.pending is not None or self.closed is not None:
+            return
+        #NOTE: A bare future rather than an asyncio.Event, which allocates a waiter deque per stream
+        self._waiter = asyncio.get_running_loop().create_future()
+        try:
+            await asyncio.wait_for(self._waiter, timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._waiter = None
+
+    def _wake(self):
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+
+class NotificationHub:
+    """
+    The worker's `LISTEN` connection and the streams it fans notifications out to.
+
+    `load_states` reads users from the primary; it serves both the re-read after a
+    notification and the resync below.
+
+    If the connection drops, streams stay open and the hub reconnects every
+    `reconnect_interval`; it then reloads the state of every subscribed user in batches
+    and pushes it, since notifications sent meanwhile were lost.
+    """
+
+    def __init__(
+        self,
+        listen_dsn: str,
+        load_states: Callable[[list[str]], Awaitable[dict[str, dict]]],
+        max_streams: int = 20000,
+        max_streams_per_user: int = 5,
+        reconnect_interval: float = 1.0,
+        connect_timeout: float = 5.0
+    ):
+        self.listen_dsn = listen_dsn
+        self.load_states = load_states
+        self.max_streams = max_streams
+        self.max_streams_per_user = max_streams_per_user
+        self.reconnect_interval = reconnect_interval
+        self.connect_timeout = connect_timeout
+
+        self.streams = 0
+        self.listening = False
+        self._connect_failures = 0
+        self._subscriptions: dict[str, list[Subscription]] = {}
+        self._listener: asyncpg.Connection | None = None
+        self._stopped = asyncio.Event()
+        self._stale: dict[str, set[str]] = {}
+        self._refresh: asyncio.Task | None = None
+
+    # ===============
+    # Streams
+    # ===============
+
+    def subscribe(self, user_id: str) -> Subscription:
+        """
+        Raises:
+            ExceptionWithErrorType: NOTIFICATION_STREAMS_EXHAUSTED (503) when the worker holds `max_streams`.
+        """
+        if self._stopped.is_set() or self.streams >= self.max_streams:
+            raise ExceptionWithErrorType(
+                error_type="NOTIFICATION_STREAMS_EXHAUSTED",
+                message="Too many open event streams on this server, retry shortly.",
+                status_code=503
+            )
+
+        subscriptions = self._subscriptions.get(user_id, ())
+        if len(subscriptions) >= self.max_streams_per_user:
+            #NOTE: The oldest stream is usually a tab the user left open; the newest one is in use
+            self._remove(subscriptions[0], "replaced")
+        subscription = Subscription(user_id)
+        self._subscriptions.setdefault(user_id, []).append(subscription)
+        self.streams += 1
+        NOTIFICATION_STREAMS.set(self.streams)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription, reason: str):
+        self._remove(subscription, reason)
+
+    def publish(self, user_id: str, changes: dict):
+        for subscription in self._subscriptions.get(user_id, ()):
+            subscription.push(changes)
+
+    def _remove(self, subscription: Subscription, reason: str):
+        subscriptions = self._subscriptions.get(subscription.user_id)
+        if subscriptions is None or subscription not in subscriptions:
+            return
+        subscriptions.remove(subscription)
+        if not subscriptions:
+            del self._subscriptions[subscription.user_id]
+        subscription.close(reason)
+        self.streams -= 1
+        NOTIFICATION_STREAMS.set(self.streams)
+        NOTIFICATION_STREAMS_CLOSED.inc(reason=subscription.closed)
+
+    # ===============
+    # Listener
+    # ===============
+
+    def _on_notify(self, connection, pid, channel, payload):
+        NOTIFICATIONS_RECEIVED.inc()
+        try:
+            message = orjson.loads(payload)
+            user_id, fields = message["user_id"], message["fields"]
+            if not isinstance(fields, list):
+                raise TypeError(fields)
+        except (orjson.JSONDecodeError, KeyError, TypeError):
+            logger.warning(f"Ignoring malformed {USER_EVENTS_CHANNEL} notification: {payload[:200]!r}")
+            return
+        if user_id not in self._subscriptions:
+            return
+        self._stale.setdefault(user_id, set()).update(fields)
+        if self._refresh is None or self._refresh.done():
+            self._refresh = asyncio.get_running_loop().create_task(self._refresh_stale())
+
+    async def _refresh_stale(self):
+        """
+        Re-reads the users notified since the last read and pushes their changed fields.
+        """
+        while self._stale and not self._stopped.is_set():
+            stale, self._stale = self._stale, {}
+            try:
+                states = await self.load_states(list(stale))
+            except Exception as e:
+                logger.warning(f"Could not read {len(stale)} changed users, their streams may be stale until the next change: {e}")
+                continue
+            for user_id, state in states.items():
+                fields = stale[user_id]
+                self.publish(user_id, {field: value for field, value in state.items() if field in fields})
+
+    def _on_listener_lost(self, connection):
+        if self._stopped.is_set():
+            return
+        logger.warning(f"Lost the {USER_EVENTS_CHANNEL} listener, streams get no updates until it reconnects")
+        self.listening = False
+
+    async def _listen(self) -> asyncpg.Connection | None:
+        try:
+            listener = await asyncpg.connect(self.listen_dsn, timeout=self.connect_timeout)
+            await listener.add_listener(USER_EVENTS_CHANNEL, self._on_notify)
+            listener.add_termination_listener(self._on_listener_lost)
+        except Exception as e:
+            if self._connect_failures == 0:
+                logger.warning(f"Could not listen for {USER_EVENTS_CHANNEL}, retrying every {self.reconnect_interval:g}s: {e}")
+            self._connect_failures += 1
+            self.listening = False
+            return None
+        self._connect_failures = 0
+        self.listening = True
+        return listener
+
+    async def resync(self):
+        """
+        Pushes the current state of every subscribed user.
+        """
+        if not self._subscriptions:
+            return
+        try:
+            states = await self.load_states(list(self._subscriptions))
+        except Exception as e:
+            logger.warning(f"Could not reload user state after reconnecting, streams may be stale until the next change: {e}")
+            return
+        for user_id, state in states.items():
+            self.publish(user_id, state)
+        logger.info(f"Resynced {len(states)} users after the {USER_EVENTS_CHANNEL} listener reconnected")
+
+    async def start(self):
+        self._listener = await self._listen()
+
+    async def run(self):
+        """
+        Keeps the listener connected until `stop()`.
+        """
+        try:
+            while not self._stopped.is_set():
+                try:
+                    await asyncio.wait_for(self._stopped.wait(), timeout=self.reconnect_interval)
+                except asyncio.TimeoutError:
+                    pass
+                if self._stopped.is_set():
+                    break
+                if self._listener is None or self._listener.is_closed():
+                    self._listener = await self._listen()
+                    if self._listener is not None:
+                        await self.resync()
+        finally:
+            if self._listener is not None and not self._listener.is_closed():
+                await self._listener.close()
+
+    def stop(self):
+        """
+        Stops listening and ends every open stream.
+        """
+        self._stopped.set()
+        if self._refresh is not None:
+            self._refresh.cancel()
+        for subscriptions in list(self._subscriptions.values()):
+            for subscription in list(subscriptions):
+                self._remove(subscription, "shutdown")
+
+
+# ===============
+# Event Stream
+# ===============
+
+class EventStreamResponse(Response):
+    """
+    Writes a subscription as `text/event-stream`: the snapshot first, then one `user`
+    event per (merged) update, and a comment after `heartbeat` idle seconds. Ends when the
+    client disconnects, at `expires_at` (epoch seconds), when the hub replaces or stops
+    the subscription, or when a write blocks for `send_timeout`.
+    """
+    media_type = "text/event-stream"
+
+    def __init__(
+        self,
+        hub: NotificationHub,
+        subscription: Subscription,
+        snapshot: dict,
+        expires_at: float,
+        heartbeat: float = 15.0,
+        send_timeout: float = 10.0
+    ):
+        self.hub = hub
+        self.subscription = subscription
+        self.snapshot = snapshot
+        self.expires_at = expires_at
+        self.heartbeat = heartbeat
+        self.send_timeout = send_timeout
+        self.status_code = 200
+        self.background = None
+        #NOTE: No `body`, so no Content-Length; the stream is sent chunked
+        self.init_headers(EVENT_STREAM_HEADERS)
+
+    async def __call__(self, scope, receive, send):
+        subscription = self.subscription
+        watcher = asyncio.ensure_future(self._watch_disconnect(receive))
+        try:
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            chunk = f"retry: {RETRY_MILLISECONDS}\n".encode() + format_event(self.snapshot)
+            kind = "snapshot"
+            while await self._write(send, chunk):
+                NOTIFICATION_EVENTS_SENT.inc(kind=kind)
+                remaining = self.expires_at - time.time()
+                if remaining <= 0:
+                    subscription.close("expired")
+                    break
+                await subscription.wait(min(self.heartbeat, remaining))
+                if subscription.closed is not None:
+                    break
+                changes = subscription.take()
+                chunk, kind = (format_event(changes), "update") if changes is not None else (b": heartbeat\n\n", "heartbeat")
+            else:
+                logger.info(f"Dropping event stream of user {subscription.user_id}: a write blocked for {self.send_timeout:g}s")
+                subscription.close("stalled")
+                return
+
+            await self._write(send, b"", more_body=False)
+        finally:
+            watcher.cancel()
+            self.hub.unsubscribe(subscription, subscription.closed or "cancelled")
+
+    async def _write(self, send, body: bytes, more_body: bool = True) -> bool:
+        try:
+            await asyncio.wait_for(send({"type": "http.response.body", "body": body, "more_body": more_body}), timeout=self.send_timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def _watch_disconnect(self, receive):
+        while (await receive())["type"] != "http.disconnect":
+            pass
+        self.subscription.close("disconnected")
@@ -0,0 +1,81 @@
+import math
+import time
+import functools
+
+from fastapi import APIRouter, Depends
+
+import common.database as database
+from api.src.utils import ExceptionWithErrorType
+from api.src.api_components.notifications.notifications import (
+    EventStreamResponse,
+    NotificationHub,
+    load_user_states,
+)
+from api.src.api_components.presentations.presentations import parse_user_uuid
+from api.src.api_components.token_validator.token_validator import validate_token
+from api.src.settings import settings
+
+
+router = APIRouter()
+
+
+@functools.lru_cache(maxsize=1)
+def get_notification_hub() -> NotificationHub:
+    """
+    Builds the worker's hub. Call after the database engines exist.
+    """
+    return NotificationHub(
+        listen_dsn=settings.DATABASE_URL,
+        load_states=lambda user_ids: load_user_states(database.async_engine, user_ids),
+        max_streams=settings.NOTIFICATION_MAX_STREAMS,
+        max_streams_per_user=settings.NOTIFICATION_MAX_STREAMS_PER_USER
+    )
+
+
+@router.get(
+    "/events",
+    response_class=EventStreamResponse,
+    tags=["Notifications"]
+)
+async def stream_user_events(token_payload: dict = Depends(validate_token)):
+    """
+    Stream your credit balance and profile as Server-Sent Events.
+
+    The first `user` event carries the full state; each later one carries only the fields
+    that changed, e.g. `{"credits_balance": 1500}` once a payment is processed. Comments
+    are sent every `NOTIFICATION_HEARTBEAT_SECONDS` while idle. The stream ends when the
+    token expires; reconnect with a fresh token.
+    """
+    user_uuid = parse_user_uuid(token_payload)
+    user_id = str(user_uuid)
+    hub = get_notification_hub()
+
+    #NOTE: Subscribe before reading the snapshot, so a change committed in between is pushed after it
+    subscription = hub.subscribe(user_id)
+    try:
+        #NOTE: Read-your-writes routing sends a user who just paid to the primary
+        states = await load_user_states(database.replica_router.engine_for(user_id), [user_id])
+    except BaseException:
+        hub.unsubscribe(subscription, "failed")
+        raise
+
+    if user_id not in states:
+        hub.unsubscribe(subscription, "failed")
+        raise ExceptionWithErrorType(
+            error_type="USER_NOT_FOUND",
+            message="User not found in the database.",
+            status_code=404
+        )
+
+    expires_at = min(
+        token_payload.get("exp") or math.inf,
+        time.time() + settings.NOTIFICATION_MAX_STREAM_SECONDS
+    )
+    return EventStreamResponse(
+        hub,
+        subscription,
+        snapshot=states[user_id],
+        expires_at=expires_at,
+        heartbeat=settings.NOTIFICATION_HEARTBEAT_SECONDS,
+        send_timeout=settings.NOTIFICATION_SEND_TIMEOUT_SECONDS
+    )
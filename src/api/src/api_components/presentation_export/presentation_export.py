@@ -0,0 +1,178 @@
+import os
+import copy
+import json
+import uuid
+import asyncio
+import hashlib
+import functools
+
+import pptx
+from loguru import logger
+from concurrent.futures import Executor
+from pptx.util import Emu
+
+from common.utils import extract_slide_title_and_body
+from api.src.utils import prune_cache_directory, touch_file_quietly
+
+#NOTE: Bump when the PPTX layout logic changes so cached exports are rebuilt
+EXPORT_FORMAT_VERSION = "3"
+
+DEFAULT_TEMPLATE_PATH = os.path.join(os.path.dirname(pptx.__file__), "templates", "default.pptx")
+
+# 16:9 canvas matching the 1920x1080 slides rendered in the editor
+SLIDE_WIDTH = Emu(12192000)
+SLIDE_HEIGHT = Emu(6858000)
+
+TITLE_AND_CONTENT_LAYOUT = "Title and Content"
+BODY_PLACEHOLDER_IDX = 1
+
+
+# ===============
+# Template Cache (per worker process)
+# ===============
+
+@functools.lru_cache(maxsize=8)
+def _load_template(template_path: str):
+    """
+    Parses the template once per worker. Builds work on deep copies of the parsed
+    package, so masters and layouts are never re-read or re-parsed from XML.
+    """
+    template = pptx.Presentation(template_path)
+    if template_path == DEFAULT_TEMPLATE_PATH:
+        template.slide_width = SLIDE_WIDTH
+        template.slide_height = SLIDE_HEIGHT
+
+    layout_indices = {layout.name: index for index, layout in enumerate(template.slide_layouts)}
+    return template, layout_indices
+
+
+# ===============
+# Deck Building (runs in the process pool)
+# ===============
+
+def build_pptx(title: str, slides: list[dict], output_path: str, template_path: str | None = None) -> int:
+    """
+    Builds a PPTX deck from slide code and writes it atomically to `output_path`.
+
+    Args:
+        title (str): Deck title stored in the document properties.
+        slides (list[dict]): Slides in deck order, each with a `code` key.
+        output_path (str): Destination file path.
+        template_path (str | None): Optional custom template; defaults to the python-pptx template.
+    Returns:
+        int: Size of the written file in bytes.
+    """
+    template, layout_indices = _load_template(template_path or DEFAULT_TEMPLATE_PATH)
+    deck = copy.deepcopy(template)
+    deck.core_properties.title = title
+
+    layout = deck.slide_layouts[layout_indices.get(TITLE_AND_CONTENT_LAYOUT, 1)]
+    for slide_data in slides:
+        slide_title, body = extract_slide_title_and_body(slide_data["code"])
+        slide = deck.slides.add_slide(layout)
+
+        if slide.shapes.title is not None:
+            slide.shapes.title.text = slide_title
+
+        body_placeholder = next(
+            (shape for shape in slide.placeholders if shape.placeholder_format.idx == BODY_PLACEHOLDER_IDX),
+            None
+        )
+        if body_placeholder is not None and body:
+            text_frame = body_placeholder.text_frame
+            text_frame.text = body[0]
+            for line in body[1:]:
+                text_frame.add_paragraph().text = line
+
+    temp_path = f"{output_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        deck.save(temp_path)
+        os.replace(temp_path, output_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    return os.path.getsize(output_path)
+
+
+# ===============
+# Export Cache
+# ===============
+
+def deck_content_hash(title: str, slides: list[dict], template_path: str | None = None) -> str:
+    """
+    Returns a hash of everything that affects the exported file.
+    """
+    payload = json.dumps(
+        {
+            "version": EXPORT_FORMAT_VERSION,
+            "template": template_path or "default",
+            "title": title,
+            "slides": [slide["code"] for slide in slides],
+        },
+        separators=(",", ":"),
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class PresentationExporter:
+    """
+    Builds PPTX exports in a process pool and caches them on disk by deck-content hash.
+    Concurrent requests for the same deck share a single build.
+
+    A cache hit touches the file, so its mtime is when it was last downloaded. After each
+    build, exports unused for `max_age_seconds` are removed, then the least recently used
+    ones until the directory holds at most `max_bytes`.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        executor: Executor,
+        template_path: str | None = None,
+        max_bytes: int = 1024 ** 3,
+        max_age_seconds: float = 7 * 24 * 3600
+    ):
+        self.cache_dir = cache_dir
+        self.executor = executor
+        self.template_path = template_path
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self._inflight: dict[str, asyncio.Future] = {}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, content_hash: str) -> str:
+        return os.path.join(self.cache_dir, f"{content_hash}.pptx")
+
+    async def export(self, title: str, slides: list[dict]) -> tuple[str, bool]:
+        """
+        Returns the path of the exported deck and whether it was served from the cache.
+        """
+        content_hash = deck_content_hash(title, slides, self.template_path)
+        path = self._path(content_hash)
+
+        if os.path.exists(path):
+            touch_file_quietly(path)
+            return path, True
+
+        inflight = self._inflight.get(content_hash)
+        if inflight is not None:
+            await asyncio.shield(inflight)
+            return path, True
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, build_pptx, title, slides, path, self.template_path)
+        self._inflight[content_hash] = future
+        try:
+            size = await asyncio.shield(future)
+        finally:
+            self._inflight.pop(content_hash, None)
+
+        logger.info(f"Exported {len(slides)} slides to PPTX ({size} bytes, hash={content_hash})")
+        #NOTE: Off the event loop; the directory may hold thousands of exports
+        await asyncio.to_thread(
+            prune_cache_directory, self.cache_dir, ".pptx", self.max_bytes, self.max_age_seconds, f"{content_hash}.pptx"
+        )
+        return path, False
@@ -0,0 +1,70 @@
+import uuid
+import functools
+
+from fastapi import APIRouter, Depends, Header, Response
+from fastapi.responses import FileResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from common.database import get_async_db
+from common.utils import safe_filename
+from api.src.process_pool import get_process_pool
+from api.src.api_components.presentations.presentations import get_user_presentation, parse_user_uuid
+from api.src.api_components.presentation_export.presentation_export import PresentationExporter, deck_content_hash
+from api.src.api_components.token_validator.token_validator import validate_token
+from api.src.settings import settings
+
+
+router = APIRouter()
+
+PPTX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
+
+
+@functools.lru_cache(maxsize=1)
+def _get_exporter() -> PresentationExporter:
+    return PresentationExporter(
+        cache_dir=settings.PRESENTATION_EXPORT_CACHE_DIR,
+        executor=get_process_pool(),
+        template_path=settings.PRESENTATION_EXPORT_TEMPLATE_PATH,
+        max_bytes=settings.PRESENTATION_EXPORT_CACHE_MAX_BYTES,
+        max_age_seconds=settings.PRESENTATION_EXPORT_CACHE_MAX_AGE_SECONDS
+    )
+
+
+# ===============
+# Export PPTX
+# ===============
+
+@router.get(
+    "/presentations/{presentation_id}/export.pptx",
+    response_class=FileResponse,
+    responses={200: {"content": {PPTX_MEDIA_TYPE: {}}}, 304: {"description": "Deck unchanged since the last download"}},
+    tags=["Presentations"]
+)
+async def export_presentation_pptx(
+    presentation_id: uuid.UUID,
+    if_none_match: str | None = Header(None),
+    token_payload: dict = Depends(validate_token),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Export a presentation as a PowerPoint file.
+
+    Exports are cached by deck content, and the response carries the content hash as `ETag`,
+    so clients re-downloading an unchanged deck receive `304 Not Modified`.
+    """
+    user_uuid = parse_user_uuid(token_payload)
+    presentation = await get_user_presentation(db, presentation_id, user_uuid)
+
+    exporter = _get_exporter()
+    etag = f'"{deck_content_hash(presentation.title, presentation.slides, exporter.template_path)}"'
+    if if_none_match == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    path, cached = await exporter.export(presentation.title, presentation.slides)
+
+    return FileResponse(
+        path,
+        media_type=PPTX_MEDIA_TYPE,
+        filename=safe_filename(presentation.title, "pptx"),
+        headers={"ETag": etag, "X-Export-Cache": "HIT" if cached else "MISS"}
+    )
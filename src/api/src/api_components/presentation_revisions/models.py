@@ -0,0 +1,34 @@
+from datetime import datetime
+from pydantic import BaseModel, Field
+from typing import Optional
+
+from api.src.api_components.slide_generation.models import SlideData
+
+
+class CommitRevisionRequest(BaseModel):
+    slides: list[SlideData] = Field(..., max_length=200, description="Slides in deck order")
+    title: Optional[str] = Field(None, min_length=1, max_length=500, description="New title; unchanged when omitted")
+    base_revision: Optional[int] = Field(
+        None,
+        ge=0,
+        description="Head revision the edit was made on (0 before the first revision); the commit is rejected with 409 if the head has moved since"
+    )
+
+
+class RevisionResponse(BaseModel):
+    number: int = Field(..., description="Revision number, counting from 1 per presentation")
+    title: str = Field(..., description="Presentation title at this revision")
+    slides: list[SlideData] = Field(..., description="Slides in deck order")
+    created_at: datetime = Field(..., description="When the revision was committed")
+
+
+class RevisionSummary(BaseModel):
+    number: int = Field(..., description="Revision number")
+    title: str = Field(..., description="Presentation title at this revision")
+    slide_count: int = Field(..., description="Number of slides")
+    created_at: datetime = Field(..., description="When the revision was committed")
+
+
+class RevisionListResponse(BaseModel):
+    revisions: list[RevisionSummary] = Field(..., description="Revisions of this page, newest first")
+    next_before: Optional[int] = Field(None, description="`before` value for the next (older) page; null when there is none")
@@ -0,0 +1,508 @@
+"""
+Content-addressed slide storage with delta revision history.
+
+- **Slide blobs** (`slide_blobs`) are keyed by the SHA-256 of the slide code, so a slide
+  that is unchanged between revisions, or identical in two decks, is stored once. A blob
+  is either the zlib-compressed code or a compressed line delta against another blob.
+- **Revisions** (`presentation_revisions`) are manifests: the slide IDs in deck order and
+  the hash of each slide. A commit that changes one slide writes one blob, usually a
+  delta against that slide's previous version.
+- **Checkout** fetches a manifest's blobs and every delta base they need in one recursive
+  query. Decoded slides never change for a hash, so they are cached per worker.
+- **Compaction** rewrites a deck's history as reverse deltas: the head's slides become
+  full copies and older versions deltas against newer ones. No delta chain is longer
+  than `max_depth`.
+
+`presentations.slides` stays the materialized head, so reading the current deck needs no decoding.
+"""
+import time
+import uuid
+import zlib
+import difflib
+import hashlib
+
+import orjson
+from loguru import logger
+from dataclasses import dataclass
+from collections import OrderedDict, defaultdict
+from sqlalchemy import func, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from common.models.presentation_revision import PresentationRevision, SlideBlob
+from api.src.metrics import REGISTRY
+from api.src.utils import ExceptionWithErrorType
+from api.src.api_components.presentations.presentations import get_user_presentation
+from api.src.api_components.presentation_search.presentation_search import index_presentation
+
+COMPRESSION_LEVEL = 6
+
+SLIDE_BLOB_WRITES = REGISTRY.counter(
+    "slide_blob_writes_total",
+    "Slides of committed revisions by storage: `deduplicated`, `delta` or `full`",
+    ("storage",)
+)
+REVISION_CHECKOUT_SECONDS = REGISTRY.histogram(
+    "presentation_revision_checkout_seconds",
+    "Time to load and decode the slides of a revision"
+)
+
+#NOTE: Blobs found here are safe from garbage collection until commit: fresh ones are inside the grace
+# period, and refreshing stale ones makes a concurrent collection re-check and skip the new row version.
+# Delta bases are locked too, so compaction cannot make them deeper while a delta against them is written.
+FIND_BLOBS_SQL = text("""
+WITH locked AS (
+    SELECT hash FROM slide_blobs
+    WHERE hash = ANY(CAST(:hashes AS bytea[]))
+      AND (referenced_at < now() - make_interval(secs => :touch_after) OR hash = ANY(CAST(:bases AS bytea[])))
+    ORDER BY hash
+    FOR NO KEY UPDATE
+),
+touched AS (
+    UPDATE slide_blobs b SET referenced_at = now()
+    FROM locked WHERE b.hash = locked.hash
+    RETURNING b.hash, b.depth
+)
+SELECT hash, depth FROM touched
+UNION ALL
+SELECT hash, depth FROM slide_blobs
+WHERE hash = ANY(CAST(:hashes AS bytea[])) AND hash NOT IN (SELECT hash FROM locked)
+""")
+
+LOAD_BLOBS_SQL = text("""
+WITH RECURSIVE chain AS (
+    SELECT hash, base_hash, data FROM slide_blobs WHERE hash = ANY(CAST(:hashes AS bytea[]))
+    UNION
+    SELECT b.hash, b.base_hash, b.data
+    FROM slide_blobs b JOIN chain c ON b.hash = c.base_hash
+)
+SELECT hash, base_hash, data FROM chain
+""")
+
+LOCK_FOR_COMPACTION_SQL = text("""
+SELECT hash, base_hash, depth, length(data) AS stored_bytes FROM slide_blobs
+WHERE hash = ANY(CAST(:hashes AS bytea[]))
+ORDER BY hash
+FOR UPDATE
+""")
+
+DEPENDENTS_SQL = text("""
+SELECT base_hash, hash FROM slide_blobs WHERE base_hash = ANY(CAST(:hashes AS bytea[]))
+""")
+
+#NOTE: A blob with deltas against it is kept until they are deleted; the next batch picks up the freed bases
+COLLECT_GARBAGE_SQL = text("""
+WITH orphans AS (
+    SELECT b.hash FROM slide_blobs b
+    WHERE b.referenced_at < now() - make_interval(secs => :grace)
+      AND NOT EXISTS (SELECT 1 FROM presentation_revisions r WHERE r.slide_hashes @> ARRAY[b.hash])
+      AND NOT EXISTS (SELECT 1 FROM slide_blobs d WHERE d.base_hash = b.hash)
+    LIMIT :limit
+    FOR UPDATE SKIP LOCKED
+)
+DELETE FROM slide_blobs WHERE hash IN (SELECT hash FROM orphans)
+RETURNING length(data)
+""")
+
+
+# ===============
+# Encoding
+# ===============
+
+def slide_hash(code: str) -> bytes:
+    return hashlib.sha256(code.encode("utf-8")).digest()
+
+
+def encode_full(code: str) -> bytes:
+    return zlib.compress(code.encode("utf-8"), COMPRESSION_LEVEL)
+
+
+def encode_delta(base: str, code: str) -> bytes:
+    """
+    Encodes `code` as line operations on `base`: `[start, end]` copies base lines,
+    a string inserts text.
+    """
+    base_lines = base.splitlines(keepends=True)
+    lines = code.splitlines(keepends=True)
+    operations = []
+    matcher = difflib.SequenceMatcher(None, base_lines, lines, autojunk=False)
+    for tag, base_start, base_end, start, end in matcher.get_opcodes():
+        if tag == "equal":
+            operations.append([base_start, base_end])
+        elif tag in ("replace", "insert"):
+            operations.append("".join(lines[start:end]))
+    return zlib.compress(orjson.dumps(operations), COMPRESSION_LEVEL)
+
+
+def apply_delta(base: str, data: bytes) -> str:
+    base_lines = base.splitlines(keepends=True)
+    parts = []
+    for operation in orjson.loads(zlib.decompress(data)):
+        if isinstance(operation, str):
+            parts.append(operation)
+        else:
+            parts.extend(base_lines[operation[0]:operation[1]])
+    return "".join(parts)
+
+
+def encode_slide(code: str, base: str | None, delta_ratio: float) -> tuple[bytes, bool]:
+    """
+    Returns the blob data for `code` and whether it is a delta against `base`.
+    """
+    full = encode_full(code)
+    if base is None:
+        return full, False
+    delta = encode_delta(base, code)
+    if len(delta) <= len(full) * delta_ratio:
+        return delta, True
+    return full, False
+
+
+class SlideCache:
+    """
+    Decoded slide code by hash, least recently used first out, bounded in bytes.
+    Entries never go stale: a hash names exactly one code.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[bytes, str] = OrderedDict()
+        self._bytes = 0
+
+    def get(self, key: bytes) -> str | None:
+        code = self._entries.get(key)
+        if code is not None:
+            self._entries.move_to_end(key)
+        return code
+
+    def put(self, key: bytes, code: str):
+        if len(code) > self.max_bytes or key in self._entries:
+            return
+        self._entries[key] = code
+        self._bytes += len(code)
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+
+
+# ===============
+# Checkout
+# ===============
+
+async def load_slides(db: AsyncSession, hashes: list[bytes], cache: SlideCache | None = None) -> dict[bytes, str]:
+    """
+    Returns the code of every hash. Uncached blobs and the delta bases they need are
+    fetched in one query.
+
+    Raises:
+        ExceptionWithErrorType: SLIDE_BLOB_MISSING if a manifest references a deleted blob.
+    """
+    codes: dict[bytes, str] = {}
+    missing = []
+    for key in set(hashes):
+        code = cache.get(key) if cache is not None else None
+        if code is None:
+            missing.append(key)
+        else:
+            codes[key] = code
+    if not missing:
+        return codes
+
+    rows = {row.hash: row for row in await db.execute(LOAD_BLOBS_SQL, {"hashes": missing})}
+
+    def decode(key: bytes) -> str:
+        pending = []
+        while (code := codes.get(key)) is None:
+            row = rows.get(key)
+            if row is None:
+                raise ExceptionWithErrorType(
+                    error_type="SLIDE_BLOB_MISSING",
+                    message="A slide of this revision is missing from storage."
+                )
+            if row.base_hash is None:
+                code = codes[key] = zlib.decompress(row.data).decode("utf-8")
+                break
+            pending.append(row)
+            key = row.base_hash
+        for row in reversed(pending):
+            code = codes[row.hash] = apply_delta(code, row.data)
+        return code
+
+    for key in missing:
+        code = decode(key)
+        if cache is not None:
+            cache.put(key, code)
+    return codes
+
+
+async def checkout_revision(
+    db: AsyncSession,
+    presentation_id: uuid.UUID,
+    number: int,
+    cache: SlideCache | None = None
+) -> tuple[PresentationRevision, list[dict]]:
+    """
+    Returns a revision and its slides in the frontend `SlideData {id, code}` shape.
+
+    Raises:
+        ExceptionWithErrorType: REVISION_NOT_FOUND if the presentation has no such revision.
+    """
+    started = time.perf_counter()
+    revision = await db.get(PresentationRevision, (presentation_id, number))
+    if revision is None:
+        raise ExceptionWithErrorType(
+            error_type="REVISION_NOT_FOUND",
+            message=f"The presentation has no revision {number}.",
+            status_code=404
+        )
+
+    codes = await load_slides(db, revision.slide_hashes, cache)
+    slides = [{"id": slide_id, "code": codes[key]} for slide_id, key in zip(revision.slide_ids, revision.slide_hashes)]
+    REVISION_CHECKOUT_SECONDS.observe(time.perf_counter() - started)
+    return revision, slides
+
+
+async def list_revisions(
+    db: AsyncSession,
+    presentation_id: uuid.UUID,
+    before: int | None = None,
+    limit: int = 50
+) -> list[tuple[int, str, int, object]]:
+    """
+    Returns `(number, title, slide_count, created_at)` of a page of revisions, newest first.
+    """
+    query = (
+        select(
+            PresentationRevision.number,
+            PresentationRevision.title,
+            func.cardinality(PresentationRevision.slide_ids),
+            PresentationRevision.created_at
+        )
+        .where(PresentationRevision.presentation_id == presentation_id)
+        .order_by(PresentationRevision.number.desc())
+        .limit(limit)
+    )
+    if before is not None:
+        query = query.where(PresentationRevision.number < before)
+    return [tuple(row) for row in await db.execute(query)]
+
+
+# ===============
+# Commit
+# ===============
+
+async def commit_revision(
+    db: AsyncSession,
+    presentation_id: uuid.UUID,
+    user_uuid: uuid.UUID,
+    slides: list[dict],
+    title: str | None = None,
+    base_revision: int | None = None,
+    max_depth: int = 16,
+    delta_ratio: float = 0.5,
+    touch_after: float = 900.0,
+    cache: SlideCache | None = None,
+    search_config: str = "english",
+    search_max_chars: int = 200_000
+) -> PresentationRevision:
+    """
+    Stores `slides` as the presentation's next revision and makes it the head, and updates
+    the presentation's search index in the same transaction.
+
+    Only slides whose code is not stored yet are written. A changed slide is stored as a
+    delta against its previous version (same slide ID in the head) when that is small enough.
+
+    Raises:
+        ExceptionWithErrorType: PRESENTATION_NOT_FOUND if the user has no such presentation.
+        ExceptionWithErrorType: REVISION_CONFLICT if `base_revision` is no longer the head.
+    """
+    presentation = await get_user_presentation(db, presentation_id, user_uuid)
+    #NOTE: Serializes commits per presentation; revision numbers and the materialized head stay in step
+    await db.refresh(presentation, with_for_update=True)
+
+    head = await db.scalar(
+        select(func.coalesce(func.max(PresentationRevision.number), 0))
+        .where(PresentationRevision.presentation_id == presentation_id)
+    )
+    if base_revision is not None and base_revision != head:
+        raise ExceptionWithErrorType(
+            error_type="REVISION_CONFLICT",
+            message=f"The presentation changed since revision {base_revision}; the head is revision {head}.",
+            status_code=409
+        )
+
+    hashes = [slide_hash(slide["code"]) for slide in slides]
+    previous = {slide["id"]: slide["code"] for slide in presentation.slides or []}
+    base_codes = {
+        index: previous[slide["id"]]
+        for index, slide in enumerate(slides)
+        if slide["id"] in previous and previous[slide["id"]] != slide["code"]
+    }
+    base_hashes = {index: slide_hash(code) for index, code in base_codes.items()}
+
+    rows = await db.execute(FIND_BLOBS_SQL, {
+        "hashes": list(set(hashes) | set(base_hashes.values())),
+        "bases": list(set(base_hashes.values())),
+        "touch_after": touch_after
+    })
+    depths = {key: depth for key, depth in rows}
+
+    new = {}
+    for index, key in enumerate(hashes):
+        if key in depths or key in new:
+            SLIDE_BLOB_WRITES.inc(storage="deduplicated")
+        else:
+            new[key] = index
+
+    blobs = []
+    for key, index in new.items():
+        code = slides[index]["code"]
+        base_hash = base_hashes.get(index)
+        usable = base_hash in depths and depths[base_hash] < max_depth
+        data, is_delta = encode_slide(code, base_codes[index] if usable else None, delta_ratio)
+        blobs.append({
+            "hash": key,
+            "data": data,
+            "base_hash": base_hash if is_delta else None,
+            "depth": depths[base_hash] + 1 if is_delta else 0,
+            "size": len(code)
+        })
+        SLIDE_BLOB_WRITES.inc(storage="delta" if is_delta else "full")
+    if blobs:
+        #NOTE: Another deck may store the same slide concurrently; either row decodes to the same code
+        await db.execute(pg_insert(SlideBlob).on_conflict_do_nothing(index_elements=["hash"]), blobs)
+
+    revision = PresentationRevision(
+        presentation_id=presentation_id,
+        number=head + 1,
+        user_id=user_uuid,
+        title=title or presentation.title,
+        slide_ids=[slide["id"] for slide in slides],
+        slide_hashes=hashes
+    )
+    db.add(revision)
+    presentation.title = revision.title
+    presentation.slides = slides
+    index_presentation(presentation, search_config, search_max_chars)
+    await db.commit()
+    await db.refresh(revision)
+
+    if cache is not None:
+        for key, slide in zip(hashes, slides):
+            cache.put(key, slide["code"])
+    return revision
+
+
+# ===============
+# Compaction
+# ===============
+
+@dataclass
+class CompactionResult:
+    blobs: int = 0
+    rewritten_full: int = 0
+    rewritten_delta: int = 0
+    bytes_before: int = 0
+    bytes_after: int = 0
+
+
+async def compact_presentation(
+    db: AsyncSession,
+    presentation_id: uuid.UUID,
+    max_depth: int = 16,
+    delta_ratio: float = 0.5,
+    batch_size: int = 200
+) -> CompactionResult:
+    """
+    Rewrites a presentation's history as reverse deltas, newest blobs first, committing
+    after every `batch_size` blobs.
+
+    Only a blob no other blob is a delta against is turned into a delta, which can never
+    form a cycle; blobs shared with other decks are changed only under the same rules.
+    """
+    manifests = (await db.execute(
+        select(PresentationRevision.slide_ids, PresentationRevision.slide_hashes)
+        .where(PresentationRevision.presentation_id == presentation_id)
+        .order_by(PresentationRevision.number.desc())
+    )).all()
+
+    # The preferred base of every blob: the same slide in the nearest newer revision
+    plan: dict[bytes, bytes | None] = {}
+    newer: dict[str, bytes] = {}
+    for slide_ids, slide_hashes in manifests:
+        for slide_id, key in zip(slide_ids, slide_hashes):
+            if key not in plan:
+                base = newer.get(slide_id)
+                plan[key] = base if base != key else None
+        newer.update(zip(slide_ids, slide_hashes))
+    await db.commit()
+
+    result = CompactionResult(blobs=len(plan))
+    order = list(plan)
+    depths: dict[bytes, int] = {}
+    for start in range(0, len(order), batch_size):
+        batch = order[start:start + batch_size]
+        bases = {plan[key] for key in batch if plan[key] is not None}
+        locked = list(set(batch) | bases)
+        rows = {row.hash: row for row in await db.execute(LOCK_FOR_COMPACTION_SQL, {"hashes": locked})}
+        dependents: dict[bytes, set[bytes]] = defaultdict(set)
+        for base, key in await db.execute(DEPENDENTS_SQL, {"hashes": batch}):
+            dependents[base].add(key)
+        codes = await load_slides(db, locked)
+
+        for key in batch:
+            row = rows.get(key)
+            if row is None:
+                continue
+            result.bytes_before += row.stored_bytes
+            base = plan[key]
+            base_depth = depths.get(base, rows[base].depth) if base in rows else max_depth
+
+            if base is not None and base_depth < max_depth and not dependents[key]:
+                data, is_delta = encode_slide(codes[key], codes[base], delta_ratio)
+                if is_delta:
+                    depths[key] = base_depth + 1
+                    if row.base_hash != base:
+                        await db.execute(
+                            update(SlideBlob).where(SlideBlob.hash == key)
+                            .values(data=data, base_hash=base, depth=depths[key])
+                        )
+                        dependents[row.base_hash].discard(key)
+                        dependents[base].add(key)
+                        result.rewritten_delta += 1
+                        result.bytes_after += len(data)
+                    else:
+                        result.bytes_after += row.stored_bytes
+                    continue
+
+            if row.base_hash is not None and (base is None or base_depth >= max_depth):
+                #NOTE: The head, and every `max_depth`-th version, is a full copy that chains start from
+                data = encode_full(codes[key])
+                await db.execute(update(SlideBlob).where(SlideBlob.hash == key).values(data=data, base_hash=None, depth=0))
+                dependents[row.base_hash].discard(key)
+                depths[key] = 0
+                result.rewritten_full += 1
+                result.bytes_after += len(data)
+            else:
+                depths[key] = row.depth
+                result.bytes_after += row.stored_bytes
+        await db.commit()
+
+    logger.info(
+        f"Compacted presentation {presentation_id}: {result.blobs} blobs, {result.rewritten_full} made full, "
+        f"{result.rewritten_delta} made deltas, {result.bytes_before} -> {result.bytes_after} bytes"
+    )
+    return result
+
+
+async def collect_garbage(db: AsyncSession, grace: float, batch_size: int = 1000) -> int:
+    """
+    Deletes slide blobs no revision references, in batches. Returns the number deleted.
+    """
+    deleted = 0
+    while True:
+        count = len((await db.execute(COLLECT_GARBAGE_SQL, {"grace": grace, "limit": batch_size})).all())
+        await db.commit()
+        if count == 0:
+            return deleted
+        deleted += count
@@ -0,0 +1,150 @@
+import uuid
+import functools
+
+from loguru import logger
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from common.database import get_async_db, get_async_read_db, mark_write
+from api.src.idempotency import IdempotencyClaim, idempotent
+from api.src.api_components.jobs.jobs import enqueue_job
+from api.src.api_components.presentation_revisions.presentation_revisions import (
+    SlideCache,
+    checkout_revision,
+    commit_revision,
+    list_revisions,
+)
+from api.src.api_components.presentation_revisions.models import (
+    CommitRevisionRequest,
+    RevisionListResponse,
+    RevisionResponse,
+    RevisionSummary,
+)
+from api.src.api_components.presentations.presentations import get_user_presentation, parse_user_uuid
+from api.src.api_components.token_validator.token_validator import validate_token
+from api.src.responses import PydanticResponse
+from api.src.settings import settings
+
+
+router = APIRouter()
+
+
+@functools.lru_cache(maxsize=1)
+def get_slide_cache() -> SlideCache:
+    return SlideCache(max_bytes=settings.PRESENTATION_REVISION_CACHE_BYTES)
+
+
+# ===============
+# Commit
+# ===============
+
+@router.post(
+    "/presentations/{presentation_id}/revisions",
+    response_model=RevisionResponse,
+    tags=["Presentations"]
+)
+async def commit_presentation_revision(
+    presentation_id: uuid.UUID,
+    request: CommitRevisionRequest,
+    token_payload: dict = Depends(validate_token),
+    _idempotency: IdempotencyClaim | None = Depends(idempotent("commit_revision")),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Save the deck as a new revision and make it the current version.
+
+    Pass the revision the edit started from as `base_revision` to get 409 instead of
+    overwriting a concurrent edit, and an `Idempotency-Key` so a retried save is not
+    committed twice.
+    """
+    user_uuid = parse_user_uuid(token_payload)
+    revision = await commit_revision(
+        db,
+        presentation_id,
+        user_uuid,
+        slides=[slide.model_dump() for slide in request.slides],
+        title=request.title,
+        base_revision=request.base_revision,
+        max_depth=settings.PRESENTATION_REVISION_MAX_DELTA_DEPTH,
+        delta_ratio=settings.PRESENTATION_REVISION_DELTA_RATIO,
+        touch_after=settings.SLIDE_BLOB_GC_GRACE_SECONDS / 4,
+        cache=get_slide_cache(),
+        search_config=settings.PRESENTATION_SEARCH_CONFIG,
+        search_max_chars=settings.PRESENTATION_SEARCH_MAX_TEXT_CHARS
+    )
+    await mark_write(db, user_uuid)
+
+    if revision.number % settings.PRESENTATION_COMPACTION_INTERVAL == 0:
+        job = await enqueue_job(
+            db,
+            kind="presentation_compaction",
+            payload={"presentation_id": str(presentation_id)},
+            priority=settings.PRESENTATION_COMPACTION_PRIORITY,
+            max_attempts=settings.JOB_MAX_ATTEMPTS
+        )
+        logger.info(f"Queued compaction job {job.id} for presentation {presentation_id} at revision {revision.number}")
+
+    return PydanticResponse(RevisionResponse(
+        number=revision.number,
+        title=revision.title,
+        slides=request.slides,
+        created_at=revision.created_at
+    ))
+
+
+# ===============
+# History & Checkout
+# ===============
+
+@router.get(
+    "/presentations/{presentation_id}/revisions",
+    response_model=RevisionListResponse,
+    tags=["Presentations"]
+)
+async def get_revision_history(
+    presentation_id: uuid.UUID,
+    before: int | None = Query(None, ge=1, description="Only revisions older than this number; `next_before` of the previous page"),
+    limit: int = Query(50, ge=1, le=200),
+    token_payload: dict = Depends(validate_token),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Page backwards through a presentation's revisions, newest first.
+    """
+    user_uuid = parse_user_uuid(token_payload)
+    await get_user_presentation(db, presentation_id, user_uuid)
+
+    rows = await list_revisions(db, presentation_id, before=before, limit=limit)
+    return PydanticResponse(RevisionListResponse(
+        revisions=[
+            RevisionSummary(number=number, title=title, slide_count=slide_count, created_at=created_at)
+            for number, title, slide_count, created_at in rows
+        ],
+        next_before=rows[-1][0] if len(rows) == limit and rows[-1][0] > 1 else None
+    ))
+
+
+@router.get(
+    "/presentations/{presentation_id}/revisions/{number}",
+    response_model=RevisionResponse,
+    tags=["Presentations"]
+)
+async def get_revision(
+    presentation_id: uuid.UUID,
+    number: int,
+    token_payload: dict = Depends(validate_token),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Check out the slides of any revision.
+    """
+    user_uuid = parse_user_uuid(token_payload)
+    await get_user_presentation(db, presentation_id, user_uuid)
+
+    revision, slides = await checkout_revision(db, presentation_id, number, cache=get_slide_cache())
+    return PydanticResponse(RevisionResponse(
+        number=revision.number,
+        title=revision.title,
+        slides=slides,
+        created_at=revision.created_at
+    ))
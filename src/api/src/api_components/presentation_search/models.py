@@ -0,0 +1,19 @@
+import uuid
+from datetime import datetime
+from pydantic import BaseModel, Field
+from typing import Optional
+
+
+class PresentationSearchHit(BaseModel):
+    id: uuid.UUID = Field(..., description="Presentation ID")
+    title: str = Field(..., description="Presentation title")
+    title_highlighted: str = Field(..., description="Title as HTML-escaped text with matches wrapped in `<mark>`")
+    snippet: str = Field(..., description="Matching passages of slide text, HTML-escaped with matches wrapped in `<mark>`")
+    rank: float = Field(..., description="Relevance between 0 and 1; title matches weigh more than slide text")
+    slide_count: int = Field(..., description="Number of slides")
+    updated_at: datetime = Field(..., description="When the presentation was last changed")
+
+
+class PresentationSearchResponse(BaseModel):
+    results: list[PresentationSearchHit] = Field(..., description="Matches of this page, best first")
+    next_cursor: Optional[str] = Field(None, description="Cursor of the next page; null when there is none")
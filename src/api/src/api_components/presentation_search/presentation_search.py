@@ -0,0 +1,237 @@
+"""
+Full-text search over a user's presentations.
+
+`presentations.search_text` holds the visible text of the slides, extracted from their
+TSX, and `presentations.search_vector` the weighted tsvector of title (A) and text (B),
+behind a GIN index. Both are written in the transaction that saves the slides
+(`commit_revision`), so the index is never behind the deck. Decks written by other means
+are picked up by `python -m api.src.reindex_presentations`.
+"""
+import html
+import time
+import uuid
+import base64
+import binascii
+
+from datetime import datetime
+from dataclasses import dataclass
+from typing import Any, Iterable
+from sqlalchemy import cast, func, literal_column, text
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from common.utils import extract_slide_text
+from common.models.presentation import Presentation
+from api.src.metrics import REGISTRY
+from api.src.utils import ExceptionWithErrorType
+
+#NOTE: Control characters never occur in extracted text, so they can delimit highlights
+HIGHLIGHT_START = "\x02"
+HIGHLIGHT_STOP = "\x03"
+SNIPPET_OPTIONS = (
+    f"StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_STOP}, "
+    "MaxWords=24, MinWords=10, MaxFragments=2, FragmentDelimiter=\" … \""
+)
+TITLE_OPTIONS = f"StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_STOP}, HighlightAll=true"
+
+SEARCH_QUERY_SECONDS = REGISTRY.histogram(
+    "presentation_search_seconds",
+    "Latency of presentation search queries"
+)
+
+
+# ===============
+# Text Extraction
+# ===============
+
+def presentation_search_text(slides: Iterable[dict[str, Any]], max_chars: int) -> str:
+    """
+    Returns the visible text of a deck, one line per fragment, cut at `max_chars`
+    (a tsvector is limited to 1 MB).
+    """
+    return "\n".join(fragment for slide in slides for _, fragment in extract_slide_text(slide.get("code") or ""))[:max_chars]
+
+
+def search_vector(config: str, title: Any, search_text: Any):
+    """
+    SQL expression of the weighted tsvector of a deck; `title` and `search_text` may be
+    values or columns.
+    """
+    regconfig = cast(config, REGCONFIG)
+    return func.setweight(func.to_tsvector(regconfig, func.coalesce(title, "")), literal_column("'A'")).op("||")(
+        func.setweight(func.to_tsvector(regconfig, func.coalesce(search_text, "")), literal_column("'B'"))
+    )
+
+
+def index_presentation(presentation: Presentation, config: str, max_chars: int):
+    """
+    Sets the search columns of a presentation from its current title and slides. Call
+    before committing a change to either.
+    """
+    presentation.search_text = presentation_search_text(presentation.slides, max_chars)
+    presentation.search_vector = search_vector(config, presentation.title, presentation.search_text)
+
+
+# ===============
+# Search
+# ===============
+
+#NOTE: Ranks and highlights only the page; `ts_headline` re-parses text and is the expensive part
+SEARCH_SQL_TEMPLATE = """
+WITH query AS (
+    SELECT websearch_to_tsquery(CAST(:config AS regconfig), :query) AS q
+),
+page AS (
+    SELECT p.id, ts_rank_cd(p.search_vector, query.q, 32) AS rank
+    FROM presentations p, query
+    WHERE p.user_id = :user_id AND p.search_vector @@ query.q{after}
+    ORDER BY rank DESC, p.id DESC
+    LIMIT :limit
+)
+SELECT p.id, page.rank, p.title, p.updated_at, jsonb_array_length(p.slides) AS slide_count,
+       ts_headline(CAST(:config AS regconfig), p.title, query.q, :title_options) AS title_headline,
+       ts_headline(CAST(:config AS regconfig), coalesce(p.search_text, ''), query.q, :snippet_options) AS snippet
+FROM page
+JOIN presentations p ON p.id = page.id
+CROSS JOIN query
+ORDER BY page.rank DESC, page.id DESC
+"""
+SEARCH_SQL = text(SEARCH_SQL_TEMPLATE.format(after=""))
+#NOTE: Continues after the (rank, id) of the previous page's last hit
+SEARCH_AFTER_SQL = text(SEARCH_SQL_TEMPLATE.format(
+    after="\n      AND (ts_rank_cd(p.search_vector, query.q, 32), p.id) < (CAST(:after_rank AS real), CAST(:after_id AS uuid))"
+))
+
+
+@dataclass
+class SearchHit:
+    id: uuid.UUID
+    rank: float
+    title: str
+    updated_at: datetime
+    slide_count: int
+    title_headline: str
+    snippet: str
+
+
+def encode_cursor(rank: float, presentation_id: uuid.UUID) -> str:
+    return base64.urlsafe_b64encode(f"{rank!r}|{presentation_id}".encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> tuple[float, uuid.UUID]:
+    """
+    Raises:
+        ExceptionWithErrorType: INVALID_CURSOR if the cursor was not produced by `encode_cursor`.
+    """
+    try:
+        rank, presentation_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|", 1)
+        return float(rank), uuid.UUID(presentation_id)
+    except (ValueError, UnicodeError, binascii.Error):
+        raise ExceptionWithErrorType(
+            error_type="INVALID_CURSOR",
+            message="The pagination cursor is invalid.",
+            status_code=400
+        )
+
+
+def highlight_html(value: str) -> str:
+    """
+    Escapes a `ts_headline` result for HTML and turns its highlight markers into `<mark>`.
+    """
+    return html.escape(value, quote=False).replace(HIGHLIGHT_START, "<mark>").replace(HIGHLIGHT_STOP, "</mark>")
+
+
+async def search_presentations(
+    db: AsyncSession,
+    user_uuid: uuid.UUID,
+    query: str,
+    config: str,
+    limit: int = 20,
+    cursor: str | None = None
+) -> tuple[list[SearchHit], str | None]:
+    """
+    Returns one page of the user's presentations matching a web-style query (`"exact phrase"`,
+    `or`, `-exclude`), best match first, and the cursor of the next page (None on the last).
+    Titles weigh more than slide text.
+
+    Raises:
+        ExceptionWithErrorType: INVALID_CURSOR if `cursor` is malformed.
+    """
+    params = {
+        "config": config,
+        "query": query,
+        "user_id": user_uuid,
+        "limit": limit + 1,
+        "title_options": TITLE_OPTIONS,
+        "snippet_options": SNIPPET_OPTIONS
+    }
+    statement = SEARCH_SQL
+    if cursor is not None:
+        params["after_rank"], params["after_id"] = decode_cursor(cursor)
+        statement = SEARCH_AFTER_SQL
+
+    started = time.perf_counter()
+    rows = (await db.execute(statement, params)).all()
+    SEARCH_QUERY_SECONDS.observe(time.perf_counter() - started)
+
+    hits = [
+        SearchHit(
+            id=row.id,
+            rank=row.rank,
+            title=row.title,
+            updated_at=row.updated_at,
+            slide_count=row.slide_count,
+            title_headline=highlight_html(row.title_headline),
+            snippet=highlight_html(row.snippet)
+        )
+        for row in rows[:limit]
+    ]
+    next_cursor = encode_cursor(hits[-1].rank, hits[-1].id) if len(rows) > limit else None
+    return hits, next_cursor
+
+
+# ===============
+# Reindexing
+# ===============
+
+REINDEX_BATCH_SQL = text("""
+SELECT id, title, slides FROM presentations
+WHERE id > :after AND (search_vector IS NULL OR updated_at >= :since)
+ORDER BY id
+LIMIT :limit
+""")
+
+#NOTE: Plain SQL, so the ORM's `onupdate` does not bump updated_at for a reindex
+REINDEX_UPDATE_SQL = text("""
+UPDATE presentations
+SET search_text = :search_text,
+    search_vector = setweight(to_tsvector(CAST(:config AS regconfig), coalesce(title, '')), 'A')
+                 || setweight(to_tsvector(CAST(:config AS regconfig), :search_text), 'B')
+WHERE id = :id
+""")
+
+
+async def reindex_presentations(
+    db: AsyncSession,
+    config: str,
+    max_chars: int,
+    since: datetime,
+    batch_size: int = 500
+) -> int:
+    """
+    Indexes presentations that have never been indexed or were updated after `since`, in
+    batches of `batch_size` committed separately. Returns the number indexed.
+    """
+    indexed = 0
+    after = uuid.UUID(int=0)
+    while True:
+        rows = (await db.execute(REINDEX_BATCH_SQL, {"after": after, "since": since, "limit": batch_size})).all()
+        if not rows:
+            return indexed
+        await db.execute(REINDEX_UPDATE_SQL, [
+            {"id": row.id, "config": config, "search_text": presentation_search_text(row.slides, max_chars)}
+            for row in rows
+        ])
+        await db.commit()
+        indexed += len(rows)
+        after = rows[-1].id
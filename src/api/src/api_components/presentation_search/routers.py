@@ -0,0 +1,57 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from common.database import get_async_read_db
+from api.src.api_components.presentation_search.presentation_search import search_presentations
+from api.src.api_components.presentation_search.models import PresentationSearchHit, PresentationSearchResponse
+from api.src.api_components.presentations.presentations import parse_user_uuid
+from api.src.api_components.token_validator.token_validator import validate_token
+from api.src.responses import PydanticResponse
+from api.src.settings import settings
+
+
+router = APIRouter()
+
+
+@router.get(
+    "/presentations/search",
+    response_model=PresentationSearchResponse,
+    tags=["Presentations"]
+)
+async def search_user_presentations(
+    q: str = Query(..., min_length=1, max_length=200, description="Words to find; supports \"exact phrases\", `or` and `-excluded` words"),
+    limit: int = Query(20, ge=1, le=50),
+    cursor: str | None = Query(None, description="`next_cursor` of the previous page"),
+    token_payload: dict = Depends(validate_token),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Search the titles and slide text of your presentations, best match first.
+
+    Words are matched by stem (`growing` also finds `grows`), and common words are ignored.
+    Highlighted fields are HTML-escaped and safe to render as HTML.
+    """
+    user_uuid = parse_user_uuid(token_payload)
+    hits, next_cursor = await search_presentations(
+        db,
+        user_uuid,
+        q,
+        config=settings.PRESENTATION_SEARCH_CONFIG,
+        limit=limit,
+        cursor=cursor
+    )
+    return PydanticResponse(PresentationSearchResponse(
+        results=[
+            PresentationSearchHit(
+                id=hit.id,
+                title=hit.title,
+                title_highlighted=hit.title_headline,
+                snippet=hit.snippet,
+                rank=hit.rank,
+                slide_count=hit.slide_count,
+                updated_at=hit.updated_at
+            )
+            for hit in hits
+        ],
+        next_cursor=next_cursor
+    ))
@@ -0,0 +1,57 @@
+import uuid
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from common.models.presentation import Presentation
+from api.src.utils import ExceptionWithErrorType
+
+
+# ===============
+# Presentation Access
+# ===============
+
+def parse_user_uuid(token_payload: dict) -> uuid.UUID:
+    """
+    Returns the user UUID from the token payload.
+
+    Raises:
+        ExceptionWithErrorType: INVALID_USER_ID if the `sub` claim is not a UUID.
+    """
+    try:
+        return uuid.UUID(token_payload.get("sub"))
+    except (TypeError, ValueError):
+        raise ExceptionWithErrorType(
+            error_type="INVALID_USER_ID",
+            message="The user ID in the token is invalid.",
+            status_code=401
+        )
+
+
+async def get_user_presentation(
+    db: AsyncSession,
+    presentation_id: uuid.UUID,
+    user_uuid: uuid.UUID
+) -> Presentation:
+    """
+    Loads a presentation owned by the given user.
+
+    Raises:
+        ExceptionWithErrorType: PRESENTATION_NOT_FOUND if it does not exist or belongs to another user.
+    """
+    result = await db.execute(
+        select(Presentation).where(
+            Presentation.id == presentation_id,
+            Presentation.user_id == user_uuid
+        )
+    )
+    presentation = result.scalar_one_or_none()
+
+    if presentation is None:
+        raise ExceptionWithErrorType(
+            error_type="PRESENTATION_NOT_FOUND",
+            message="No presentation found with the provided ID.",
+            status_code=404
+        )
+
+    return presentation
@@ -0,0 +1,25 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+
+
+class SlideData(BaseModel):
+    """A single generated slide, matching the frontend `SlideData` interface."""
+    id: str = Field(..., description="Stable slide identifier within the deck")
+    code: str = Field(..., description="TSX source of the slide component")
+
+
+class SlideOutlineItem(BaseModel):
+    """One entry of the deck outline produced by the outline stage."""
+    index: int = Field(..., ge=0, description="Zero-based position of the slide in the deck")
+    title: str = Field(..., description="Working title of the slide")
+    brief: str = Field("", description="What the slide should communicate")
+
+
+class GenerateSlidesRequest(BaseModel):
+    content: str = Field(..., min_length=1, description="Source content the deck is generated from")
+    instructions: Optional[str] = Field(None, description="Additional user instructions for the AI")
+    slide_count: int = Field(8, ge=1, le=50, description="Number of slides to generate")
+
+
+class GenerateSlidesResponse(BaseModel):
+    slides: list[SlideData] = Field(..., description="Generated slides in deck order")
@@ -0,0 +1,407 @@
+"""
+Retrieval over long source content, so each slide prompt carries only the passages it needs.
+
+Content is split into chunks of about `chunk_tokens` tokens at paragraph and sentence
+boundaries, embedded in batches and stored as one float32 matrix per document: a `.npy`
+file opened memory-mapped, next to the chunk texts. Indexes are keyed by the content's
+SHA-256 with the embedding model and chunk size, so regenerating a deck from the same
+content reuses its index. A search is one matrix-vector product over the normalized rows
+(cosine similarity) and a partial sort for the top k.
+
+Worker functions run in the process pool; this module must not import `api.src.settings`.
+"""
+import os
+import re
+import json
+import time
+import uuid
+import zlib
+import asyncio
+import hashlib
+
+import numpy as np
+from loguru import logger
+from collections import OrderedDict
+from concurrent.futures import Executor
+from typing import Callable, Protocol, Sequence
+
+from api.src.metrics import REGISTRY
+
+#NOTE: Bump when chunking or the local embedding changes, so old indexes are not reused
+INDEX_FORMAT_VERSION = 1
+CHARS_PER_TOKEN = 4
+LOCAL_EMBEDDING_MODEL = "local"
+EXCERPT_SEPARATOR = "\n\n[...]\n\n"
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+PARAGRAPH_PATTERN = re.compile(r"\n\s*\n")
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with".split()
+)
+
+RETRIEVAL_INDEX_REQUESTS = REGISTRY.counter(
+    "retrieval_index_requests_total",
+    "Document index lookups by where the index came from: memory, disk or built",
+    ("source",)
+)
+RETRIEVAL_INDEX_BUILD_SECONDS = REGISTRY.histogram(
+    "retrieval_index_build_seconds",
+    "Time to chunk and embed a document and store its index",
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+)
+RETRIEVAL_INDEX_EVICTIONS = REGISTRY.counter(
+    "retrieval_index_evictions_total",
+    "Document indexes removed from disk past the cache's age or size bound"
+)
+RETRIEVAL_CONTENT_TOKENS = REGISTRY.counter(
+    "retrieval_content_tokens_total",
+    "Estimated source content tokens of prompts with retrieval: the whole content, or the excerpts sent",
+    ("kind",)
+)
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN
+
+
+# ===============
+# Chunking
+# ===============
+
+def chunk_text(content: str, chunk_tokens: int) -> list[str]:
+    """
+    Splits content into chunks of at most about `chunk_tokens` tokens, packing whole
+    paragraphs, then whole sentences of longer paragraphs, then fixed slices of longer sentences.
+    """
+    max_chars = chunk_tokens * CHARS_PER_TOKEN
+    pieces = []
+    for paragraph in PARAGRAPH_PATTERN.split(content):
+        paragraph = paragraph.strip()
+        if len(paragraph) <= max_chars:
+            pieces.append(paragraph)
+            continue
+        for sentence in SENTENCE_PATTERN.split(paragraph):
+            pieces.extend(sentence[start:start + max_chars] for start in range(0, len(sentence), max_chars))
+
+    chunks, current = [], ""
+    for piece in pieces:
+        if not piece:
+            continue
+        if current and len(current) + len(piece) + 2 > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+# ===============
+# Embeddings
+# ===============
+
+class Embeddings(Protocol):
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]] | np.ndarray: ...
+
+    async def aembed_query(self, text: str) -> list[float] | np.ndarray: ...
+
+
+def _hash_embed(texts: list[str], dimensions: int) -> np.ndarray:
+    #NOTE: Words and word pairs are hashed into `dimensions` buckets with a stable hash (Python's is salted per process)
+    matrix = np.zeros((len(texts), dimensions), dtype=np.float32)
+    for row, text in enumerate(texts):
+        words = [word for word in WORD_PATTERN.findall(text.lower()) if word not in STOPWORDS]
+        features = words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+        if not features:
+            continue
+        buckets = np.fromiter((zlib.crc32(feature.encode()) % dimensions for feature in features), dtype=np.int64, count=len(features))
+        counts = np.bincount(buckets, minlength=dimensions).astype(np.float32)
+        #NOTE: Sublinear term frequency, so a word repeated across a chunk does not dominate it
+        np.log1p(counts, out=counts)
+        matrix[row] = counts
+    return _normalize(matrix)
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+class LocalHashingEmbeddings:
+    """
+    Embeds text on this worker by hashing its words and word pairs into a fixed number of
+    dimensions. Needs no provider or API key and is deterministic; matches words, not meaning.
+    """
+
+    def __init__(self, dimensions: int, get_executor: Callable[[], Executor]):
+        self.dimensions = dimensions
+        self.get_executor = get_executor
+
+    async def aembed_documents(self, texts: list[str]) -> np.ndarray:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.get_executor(), _hash_embed, texts, self.dimensions)
+
+    async def aembed_query(self, text: str) -> np.ndarray:
+        #NOTE: A single query is cheaper to embed in place than to send to the pool
+        return _hash_embed([text], self.dimensions)[0]
+
+
+# ===============
+# Index
+# ===============
+
+class DocumentIndex:
+    """
+    Chunks of one document and their normalized embeddings, one row per chunk.
+    """
+
+    def __init__(self, key: str, chunks: list[str], matrix: np.ndarray):
+        self.key = key
+        self.chunks = chunks
+        self.matrix = matrix
+        self.content_tokens = sum(estimate_tokens(chunk) for chunk in chunks)
+
+    def search(self, query: np.ndarray, k: int) -> list[int]:
+        """
+        Returns the positions of the `k` chunks most similar to `query`, in document order.
+        """
+        if k >= len(self.chunks):
+            return list(range(len(self.chunks)))
+        scores = self.matrix @ query
+        top = np.argpartition(-scores, k - 1)[:k]
+        return sorted(top.tolist())
+
+    def excerpts(self, positions: Sequence[int]) -> str:
+        return EXCERPT_SEPARATOR.join(self.chunks[position] for position in positions)
+
+
+class DocumentIndexCache:
+    """
+    Disk cache of document indexes: `<key>.npy` holds the embeddings and `<key>.json` the
+    chunks. Both are written to temporary names and renamed, the chunks last, so an index
+    is complete once its `.json` exists.
+
+    Loading an index touches its `.json`, so its mtime is when it was last used. After each
+    store, indexes unused for `max_age_seconds` are removed, then the least recently used
+    ones until the directory holds at most `max_bytes`.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 2 * 1024 ** 3, max_age_seconds: float = 7 * 24 * 3600):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str, extension: str) -> str:
+        return os.path.join(self.directory, f"{key}.{extension}")
+
+    def load(self, key: str) -> DocumentIndex | None:
+        #NOTE: Other workers prune the same directory, so an index can vanish between its two files
+        try:
+            with open(self._path(key, "json"), "r", encoding="utf-8") as file:
+                chunks = json.load(file)
+            #NOTE: Memory-mapped, so workers share the page cache instead of each holding a copy
+            matrix = np.load(self._path(key, "npy"), mmap_mode="r")
+            os.utime(self._path(key, "json"))
+        except FileNotFoundError:
+            return None
+        return DocumentIndex(key, chunks, matrix)
+
+    def store(self, index: DocumentIndex):
+        key, suffix = index.key, f".{uuid.uuid4().hex}.tmp"
+        with open(self._path(key, "npy") + suffix, "wb") as file:
+            np.save(file, index.matrix)
+        with open(self._path(key, "json") + suffix, "w", encoding="utf-8") as file:
+            json.dump(index.chunks, file)
+        os.replace(self._path(key, "npy") + suffix, self._path(key, "npy"))
+        os.replace(self._path(key, "json") + suffix, self._path(key, "json"))
+        self.prune(keep=key)
+
+    def _remove(self, *paths: str):
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def prune(self, keep: str | None = None) -> int:
+        """
+        Removes indexes past the age and size bounds, least recently used first, and
+        temporary files left by interrupted stores. The index `keep`, just stored, stays
+        even if it alone is over `max_bytes`. Returns the number of indexes removed.
+        """
+        now = time.time()
+        entries, sizes = [], {}
+        for entry in os.scandir(self.directory):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            if entry.name.endswith(".tmp"):
+                #NOTE: A store in progress renames its files within seconds; older ones were interrupted
+                if now - stat.st_mtime > 3600:
+                    self._remove(entry.path)
+            elif entry.name.endswith(".json"):
+                if entry.name != f"{keep}.json":
+                        entries.append((entry.name[:-len(".json")], stat.st_mtime))
+                sizes[entry.name] = stat.st_size
+            elif entry.name.endswith(".npy"):
+                sizes[entry.name] = stat.st_size
+
+        total = sum(sizes.values())
+        removed = 0
+        for key, used_at in sorted(entries, key=lambda entry: entry[1]):
+            if total <= self.max_bytes and now - used_at <= self.max_age_seconds:
+                break
+            #NOTE: The chunks go first, so readers never find an index without its matrix
+            self._remove(self._path(key, "json"), self._path(key, "npy"))
+            total -= sizes.get(f"{key}.json", 0) + sizes.get(f"{key}.npy", 0)
+            removed += 1
+        if removed:
+            RETRIEVAL_INDEX_EVICTIONS.inc(removed)
+        return removed
+
+
+# ===============
+# Retriever
+# ===============
+
+class DocumentRetriever:
+    """
+    Builds, caches and searches document indexes for slide generation.
+
+    Args:
+        embeddings (Embeddings): Model that embeds chunks and queries.
+        embedding_model (str): Name of the model, part of the index key.
+        cache (DocumentIndexCache): Where indexes are stored.
+        min_content_tokens (int): Content below this is not indexed; prompts carry it whole.
+        chunk_tokens (int): Target size of a chunk.
+        batch_size (int): Chunks embedded per call.
+        max_concurrent_batches (int): Embedding calls in flight per document.
+        top_k (int): Chunks retrieved for each slide.
+        outline_chunks (int): Chunks the outline is planned from.
+        memory_cache_size (int): Indexes kept loaded in this worker.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        embedding_model: str,
+        cache: DocumentIndexCache,
+        min_content_tokens: int,
+        chunk_tokens: int,
+        batch_size: int,
+        max_concurrent_batches: int,
+        top_k: int,
+        outline_chunks: int,
+        memory_cache_size: int = 16
+    ):
+        self.embeddings = embeddings
+        self.embedding_model = embedding_model
+        self.cache = cache
+        self.min_content_tokens = min_content_tokens
+        self.chunk_tokens = chunk_tokens
+        self.batch_size = batch_size
+        self.max_concurrent_batches = max_concurrent_batches
+        self.top_k = top_k
+        self.outline_chunks = outline_chunks
+        self.memory_cache_size = memory_cache_size
+        self._loaded: OrderedDict[str, DocumentIndex] = OrderedDict()
+        self._building: dict[str, asyncio.Task] = {}
+
+    def applies(self, content: str) -> bool:
+        return estimate_tokens(content) >= self.min_content_tokens
+
+    def index_key(self, content: str) -> str:
+        digest = hashlib.sha256(f"{INDEX_FORMAT_VERSION}|{self.embedding_model}|{self.chunk_tokens}|".encode())
+        digest.update(content.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _remember(self, index: DocumentIndex) -> DocumentIndex:
+        self._loaded[index.key] = index
+        self._loaded.move_to_end(index.key)
+        while len(self._loaded) > self.memory_cache_size:
+            self._loaded.popitem(last=False)
+        return index
+
+    async def get_index(self, content: str) -> DocumentIndex:
+        """
+        Returns the content's index from memory, from disk, or built now.
+        Concurrent requests for the same content in this worker share one build.
+        """
+        key = self.index_key(content)
+        if key in self._loaded:
+            RETRIEVAL_INDEX_REQUESTS.inc(source="memory")
+            self._loaded.move_to_end(key)
+            return self._loaded[key]
+
+        index = self.cache.load(key)
+        if index is not None:
+            RETRIEVAL_INDEX_REQUESTS.inc(source="disk")
+            return self._remember(index)
+
+        task = self._building.get(key)
+        if task is None:
+            RETRIEVAL_INDEX_REQUESTS.inc(source="built")
+            task = self._building[key] = asyncio.create_task(self._build(key, content))
+            task.add_done_callback(lambda _: self._building.pop(key, None))
+        #NOTE: Shielded, so a cancelled request does not cancel the build other requests wait on
+        return await asyncio.shield(task)
+
+    async def _build(self, key: str, content: str) -> DocumentIndex:
+        started = time.perf_counter()
+        chunks = chunk_text(content, self.chunk_tokens)
+        semaphore = asyncio.Semaphore(self.max_concurrent_batches)
+
+        async def embed(batch: list[str]) -> np.ndarray:
+            async with semaphore:
+                return np.asarray(await self.embeddings.aembed_documents(batch), dtype=np.float32)
+
+        batches = await asyncio.gather(*(
+            embed(chunks[start:start + self.batch_size])
+            for start in range(0, len(chunks), self.batch_size)
+        ))
+        index = DocumentIndex(key, chunks, _normalize(np.concatenate(batches)))
+        #NOTE: Stored off the event loop; an index of a long document is tens of megabytes
+        await asyncio.to_thread(self.cache.store, index)
+
+        seconds = time.perf_counter() - started
+        RETRIEVAL_INDEX_BUILD_SECONDS.observe(seconds)
+        logger.info(f"Built retrieval index {key[:12]} of {len(chunks)} chunks in {seconds:.2f}s")
+        return self._remember(index)
+
+    def load_index(self, key: str) -> DocumentIndex:
+        """
+        Returns an index already built by `get_index`.
+        """
+        index = self._loaded.get(key) or self.cache.load(key)
+        if index is None:
+            raise KeyError(f"Retrieval index {key} was not built")
+        return self._remember(index)
+
+    async def _query(self, text: str) -> np.ndarray:
+        return _normalize(np.asarray(await self.embeddings.aembed_query(text), dtype=np.float32))
+
+    async def outline_excerpts(self, index: DocumentIndex, instructions: str | None) -> str:
+        """
+        Returns the excerpts the outline is planned from: chunks spread evenly over the
+        document, so the deck covers all of it, and the chunks closest to the instructions.
+        """
+        spread = self.outline_chunks if not instructions else self.outline_chunks - self.outline_chunks // 3
+        positions = set(np.linspace(0, len(index.chunks) - 1, num=min(spread, len(index.chunks)), dtype=int).tolist())
+        if instructions:
+            positions.update(index.search(await self._query(instructions), self.outline_chunks // 3))
+        return self._excerpts(index, sorted(positions))
+
+    async def slide_excerpts(self, index: DocumentIndex, title: str, brief: str) -> str:
+        """
+        Returns the `top_k` chunks closest to a slide's title and brief.
+        """
+        return self._excerpts(index, index.search(await self._query(f"{title}\n{brief}"), self.top_k))
+
+    def _excerpts(self, index: DocumentIndex, positions: Sequence[int]) -> str:
+        excerpts = index.excerpts(positions)
+        RETRIEVAL_CONTENT_TOKENS.inc(index.content_tokens, kind="source")
+        RETRIEVAL_CONTENT_TOKENS.inc(estimate_tokens(excerpts), kind="sent")
+        return excerpts
@@ -0,0 +1,141 @@
+import functools
+
+from loguru import logger
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from langchain.embeddings import init_embeddings
+
+from api.src.api_components.slide_generation.slide_generation import (
+    build_slide_generation_graph,
+    create_generation_llm,
+    generate_slides,
+)
+from api.src.api_components.slide_generation.retrieval import (
+    LOCAL_EMBEDDING_MODEL,
+    DocumentIndexCache,
+    DocumentRetriever,
+    LocalHashingEmbeddings,
+)
+from api.src.api_components.slide_generation.models import (
+    GenerateSlidesRequest,
+    GenerateSlidesResponse,
+)
+from api.src.api_components.jobs.jobs import enqueue_job
+from api.src.api_components.jobs.models import JobResponse
+from api.src.api_components.presentations.presentations import parse_user_uuid
+from api.src.api_components.token_validator.token_validator import validate_token
+from common.database import get_async_db
+from api.src.prompts import model_provider
+from api.src.process_pool import get_process_pool
+from api.src.resilience import GuardedEmbeddings, get_dependency, llm_dependency_name
+from api.src.responses import PydanticResponse
+from api.src.usage_metering import usage_user
+from api.src.settings import settings
+
+
+router = APIRouter()
+
+
+@functools.lru_cache(maxsize=1)
+def get_document_retriever() -> DocumentRetriever:
+    model = settings.RETRIEVAL_EMBEDDING_MODEL
+    if model == LOCAL_EMBEDDING_MODEL:
+        embeddings = LocalHashingEmbeddings(settings.RETRIEVAL_LOCAL_DIMENSIONS, get_executor=get_process_pool)
+        #NOTE: The dimensions are part of the index key, so changing them does not reuse old indexes
+        model = f"{LOCAL_EMBEDDING_MODEL}:{settings.RETRIEVAL_LOCAL_DIMENSIONS}"
+    else:
+        embeddings = GuardedEmbeddings(init_embeddings(model), get_dependency(llm_dependency_name(model)))
+
+    return DocumentRetriever(
+        embeddings,
+        embedding_model=model,
+        cache=DocumentIndexCache(
+            settings.RETRIEVAL_INDEX_DIR,
+            max_bytes=settings.RETRIEVAL_INDEX_MAX_BYTES,
+            max_age_seconds=settings.RETRIEVAL_INDEX_MAX_AGE_SECONDS
+        ),
+        min_content_tokens=settings.RETRIEVAL_MIN_CONTENT_TOKENS,
+        chunk_tokens=settings.RETRIEVAL_CHUNK_TOKENS,
+        batch_size=settings.RETRIEVAL_EMBEDDING_BATCH_SIZE,
+        max_concurrent_batches=settings.RETRIEVAL_MAX_CONCURRENT_BATCHES,
+        top_k=settings.RETRIEVAL_TOP_K,
+        outline_chunks=settings.RETRIEVAL_OUTLINE_CHUNKS
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def get_generation_graph():
+    #NOTE: Compiled once per worker; the graph holds no per-request state
+    llm = create_generation_llm(
+        settings.SLIDE_GENERATION_MODEL,
+        timeout=settings.SLIDE_GENERATION_TIMEOUT_SECONDS
+    )
+    return build_slide_generation_graph(
+        llm,
+        max_retries=settings.SLIDE_GENERATION_MAX_RETRIES,
+        provider=model_provider(settings.SLIDE_GENERATION_MODEL),
+        retriever=get_document_retriever()
+    )
+
+
+# ===============
+# Generate Slides
+# ===============
+
+@router.post(
+    "/generate-slides",
+    response_model=GenerateSlidesResponse,
+    tags=["Slide Generation"]
+)
+async def generate_slides_endpoint(
+    request: GenerateSlidesRequest,
+    token_payload: dict = Depends(validate_token)
+):
+    """
+    Generate a deck from source content: one outline step, then all slides in parallel.
+
+    - **content**: Source text for the presentation
+    - **instructions**: Optional instructions for tone, audience or style
+    - **slide_count**: Number of slides to generate
+    """
+    with usage_user(parse_user_uuid(token_payload)):
+        slides = await generate_slides(
+            get_generation_graph(),
+            content=request.content,
+            instructions=request.instructions,
+            slide_count=request.slide_count,
+            max_concurrency=settings.SLIDE_GENERATION_MAX_CONCURRENCY
+        )
+
+    logger.info(f"Generated {len(slides)} slides for user_id={token_payload.get('sub')}")
+    return PydanticResponse(GenerateSlidesResponse(slides=slides))
+
+
+@router.post(
+    "/generate-slides/jobs",
+    response_model=JobResponse,
+    status_code=202,
+    tags=["Slide Generation"]
+)
+async def enqueue_slide_generation(
+    request: GenerateSlidesRequest,
+    token_payload: dict = Depends(validate_token),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Queue deck generation as a background job and return immediately.
+
+    Poll `GET /jobs/{job_id}`; on success the job `result` holds `{"slides": [...]}`.
+    """
+    user_uuid = parse_user_uuid(token_payload)
+    job = await enqueue_job(
+        db,
+        kind="slide_generation",
+        payload=request.model_dump(),
+        user_id=user_uuid,
+        priority=settings.JOB_SLIDE_GENERATION_PRIORITY,
+        max_attempts=settings.JOB_MAX_ATTEMPTS
+    )
+
+    logger.info(f"Queued slide generation job {job.id} for user_id={user_uuid}")
+    return PydanticResponse(JobResponse.model_validate(job), status_code=202)
@@ -0,0 +1,328 @@
+import re
+import json
+import operator
+import traceback
+
+from loguru import logger
+from typing import Annotated, Any, TypedDict
+from langchain.chat_models import init_chat_model
+from langgraph.graph import StateGraph, START, END
+from langgraph.types import RetryPolicy, Send
+
+from api.src.utils import ExceptionWithErrorType, extract_text_from_response
+from api.src.resilience import GuardedChatModel, get_dependency, llm_dependency_name
+from api.src.usage_metering import MeteredChatModel
+from api.src.llm_recording import recordable_chat_model
+from api.src.prompts import PromptTemplate, register_prompt
+from api.src.api_components.slide_generation.retrieval import DocumentRetriever
+from api.src.api_components.slide_generation.models import SlideData, SlideOutlineItem
+
+
+# ===============
+# Prompts
+# ===============
+
+#NOTE: The outline and slide prompts share their system text and deck context word for word, so
+# the outline call writes the cached prefix that every slide call of the deck then reads
+DESIGN_GUIDE = (
+    "You are a presentation strategist and senior presentation designer. You plan decks "
+    "and write each slide as a React component with TailwindCSS.\n\n"
+    "Slide rules:\n"
+    "- Write a single component named `Slide` rendered on a 1920x1080 canvas (`w-[1920px] h-[1080px]`).\n"
+    "- Load custom fonts only through `font-['Font_Name']` classes."
+)
+
+DECK_CONTEXT = (
+    "Instructions: {instructions}\n\n"
+    "Source content:\n{content}"
+)
+
+OUTLINE_PROMPT = register_prompt(PromptTemplate(
+    name="slide_generation.outline",
+    version=1,
+    system=DESIGN_GUIDE,
+    prefix=DECK_CONTEXT,
+    suffix=(
+        "Split the source content into a slide outline.\n"
+        "Number of slides: {slide_count}\n"
+        "Respond with a JSON array only, where each item has the keys \"title\" and \"brief\". "
+        "Return exactly the requested number of items."
+    )
+))
+
+SLIDE_PROMPT = register_prompt(PromptTemplate(
+    name="slide_generation.slide",
+    version=1,
+    system=DESIGN_GUIDE,
+    prefix=DECK_CONTEXT,
+    suffix=(
+        "Write slide {number} of {slide_count}: {title}\n"
+        "Brief: {brief}\n"
+        "Respond with one ```tsx code block and nothing else."
+    )
+))
+
+CODE_BLOCK_PATTERN = re.compile(r"```(?:tsx|jsx|typescript|javascript)?[ \t]*\n(.*?)```", re.DOTALL)
+
+
+# ===============
+# Graph State
+# ===============
+
+class GenerationState(TypedDict, total=False):
+    content: str
+    instructions: str
+    slide_count: int
+    #NOTE: Set when the content was indexed for retrieval; prompts then carry excerpts of it
+    index_key: str | None
+    outline: list[dict[str, Any]]
+    #NOTE: Fan-out branches append here concurrently; order is restored in the merge step
+    generated: Annotated[list[dict[str, Any]], operator.add]
+    slides: list[dict[str, Any]]
+
+
+class SlideTaskState(TypedDict):
+    content: str
+    instructions: str
+    slide_count: int
+    index_key: str | None
+    item: dict[str, Any]
+
+
+# ===============
+# Parsing & Validation
+# ===============
+
+def _strip_code_fence(text: str) -> str:
+    match = CODE_BLOCK_PATTERN.search(text)
+    return (match.group(1) if match else text).strip()
+
+
+def parse_outline(text: str, slide_count: int) -> list[SlideOutlineItem]:
+    """Parse the outline stage output into exactly `slide_count` outline items.
+
+    Raises:
+        ExceptionWithErrorType: CONTENT_PARSING_ERROR if the output is not a usable JSON outline.
+    """
+    try:
+        raw_items = json.loads(_strip_code_fence(text))
+    except json.JSONDecodeError as e:
+        logger.error(f"Outline is not valid JSON: {e} | output: {text[:300]}")
+        raise ExceptionWithErrorType(
+            error_type="CONTENT_PARSING_ERROR",
+            message="Outline stage returned invalid JSON."
+        )
+
+    if not isinstance(raw_items, list) or len(raw_items) < slide_count:
+        logger.error(f"Outline has an unexpected shape | output: {text[:300]}")
+        raise ExceptionWithErrorType(
+            error_type="CONTENT_PARSING_ERROR",
+            message=f"Outline stage returned fewer than {slide_count} slides."
+        )
+
+    outline = []
+    for index, raw_item in enumerate(raw_items[:slide_count]):
+        if not isinstance(raw_item, dict) or not str(raw_item.get("title", "")).strip():
+            raise ExceptionWithErrorType(
+                error_type="CONTENT_PARSING_ERROR",
+                message=f"Outline item {index} is missing a title."
+            )
+        outline.append(SlideOutlineItem(
+            index=index,
+            title=str(raw_item["title"]).strip(),
+            brief=str(raw_item.get("brief", "")).strip()
+        ))
+    return outline
+
+
+def parse_slide_code(text: str) -> str:
+    """Extract the slide component from the model output and validate its basic structure.
+
+    Raises:
+        ExceptionWithErrorType: CONTENT_PARSING_ERROR if the code would not render as a slide.
+    """
+    code = _strip_code_fence(text)
+
+    if "const Slide" not in code and "function Slide" not in code:
+        logger.error(f"Slide code does not define a Slide component | output: {text[:300]}")
+        raise ExceptionWithErrorType(
+            error_type="CONTENT_PARSING_ERROR",
+            message="Generated slide does not define a `Slide` component."
+        )
+
+    if code.count("{") != code.count("}") or code.count("(") != code.count(")"):
+        logger.error(f"Slide code has unbalanced delimiters | output: {text[:300]}")
+        raise ExceptionWithErrorType(
+            error_type="CONTENT_PARSING_ERROR",
+            message="Generated slide has unbalanced braces or parentheses."
+        )
+
+    return code
+
+
+def _should_retry(exc: Exception) -> bool:
+    """Retry on malformed model output and provider errors, never on programming errors."""
+    if isinstance(exc, ExceptionWithErrorType):
+        return exc.error_type == "CONTENT_PARSING_ERROR"
+    return not isinstance(exc, (TypeError, AttributeError, NameError, KeyError, ImportError))
+
+
+# ===============
+# Graph
+# ===============
+
+def create_generation_llm(model: str, timeout: float):
+    """Create the chat model used by the generation graph.
+
+    Provider-level retries are disabled because retries are handled per graph node.
+    Calls go through the provider's circuit breaker and bulkhead, and their token usage is metered.
+    With `LLM_RECORDING_MODE` set, responses are recorded to fixtures or replayed from them.
+    """
+    chat_model = recordable_chat_model(model, lambda: init_chat_model(model, timeout=timeout, max_retries=0))
+    guarded = GuardedChatModel(chat_model, get_dependency(llm_dependency_name(model)))
+    return MeteredChatModel(guarded, model)
+
+
+def build_slide_generation_graph(
+    llm,
+    max_retries: int = 2,
+    provider: str | None = None,
+    retriever: DocumentRetriever | None = None
+):
+    """Build the outline -> parallel slides -> ordered merge generation graph.
+
+    Args:
+        llm: Any LangChain-compatible chat model exposing `ainvoke`.
+        max_retries (int): Additional attempts per node when generation or validation fails.
+        provider (str | None): Provider of `llm`, which decides how prompt cache breakpoints are sent.
+        retriever (DocumentRetriever | None): Indexes long content, so the outline is planned from
+            excerpts spread over it and each slide gets only its closest chunks.
+    Returns:
+        The compiled graph. Parallelism is bounded per invocation via `max_concurrency`.
+    """
+
+    async def outline_node(state: GenerationState) -> dict:
+        content, index_key = state["content"], None
+        if retriever is not None and retriever.applies(content):
+            index = await retriever.get_index(content)
+            content, index_key = await retriever.outline_excerpts(index, state.get("instructions")), index.key
+
+        messages = OUTLINE_PROMPT.render(
+            provider,
+            instructions=state.get("instructions") or "None",
+            content=content,
+            slide_count=state["slide_count"]
+        )
+        response = await llm.ainvoke(messages, stage=OUTLINE_PROMPT.stage)
+        text = extract_text_from_response(response, context="slide_generation.outline")
+        outline = parse_outline(text, state["slide_count"])
+        return {"outline": [item.model_dump() for item in outline], "index_key": index_key}
+
+    def fan_out_slides(state: GenerationState) -> list[Send]:
+        return [
+            Send("generate_slide", {
+                "content": state["content"],
+                "instructions": state.get("instructions") or "",
+                "slide_count": state["slide_count"],
+                "index_key": state.get("index_key"),
+                "item": item,
+            })
+            for item in state["outline"]
+        ]
+
+    async def generate_slide_node(task: SlideTaskState) -> dict:
+        item = task["item"]
+        content = task["content"]
+        if task["index_key"] is not None:
+            #NOTE: Excerpts differ per slide, so these prompts share no cached prefix; they are far smaller instead
+            content = await retriever.slide_excerpts(retriever.load_index(task["index_key"]), item["title"], item["brief"])
+
+        messages = SLIDE_PROMPT.render(
+            provider,
+            instructions=task["instructions"] or "None",
+            content=content,
+            slide_count=task["slide_count"],
+            number=item["index"] + 1,
+            title=item["title"],
+            brief=item["brief"]
+        )
+        response = await llm.ainvoke(messages, stage=SLIDE_PROMPT.stage)
+        text = extract_text_from_response(response, context=f"slide_generation.slide_{item['index']}")
+        return {"generated": [{"index": item["index"], "code": parse_slide_code(text)}]}
+
+    def merge_node(state: GenerationState) -> dict:
+        by_index = {}
+        for slide in state.get("generated", []):
+            by_index.setdefault(slide["index"], slide["code"])
+
+        missing = [index for index in range(state["slide_count"]) if index not in by_index]
+        if missing:
+            raise ExceptionWithErrorType(
+                error_type="WORKFLOW_FAILURE",
+                message=f"Slides missing after generation: {missing}"
+            )
+
+        slides = [
+            SlideData(id=f"slide-{index + 1}", code=by_index[index]).model_dump()
+            for index in range(state["slide_count"])
+        ]
+        return {"slides": slides}
+
+    retry_policy = RetryPolicy(
+        max_attempts=max_retries + 1,
+        initial_interval=0.5,
+        backoff_factor=2.0,
+        retry_on=_should_retry
+    )
+
+    graph = StateGraph(GenerationState)
+    graph.add_node("outline", outline_node, retry_policy=retry_policy)
+    graph.add_node("generate_slide", generate_slide_node, retry_policy=retry_policy)
+    graph.add_node("merge", merge_node)
+
+    graph.add_edge(START, "outline")
+    graph.add_conditional_edges("outline", fan_out_slides, ["generate_slide"])
+    graph.add_edge("generate_slide", "merge")
+    graph.add_edge("merge", END)
+
+    return graph.compile()
+
+
+async def generate_slides(
+    graph,
+    content: str,
+    instructions: str | None,
+    slide_count: int,
+    max_concurrency: int
+) -> list[SlideData]:
+    """Run the generation graph and return the slides in deck order.
+
+    Args:
+        graph: Compiled graph from `build_slide_generation_graph`.
+        content (str): Source content for the deck.
+        instructions (str | None): Optional user instructions.
+        slide_count (int): Number of slides to generate.
+        max_concurrency (int): Upper bound on slides generated at the same time.
+    Raises:
+        ExceptionWithErrorType: CONTENT_PARSING_ERROR or WORKFLOW_FAILURE if generation fails.
+    """
+    try:
+        result = await graph.ainvoke(
+            {
+                "content": content,
+                "instructions": instructions or "",
+                "slide_count": slide_count,
+            },
+            config={"max_concurrency": max_concurrency}
+        )
+    except ExceptionWithErrorType:
+        raise
+    except Exception as e:
+        error_traceback = traceback.format_exc()
+        logger.error(f"Slide generation workflow failed: {e}\n{error_traceback}")
+        raise ExceptionWithErrorType(
+            error_type="WORKFLOW_FAILURE",
+            message=f"Slide generation failed: {type(e).__name__}"
+        )
+
+    return [SlideData(**slide) for slide in result["slides"]]
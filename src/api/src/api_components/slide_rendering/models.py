@@ -0,0 +1,19 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+
+from api.src.api_components.slide_generation.models import SlideData
+
+
+class RenderThumbnailsRequest(BaseModel):
+    slides: list[SlideData] = Field(..., min_length=1, max_length=200, description="Slides to render")
+    width: int = Field(480, ge=64, le=1920, description="Thumbnail width in pixels (16:9)")
+
+
+class SlideThumbnail(BaseModel):
+    id: str = Field(..., description="Slide identifier from the request")
+    image_base64: Optional[str] = Field(None, description="PNG thumbnail, base64 encoded")
+    error: Optional[str] = Field(None, description="Render error if the slide code failed")
+
+
+class RenderThumbnailsResponse(BaseModel):
+    thumbnails: list[SlideThumbnail] = Field(..., description="Thumbnails in request order")
@@ -0,0 +1,104 @@
+import uuid
+import base64
+import functools
+
+from loguru import logger
+from fastapi import APIRouter, Depends, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from common.database import get_async_db
+from common.utils import content_disposition, safe_filename
+from api.src.api_components.presentations.presentations import get_user_presentation, parse_user_uuid
+from api.src.api_components.slide_rendering.slide_rendering import SlideRenderPool
+from api.src.api_components.slide_rendering.models import (
+    RenderThumbnailsRequest,
+    RenderThumbnailsResponse,
+    SlideThumbnail,
+)
+from api.src.api_components.token_validator.token_validator import validate_token
+from api.src.responses import PydanticResponse
+from api.src.settings import settings
+
+
+router = APIRouter()
+
+
+@functools.lru_cache(maxsize=1)
+def get_render_pool() -> SlideRenderPool:
+    return SlideRenderPool(
+        vendor_dir=settings.SLIDE_RENDER_VENDOR_DIR,
+        browsers=settings.SLIDE_RENDER_BROWSERS,
+        contexts_per_browser=settings.SLIDE_RENDER_CONTEXTS_PER_BROWSER,
+        batch_size=settings.SLIDE_RENDER_BATCH_SIZE,
+        max_waiters=settings.SLIDE_RENDER_MAX_WAITERS,
+        acquire_timeout=settings.SLIDE_RENDER_ACQUIRE_TIMEOUT_SECONDS,
+        render_timeout=settings.SLIDE_RENDER_TIMEOUT_SECONDS,
+        max_batches_per_request=settings.SLIDE_RENDER_MAX_BATCHES_PER_REQUEST,
+        thumbnail_cache_bytes=settings.SLIDE_RENDER_THUMBNAIL_CACHE_BYTES
+    )
+
+
+# ===============
+# Slide Thumbnails
+# ===============
+
+@router.post(
+    "/slides/thumbnails",
+    response_model=RenderThumbnailsResponse,
+    tags=["Slide Rendering"]
+)
+async def render_slide_thumbnails(
+    request: RenderThumbnailsRequest,
+    token_payload: dict = Depends(validate_token)
+):
+    """
+    Render PNG thumbnails for a batch of slides.
+
+    - **slides**: Slides (`id`, `code`) to render
+    - **width**: Thumbnail width in pixels; height follows the 16:9 canvas
+    """
+    rendered = await get_render_pool().render_thumbnails(
+        [slide.code for slide in request.slides],
+        width=request.width
+    )
+
+    thumbnails = [
+        SlideThumbnail(
+            id=slide.id,
+            image_base64=base64.b64encode(image).decode("ascii") if image is not None else None,
+            error=error
+        )
+        for slide, (image, error) in zip(request.slides, rendered)
+    ]
+    return PydanticResponse(RenderThumbnailsResponse(thumbnails=thumbnails))
+
+
+# ===============
+# Export PDF
+# ===============
+
+@router.get(
+    "/presentations/{presentation_id}/export.pdf",
+    response_class=Response,
+    responses={200: {"content": {"application/pdf": {}}}},
+    tags=["Presentations"]
+)
+async def export_presentation_pdf(
+    presentation_id: uuid.UUID,
+    token_payload: dict = Depends(validate_token),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Export a presentation as a PDF with one page per slide.
+    """
+    user_uuid = parse_user_uuid(token_payload)
+    presentation = await get_user_presentation(db, presentation_id, user_uuid)
+
+    pdf = await get_render_pool().render_pdf([slide["code"] for slide in presentation.slides])
+    logger.info(f"Exported presentation {presentation_id} to PDF ({len(pdf)} bytes)")
+
+    return Response(
+        content=pdf,
+        media_type="application/pdf",
+        headers={"Content-Disposition": content_disposition(safe_filename(presentation.title, "pdf"))}
+    )
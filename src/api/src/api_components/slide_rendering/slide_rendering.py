@@ -0,0 +1,467 @@
+import os
+import math
+import asyncio
+import urllib.parse
+import hashlib
+import traceback
+
+from loguru import logger
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from playwright.async_api import async_playwright, Browser, BrowserContext, Route, WebSocketRoute
+
+from api.src.utils import ExceptionWithErrorType
+from api.src.resilience import timeout_after
+
+#NOTE: Bump when the render page changes so cached thumbnails are invalidated
+RENDERER_VERSION = "1"
+
+#NOTE: Bounds closing a page or context whose renderer may be stuck in slide code
+CLOSE_TIMEOUT_SECONDS = 5.0
+
+SLIDE_WIDTH = 1920
+SLIDE_HEIGHT = 1080
+
+RENDER_ORIGIN = "https://render.flashslides.local"
+RENDER_PAGE_URL = f"{RENDER_ORIGIN}/render.html"
+
+#NOTE: Slide code is untrusted and runs in the page; it may reach only the render origin and these font hosts
+RENDER_ALLOWED_HOSTS = frozenset({"fonts.googleapis.com", "fonts.gstatic.com"})
+
+VENDOR_SCRIPTS = [
+    "react.production.min.js",
+    "react-dom.production.min.js",
+    "babel.min.js",
+    "gsap.min.js",
+    "tailwindcss.js",
+]
+
+RENDER_PAGE_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+{scripts}
+<style>
+  html, body {{ margin: 0; padding: 0; background: transparent; }}
+  .slide-frame {{ position: relative; overflow: hidden; }}
+  .slide-mount {{ width: {width}px; height: {height}px; transform-origin: top left; }}
+  .page-break {{ page-break-after: always; break-after: page; }}
+</style>
+<script>
+  const HOOKS = "const {{ useState, useEffect, useRef, useMemo, useCallback, useLayoutEffect }} = React;";
+
+  function stripModuleLines(code) {{
+    return code.split("\\n").filter(line => {{
+      const trimmed = line.trim();
+      return !trimmed.startsWith("import ") && !trimmed.startsWith("export ");
+    }}).join("\\n");
+  }}
+
+  function loadFonts(code) {{
+    const families = new Set();
+    for (const match of code.matchAll(/font-\\['([^']+)'\\]/g)) {{
+      families.add(match[1].replace(/_/g, "+"));
+    }}
+    if (families.size === 0) return;
+    const link = document.createElement("link");
+    link.rel = "stylesheet";
+    link.href = `https://fonts.googleapis.com/css2?family=${{[...families].join("&family=")}}:wght@300;400;500;600;700&display=swap`;
+    document.head.appendChild(link);
+  }}
+
+  window.renderSlides = async (sources, scale, pageBreaks) => {{
+    const errors = [];
+    sources.forEach((source, index) => {{
+      const frame = document.createElement("div");
+      frame.id = `frame-${{index}}`;
+      frame.className = "slide-frame" + (pageBreaks ? " page-break" : "");
+      frame.style.width = `${{Math.round({width} * scale)}}px`;
+      frame.style.height = `${{Math.round({height} * scale)}}px`;
+
+      const mount = document.createElement("div");
+      mount.className = "slide-mount";
+      mount.style.transform = `scale(${{scale}})`;
+      frame.appendChild(mount);
+      document.body.appendChild(frame);
+
+      try {{
+        loadFonts(source);
+        const compiled = Babel.transform(stripModuleLines(source), {{
+          presets: [["typescript", {{ isTSX: true, allExtensions: true }}], "react"],
+          filename: `slide-${{index}}.tsx`,
+        }}).code;
+        const Slide = new Function("React", `${{HOOKS}}\\n${{compiled}}\\nreturn Slide;`)(React);
+        ReactDOM.flushSync(() => ReactDOM.createRoot(mount).render(React.createElement(Slide)));
+        errors.push(null);
+      }} catch (error) {{
+        errors.push(String(error));
+      }}
+    }});
+
+    const fontsReady = Promise.race([document.fonts.ready, new Promise(resolve => setTimeout(resolve, 2000))]);
+    await fontsReady;
+    await new Promise(resolve => requestAnimationFrame(() => requestAnimationFrame(resolve)));
+    return errors;
+  }};
+</script>
+</head>
+<body></body>
+</html>
+"""
+
+
+# ===============
+# Thumbnail Cache
+# ===============
+
+def thumbnail_cache_key(code: str, width: int) -> str:
+    return hashlib.sha256(f"{RENDERER_VERSION}:{width}:{code}".encode("utf-8")).hexdigest()
+
+
+class ThumbnailCache:
+    """
+    In-memory LRU of rendered thumbnails keyed by slide-code hash, bounded by total bytes.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._size = 0
+
+    def get(self, key: str) -> bytes | None:
+        image = self._entries.get(key)
+        if image is not None:
+            self._entries.move_to_end(key)
+        return image
+
+    def set(self, key: str, image: bytes):
+        if len(image) > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._size -= len(previous)
+
+        self._entries[key] = image
+        self._size += len(image)
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+
+# ===============
+# Browser Pool
+# ===============
+
+async def _refuse_web_socket(web_socket: WebSocketRoute):
+    await web_socket.close(code=1008, reason="Blocked by the slide renderer")
+
+
+async def _close_quietly(closing, what: str):
+    try:
+        await asyncio.wait_for(closing, timeout=CLOSE_TIMEOUT_SECONDS)
+    except (Exception, asyncio.TimeoutError) as e:
+        logger.warning(f"Error closing {what}: {e!r}")
+
+
+async def _gather_or_cancel(coroutines) -> list:
+    """
+    Like `asyncio.gather`, but cancels the remaining coroutines as soon as one fails
+    (`asyncio.TaskGroup` is Python 3.11+).
+    """
+    tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+class SlideRenderPool:
+    """
+    Warm pool of Chromium browsers with reusable contexts for server-side slide rendering.
+
+    Every render acquires one context, loads the render page once and renders a whole batch
+    of slides into it. When all contexts are busy, at most `max_waiters` renders may queue;
+    further requests fail fast with RENDER_POOL_SATURATED instead of piling up.
+
+    Slide code is untrusted: a render that runs past `render_timeout` (per batch of slides)
+    fails with RENDER_TIMEOUT, and its context is closed and replaced. One request renders
+    at most `max_batches_per_request` batches at once, always fewer than the pool's contexts.
+    """
+
+    def __init__(
+        self,
+        vendor_dir: str,
+        browsers: int = 1,
+        contexts_per_browser: int = 4,
+        batch_size: int = 12,
+        max_waiters: int = 16,
+        acquire_timeout: float = 10.0,
+        render_timeout: float = 30.0,
+        max_batches_per_request: int = 2,
+        thumbnail_cache_bytes: int = 64 * 1024 * 1024
+    ):
+        self.vendor_dir = vendor_dir
+        self.browser_count = browsers
+        self.contexts_per_browser = contexts_per_browser
+        self.batch_size = batch_size
+        self.max_waiters = max_waiters
+        self.acquire_timeout = acquire_timeout
+        self.render_timeout = render_timeout
+        self.max_batches_per_request = max(1, min(max_batches_per_request, self.size - 1))
+        self.thumbnails = ThumbnailCache(thumbnail_cache_bytes)
+
+        self._playwright = None
+        self._browsers: list[Browser] = []
+        self._available: asyncio.Queue[BrowserContext] = asyncio.Queue()
+        self._waiters = 0
+        self._assets: dict[str, tuple[bytes, str]] = {}
+        self._start_lock = asyncio.Lock()
+
+    @property
+    def size(self) -> int:
+        return self.browser_count * self.contexts_per_browser
+
+    @property
+    def started(self) -> bool:
+        return self._playwright is not None
+
+    def _load_assets(self):
+        scripts = []
+        for name in VENDOR_SCRIPTS:
+            path = os.path.join(self.vendor_dir, name)
+            if not os.path.exists(path):
+                logger.warning(f"Render vendor script missing: {path}")
+                continue
+            with open(path, "rb") as file:
+                self._assets[f"/vendor/{name}"] = (file.read(), "application/javascript")
+            scripts.append(f'<script src="{RENDER_ORIGIN}/vendor/{name}"></script>')
+
+        html = RENDER_PAGE_HTML.format(scripts="\n".join(scripts), width=SLIDE_WIDTH, height=SLIDE_HEIGHT)
+        self._assets["/render.html"] = (html.encode("utf-8"), "text/html")
+
+    async def _handle_request(self, route: Route):
+        url = route.request.url
+        if url.startswith(f"{RENDER_ORIGIN}/"):
+            await self._serve_asset(route)
+            return
+
+        parsed = urllib.parse.urlsplit(url)
+        if parsed.scheme == "https" and parsed.hostname in RENDER_ALLOWED_HOSTS and parsed.port is None:
+            await route.continue_()
+            return
+
+        logger.warning(f"Blocked request from slide render to {parsed.scheme}://{parsed.hostname}")
+        await route.abort("blockedbyclient")
+
+    async def _serve_asset(self, route: Route):
+        path = route.request.url[len(RENDER_ORIGIN):].split("?", 1)[0]
+        asset = self._assets.get(path)
+        if asset is None:
+            await route.fulfill(status=404)
+            return
+        body, content_type = asset
+        await route.fulfill(status=200, body=body, content_type=content_type)
+
+    async def _new_context(self, browser: Browser) -> BrowserContext:
+        #NOTE: Service workers would fetch outside of the context's routes, so they are blocked
+        context = await browser.new_context(viewport={"width": SLIDE_WIDTH, "height": SLIDE_HEIGHT}, service_workers="block")
+        await context.route("**", self._handle_request)
+        await context.route_web_socket("**", _refuse_web_socket)
+        return context
+
+    async def start(self):
+        """
+        Launches the browsers and contexts. Safe to call concurrently and repeatedly.
+        """
+        async with self._start_lock:
+            if self.started:
+                return
+            try:
+                self._load_assets()
+                self._playwright = await async_playwright().start()
+                for _ in range(self.browser_count):
+                    browser = await self._playwright.chromium.launch(args=["--disable-dev-shm-usage"])
+                    self._browsers.append(browser)
+                    for _ in range(self.contexts_per_browser):
+                        self._available.put_nowait(await self._new_context(browser))
+            except Exception as e:
+                error_traceback = traceback.format_exc()
+                logger.error(f"Failed to start slide render pool: {e}\n{error_traceback}")
+                await self.close()
+                raise ExceptionWithErrorType(
+                    error_type="PROCESSING_SERVICE_UNAVAILABLE",
+                    message="Slide renderer could not be started.",
+                    status_code=503
+                )
+
+        logger.info(f"Slide render pool started with {self.browser_count} browsers x {self.contexts_per_browser} contexts")
+
+    async def close(self):
+        for browser in self._browsers:
+            try:
+                await browser.close()
+            except Exception as e:
+                logger.warning(f"Error closing render browser: {e}")
+        self._browsers = []
+        self._available = asyncio.Queue()
+
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    @asynccontextmanager
+    async def acquire_context(self):
+        """
+        Borrows a browser context, applying back-pressure when the pool is saturated.
+
+        Raises:
+            ExceptionWithErrorType: RENDER_POOL_SATURATED if too many renders are queued
+                or no context frees up within `acquire_timeout`.
+        """
+        if not self.started:
+            await self.start()
+
+        if self._available.empty() and self._waiters >= self.max_waiters:
+            raise ExceptionWithErrorType(
+                error_type="RENDER_POOL_SATURATED",
+                message="Slide renderer is at capacity, retry shortly.",
+                status_code=503
+            )
+
+        self._waiters += 1
+        try:
+            context = await asyncio.wait_for(self._available.get(), timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            raise ExceptionWithErrorType(
+                error_type="RENDER_POOL_SATURATED",
+                message="Timed out waiting for a free slide renderer.",
+                status_code=503
+            )
+        finally:
+            self._waiters -= 1
+
+        healthy = True
+        try:
+            yield context
+        except ExceptionWithErrorType:
+            raise
+        except asyncio.TimeoutError:
+            #NOTE: The renderer may still be running the slide code (`while(true){}`)
+            healthy = False
+            raise ExceptionWithErrorType(
+                error_type="RENDER_TIMEOUT",
+                message="Slides took too long to render.",
+                status_code=504
+            ) from None
+        except Exception:
+            healthy = False
+            raise
+        finally:
+            if not healthy:
+                #NOTE: Replace contexts that failed or timed out mid-render so a stuck or crashed renderer is not reused
+                browser = context.browser
+                await _close_quietly(context.close(), "failed render context")
+                if browser is not None and browser.is_connected():
+                    context = await self._new_context(browser)
+                else:
+                    context = None
+            if context is not None:
+                self._available.put_nowait(context)
+
+    async def _render_batch(self, sources: list[str], scale: float) -> list[tuple[bytes | None, str | None]]:
+        async with self.acquire_context() as context:
+            page = await context.new_page()
+            try:
+                async with timeout_after(self.render_timeout):
+                    await page.goto(RENDER_PAGE_URL)
+                    errors = await page.evaluate(
+                        "([sources, scale]) => window.renderSlides(sources, scale, false)",
+                        [sources, scale]
+                    )
+                    results = []
+                    for index, error in enumerate(errors):
+                        if error is not None:
+                            results.append((None, error))
+                            continue
+                        image = await page.locator(f"#frame-{index}").screenshot(type="png", omit_background=True)
+                        results.append((image, None))
+                    return results
+            finally:
+                await _close_quietly(page.close(), "render page")
+
+    async def render_thumbnails(self, codes: list[str], width: int) -> list[tuple[bytes | None, str | None]]:
+        """
+        Renders PNG thumbnails for the given slide codes, in order.
+        Cached slides are served from the thumbnail cache; the rest are rendered in batches
+        spread across the pool's contexts.
+
+        Returns:
+            list of `(png_bytes, error)` pairs, one per slide.
+        """
+        results: list[tuple[bytes | None, str | None]] = [(None, None)] * len(codes)
+        keys = [thumbnail_cache_key(code, width) for code in codes]
+
+        misses = []
+        for index, key in enumerate(keys):
+            image = self.thumbnails.get(key)
+            if image is not None:
+                results[index] = (image, None)
+            else:
+                misses.append(index)
+
+        batches = [misses[start:start + self.batch_size] for start in range(0, len(misses), self.batch_size)]
+        scale = width / SLIDE_WIDTH
+        #NOTE: Batches wait here rather than in the pool, so a large deck neither counts against `max_waiters` nor starves other requests
+        semaphore = asyncio.Semaphore(self.max_batches_per_request)
+
+        async def render(batch: list[int]) -> list[tuple[bytes | None, str | None]]:
+            async with semaphore:
+                return await self._render_batch([codes[index] for index in batch], scale)
+
+        batch_results = await _gather_or_cancel(render(batch) for batch in batches)
+
+        for batch, rendered in zip(batches, batch_results):
+            for index, (image, error) in zip(batch, rendered):
+                results[index] = (image, error)
+                if image is not None:
+                    self.thumbnails.set(keys[index], image)
+
+        return results
+
+    async def render_pdf(self, codes: list[str]) -> bytes:
+        """
+        Renders all slides into a single PDF with one 1920x1080 page per slide.
+
+        Raises:
+            ExceptionWithErrorType: CONTENT_PARSING_ERROR if any slide fails to render,
+                RENDER_TIMEOUT if the deck takes longer than `render_timeout` per batch of slides.
+        """
+        timeout = self.render_timeout * max(1, math.ceil(len(codes) / self.batch_size))
+        async with self.acquire_context() as context:
+            page = await context.new_page()
+            try:
+                async with timeout_after(timeout):
+                    await page.goto(RENDER_PAGE_URL)
+                    errors = await page.evaluate(
+                        "([sources]) => window.renderSlides(sources, 1, true)",
+                        [codes]
+                    )
+                    failed = [index for index, error in enumerate(errors) if error is not None]
+                    if failed:
+                        logger.error(f"Slides failed to render for PDF export: {failed} | first error: {errors[failed[0]][:300]}")
+                        raise ExceptionWithErrorType(
+                            error_type="CONTENT_PARSING_ERROR",
+                            message=f"Slides failed to render: {[index + 1 for index in failed]}",
+                            status_code=422
+                        )
+                    return await page.pdf(
+                        width=f"{SLIDE_WIDTH}px",
+                        height=f"{SLIDE_HEIGHT}px",
+                        print_background=True,
+                        margin={"top": "0", "right": "0", "bottom": "0", "left": "0"}
+                    )
+            finally:
+                await _close_quietly(page.close(), "render page")
@@ -14,4 +14,21 @@ class AuthenticationRequest(BaseModel):
 class AuthenticationResponse(BaseModel):
     internal_id: str
     status: str
-    is_new_user: bool
\ No newline at end of file
+    is_new_user: bool
+
+
+class SessionBootstrapResponse(BaseModel):
+    internal_id: str
+    status: str
+    is_new_user: bool
+    email: str
+    first_name: str | None = None
+    last_name: str | None = None
+    profile_image_url: str | None = None
+    credits_balance: int = 0
+    stripe_customer_id: str | None = None
+    user_type: str | None = None
+    organization_id: str | None = None
+    timezone: str | None = None
+    language_preference: str | None = None
+    preferences: dict | None = None
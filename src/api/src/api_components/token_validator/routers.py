@@ -4,17 +4,82 @@ from typing import Any
 from loguru import logger
 from fastapi import APIRouter, Depends, Request
 from sqlalchemy.orm import Session
-from sqlalchemy import select
-from common.database import get_db
+from sqlalchemy import String, bindparam, column, select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from common.database import get_async_db, get_db, mark_write, mark_write_sync
 from common.models.user import User
 
 from api.src.api_components.token_validator.token_validator import validate_token
-from api.src.api_components.token_validator.models import AuthenticationResponse
+from api.src.api_components.token_validator.models import (
+    AuthenticationRequest,
+    AuthenticationResponse,
+    SessionBootstrapResponse,
+)
+from api.src.api_components.user_provisioning.user_provisioning import (
+    PROVISIONED_PASSWORD_STATUS,
+    claim_provisioned_user,
+)
 from api.src.utils import ExceptionWithErrorType
+from api.src.idempotency import idempotent
 
 
 router = APIRouter()
 
+#NOTE: Login calls repeated with the same token (page loads, tabs, retries) replay the first result
+LOGIN_REPLAY_TTL_SECONDS = 300
+
+SESSION_COLUMNS = tuple(User.__table__.c[name] for name in (
+    "id",
+    "email",
+    "first_name",
+    "last_name",
+    "profile_image_url",
+    "credits_balance",
+    "stripe_customer_id",
+    "user_type",
+    "organization_id",
+    "timezone",
+    "language_preference",
+    "preferences",
+))
+
+_SESSION_SELECT = ", ".join(column.name for column in SESSION_COLUMNS)
+
+#NOTE: Reads the user; if missing, claims their provisioned row as `claim_provisioned_user` does;
+# if none, creates them. Each branch only acts when the earlier ones found nothing, so the
+# login is one round trip. Kept as text because SQLAlchemy does not cache compiled
+# `ON CONFLICT` inserts, and compiling this statement costs more than running it.
+BOOTSTRAP_SQL = text(f"""
+    WITH existing AS (
+        SELECT {_SESSION_SELECT} FROM users WHERE id = :user_id
+    ),
+    claimed AS (
+        UPDATE users
+        SET id = :user_id, password_status = NULL, last_login_at = now(), updated_at = now()
+        WHERE lower(email) = :claim_email
+          AND password_status = :provisioned
+          AND NOT EXISTS (SELECT 1 FROM existing)
+        RETURNING {_SESSION_SELECT}
+    ),
+    created AS (
+        INSERT INTO users (id, email, first_name, last_name, password_hash, preferences, credits_balance, is_active)
+        SELECT :user_id, CAST(:email AS VARCHAR), :first_name, :last_name, :password_hash, :preferences, 0, true
+        WHERE CAST(:email AS VARCHAR) IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM existing)
+          AND NOT EXISTS (SELECT 1 FROM claimed)
+        -- Only an ID conflict means a concurrent bootstrap won; an email taken by another user still fails
+        ON CONFLICT (id) DO NOTHING
+        RETURNING {_SESSION_SELECT}
+    )
+    SELECT 'authenticated' AS status, {_SESSION_SELECT} FROM existing
+    UNION ALL SELECT 'claimed', {_SESSION_SELECT} FROM claimed
+    UNION ALL SELECT 'created', {_SESSION_SELECT} FROM created
+""").bindparams(
+    bindparam("user_id", type_=User.__table__.c.id.type),
+    bindparam("preferences", type_=User.__table__.c.preferences.type)
+).columns(column("status", String), *SESSION_COLUMNS)
+
 
 # ========== 
 # Helper Functions 
@@ -28,11 +93,13 @@ def _extract_name_parts(full_name: str) -> tuple[str, str]:
 
 
 def _get_email(body: dict[str, Any], token_data: dict[str, Any]) -> str | None:
-    return (
+    email = (
         body.get("email") or
         token_data.get("email") or
         token_data.get("user_metadata", {}).get("email")
     )
+    #NOTE: Stored lowercased, like provisioned users, so `ix_users_email_lower` sees one address
+    return email.strip().lower() if email else None
 
 
 def _get_full_name(body: dict[str, Any], token_data: dict[str, Any]) -> str:
@@ -46,6 +113,40 @@ def _get_full_name(body: dict[str, Any], token_data: dict[str, Any]) -> str:
     )
 
 
+def _new_user_values(user_uuid: uuid.UUID, body: dict[str, Any], token_data: dict[str, Any]) -> dict[str, Any] | None:
+    email = _get_email(body, token_data)
+    if not email:
+        return None
+    first_name, last_name = _extract_name_parts(_get_full_name(body, token_data))
+    meta = token_data.get("user_metadata", {})
+    return {
+        "id": user_uuid,
+        "email": email,
+        "first_name": first_name,
+        "last_name": last_name,
+        "password_hash": "managed_externally",
+        "preferences": {"marketing_consent": meta.get("marketing_consent")}
+    }
+
+
+def bootstrap_params(user_uuid: uuid.UUID, claim_email: str | None, new_user: dict[str, Any] | None) -> dict[str, Any]:
+    """
+    Parameters of `BOOTSTRAP_SQL`. The claim is skipped without `claim_email` and the
+    insert without `new_user`.
+    """
+    new_user = new_user or {}
+    return {
+        "user_id": user_uuid,
+        "claim_email": claim_email.strip().lower() if claim_email else None,
+        "provisioned": PROVISIONED_PASSWORD_STATUS,
+        "email": new_user.get("email"),
+        "first_name": new_user.get("first_name"),
+        "last_name": new_user.get("last_name"),
+        "password_hash": new_user.get("password_hash"),
+        "preferences": new_user.get("preferences")
+    }
+
+
 # ========== 
 # Token Authentication 
 # ==========
@@ -54,8 +155,13 @@ def _get_full_name(body: dict[str, Any], token_data: dict[str, Any]) -> str:
 async def authenticate_jwt(
     request: Request,
     token_data: dict = Depends(validate_token),
+    _idempotency = Depends(idempotent("authenticate_jwt", ttl=LOGIN_REPLAY_TTL_SECONDS, key_from_token=True)),
     db: Session = Depends(get_db),
 ):
+    """
+    Returns the user for the token, creating it on first login.
+    Repeated calls with the same token within `LOGIN_REPLAY_TTL_SECONDS` replay the first response.
+    """
     try:
         body = await request.json()
     except Exception:
@@ -74,6 +180,11 @@ async def authenticate_jwt(
     if user:
         return AuthenticationResponse(internal_id=str(user.id), status="authenticated", is_new_user=False)
 
+    if claim_provisioned_user(db, user_uuid, token_data):
+        mark_write_sync(db, user_uuid)
+        logger.info(f"Provisioned user claimed: {user_uuid}")
+        return AuthenticationResponse(internal_id=str(user_uuid), status="created", is_new_user=True)
+
     email = _get_email(body, token_data)
     if not email:
         raise ExceptionWithErrorType(
@@ -96,6 +207,7 @@ async def authenticate_jwt(
         db.add(user)
         db.commit()
         db.refresh(user)
+        mark_write_sync(db, user.id)
 
         logger.info(f"New user created: {user.id}")
         return AuthenticationResponse(internal_id=str(user.id), status="created", is_new_user=True)
@@ -106,4 +218,78 @@ async def authenticate_jwt(
         raise ExceptionWithErrorType(
             message=f"User creation failed: {str(e)}",
             error_type="AUTH_USER_CREATION_FAILURE"
-        )
\ No newline at end of file
+        )
+
+
+@router.post("/session/bootstrap", response_model=SessionBootstrapResponse, tags=["Authentication"])
+async def bootstrap_session(
+    params: AuthenticationRequest | None = None,
+    token_data: dict = Depends(validate_token),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Returns the user's profile, credit balance and settings, creating the user on first login.
+
+    Replaces calling `/authenticate-jwt` and then reading the `users` row: the lookup, the
+    claim of a provisioned user and the insert run as one statement on the primary.
+    """
+    body = params.model_dump(exclude_none=True) if params is not None else {}
+
+    try:
+        user_uuid = uuid.UUID(token_data.get("sub"))
+    except (ValueError, TypeError):
+        raise ExceptionWithErrorType(
+            message="Invalid user ID in authentication token",
+            error_type="AUTH_INVALID_USER_DATA"
+        )
+
+    new_user = _new_user_values(user_uuid, body, token_data)
+    params = bootstrap_params(user_uuid, token_data.get("email"), new_user)
+
+    try:
+        row = (await db.execute(BOOTSTRAP_SQL, params)).mappings().first()
+        if row is None and new_user is not None:
+            #NOTE: A concurrent bootstrap inserted the user first; its row is committed by now
+            row = (await db.execute(BOOTSTRAP_SQL, params)).mappings().first()
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        logger.error(f"User creation failed: {e.orig}")
+        #NOTE: ID conflicts are skipped, so this is the email belonging to another user
+        raise ExceptionWithErrorType(
+            message="User creation failed: the email is already registered to another user",
+            error_type="AUTH_USER_CREATION_FAILURE"
+        )
+
+    if row is None:
+        if new_user is None:
+            raise ExceptionWithErrorType(
+                message="Email is required for user creation",
+                error_type="AUTH_MISSING_EMAIL"
+            )
+        raise ExceptionWithErrorType(
+            message="User creation failed: no row was created",
+            error_type="AUTH_USER_CREATION_FAILURE"
+        )
+
+    status = row["status"]
+    if status != "authenticated":
+        await mark_write(db, user_uuid)
+        logger.info(f"User {status} on session bootstrap: {user_uuid}")
+
+    return SessionBootstrapResponse(
+        internal_id=str(row["id"]),
+        status="authenticated" if status == "authenticated" else "created",
+        is_new_user=status != "authenticated",
+        email=row["email"],
+        first_name=row["first_name"],
+        last_name=row["last_name"],
+        profile_image_url=row["profile_image_url"],
+        credits_balance=row["credits_balance"] or 0,
+        stripe_customer_id=row["stripe_customer_id"],
+        user_type=row["user_type"].value if row["user_type"] is not None else None,
+        organization_id=str(row["organization_id"]) if row["organization_id"] is not None else None,
+        timezone=row["timezone"],
+        language_preference=row["language_preference"],
+        preferences=row["preferences"]
+    )
@@ -1,10 +1,11 @@
 import os
 import jwt
 import json
+import functools
 
 from loguru import logger
 from jwt import PyJWK
-from fastapi import Security
+from fastapi import Request, Security
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 from api.src.utils import ExceptionWithErrorType
@@ -15,25 +16,44 @@ ALGORITHM = "ES256"
 
 security = HTTPBearer()
 
+
+@functools.lru_cache(maxsize=1)
+def _get_public_key():
+    #NOTE: Parsed once per process instead of on every request
+    return PyJWK(json.loads(JWT_SECRET_JSON)).key
+
+
+def decode_token(token: str) -> dict:
+    """
+    Verifies the token signature and expiry and returns its payload.
+
+    Raises:
+        jwt.PyJWTError: If the token is invalid or expired.
+    """
+    return jwt.decode(
+        token,
+        _get_public_key(),
+        algorithms=[ALGORITHM],
+        options={"verify_aud": False}
+    )
+
+
 def validate_token(
+    request: Request,
     credentials: HTTPAuthorizationCredentials = Security(security)
 ) -> str:
     """
     Decodes the token and returns the Identity Provider's User ID.
+    Reuses the payload already verified by the admission control middleware, if any.
     """
     token = credentials.credentials
 
+    verified = getattr(request.state, "verified_token", None)
+    if verified is not None and verified[0] == token:
+        return verified[1]
+
     try:
-        jwk_data = json.loads(JWT_SECRET_JSON)
-        public_key = PyJWK(jwk_data).key
-
-        payload = jwt.decode(
-            token,
-            public_key,
-            algorithms=[ALGORITHM],
-            options={"verify_aud": False}
-        )
-        return payload
+        return decode_token(token)
     
     except jwt.ExpiredSignatureError:
         logger.error("Token validation failed: Token expired.")
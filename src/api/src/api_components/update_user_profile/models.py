@@ -1,3 +1,4 @@
+import uuid
 from pydantic import BaseModel, EmailStr, Field
 from typing import Optional
 
@@ -6,6 +7,7 @@ class UpdateUserProfileRequest(BaseModel):
     last_name: Optional[str] = Field(None, description="The user's last name")
     company: Optional[str] = Field(None, description="The user's company (stored in preferences)")
     avatar_url: Optional[str] = Field(None, description="The user's avatar URL (maps to profile_image_url)")
+    avatar_asset_id: Optional[uuid.UUID] = Field(None, description="An uploaded asset to use as avatar; takes precedence over avatar_url")
 
     class Config:
         extra = "ignore"  # More flexible: ignore unknown fields instead of raising errors
@@ -2,14 +2,17 @@ import uuid
 import traceback
 
 from loguru import logger
-from fastapi import APIRouter, Depends
-from sqlalchemy import update, select
+from fastapi import APIRouter, Depends, Request
+from sqlalchemy import func, update, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
 
 from common.models.user import User
-from common.database import get_async_db
+from common.database import get_async_db, get_async_read_db, mark_write
 from api.src.utils import ExceptionWithErrorType
+from api.src.globals import AVATAR_VARIANT
+from api.src.api_components.assets.assets import get_asset
+from api.src.api_components.notifications.notifications import notify_user_changed
 from api.src.api_components.update_user_profile.models import (
     UpdateUserProfileRequest,
     UpdateUserProfileResponse,
@@ -27,6 +30,7 @@ router = APIRouter()
 )
 async def update_user_profile(
     params: UpdateUserProfileRequest,
+    request: Request,
     token_payload: dict = Depends(validate_token),
     db: AsyncSession = Depends(get_async_db)
 ):
@@ -36,6 +40,7 @@ async def update_user_profile(
     - **first_name**: User's first name
     - **last_name**: User's last name
     - **avatar_url**: URL to user's profile image
+    - **avatar_asset_id**: Uploaded asset to use as profile image (see `POST /assets`)
     - **company**: Company name (stored in preferences JSONB)
     """
 
@@ -61,6 +66,10 @@ async def update_user_profile(
     if "avatar_url" in request_data:
         db_data["profile_image_url"] = request_data["avatar_url"]
 
+    if request_data.get("avatar_asset_id"):
+        asset = await get_asset(db, request_data["avatar_asset_id"])
+        db_data["profile_image_url"] = str(request.url_for("redirect_to_asset_variant", asset_id=str(asset.id), variant=AVATAR_VARIANT))
+
     if "first_name" in request_data:
         db_data["first_name"] = request_data["first_name"]
 
@@ -115,14 +124,16 @@ async def update_user_profile(
         )
 
         result = await db.execute(statement)
-        await db.commit()
-
         if result.rowcount == 0:
+            await db.rollback()
             raise ExceptionWithErrorType(
                 error_type="USER_NOT_FOUND",
                 message="No user found with the provided ID."
             )
+        await notify_user_changed(db, user_uuid, *db_data)
+        await db.commit()
 
+        await mark_write(db, user_uuid)
         logger.info(f"User profile updated successfully for user_id={user_uuid}")
 
         return UpdateUserProfileResponse(
@@ -159,7 +170,7 @@ async def update_user_profile(
 async def check_email_availability(
     email: str,
     token_payload: dict = Depends(validate_token),
-    db: AsyncSession = Depends(get_async_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Check if an email address is already taken by another user.
@@ -181,7 +192,7 @@ async def check_email_availability(
     try:
         # Check if email exists in the database
         result = await db.execute(
-            select(User.id).where(User.email == email)
+            select(User.id).where(func.lower(User.email) == email.strip().lower())
         )
         existing_user = result.scalar_one_or_none()
 
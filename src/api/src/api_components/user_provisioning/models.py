@@ -0,0 +1,17 @@
+from typing import Optional
+from pydantic import BaseModel, Field
+
+
+class UserImportError(BaseModel):
+    line: int = Field(..., description="Line number in the uploaded file, starting at 1")
+    email: Optional[str] = Field(None, description="Email of the row, if it could be read")
+    error: str
+
+
+class UserImportResponse(BaseModel):
+    total_rows: int = Field(..., description="Data rows read, excluding the CSV header and blank lines")
+    created: int = Field(..., description="Users created")
+    updated: int = Field(..., description="Existing members whose names were updated")
+    failed: int = Field(..., description="Rows skipped because of an error")
+    errors: list[UserImportError] = Field(default_factory=list, description="Skipped rows, ordered by line")
+    errors_truncated: bool = Field(False, description="True if more rows failed than are listed in `errors`")
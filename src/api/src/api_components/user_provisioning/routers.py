@@ -0,0 +1,76 @@
+from loguru import logger
+from fastapi import APIRouter, Depends, Header, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from common.database import get_async_db
+from api.src.api_components.presentations.presentations import parse_user_uuid
+from api.src.api_components.token_validator.token_validator import validate_token
+from api.src.api_components.user_provisioning.models import UserImportResponse
+from api.src.api_components.user_provisioning.user_provisioning import (
+    IMPORT_FORMATS,
+    get_admin_organization_id,
+    import_users,
+    read_chunks,
+    spool_upload,
+)
+from api.src.utils import ExceptionWithErrorType
+from api.src.responses import PydanticResponse
+from api.src.settings import settings
+
+
+router = APIRouter()
+
+
+# ===============
+# Bulk Import
+# ===============
+
+@router.post(
+    "/organization/users/import",
+    response_model=UserImportResponse,
+    openapi_extra={"requestBody": {"content": {media_type: {} for media_type in IMPORT_FORMATS}, "required": True}},
+    tags=["User Provisioning"]
+)
+async def import_organization_users(
+    request: Request,
+    content_type: str = Header(...),
+    token_payload: dict = Depends(validate_token),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Provision users into the caller's organization from a CSV (`text/csv`, with an `email`
+    header) or NDJSON (`application/x-ndjson`) body. Optional fields: `first_name`,
+    `last_name`, `user_type` (member, admin or guest; defaults to member).
+
+    Rows that fail are reported with their line number; all others are imported.
+    """
+    import_format = IMPORT_FORMATS.get(content_type.split(";", 1)[0].strip().lower())
+    if import_format is None:
+        raise ExceptionWithErrorType(
+            error_type="UNSUPPORTED_IMPORT_FORMAT",
+            message=f"Content-Type must be one of {', '.join(IMPORT_FORMATS)}.",
+            status_code=415
+        )
+
+    organization_id = await get_admin_organization_id(db, parse_user_uuid(token_payload))
+    #NOTE: Returns the session's connection to the pool while the client uploads
+    await db.commit()
+
+    upload = await spool_upload(request.stream(), settings.USER_IMPORT_MAX_BYTES)
+    try:
+        report = await import_users(
+            db,
+            organization_id,
+            read_chunks(upload),
+            import_format,
+            max_bytes=settings.USER_IMPORT_MAX_BYTES,
+            max_rows=settings.USER_IMPORT_MAX_ROWS,
+            max_reported_errors=settings.USER_IMPORT_MAX_REPORTED_ERRORS
+        )
+    finally:
+        upload.close()
+    logger.info(
+        f"User import for organization {organization_id}: {report.created} created, "
+        f"{report.updated} updated, {report.failed} failed"
+    )
+    return PydanticResponse(report)
@@ -0,0 +1,393 @@
+"""
+Bulk user provisioning for organizations.
+
+An upload is first spooled to a temporary file, so a slow client never holds a database
+connection. The file is then parsed, validated and normalized in one streaming pass that
+feeds `COPY` into a temporary staging table, so neither the file nor the parsed rows are
+held in memory. One `INSERT ... ON CONFLICT` statement then merges the staging table into
+`users` and reports the rows it could not merge.
+
+Emails are unique regardless of case (`ix_users_email_lower`), so rows match existing
+users on `lower(email)`.
+"""
+import io
+import re
+import csv
+import uuid
+import asyncio
+import tempfile
+
+import orjson
+from typing import AsyncIterator
+from email_validator import EmailNotValidError, validate_email
+from sqlalchemy import func, text, update
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from common.models.user import User, UserType
+from api.src.utils import ExceptionWithErrorType
+from api.src.api_components.user_provisioning.models import UserImportError, UserImportResponse
+
+IMPORT_FORMATS = {"text/csv": "csv", "application/x-ndjson": "ndjson", "application/jsonl": "ndjson"}
+IMPORT_COLUMNS = ("email", "first_name", "last_name", "user_type")
+IMPORTABLE_USER_TYPES = {UserType.member.value, UserType.admin.value, UserType.guest.value}
+PROVISIONED_PASSWORD_STATUS = "provisioned"
+MAX_NAME_LENGTH = 100
+COPY_BATCH_ROWS = 2000
+READ_CHUNK_BYTES = 256 * 1024
+
+#NOTE: Covers ordinary ASCII addresses; anything else goes through email_validator, which is ~50x slower
+FAST_EMAIL_PATTERN = re.compile(
+    r"[a-z0-9!#$%&'*+/=?^_`{|}~-]+(?:\.[a-z0-9!#$%&'*+/=?^_`{|}~-]+)*"
+    r"@(?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+[a-z]{2,63}"
+)
+
+CREATE_STAGING_TABLE_SQL = text("""
+CREATE TEMP TABLE user_import_staging (
+    line integer NOT NULL,
+    email text NOT NULL,
+    first_name text,
+    last_name text,
+    user_type user_type NOT NULL
+) ON COMMIT DROP
+""")
+
+#NOTE: Existing users are only updated if they already belong to the organization; `xmax = 0` marks inserted rows.
+#      Staged emails are lowercased, existing ones may not be, hence `lower(email)` on the users side
+MERGE_STAGED_USERS_SQL = text("""
+WITH merged AS (
+    INSERT INTO users AS u (
+        email, first_name, last_name, organization_id, user_type,
+        password_hash, password_status, credits_balance, is_active
+    )
+    SELECT email, first_name, last_name, :organization_id, user_type,
+           'managed_externally', :password_status, 0, true
+    FROM user_import_staging
+    ON CONFLICT ((lower(email))) DO UPDATE SET
+        first_name = coalesce(EXCLUDED.first_name, u.first_name),
+        last_name = coalesce(EXCLUDED.last_name, u.last_name),
+        updated_at = now()
+    WHERE u.organization_id = EXCLUDED.organization_id
+    RETURNING u.email, u.xmax = 0 AS inserted
+)
+SELECT
+    count(m.email) FILTER (WHERE m.inserted) AS created,
+    count(m.email) FILTER (WHERE NOT m.inserted) AS updated,
+    coalesce(
+        jsonb_agg(jsonb_build_object('line', s.line, 'email', s.email) ORDER BY s.line) FILTER (WHERE m.email IS NULL),
+        '[]'::jsonb
+    ) AS conflicts
+FROM user_import_staging s
+LEFT JOIN merged m ON lower(m.email) = s.email
+""")
+
+
+# ===============
+# Validation
+# ===============
+
+def normalize_email(value: str) -> str:
+    """
+    Returns the address trimmed and lowercased.
+
+    Raises:
+        ValueError: if the address is not valid.
+    """
+    email = value.strip().lower()
+    if not email:
+        raise ValueError("Email is required.")
+    if len(email) <= 254 and FAST_EMAIL_PATTERN.fullmatch(email) and len(email.partition("@")[0]) <= 64:
+        return email
+    try:
+        return validate_email(email, check_deliverability=False).normalized.lower()
+    except EmailNotValidError as e:
+        raise ValueError(str(e))
+
+
+def normalize_row(fields: dict) -> tuple[str, str | None, str | None, str]:
+    """
+    Validates one import row and returns (email, first_name, last_name, user_type).
+
+    Raises:
+        ValueError: with a message for the import report.
+    """
+    email = normalize_email(str(fields.get("email") or ""))
+
+    names = []
+    for key in ("first_name", "last_name"):
+        name = str(fields.get(key) or "").strip()
+        if len(name) > MAX_NAME_LENGTH:
+            raise ValueError(f"{key} is longer than {MAX_NAME_LENGTH} characters.")
+        names.append(name or None)
+
+    user_type = str(fields.get("user_type") or UserType.member.value).strip().lower()
+    if user_type not in IMPORTABLE_USER_TYPES:
+        raise ValueError(f"user_type must be one of {', '.join(sorted(IMPORTABLE_USER_TYPES))}.")
+
+    return email, names[0], names[1], user_type
+
+
+# ===============
+# Streaming Parse
+# ===============
+
+async def spool_upload(chunks: AsyncIterator[bytes], max_bytes: int):
+    """
+    Writes an upload to an anonymous temporary file and returns the file, rewound.
+    The caller closes it.
+
+    Raises:
+        ExceptionWithErrorType: RESOURCE_LIMIT_EXCEEDED if the upload is larger than `max_bytes`.
+    """
+    file = await asyncio.to_thread(tempfile.TemporaryFile)
+    try:
+        size = 0
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > max_bytes:
+                raise ExceptionWithErrorType(
+                    error_type="RESOURCE_LIMIT_EXCEEDED",
+                    message=f"Import exceeds the maximum size of {max_bytes} bytes.",
+                    status_code=413
+                )
+            await asyncio.to_thread(file.write, chunk)
+        await asyncio.to_thread(file.seek, 0)
+    except BaseException:
+        file.close()
+        raise
+    return file
+
+
+async def read_chunks(file) -> AsyncIterator[bytes]:
+    while chunk := await asyncio.to_thread(file.read, READ_CHUNK_BYTES):
+        yield chunk
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_bytes: int) -> AsyncIterator[tuple[int, bytes]]:
+    """
+    Splits a byte stream into numbered lines without buffering more than one partial line.
+
+    Raises:
+        ExceptionWithErrorType: RESOURCE_LIMIT_EXCEEDED if the stream is larger than `max_bytes`.
+    """
+    buffer = b""
+    size = 0
+    line_number = 0
+    async for chunk in chunks:
+        size += len(chunk)
+        if size > max_bytes:
+            raise ExceptionWithErrorType(
+                error_type="RESOURCE_LIMIT_EXCEEDED",
+                message=f"Import exceeds the maximum size of {max_bytes} bytes.",
+                status_code=413
+            )
+        *lines, buffer = (buffer + chunk).split(b"\n")
+        for line in lines:
+            line_number += 1
+            yield line_number, line
+    if buffer:
+        yield line_number + 1, buffer
+
+
+class UserImportParser:
+    """
+    Turns lines of a CSV (with a header row) or NDJSON upload into field dicts.
+    CSV records must fit on one line; quoted fields with line breaks are not supported.
+    """
+
+    def __init__(self, import_format: str):
+        self.import_format = import_format
+        self.header: list[str] | None = None
+
+    def parse(self, line_number: int, line: bytes) -> dict | None:
+        """
+        Returns the row's fields, or None for the CSV header and blank lines.
+
+        Raises:
+            ValueError: if the line cannot be parsed.
+            ExceptionWithErrorType: INVALID_IMPORT_FILE if the CSV header has no email column.
+        """
+        if line_number == 1:
+            line = line.removeprefix(b"\xef\xbb\xbf")
+        try:
+            decoded = line.decode("utf-8").rstrip("\r")
+        except UnicodeDecodeError:
+            raise ValueError("Line is not valid UTF-8.")
+        if not decoded.strip():
+            return None
+
+        if self.import_format == "ndjson":
+            try:
+                fields = orjson.loads(decoded)
+            except orjson.JSONDecodeError:
+                raise ValueError("Line is not valid JSON.")
+            if not isinstance(fields, dict):
+                raise ValueError("Line must be a JSON object.")
+            return fields
+
+        values = next(csv.reader([decoded]))
+        if self.header is None:
+            self.header = [value.strip().lower() for value in values]
+            if "email" not in self.header:
+                raise ExceptionWithErrorType(
+                    error_type="INVALID_IMPORT_FILE",
+                    message="The CSV header must contain an email column.",
+                    status_code=400
+                )
+            return None
+        return dict(zip(self.header, values))
+
+
+# ===============
+# Import
+# ===============
+
+class _StagingRows:
+    """
+    Async iterator of CSV-encoded batches for `COPY`, validating rows as they stream through.
+    """
+
+    def __init__(self, chunks, import_format: str, max_bytes: int, max_rows: int, max_reported_errors: int):
+        self.lines = iter_lines(chunks, max_bytes)
+        self.parser = UserImportParser(import_format)
+        self.max_rows = max_rows
+        self.max_reported_errors = max_reported_errors
+        self.seen_emails: set[str] = set()
+        self.total_rows = 0
+        self.failed = 0
+        self.errors: list[UserImportError] = []
+
+    def add_error(self, line: int, email: str | None, error: str):
+        self.failed += 1
+        if len(self.errors) < self.max_reported_errors:
+            self.errors.append(UserImportError(line=line, email=email, error=error))
+
+    async def __aiter__(self):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        batched = 0
+
+        async for line_number, line in self.lines:
+            fields = None
+            try:
+                fields = self.parser.parse(line_number, line)
+                if fields is None:
+                    continue
+                self.total_rows += 1
+                if self.total_rows > self.max_rows:
+                    raise ExceptionWithErrorType(
+                        error_type="RESOURCE_LIMIT_EXCEEDED",
+                        message=f"Import exceeds the maximum of {self.max_rows} rows.",
+                        status_code=413
+                    )
+                email, first_name, last_name, user_type = normalize_row(fields)
+            except ValueError as e:
+                email = fields.get("email") if isinstance(fields, dict) else None
+                self.add_error(line_number, str(email) if email else None, str(e))
+                continue
+
+            if email in self.seen_emails:
+                self.add_error(line_number, email, "Duplicate email in this file.")
+                continue
+            self.seen_emails.add(email)
+
+            writer.writerow((line_number, email, first_name, last_name, user_type))
+            batched += 1
+            if batched >= COPY_BATCH_ROWS:
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate()
+                batched = 0
+
+        if batched:
+            yield buffer.getvalue().encode("utf-8")
+
+
+async def import_users(
+    db: AsyncSession,
+    organization_id: uuid.UUID,
+    chunks: AsyncIterator[bytes],
+    import_format: str,
+    max_bytes: int,
+    max_rows: int,
+    max_reported_errors: int = 1000
+) -> UserImportResponse:
+    """
+    Creates the organization's users from a CSV or NDJSON stream in one transaction.
+
+    Rows that fail validation, repeat an earlier email, or belong to an account outside
+    the organization are reported with their line number and skipped; every other row is
+    created, or updated if the user is already a member.
+
+    Raises:
+        ExceptionWithErrorType: INVALID_IMPORT_FILE for a CSV without an email column,
+            RESOURCE_LIMIT_EXCEEDED if the stream exceeds `max_bytes` or `max_rows`.
+    """
+    staging_rows = _StagingRows(chunks, import_format, max_bytes, max_rows, max_reported_errors)
+
+    connection = await db.connection()
+    await connection.execute(CREATE_STAGING_TABLE_SQL)
+    raw_connection = await connection.get_raw_connection()
+    await raw_connection.driver_connection.copy_to_table(
+        "user_import_staging",
+        source=staging_rows,
+        columns=["line", "email", "first_name", "last_name", "user_type"],
+        format="csv"
+    )
+
+    created, updated, conflicts = (await connection.execute(MERGE_STAGED_USERS_SQL, {
+        "organization_id": organization_id,
+        "password_status": PROVISIONED_PASSWORD_STATUS,
+    })).one()
+    await db.commit()
+
+    for conflict in conflicts:
+        staging_rows.add_error(conflict["line"], conflict["email"], "Email belongs to an account outside this organization.")
+
+    return UserImportResponse(
+        total_rows=staging_rows.total_rows,
+        created=created,
+        updated=updated,
+        failed=staging_rows.failed,
+        errors=sorted(staging_rows.errors, key=lambda error: error.line),
+        errors_truncated=staging_rows.failed > len(staging_rows.errors)
+    )
+
+
+# ===============
+# Access & First Login
+# ===============
+
+async def get_admin_organization_id(db: AsyncSession, user_uuid: uuid.UUID) -> uuid.UUID:
+    """
+    Raises:
+        ExceptionWithErrorType: ORGANIZATION_ADMIN_REQUIRED unless the user administers an organization.
+    """
+    user = await db.get(User, user_uuid)
+    if user is None or user.user_type != UserType.admin or user.organization_id is None:
+        raise ExceptionWithErrorType(
+            error_type="ORGANIZATION_ADMIN_REQUIRED",
+            message="Only organization admins can provision users.",
+            status_code=403
+        )
+    return user.organization_id
+
+
+def claim_provisioned_user(db: Session, user_uuid: uuid.UUID, token_data: dict) -> bool:
+    """
+    Links a provisioned user to the auth account signing in for the first time, by giving the
+    row the token's subject as its ID. Matches on the token's own email only, never on
+    client-supplied data. Provisioned users own no rows yet, so changing the ID is safe.
+    """
+    email = token_data.get("email")
+    if not email:
+        return False
+
+    claimed = db.execute(
+        update(User)
+        .where(func.lower(User.email) == email.strip().lower(), User.password_status == PROVISIONED_PASSWORD_STATUS)
+        .values(id=user_uuid, password_status=None, last_login_at=func.now())
+        .returning(User.id)
+    ).first()
+    db.commit()
+    return claimed is not None
@@ -1,14 +1,31 @@
 import os
+import hmac
+import math
+import signal
+import asyncio
 import multiprocessing
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, ORJSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from mangum import Mangum
 
 import api.src.routers.router_v1 as router_v1
-from api.src.logging_config import setup_logging
-from common.database import init_async_db, init_db
+from api.src.lifespan import close_resources, init_resources, lifespan
 from api.src.settings import settings
+from api.src.usage_metering import get_usage_recorder
+from api.src.utils import ExceptionWithErrorType
+from api.src.globals import ADMISSION_EXEMPT_PATHS, ROUTE_LIMITS
+from api.src.metrics import REGISTRY
+from api.src.compression import CompressionMiddleware
+from api.src.profiling import HotStacks, ProfileStore, ProfilingMiddleware
+from api.src.idempotency import IdempotencyMiddleware, IdempotentReplay, idempotent_replay_handler
+from api.src.admission_control import (
+    AdmissionControlMiddleware,
+    LocalRateLimiter,
+    RouteLimit,
+    create_postgres_rate_limiter,
+)
 
 #NOTE: Set multiprocessing start method for compatibility with gRPC
 if multiprocessing.get_start_method(allow_none=True) != 'spawn':
@@ -17,13 +34,84 @@ if multiprocessing.get_start_method(allow_none=True) != 'spawn':
     except RuntimeError:
         pass
 
-setup_logging(env=settings.ENV)
-init_db()
-init_async_db()
+
+async def exception_with_error_type_handler(request: Request, exc: ExceptionWithErrorType):
+    """
+    Returns domain errors in the documented `{"detail": {"message", "error_type"}}` format.
+    Errors that know when to retry, like an open circuit breaker, add `Retry-After`.
+    """
+    retry_after = getattr(exc, "retry_after", None)
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": {"message": str(exc), "error_type": exc.error_type}},
+        headers={"Retry-After": str(math.ceil(retry_after))} if retry_after is not None else None
+    )
+
+
+async def metrics_endpoint(request: Request):
+    """
+    Serves this worker's metrics to a scraper sending `Authorization: Bearer <METRICS_TOKEN>`.
+    """
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    expected = settings.METRICS_TOKEN.get_secret_value()
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.strip().encode(), expected.encode()):
+        return PlainTextResponse("Unauthorized", status_code=401, headers={"WWW-Authenticate": "Bearer"})
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
 
 def create_app():
-    app = FastAPI()
+    app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
+    app.add_exception_handler(ExceptionWithErrorType, exception_with_error_type_handler)
+    app.add_exception_handler(IdempotentReplay, idempotent_replay_handler)
+    #NOTE: Metrics reveal routes, dependencies and traffic, so they are only served with a token
+    if settings.METRICS_TOKEN is not None:
+        app.add_route("/metrics", metrics_endpoint, include_in_schema=False)
+
+    #NOTE: Innermost, so stored responses are uncompressed and replays are compressed per client
+    app.add_middleware(IdempotencyMiddleware)
+
+    #NOTE: Inside compression so profiles and hot stacks are served compressed
+    if settings.PROFILING_ENABLED:
+        app.add_middleware(
+            ProfilingMiddleware,
+            store=ProfileStore(settings.PROFILING_OUTPUT_DIR, max_profiles=settings.PROFILING_MAX_PROFILES),
+            hot_stacks=HotStacks(max_stacks_per_route=settings.PROFILING_MAX_STACKS_PER_ROUTE),
+            secret=settings.PROFILING_SECRET.get_secret_value() if settings.PROFILING_SECRET else None,
+            sample_rate=settings.PROFILING_SAMPLE_RATE,
+            interval=settings.PROFILING_INTERVAL_SECONDS,
+            continuous_rate=settings.PROFILING_CONTINUOUS_RATE,
+            continuous_interval=settings.PROFILING_CONTINUOUS_INTERVAL_SECONDS
+        )
+
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+        gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+        brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+        thread_minimum_size=settings.COMPRESSION_THREAD_MINIMUM_SIZE
+    )
+
+    #NOTE: Added before CORS so 429 responses still carry CORS headers
+    if settings.ADMISSION_CONTROL_ENABLED:
+        if settings.RATE_LIMIT_BACKEND == "postgres":
+            route_limiter = create_postgres_rate_limiter(
+                settings.ASYNC_DATABASE_URL,
+                pool_size=settings.RATE_LIMIT_DB_POOL_SIZE,
+                timeout=settings.RATE_LIMIT_BACKEND_TIMEOUT_SECONDS
+            )
+        else:
+            route_limiter = LocalRateLimiter()
+        app.state.route_limiter = route_limiter
+
+        app.add_middleware(
+            AdmissionControlMiddleware,
+            route_limiter=route_limiter,
+            route_limits=[RouteLimit.from_config(config) for config in ROUTE_LIMITS],
+            default_rate=settings.RATE_LIMIT_DEFAULT_RATE,
+            default_burst=settings.RATE_LIMIT_DEFAULT_BURST,
+            max_in_flight=settings.ADMISSION_MAX_IN_FLIGHT,
+            exempt_paths=ADMISSION_EXEMPT_PATHS
+        )
 
     # Add CORS middleware
     app.add_middleware(
@@ -46,4 +134,70 @@ def create_app():
     return app
 
 app = create_app()
-handler = Mangum(app)
\ No newline at end of file
+_mangum = Mangum(app, lifespan="off")
+
+
+#NOTE: Owned here, not taken from `asyncio.get_event_loop()`, which warns outside a running loop and will stop creating one
+_loop: asyncio.AbstractEventLoop | None = None
+_terminating = False
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """
+    Returns the container's event loop, created on the first invocation. Mangum runs every
+    invocation on the current loop, so this one is set as current and the pooled connections
+    belong to it.
+    """
+    global _loop
+    if _loop is None:
+        _loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_loop)
+    return _loop
+
+
+def _close_loop():
+    """
+    Closes the resources, then the loop once its async generators and default executor are done.
+    """
+    loop = _get_loop()
+    loop.run_until_complete(close_resources(app))
+    loop.run_until_complete(loop.shutdown_asyncgens())
+    loop.run_until_complete(loop.shutdown_default_executor())
+    loop.close()
+
+
+def _close_container(signum, frame):
+    """
+    Lambda sends SIGTERM before reclaiming a container (when an extension is registered).
+    Closing the pools then ends the connections cleanly instead of leaving Postgres to time them out.
+    """
+    global _terminating
+    if _loop is not None and _loop.is_running():
+        #NOTE: Mid-invocation; the loop cannot be re-entered, so `handler` closes it once the response is built
+        _terminating = True
+        return
+    _close_loop()
+    #NOTE: Ends the process the way SIGTERM would have, rather than unwinding the runtime with SystemExit
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    os.kill(os.getpid(), signal.SIGTERM)
+
+
+def handler(event, context):
+    """
+    Lambda entry point. The first invocation of a container creates the resources and later
+    (warm) invocations reuse them; connections open on first use.
+    """
+    loop = _get_loop()
+    #NOTE: Mangum would run the lifespan, and recreate the pools, around every invocation
+    if init_resources() and settings.SERVERLESS:
+        signal.signal(signal.SIGTERM, _close_container)
+    response = _mangum(event, context)
+
+    #NOTE: Nothing runs between invocations, and a frozen container may never wake again
+    usage_recorder = get_usage_recorder()
+    if usage_recorder.pending:
+        loop.run_until_complete(usage_recorder.flush())
+    if _terminating:
+        #NOTE: The response is still returned; Lambda ends the process after it
+        _close_loop()
+    return response
@@ -0,0 +1,36 @@
+"""
+Fire-and-forget tasks that must not outlive the worker.
+
+`asyncio.create_task` keeps only a weak reference to its task, so untracked tasks can be
+garbage collected mid-run and are silently dropped at shutdown. Tasks started with
+`spawn_background_task` are tracked until they finish, and the lifespan gives them a
+grace period on shutdown before cancelling the rest.
+"""
+import asyncio
+
+from loguru import logger
+from typing import Coroutine
+
+_background_tasks: set[asyncio.Task] = set()
+
+
+def spawn_background_task(coroutine: Coroutine, name: str | None = None) -> asyncio.Task:
+    task = asyncio.create_task(coroutine, name=name)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+async def drain_background_tasks(timeout: float):
+    """
+    Waits up to `timeout` seconds for tracked tasks to finish, then cancels the rest.
+    """
+    if not _background_tasks:
+        return
+
+    _, pending = await asyncio.wait(set(_background_tasks), timeout=timeout)
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+        logger.warning(f"Cancelled {len(pending)} background tasks still running at shutdown")
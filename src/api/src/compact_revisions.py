@@ -0,0 +1,68 @@
+"""
+Compact presentation revision history and delete unreferenced slide blobs. Run from the
+`src` directory, e.g. nightly:
+
+```
+python -m api.src.compact_revisions
+python -m api.src.compact_revisions --since-hours 168 --skip-garbage-collection
+```
+
+Compacts every presentation with a revision committed in the last `--since-hours`, the
+same as the `presentation_compaction` job queued every `PRESENTATION_COMPACTION_INTERVAL`
+revisions, then deletes slide blobs that no revision references (left behind by deleted
+presentations). Prints a summary as JSON.
+"""
+import json
+import asyncio
+import argparse
+from dataclasses import asdict
+from datetime import datetime, timedelta, timezone
+
+from api.src.settings import settings
+
+
+async def compact(args) -> str:
+    from sqlalchemy import select
+    import common.database as database
+    from common.models.presentation_revision import PresentationRevision
+    from api.src.api_components.presentation_revisions.presentation_revisions import collect_garbage, compact_presentation
+
+    database.init_async_db()
+    summary = {"presentations": 0, "rewritten_full": 0, "rewritten_delta": 0, "bytes_before": 0, "bytes_after": 0, "blobs_deleted": 0}
+    try:
+        async with database.async_session_local() as db:
+            since = datetime.now(timezone.utc) - timedelta(hours=args.since_hours)
+            presentation_ids = (await db.scalars(
+                select(PresentationRevision.presentation_id)
+                .where(PresentationRevision.created_at >= since)
+                .distinct()
+            )).all()
+            await db.commit()
+
+            for presentation_id in presentation_ids:
+                result = asdict(await compact_presentation(
+                    db,
+                    presentation_id,
+                    max_depth=settings.PRESENTATION_REVISION_MAX_DELTA_DEPTH,
+                    delta_ratio=settings.PRESENTATION_REVISION_DELTA_RATIO
+                ))
+                summary["presentations"] += 1
+                for field in ("rewritten_full", "rewritten_delta", "bytes_before", "bytes_after"):
+                    summary[field] += result[field]
+
+            if not args.skip_garbage_collection:
+                summary["blobs_deleted"] = await collect_garbage(db, grace=settings.SLIDE_BLOB_GC_GRACE_SECONDS)
+    finally:
+        await database.close_async_db()
+    return json.dumps(summary, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--since-hours", type=float, default=24.0)
+    parser.add_argument("--skip-garbage-collection", action="store_true")
+    print(asyncio.run(compact(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Response compression negotiated from `Accept-Encoding` (gzip preferred, then brotli).
+
+Only textual content types are compressed; PDFs, PPTX files and images are already
+compressed and pass through untouched, as do Server-Sent Events (compressing them
+would buffer events). Streamed bodies such as NDJSON are compressed chunk by chunk
+and flushed after every chunk, so the client still receives data as it is produced.
+Bodies and chunks of at least `thread_minimum_size` bytes are compressed in a thread;
+zlib and brotli release the GIL, so the event loop keeps serving meanwhile.
+"""
+import zlib
+import asyncio
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional; gzip is always available
+    brotli = None
+
+COMPRESSIBLE_CONTENT_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "image/svg+xml",
+    "text/",
+)
+UNCOMPRESSED_CONTENT_TYPES = ("text/event-stream",)
+
+
+def negotiate_encoding(accept_encoding: str, brotli_available: bool = brotli is not None) -> str | None:
+    """
+    Picks `gzip` or `br` from an `Accept-Encoding` header, honouring q-values; gzip wins
+    ties. Returns None when neither is acceptable.
+    """
+    weights: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding] = weight
+
+    #NOTE: On deck JSON, brotli at per-request qualities is no smaller than gzip level 6 (see response_encoding.md)
+    candidates = ["gzip"] + (["br"] if brotli_available else [])
+    wildcard = weights.get("*", 0.0)
+    best, best_weight = None, 0.0
+    for coding in candidates:
+        weight = weights.get(coding, wildcard)
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+class _Compressor:
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality, mode=brotli.MODE_TEXT)
+        else:
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, flush: bool = False) -> bytes:
+        if self.encoding == "br":
+            output = self._brotli.process(data)
+            return output + self._brotli.flush() if flush else output
+        output = self._zlib.compress(data)
+        return output + self._zlib.flush(zlib.Z_SYNC_FLUSH) if flush else output
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.finish()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_FINISH)
+
+
+def compress_body(body: bytes, encoding: str, gzip_level: int = 6, brotli_quality: int = 6) -> bytes:
+    return _Compressor(encoding, gzip_level, brotli_quality).finish(body)
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing responses of at least `minimum_size` bytes.
+
+    gzip is sent unless the client prefers brotli. `brotli_quality` defaults to 6: on
+    deck JSON it is about as small as gzip level 6 and a little faster, while quality 4
+    is a third larger and the maximum (11) is far too slow to run per request.
+    """
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 6,
+        thread_minimum_size: int = 65536
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.thread_minimum_size = thread_minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder)
+
+
+class _CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = send
+        self.start_message = None
+        self.compressor: _Compressor | None = None
+        self.passthrough = False
+
+    async def __call__(self, message):
+        message_type = message["type"]
+
+        if message_type == "http.response.start":
+            #NOTE: Held back until the first body chunk shows whether the response is worth compressing
+            self.start_message = message
+            headers = Headers(raw=message["headers"])
+            content_type = headers.get("content-type", "")
+            self.passthrough = (
+                "content-encoding" in headers
+                or not content_type.startswith(COMPRESSIBLE_CONTENT_TYPES)
+                or content_type.startswith(UNCOMPRESSED_CONTENT_TYPES)
+            )
+            return
+
+        if message_type != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.start_message is not None:
+            start_message, self.start_message = self.start_message, None
+            if self.passthrough or (not more_body and len(body) < self.middleware.minimum_size):
+                self.passthrough = True
+                await self.send(start_message)
+                await self.send(message)
+                return
+
+            self.compressor = _Compressor(self.encoding, self.middleware.gzip_level, self.middleware.brotli_quality)
+            headers = MutableHeaders(raw=start_message["headers"])
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if "etag" in headers and not headers["etag"].startswith("W/"):
+                headers["ETag"] = "W/" + headers["etag"]
+
+            if more_body:
+                del headers["Content-Length"]
+                await self.send(start_message)
+                await self.send({"type": "http.response.body", "body": await self._compress(body, more_body), "more_body": True})
+            else:
+                compressed = await self._compress(body, more_body)
+                headers["Content-Length"] = str(len(compressed))
+                await self.send(start_message)
+                await self.send({"type": "http.response.body", "body": compressed})
+            return
+
+        if self.passthrough:
+            await self.send(message)
+        elif more_body:
+            await self.send({"type": "http.response.body", "body": await self._compress(body, more_body), "more_body": True})
+        else:
+            await self.send({"type": "http.response.body", "body": await self._compress(body, more_body)})
+
+    async def _compress(self, body: bytes, more_body: bool) -> bytes:
+        if len(body) < self.middleware.thread_minimum_size:
+            return self.compressor.compress(body, flush=True) if more_body else self.compressor.finish(body)
+        if more_body:
+            return await asyncio.to_thread(self.compressor.compress, body, True)
+        return await asyncio.to_thread(self.compressor.finish, body)
@@ -8,4 +8,59 @@ CREDIT_OPTIONS = {
     "2500": {"credits": 2500, "price_in_cents": 2500},
     "5000": {"credits": 5000, "price_in_cents": 5000},
     "10000": {"credits": 10000, "price_in_cents": 10000}
-}
\ No newline at end of file
+}
+
+#NOTE: Per-route admission limits, keyed by the JWT `sub` (client IP when unauthenticated).
+# `rate` is requests per second, `burst` the bucket size, `max_in_flight` caps concurrent
+# requests to the route in one worker, and `long_lived` routes (streams) are left out of the
+# worker-wide `ADMISSION_MAX_IN_FLIGHT` cap. Paths are matched without the /v1 or /latest prefix.
+ROUTE_LIMITS = [
+    {"name": "check_email", "methods": ["GET"], "path": "/check_email_availability", "rate": 2.0, "burst": 10},
+    {"name": "authenticate", "methods": ["POST"], "path": "/authenticate-jwt", "rate": 1.0, "burst": 10},
+    {"name": "session_bootstrap", "methods": ["POST"], "path": "/session/bootstrap", "rate": 1.0, "burst": 10},
+    {"name": "checkout", "methods": ["POST"], "path": "/create-checkout-session", "rate": 0.2, "burst": 5},
+    {"name": "generate_slides", "methods": ["POST"], "path": "/generate-slides", "rate": 0.05, "burst": 3, "max_in_flight": 8},
+    {"name": "generate_slides_job", "methods": ["POST"], "path": "/generate-slides/jobs", "rate": 0.05, "burst": 3},
+    {"name": "chat", "methods": ["POST"], "path": "/presentations/{presentation_id}/chat", "rate": 0.5, "burst": 5, "max_in_flight": 16},
+    {"name": "ingest", "methods": ["POST"], "path": "/documents/ingest", "rate": 0.1, "burst": 3, "max_in_flight": 4},
+    {"name": "export", "methods": ["GET"], "path": "/presentations/{presentation_id}/export.{format}", "rate": 0.5, "burst": 5},
+    {"name": "thumbnails", "methods": ["POST"], "path": "/slides/thumbnails", "rate": 2.0, "burst": 10},
+    {"name": "user_import", "methods": ["POST"], "path": "/organization/users/import", "rate": 0.05, "burst": 3, "max_in_flight": 2},
+    {"name": "search", "methods": ["GET"], "path": "/presentations/search", "rate": 5.0, "burst": 20},
+    #NOTE: Each upload holds up to two S3 parts in memory, so `max_in_flight` bounds worker RSS
+    {"name": "asset_upload", "methods": ["POST"], "path": "/assets", "rate": 1.0, "burst": 20, "max_in_flight": 16},
+    {"name": "events", "methods": ["GET"], "path": "/events", "rate": 0.2, "burst": 10, "long_lived": True},
+]
+
+#NOTE: Circuit breaker and bulkhead per external dependency, per worker (see `resilience.py`).
+# Keys override the `CIRCUIT_*` settings. `max_concurrent` calls run at once and others wait
+# up to `max_wait_seconds` for a slot; calls slower than `slow_call_seconds` count towards
+# opening the breaker; `timeout_seconds` bounds a whole call including client retries.
+# LLM providers are guarded as `llm:<provider>` with the `llm` policy.
+DEPENDENCY_POLICIES = {
+    "stripe": {"max_concurrent": 16, "max_wait_seconds": 0.5, "slow_call_seconds": 5.0, "timeout_seconds": 30.0},
+    "llm": {"max_concurrent": 48, "max_wait_seconds": 5.0, "slow_call_seconds": 60.0},
+    #NOTE: Checked every few minutes, so a short window would never see `min_calls`; the timeout stays below HEALTH_CHECK_TIMEOUT_SECONDS
+    "ssm": {"max_concurrent": 1, "window_seconds": 1800.0, "min_calls": 2, "failure_rate": 1.0, "open_seconds": 900.0, "half_open_probes": 1, "timeout_seconds": 1.5},
+}
+
+#NOTE: Credits charged per million tokens, by model in `provider:model` form; `default` covers
+# unlisted models. One credit is one cent (see `CREDIT_OPTIONS`), so these are the providers'
+# list prices; raise them to add a margin. Usage is priced when the call is made. Input tokens
+# read from or written to the prompt cache are priced at `cache_read`/`cache_write` (`input`
+# when missing); OpenAI and Gemini charge nothing extra for writes.
+LLM_CREDIT_RATES = {
+    "default": {"input": 300, "output": 1500, "cache_read": 30, "cache_write": 375},
+    "anthropic:claude-3-7-sonnet-latest": {"input": 300, "output": 1500, "cache_read": 30, "cache_write": 375},
+    "anthropic:claude-3-5-haiku-latest": {"input": 80, "output": 400, "cache_read": 8, "cache_write": 100},
+}
+
+#NOTE: Routes that bypass admission control entirely (probes, Stripe retries on its own schedule)
+ADMISSION_EXEMPT_PATHS = {"/", "/health", "/health/ready", "/health/live", "/metrics", "/stripe-webhook", "/docs", "/openapi.json"}
+
+#NOTE: Resized WebP copies of every uploaded image, by name: longest side in pixels
+ASSET_VARIANTS = {
+    "thumbnail": 256,
+    "medium": 1280
+}
+AVATAR_VARIANT = "thumbnail"
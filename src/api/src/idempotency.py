@@ -0,0 +1,464 @@
+"""
+`Idempotency-Key` support for POST endpoints.
+
+A route opts in with `Depends(idempotent("<scope>"))`. The first request with a key
+claims it and runs; its successful response is stored in `idempotency_keys` and
+replayed, byte for byte, to every later request with the same key:
+
+1. **Front cache**: completed responses are kept per worker (LRU, bounded in bytes),
+   so a repeat on the same worker is answered without touching the database.
+2. **In-flight coalescing**: concurrent duplicates in the same worker wait on the first
+   request's future; duplicates on other workers see its claim row and poll it until
+   the response is stored (or `IDEMPOTENCY_WAIT_SECONDS` pass).
+3. **Postgres**: one upsert claims a key; it also takes over expired keys and claims
+   abandoned by a crashed worker (`locked_until`).
+
+Only 2xx responses are stored. Errors release the key, so a retry runs again. Keys
+are scoped by route and by the JWT `sub`, and reusing a key with a different request
+body is rejected.
+"""
+import time
+import asyncio
+import hashlib
+
+from loguru import logger
+from dataclasses import dataclass
+from collections import OrderedDict
+from fastapi import Depends, Header, Request, Response
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.datastructures import Headers
+
+import common.database as database
+from api.src.metrics import REGISTRY
+from api.src.settings import settings
+from api.src.utils import ExceptionWithErrorType
+from api.src.background_tasks import spawn_background_task
+from api.src.api_components.token_validator.token_validator import validate_token
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+POLL_INTERVALS = (0.02, 0.05, 0.1, 0.2, 0.5)
+
+IDEMPOTENCY_REQUESTS = REGISTRY.counter(
+    "idempotency_requests_total",
+    "Requests with an idempotency key by scope and outcome",
+    ("scope", "outcome")
+)
+
+#NOTE: Takes over keys whose response expired and in-progress claims whose worker stopped renewing them
+CLAIM_KEY_SQL = text("""
+INSERT INTO idempotency_keys AS k (key, request_hash, locked_until, expires_at)
+VALUES (:key, :request_hash, now() + make_interval(secs => :lock_timeout), now() + make_interval(secs => :ttl))
+ON CONFLICT (key) DO UPDATE SET
+    request_hash = EXCLUDED.request_hash,
+    status_code = NULL,
+    content_type = NULL,
+    body = NULL,
+    locked_until = EXCLUDED.locked_until,
+    expires_at = EXCLUDED.expires_at,
+    created_at = now()
+WHERE k.expires_at < now() OR (k.status_code IS NULL AND k.locked_until < now())
+RETURNING true
+""")
+
+GET_KEY_SQL = text("""
+SELECT request_hash, status_code, content_type, body, extract(epoch FROM expires_at - now())
+FROM idempotency_keys
+WHERE key = :key AND expires_at > now()
+""")
+
+COMPLETE_KEY_SQL = text("""
+UPDATE idempotency_keys
+SET status_code = :status_code, content_type = :content_type, body = :body,
+    locked_until = NULL, expires_at = now() + make_interval(secs => :ttl)
+WHERE key = :key AND status_code IS NULL
+""")
+
+RELEASE_KEY_SQL = text("DELETE FROM idempotency_keys WHERE key = :key AND status_code IS NULL")
+
+PRUNE_KEYS_SQL = text("DELETE FROM idempotency_keys WHERE expires_at < now()")
+
+
+@dataclass(frozen=True)
+class StoredResponse:
+    request_hash: str
+    status_code: int
+    content_type: str | None
+    body: bytes
+
+    def to_response(self) -> Response:
+        return Response(
+            content=self.body,
+            status_code=self.status_code,
+            media_type=self.content_type,
+            headers={REPLAYED_HEADER: "true"}
+        )
+
+
+class IdempotentReplay(Exception):
+    """
+    Raised by the dependency to answer a repeated request with its stored response.
+    """
+    def __init__(self, stored: StoredResponse):
+        self.stored = stored
+        super().__init__("Replaying stored response")
+
+
+async def idempotent_replay_handler(request: Request, exc: IdempotentReplay):
+    return exc.stored.to_response()
+
+
+# ===============
+# Store
+# ===============
+
+@dataclass
+class IdempotencyClaim:
+    """
+    A claimed key; the middleware completes or releases it once the response is known.
+    """
+    store: "IdempotencyStore"
+    scope: str
+    key: str
+    request_hash: str
+    ttl: float
+
+    async def complete(self, status_code: int, content_type: str | None, body: bytes):
+        await self.store.complete(self, StoredResponse(self.request_hash, status_code, content_type, body))
+
+    async def release(self):
+        await self.store.release(self)
+
+
+class IdempotencyStore:
+    """
+    Claims, stores and replays responses by idempotency key.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        lock_timeout: float = 60.0,
+        wait_timeout: float = 10.0,
+        cache_bytes: int = 8 * 1024 * 1024,
+        max_response_bytes: int = 256 * 1024,
+        prune_interval: float = 600.0
+    ):
+        self.engine = engine
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self.cache_bytes = cache_bytes
+        self.max_response_bytes = max_response_bytes
+        self.prune_interval = prune_interval
+
+        self._cache: OrderedDict[str, tuple[StoredResponse, float]] = OrderedDict()
+        self._cached_bytes = 0
+        self._in_flight: dict[str, asyncio.Future] = {}
+        self._next_prune = time.monotonic() + prune_interval
+
+    async def begin(self, scope: str, key: str, request_hash: str, ttl: float) -> IdempotencyClaim | StoredResponse:
+        """
+        Returns the stored response for a repeated request, or a claim for the first one.
+
+        Raises:
+            ExceptionWithErrorType: IDEMPOTENCY_KEY_REUSED if the key was used for a different request,
+                IDEMPOTENCY_REQUEST_IN_PROGRESS if the first request is still running after `wait_timeout`.
+        """
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            stored = self._cache_get(key)
+            if stored is not None:
+                return self._replay(scope, "replayed_cache", stored, request_hash)
+
+            in_flight = self._in_flight.get(key)
+            if in_flight is not None:
+                IDEMPOTENCY_REQUESTS.inc(scope=scope, outcome="coalesced")
+                try:
+                    stored = await asyncio.wait_for(asyncio.shield(in_flight), timeout=max(deadline - time.monotonic(), 0))
+                except asyncio.TimeoutError:
+                    raise self._in_progress_error(scope)
+                if stored is not None:
+                    return self._replay(scope, "coalesced", stored, request_hash)
+                #NOTE: The first request failed and released the key; the next waiter to get here claims it
+                continue
+
+            if time.monotonic() > self._next_prune:
+                self._next_prune = time.monotonic() + self.prune_interval
+                spawn_background_task(self._prune(), name="idempotency-prune")
+
+            #NOTE: Registered before the round trip, so duplicates arriving meanwhile wait on it too
+            self._in_flight[key] = asyncio.get_running_loop().create_future()
+            try:
+                claimed, row = await self._claim(key, request_hash, ttl)
+            except BaseException:
+                self._resolve(key, None)
+                raise
+            if claimed:
+                IDEMPOTENCY_REQUESTS.inc(scope=scope, outcome="executed")
+                return IdempotencyClaim(self, scope, key, request_hash, ttl)
+
+            stored = None
+            if row is not None and row[1] is not None:
+                stored_hash, status_code, content_type, body, expires_in = row
+                stored = StoredResponse(stored_hash, status_code, content_type, bytes(body))
+                self._cache_put(key, stored, float(expires_in))
+            self._resolve(key, stored)
+            if stored is not None:
+                return self._replay(scope, "replayed_database", stored, request_hash)
+            if row is None:
+                #NOTE: Released or expired between the claim and the read
+                continue
+
+            if row[0] != request_hash:
+                raise self._reused_error(scope)
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise self._in_progress_error(scope)
+            await self._wait_for_other_worker(key, min(remaining, self.wait_timeout))
+
+    async def complete(self, claim: IdempotencyClaim, stored: StoredResponse):
+        if len(stored.body) > self.max_response_bytes:
+            logger.warning(f"Response for idempotency scope {claim.scope} is {len(stored.body)} bytes; not stored")
+            await self.release(claim)
+            return
+        try:
+            async with self.engine.begin() as connection:
+                await connection.execute(COMPLETE_KEY_SQL, {
+                    "key": claim.key,
+                    "status_code": stored.status_code,
+                    "content_type": stored.content_type,
+                    "body": stored.body,
+                    "ttl": claim.ttl,
+                })
+        except Exception as e:
+            #NOTE: Duplicates on other workers stop waiting once the claim's lock times out and run again
+            logger.error(f"Storing idempotent response for scope {claim.scope} failed: {e}")
+        self._cache_put(claim.key, stored, claim.ttl)
+        self._resolve(claim.key, stored)
+
+    async def release(self, claim: IdempotencyClaim):
+        try:
+            async with self.engine.begin() as connection:
+                await connection.execute(RELEASE_KEY_SQL, {"key": claim.key})
+        except Exception as e:
+            logger.error(f"Releasing idempotency key for scope {claim.scope} failed: {e}")
+        self._resolve(claim.key, None)
+
+    async def _claim(self, key: str, request_hash: str, ttl: float) -> tuple[bool, tuple | None]:
+        async with self.engine.begin() as connection:
+            claimed = (await connection.execute(CLAIM_KEY_SQL, {
+                "key": key,
+                "request_hash": request_hash,
+                "lock_timeout": self.lock_timeout,
+                "ttl": ttl,
+            })).scalar()
+            if claimed:
+                return True, None
+            return False, (await connection.execute(GET_KEY_SQL, {"key": key})).first()
+
+    async def _wait_for_other_worker(self, key: str, timeout: float):
+        """
+        Polls the claim row of a duplicate running on another worker, backing off up to `timeout`.
+        """
+        deadline = time.monotonic() + timeout
+        for attempt in range(1_000_000):
+            await asyncio.sleep(min(POLL_INTERVALS[min(attempt, len(POLL_INTERVALS) - 1)], max(deadline - time.monotonic(), 0)))
+            async with self.engine.connect() as connection:
+                row = (await connection.execute(GET_KEY_SQL, {"key": key})).first()
+            if row is None or row[1] is not None or time.monotonic() >= deadline:
+                return
+
+    def _resolve(self, key: str, stored: StoredResponse | None):
+        future = self._in_flight.pop(key, None)
+        if future is not None and not future.done():
+            future.set_result(stored)
+
+    def _replay(self, scope: str, outcome: str, stored: StoredResponse, request_hash: str) -> StoredResponse:
+        if stored.request_hash != request_hash:
+            raise self._reused_error(scope)
+        if outcome != "coalesced":
+            IDEMPOTENCY_REQUESTS.inc(scope=scope, outcome=outcome)
+        return stored
+
+    def _reused_error(self, scope: str) -> ExceptionWithErrorType:
+        IDEMPOTENCY_REQUESTS.inc(scope=scope, outcome="key_reused")
+        return ExceptionWithErrorType(
+            error_type="IDEMPOTENCY_KEY_REUSED",
+            message=f"This {IDEMPOTENCY_HEADER} was already used for a different request.",
+            status_code=422
+        )
+
+    def _in_progress_error(self, scope: str) -> ExceptionWithErrorType:
+        IDEMPOTENCY_REQUESTS.inc(scope=scope, outcome="in_progress")
+        return ExceptionWithErrorType(
+            error_type="IDEMPOTENCY_REQUEST_IN_PROGRESS",
+            message=f"A request with this {IDEMPOTENCY_HEADER} is still being processed. Retry shortly.",
+            status_code=409
+        )
+
+    # ===============
+    # Front Cache
+    # ===============
+
+    def _cache_get(self, key: str) -> StoredResponse | None:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        stored, expires_at = entry
+        if expires_at <= time.monotonic():
+            self._cache_pop(key)
+            return None
+        self._cache.move_to_end(key)
+        return stored
+
+    def _cache_put(self, key: str, stored: StoredResponse, ttl: float):
+        size = len(stored.body)
+        if size > self.cache_bytes:
+            return
+        self._cache_pop(key)
+        self._cache[key] = (stored, time.monotonic() + ttl)
+        self._cached_bytes += size
+        while self._cached_bytes > self.cache_bytes:
+            self._cache_pop(next(iter(self._cache)))
+
+    def _cache_pop(self, key: str):
+        entry = self._cache.pop(key, None)
+        if entry is not None:
+            self._cached_bytes -= len(entry[0].body)
+
+    async def _prune(self):
+        try:
+            async with self.engine.begin() as connection:
+                await connection.execute(PRUNE_KEYS_SQL)
+        except Exception as e:
+            logger.warning(f"Pruning idempotency keys failed: {e}")
+
+
+# ===============
+# Dependency
+# ===============
+
+def fingerprint(*parts: bytes | str) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8") if isinstance(part, str) else part)
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def idempotent(scope: str, ttl: float | None = None, key_from_token: bool = False):
+    """
+    Dependency factory making a POST route idempotent under `scope`.
+
+    With `key_from_token`, requests without an `Idempotency-Key` header are keyed by their
+    bearer token and body, so repeated calls with the same token and body replay the first
+    response, and a different body runs as a new request instead of reusing the key.
+    The dependency returns the claim (its `key` suits downstream idempotency keys, e.g.
+    Stripe's), or None if the request carries no key.
+    """
+    async def dependency(
+        request: Request,
+        idempotency_key: str | None = Header(None, alias=IDEMPOTENCY_HEADER, max_length=MAX_KEY_LENGTH),
+        token_payload: dict = Depends(validate_token)
+    ) -> IdempotencyClaim | None:
+        body = await request.body()
+        client_key = idempotency_key
+        if not client_key and key_from_token:
+            #NOTE: The body is part of the derived key; a client cannot pick a new key for a new body
+            client_key = "token:" + fingerprint(request.headers.get("authorization", ""), body)
+        if not client_key:
+            return None
+
+        store = get_idempotency_store()
+        if store is None:
+            return None
+
+        key = fingerprint(scope, str(token_payload.get("sub")), client_key)
+        request_hash = fingerprint(request.method, request.url.path, body)
+        try:
+            result = await store.begin(scope, key, request_hash, ttl or settings.IDEMPOTENCY_TTL_SECONDS)
+        except ExceptionWithErrorType:
+            raise
+        except Exception as e:
+            #NOTE: Fails open; routes that call external APIs also pass the key on (e.g. to Stripe)
+            IDEMPOTENCY_REQUESTS.inc(scope=scope, outcome="fail_open")
+            logger.warning(f"Idempotency check for scope {scope} failed open: {e}")
+            return None
+
+        if isinstance(result, StoredResponse):
+            raise IdempotentReplay(result)
+        request.state.idempotency_claim = result
+        return result
+
+    return dependency
+
+
+_store: IdempotencyStore | None = None
+
+
+def get_idempotency_store() -> IdempotencyStore | None:
+    """
+    Returns the worker's store, creating it on first use. None before the database is initialized.
+    """
+    global _store
+    if _store is None or _store.engine is not database.async_engine:
+        if database.async_engine is None:
+            return None
+        _store = IdempotencyStore(
+            database.async_engine,
+            lock_timeout=settings.IDEMPOTENCY_LOCK_TIMEOUT_SECONDS,
+            wait_timeout=settings.IDEMPOTENCY_WAIT_SECONDS,
+            cache_bytes=settings.IDEMPOTENCY_CACHE_BYTES,
+            max_response_bytes=settings.IDEMPOTENCY_MAX_RESPONSE_BYTES
+        )
+    return _store
+
+
+# ===============
+# Middleware
+# ===============
+
+class IdempotencyMiddleware:
+    """
+    Stores the response of requests whose route claimed an idempotency key.
+    Must sit inside the compression middleware, so stored bodies are uncompressed.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+
+        response_start: dict | None = None
+        body = bytearray()
+
+        async def send_wrapper(message):
+            nonlocal response_start
+            if "idempotency_claim" in scope.get("state", {}):
+                if message["type"] == "http.response.start":
+                    response_start = message
+                elif message["type"] == "http.response.body":
+                    body.extend(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException:
+            claim = scope.get("state", {}).get("idempotency_claim")
+            if claim is not None:
+                await asyncio.shield(claim.release())
+            raise
+
+        claim = scope.get("state", {}).get("idempotency_claim")
+        if claim is None:
+            return
+        if response_start is not None and 200 <= response_start["status"] < 300:
+            await claim.complete(response_start["status"], Headers(raw=response_start["headers"]).get("content-type"), bytes(body))
+        else:
+            await claim.release()
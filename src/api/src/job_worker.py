@@ -0,0 +1,97 @@
+"""
+Background job worker.
+
+Runs `JOB_WORKER_PROCESSES` worker processes (started with `spawn`), each running up
+to `JOB_WORKER_CONCURRENCY` jobs at a time. Run from the `src` directory:
+
+```
+python -m api.src.job_worker
+python -m api.src.job_worker --processes 4 --concurrency 8
+```
+
+SIGTERM/SIGINT stop claiming new jobs and wait for running ones to finish.
+"""
+import signal
+import asyncio
+import argparse
+import multiprocessing
+
+from loguru import logger
+
+from api.src.settings import settings
+
+
+async def _run_worker(concurrency: int):
+    import common.database as database
+    from api.src.api_components.jobs.jobs import JobWorker
+    from api.src.api_components.jobs.handlers import JOB_HANDLERS
+    from api.src.usage_metering import get_usage_recorder
+
+    database.init_async_db()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signal_number in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signal_number, stop.set)
+
+    worker = JobWorker(
+        engine=database.async_engine,
+        listen_dsn=settings.DATABASE_URL,
+        handlers=JOB_HANDLERS,
+        concurrency=concurrency,
+        per_user_limit=settings.JOB_PER_USER_CONCURRENCY,
+        heartbeat_interval=settings.JOB_HEARTBEAT_INTERVAL_SECONDS,
+        stale_after=settings.JOB_STALE_AFTER_SECONDS,
+        poll_interval=settings.JOB_POLL_INTERVAL_SECONDS
+    )
+    usage_recorder = get_usage_recorder()
+    usage_writer = asyncio.create_task(usage_recorder.run())
+    try:
+        await worker.run(stop)
+    finally:
+        #NOTE: Running jobs have finished, so every usage event they recorded is written before exit
+        await usage_recorder.close()
+        await usage_writer
+        await database.async_engine.dispose()
+
+
+def run_worker_process(concurrency: int):
+    from api.src.logging_config import setup_logging
+
+    setup_logging(env=settings.ENV)
+    asyncio.run(_run_worker(concurrency))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=settings.JOB_WORKER_PROCESSES)
+    parser.add_argument("--concurrency", type=int, default=settings.JOB_WORKER_CONCURRENCY)
+    args = parser.parse_args()
+
+    if args.processes == 1:
+        run_worker_process(args.concurrency)
+        return
+
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=run_worker_process, args=(args.concurrency,), name=f"job-worker-{index}")
+        for index in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    logger.info(f"Started {len(processes)} job worker processes")
+
+    def forward_signal(signal_number, frame):
+        #NOTE: Children drain on SIGTERM; forwarding covers signals sent only to the parent (e.g. `docker stop`)
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGTERM, forward_signal)
+    signal.signal(signal.SIGINT, forward_signal)
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Application lifespan: per-worker resources are created on startup and released on shutdown.
+
+Importing the app connects to nothing and starts no threads, so it can be imported
+once in a master process and forked into workers (`SERVER_PRELOAD`). On SIGTERM uvicorn
+stops accepting connections and gives in-flight requests up to
+`SERVER_GRACEFUL_SHUTDOWN_SECONDS` to finish; the shutdown half of the lifespan then
+drains background tasks and disposes of the pools.
+"""
+import asyncio
+import traceback
+
+from loguru import logger
+from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+import common.database as database
+from api.src.logging_config import setup_logging
+from api.src.process_pool import shutdown_process_pool
+from api.src.usage_metering import get_usage_recorder
+from api.src.background_tasks import drain_background_tasks, spawn_background_task
+from api.src.admission_control import PostgresRateLimiter
+from api.src.api_components.health.health import async_database_ping
+from api.src.api_components.health.routers import get_health_monitor
+from api.src.api_components.notifications.routers import get_notification_hub
+from api.src.api_components.billing.billing import close_stripe_client, get_stripe_client
+from api.src.api_components.conversation.routers import get_chat_llm, get_summarizer
+from api.src.api_components.slide_generation.routers import get_generation_graph
+from api.src.api_components.slide_rendering.routers import get_render_pool
+from api.src.settings import settings
+
+BACKGROUND_TASK_GRACE_SECONDS = 5.0
+
+LLM_CLIENT_FACTORIES = (get_generation_graph, get_chat_llm, get_summarizer)
+
+
+def init_resources() -> bool:
+    """
+    Sets up logging and creates the database engines and the Stripe client.
+    Idempotent, so entry points without a lifespan (Lambda) can call it per invocation.
+    Returns whether this call created them.
+    """
+    if database.async_engine is not None:
+        return False
+
+    #NOTE: Lambda has no /dev/shm for the queue, and a frozen container would hold queued lines back
+    setup_logging(env=settings.ENV, enqueue=not settings.SERVERLESS)
+    database.init_db()
+    database.init_async_db()
+    get_stripe_client()
+    return True
+
+
+def warm_llm_clients():
+    """
+    Builds the LLM clients and the compiled generation graph before the first request needs them.
+    """
+    for factory in LLM_CLIENT_FACTORIES:
+        try:
+            factory()
+        except Exception as e:
+            #NOTE: Not fatal; the factory is retried on first use and fails that request instead
+            logger.warning(f"Could not create {factory.__name__} at startup: {e}")
+
+
+async def start_health_monitor(app: FastAPI):
+    """
+    Runs the first evaluation before the worker accepts traffic, then keeps evaluating in the background.
+    """
+    monitor = get_health_monitor()
+    route_limiter = getattr(app.state, "route_limiter", None)
+    if isinstance(route_limiter, PostgresRateLimiter):
+        #NOTE: Non-critical: shared rate limit checks fail open when their database is unavailable
+        monitor.register("rate_limit_database", async_database_ping(route_limiter.engine), critical=False)
+
+    await monitor.run_once()
+    spawn_background_task(monitor.run(), name="health-monitor")
+
+
+async def start_replica_monitor():
+    """
+    Measures read replica lag once before the worker accepts traffic, then keeps measuring in the background.
+    """
+    router = database.replica_router
+    if router.replicas:
+        await router.start()
+        spawn_background_task(router.run(), name="replica-monitor")
+
+
+async def start_notification_hub():
+    """
+    Connects the worker's notification listener, then keeps it connected in the background.
+    """
+    hub = get_notification_hub()
+    await hub.start()
+    spawn_background_task(hub.run(), name="notification-listener")
+
+
+def start_usage_recorder():
+    """
+    Writes the worker's buffered LLM usage events in the background.
+    """
+    spawn_background_task(get_usage_recorder().run(), name="usage-recorder")
+
+
+async def close_resources(app: FastAPI):
+    """
+    Releases everything `init_resources` and the routes created, in reverse dependency order.
+    Each step is isolated so one failing close does not leak the remaining pools.
+    """
+    get_health_monitor().stop()
+    get_notification_hub().stop()
+    get_usage_recorder().stop()
+    if database.replica_router is not None:
+        database.replica_router.stop()
+
+    steps = [
+        ("background tasks", lambda: drain_background_tasks(BACKGROUND_TASK_GRACE_SECONDS)),
+        ("render pool", lambda: get_render_pool().close()),
+        ("process pool", lambda: asyncio.to_thread(shutdown_process_pool, True)),
+        ("stripe client", close_stripe_client),
+    ]
+    route_limiter = getattr(app.state, "route_limiter", None)
+    if route_limiter is not None:
+        steps.append(("rate limiter", route_limiter.close))
+    steps += [
+        #NOTE: After the background tasks, which may still record usage, and before the engine it writes with
+        ("usage recorder", lambda: get_usage_recorder().close()),
+        ("async database engine", database.close_async_db),
+        ("database engine", lambda: asyncio.to_thread(database.close_db)),
+    ]
+
+    for name, close in steps:
+        try:
+            await close()
+        except Exception as e:
+            error_traceback = traceback.format_exc()
+            logger.error(f"Error closing {name}: {e}\n{error_traceback}")
+
+    for factory in LLM_CLIENT_FACTORIES:
+        factory.cache_clear()
+    get_health_monitor.cache_clear()
+    get_notification_hub.cache_clear()
+    get_usage_recorder.cache_clear()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_resources()
+    warm_llm_clients()
+    await start_replica_monitor()
+    await start_notification_hub()
+    start_usage_recorder()
+    await start_health_monitor(app)
+    logger.info("Application startup complete")
+
+    yield
+
+    logger.info("Application shutting down")
+    await close_resources(app)
+    logger.info("Application shutdown complete")
+    #NOTE: Flushes and stops the enqueued log sink; forked workers exit without running finalizers
+    await logger.complete()
+    logger.remove()
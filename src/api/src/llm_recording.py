@@ -0,0 +1,210 @@
+"""
+Record and replay of LLM calls, so generation runs offline and deterministically.
+
+- **record**: every chat model built by `create_generation_llm` streams its responses
+  and stores them, chunk by chunk with their arrival time, in a fixture file per request
+  under `LLM_FIXTURE_DIR`. Callers still get the same message as from `ainvoke`.
+- **replay**: no provider client is built. Each request is answered from its fixture,
+  the chunks paced as recorded and divided by `LLM_REPLAY_SPEED` (0 replays without
+  delay). `LLM_REPLAY_FIRST_TOKEN_SECONDS` replaces the recorded time to the first chunk.
+  Token counts are the recorded ones, so usage metering and prompt cache metrics see
+  the same numbers as the live run.
+
+Requests are keyed by model, messages and call arguments. A request seen several times
+while recording, e.g. a slide retried after an invalid answer, keeps every response and
+replays them in turn. A request without a fixture fails with `LLM_FIXTURE_MISSING`: the
+prompts changed since the recording, so record again.
+"""
+import json
+import time
+import asyncio
+import hashlib
+import operator
+import functools
+import threading
+
+from pathlib import Path
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Callable
+from langchain_core.messages import AIMessageChunk, BaseMessage, convert_to_messages, message_chunk_to_message
+
+from api.src.settings import settings
+from api.src.utils import ExceptionWithErrorType
+
+
+# ===============
+# Fixtures
+# ===============
+
+def request_key(model: str, messages: list[BaseMessage], kwargs: dict) -> str:
+    """
+    Returns the fixture key of a request: a hash of the model, the messages' roles and
+    content (cache breakpoints included) and the call arguments other than `config`.
+    """
+    request = {
+        "model": model,
+        "messages": [{"type": message.type, "content": message.content} for message in messages],
+        "kwargs": {name: value for name, value in kwargs.items() if name != "config"},
+    }
+    return hashlib.sha256(json.dumps(request, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class FixtureStore:
+    """
+    Fixture files of one directory, one JSON file per request key holding the request and
+    its recorded responses.
+    """
+
+    def __init__(self, directory: str | Path):
+        self.directory = Path(directory)
+        self._fixtures: dict[str, dict] = {}
+        self._served: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def _load(self, key: str) -> dict | None:
+        fixture = self._fixtures.get(key)
+        if fixture is None and self._path(key).exists():
+            fixture = self._fixtures[key] = json.loads(self._path(key).read_text())
+        return fixture
+
+    def append(self, key: str, model: str, messages: list[BaseMessage], response: dict):
+        """
+        Adds a response to the request's fixture and rewrites the file.
+        """
+        with self._lock:
+            fixture = self._load(key) or {
+                "model": model,
+                "messages": [{"type": message.type, "content": message.content} for message in messages],
+                "responses": [],
+            }
+            fixture["responses"].append(response)
+            self._fixtures[key] = fixture
+
+            self.directory.mkdir(parents=True, exist_ok=True)
+            #NOTE: Written to a temporary file and renamed, so a concurrent reader never sees half a fixture
+            temporary = self._path(key).with_suffix(".tmp")
+            temporary.write_text(json.dumps(fixture, indent=1, default=str))
+            temporary.replace(self._path(key))
+
+    def next_response(self, key: str, model: str) -> dict:
+        """
+        Returns the request's next recorded response, starting over after the last one.
+
+        Raises:
+            ExceptionWithErrorType: LLM_FIXTURE_MISSING if the request was never recorded.
+        """
+        with self._lock:
+            fixture = self._load(key)
+            if fixture is None or not fixture["responses"]:
+                raise ExceptionWithErrorType(
+                    f"No recorded response for this {model} request in {self.directory} ({key}). "
+                    "The prompt changed since the fixtures were recorded; record them again.",
+                    error_type="LLM_FIXTURE_MISSING"
+                )
+            served = self._served.get(key, 0)
+            self._served[key] = served + 1
+            return fixture["responses"][served % len(fixture["responses"])]
+
+
+@functools.lru_cache(maxsize=None)
+def get_fixture_store(directory: str) -> FixtureStore:
+    return FixtureStore(directory)
+
+
+# ===============
+# Chat Models
+# ===============
+
+def _to_messages(input) -> list[BaseMessage]:
+    return convert_to_messages(input if isinstance(input, list) else [input])
+
+
+async def _collect(chunks: AsyncIterator[AIMessageChunk]) -> BaseMessage:
+    collected = [chunk async for chunk in chunks]
+    if not collected:
+        raise ValueError("The model returned an empty stream")
+    return message_chunk_to_message(functools.reduce(operator.add, collected))
+
+
+class RecordingChatModel:
+    """
+    Wraps a LangChain chat model so every response is streamed and stored in a fixture.
+    """
+
+    def __init__(self, llm, model: str, fixtures: FixtureStore):
+        self.llm = llm
+        self.model = model
+        self.fixtures = fixtures
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        return await _collect(self.astream(input, config, **kwargs))
+
+    async def astream(self, input, config=None, **kwargs) -> AsyncIterator[AIMessageChunk]:
+        messages = _to_messages(input)
+        recorded = []
+        started = time.perf_counter()
+        async for chunk in self.llm.astream(messages, config, **kwargs):
+            recorded.append({"offset": time.perf_counter() - started, "chunk": chunk.model_dump()})
+            yield chunk
+
+        #NOTE: Only complete responses are stored; a stream the caller abandons is not replayable
+        self.fixtures.append(request_key(self.model, messages, kwargs), self.model, messages, {
+            "recorded_at": datetime.now(timezone.utc).isoformat(),
+            "chunks": recorded,
+        })
+
+
+class ReplayChatModel:
+    """
+    Chat model answering from recorded fixtures with the recorded pacing.
+
+    Args:
+        model (str): Model the fixtures were recorded with, in `provider:model` form.
+        fixtures (FixtureStore): Where the fixtures are read from.
+        speed (float): Recorded delays are divided by this; 0 replays without delay.
+        first_token_seconds (float | None): Time to the first chunk instead of the recorded one.
+    """
+
+    def __init__(self, model: str, fixtures: FixtureStore, speed: float = 1.0, first_token_seconds: float | None = None):
+        self.model = model
+        self.fixtures = fixtures
+        self.speed = speed
+        self.first_token_seconds = first_token_seconds
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        return await _collect(self.astream(input, config, **kwargs))
+
+    async def astream(self, input, config=None, **kwargs) -> AsyncIterator[AIMessageChunk]:
+        response = self.fixtures.next_response(request_key(self.model, _to_messages(input), kwargs), self.model)
+        chunks = response["chunks"]
+        shift = 0.0 if self.first_token_seconds is None else self.first_token_seconds - chunks[0]["offset"]
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for recorded in chunks:
+            if self.speed > 0:
+                #NOTE: Sleeping until each chunk's deadline keeps the total from drifting with many small sleeps
+                delay = started + (recorded["offset"] + shift) / self.speed - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            yield AIMessageChunk.model_validate(recorded["chunk"])
+
+
+def recordable_chat_model(model: str, build: Callable[[], Any]):
+    """
+    Returns the chat model for `model` according to `LLM_RECORDING_MODE`: the one `build`
+    returns, the same recorded to fixtures, or a replay of the fixtures without building it.
+    """
+    if settings.LLM_RECORDING_MODE == "replay":
+        return ReplayChatModel(
+            model,
+            get_fixture_store(settings.LLM_FIXTURE_DIR),
+            speed=settings.LLM_REPLAY_SPEED,
+            first_token_seconds=settings.LLM_REPLAY_FIRST_TOKEN_SECONDS
+        )
+    if settings.LLM_RECORDING_MODE == "record":
+        return RecordingChatModel(build(), model, get_fixture_store(settings.LLM_FIXTURE_DIR))
+    return build()
@@ -2,7 +2,7 @@ from loguru import logger
 import sys
 
 
-def setup_logging(env: str = "local", serialize: bool = False):
+def setup_logging(env: str = "local", serialize: bool = False, enqueue: bool = True):
     """
     Setup of the logging for the application.
     The logger will configure logging level based on the environment 
@@ -17,6 +17,7 @@ def setup_logging(env: str = "local", serialize: bool = False):
     Args:
         env (str): The environment to setup logging for.
         serialize (bool): Whether to serialize the logs.
+        enqueue (bool): Whether to write logs from a background thread through a multiprocessing queue.
     """
 
     assert env in ["local", "dev", "preprod", "prod"], "Environment must be local, dev, preprod or prod"
@@ -43,7 +44,7 @@ def setup_logging(env: str = "local", serialize: bool = False):
         sys.stdout,
         format = logger_format,
         level = level,
-        enqueue = True, # In multiprocess setups ensures logs from different processes are safely written.
+        enqueue = enqueue, # In multiprocess setups ensures logs from different processes are safely written.
         serialize = serialize # Can turn logs to structured and makes sure logs are serialized and can be safely written to stdout.
     )
 
@@ -0,0 +1,57 @@
+"""
+Shared process pool for CPU-bound work that must not run on the event loop
+(PDF parsing, document exports, image processing).
+
+Worker functions submitted to the pool must live in modules that do not import
+`api.src.settings`, otherwise every spawned worker would load settings again.
+
+In serverless mode the pool is a thread pool: Lambda has no `/dev/shm`, which
+multiprocessing queues need, and a container serves one request at a time anyway.
+"""
+import sys
+import multiprocessing
+
+from loguru import logger
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from api.src.settings import settings
+
+_process_pool: Executor | None = None
+
+
+def get_process_pool() -> Executor:
+    """
+    Returns the worker-wide process pool, creating it on first use.
+    Uses the `spawn` start method, matching the one forced in `api_service_layer_main`.
+    """
+    global _process_pool
+
+    if _process_pool is None and settings.SERVERLESS:
+        _process_pool = ThreadPoolExecutor(max_workers=settings.PROCESS_POOL_MAX_WORKERS)
+        logger.info("Serverless mode: CPU-bound work runs in a thread pool")
+
+    if _process_pool is None:
+        options = {}
+        #NOTE: `max_tasks_per_child` is new in Python 3.11; on 3.10 (the Docker image) workers are not recycled
+        if sys.version_info >= (3, 11):
+            options["max_tasks_per_child"] = settings.PROCESS_POOL_MAX_TASKS_PER_CHILD
+        _process_pool = ProcessPoolExecutor(
+            max_workers=settings.PROCESS_POOL_MAX_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            **options
+        )
+        logger.info(f"Process pool started with max_workers={settings.PROCESS_POOL_MAX_WORKERS or 'cpu_count'}")
+
+    return _process_pool
+
+
+def shutdown_process_pool(wait: bool = True):
+    """
+    Shuts down the process pool if it was started.
+    """
+    global _process_pool
+
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=wait, cancel_futures=not wait)
+        _process_pool = None
+        logger.info("Process pool shut down")
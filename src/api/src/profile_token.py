@@ -0,0 +1,30 @@
+"""
+Mint a profiling token. Run from the `src` directory with access to `PROFILING_SECRET`:
+
+```
+python -m api.src.profile_token --ttl-minutes 30
+curl -H "X-Profile-Token: $(python -m api.src.profile_token)" https://api.example.com/api/v1/update_profile ...
+```
+
+A request with the token is profiled and answered with an `X-Profile-ID` header; the
+same token reads stored profiles and hot stacks under `/_profiling`. Anyone holding the
+token can do both until it expires, so keep the TTL short.
+"""
+import time
+import argparse
+
+from api.src.settings import settings
+from api.src.profiling import sign_token
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ttl-minutes", type=float, default=15.0)
+    args = parser.parse_args()
+    if settings.PROFILING_SECRET is None:
+        parser.error("PROFILING_SECRET is not set")
+    print(sign_token(settings.PROFILING_SECRET.get_secret_value(), int(time.time() + args.ttl_minutes * 60)))
+
+
+if __name__ == "__main__":
+    main()
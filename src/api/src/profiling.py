@@ -0,0 +1,394 @@
+"""
+Per-request profiling with pyinstrument, for finding where a slow endpoint spends its time.
+
+The middleware is only installed when `PROFILING_ENABLED` is set; otherwise requests do
+not pass through it at all. When installed, a request is profiled if:
+
+1. **Token**: it carries a valid `X-Profile-Token` (an HMAC of its expiry under
+   `PROFILING_SECRET`, minted by `python -m api.src.profile_token`). The response gets
+   an `X-Profile-ID` header naming the stored profile.
+2. **Sampled**: it falls within `PROFILING_SAMPLE_RATE`. The profile is stored under a
+   new ID, which is logged.
+3. **Continuous**: it falls within `PROFILING_CONTINUOUS_RATE`. It is profiled at a coarse
+   interval and only its stacks are kept, summed per route into hot stacks.
+
+The profiler is async-aware: only the request's own task is sampled, and time spent
+awaiting shows up as `[await]` instead of as whatever else the event loop ran. Stored
+profiles are pyinstrument sessions, rendered as speedscope JSON or HTML when fetched
+from `/_profiling/profiles/{id}` (token required).
+"""
+import os
+import re
+import hmac
+import time
+import uuid
+import random
+import sysconfig
+import asyncio
+import hashlib
+import threading
+
+from loguru import logger
+from dataclasses import dataclass, field
+from pyinstrument import Profiler
+from pyinstrument.session import Session
+from pyinstrument.renderers import HTMLRenderer, SpeedscopeRenderer
+from starlette.requests import Request
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse, PlainTextResponse, Response
+
+from api.src.metrics import REGISTRY
+
+PROFILE_TOKEN_HEADER = "x-profile-token"
+PROFILE_ID_HEADER = b"x-profile-id"
+ADMIN_PATH_PREFIX = "/_profiling"
+PROFILE_ID = re.compile(r"^[0-9a-f]{32}$")
+SESSION_SUFFIX = ".pyisession"
+OTHER_STACKS = "[other]"
+SRC_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+STDLIB_ROOT = sysconfig.get_paths()["stdlib"]
+#NOTE: Frames up to this module's own are the server and outer middleware, the same for every request
+MODULE_FILE_MARKER = f"\x00{__file__}\x00"
+
+PROFILED_REQUESTS = REGISTRY.counter(
+    "profiled_requests_total",
+    "Requests run under the profiler by trigger",
+    ("trigger",)
+)
+
+
+# ===============
+# Tokens
+# ===============
+
+def sign_token(secret: str, expires_at: int) -> str:
+    """
+    Returns a profiling token valid until the Unix time `expires_at`.
+    """
+    signature = hmac.new(secret.encode("utf-8"), f"profile:{expires_at}".encode("ascii"), hashlib.sha256).hexdigest()
+    return f"{expires_at}.{signature}"
+
+
+def verify_token(secret: str, token: str, now: float | None = None) -> bool:
+    expires_at, _, _ = token.partition(".")
+    #NOTE: str.isdigit also accepts non-ASCII digits, which the ASCII-encoded signature cannot carry
+    if not (expires_at.isascii() and expires_at.isdigit()) or int(expires_at) < (time.time() if now is None else now):
+        return False
+    return hmac.compare_digest(sign_token(secret, int(expires_at)), token)
+
+
+# ===============
+# Hot Stacks
+# ===============
+
+def _frame_label(identifier: str) -> str:
+    """
+    Turns a pyinstrument frame identifier (`function\\x00file\\x00line\\x01attributes`) into
+    `function (path:line)`, with paths relative to `src`, site-packages or the standard library.
+    """
+    function, _, location = identifier.partition("\x00")
+    if not location:
+        return function
+    path, _, line = location.split("\x01", 1)[0].partition("\x00")
+    if path.startswith(SRC_ROOT + os.sep):
+        path = path[len(SRC_ROOT) + 1:]
+    elif "site-packages" + os.sep in path:
+        path = path.split("site-packages" + os.sep, 1)[1]
+    elif path.startswith(STDLIB_ROOT + os.sep):
+        path = path[len(STDLIB_ROOT) + 1:]
+    return f"{function} ({path}:{line})"
+
+
+def _request_stack(call_stack: list[str]) -> list[str] | None:
+    """
+    Returns the frames above the middleware, or None for a sample taken outside the
+    request (the event loop between two steps of its task).
+    """
+    for index, identifier in enumerate(call_stack):
+        if MODULE_FILE_MARKER in identifier:
+            return call_stack[index + 1:]
+    return None
+
+
+@dataclass
+class RouteStacks:
+    requests: int = 0
+    seconds: float = 0.0
+    stacks: dict[str, float] = field(default_factory=dict)
+
+
+class HotStacks:
+    """
+    Profiled time per route and folded stack (`outer;...;inner`), summed across requests.
+    Each route keeps at most `max_stacks_per_route` distinct stacks; time in further stacks
+    is counted under `[other]`.
+    """
+
+    def __init__(self, max_stacks_per_route: int = 500):
+        self.max_stacks_per_route = max_stacks_per_route
+        self._routes: dict[str, RouteStacks] = {}
+        self._lock = threading.Lock()
+
+    def add(self, route: str, session: Session):
+        folded: dict[str, float] = {}
+        for call_stack, seconds in session.frame_records:
+            request_stack = _request_stack(call_stack)
+            if request_stack:
+                stack = ";".join(_frame_label(identifier) for identifier in request_stack)
+                folded[stack] = folded.get(stack, 0.0) + seconds
+
+        with self._lock:
+            stats = self._routes.setdefault(route, RouteStacks())
+            stats.requests += 1
+            stats.seconds += session.duration
+            for stack, seconds in folded.items():
+                if stack not in stats.stacks and len(stats.stacks) >= self.max_stacks_per_route:
+                    stack = OTHER_STACKS
+                stats.stacks[stack] = stats.stacks.get(stack, 0.0) + seconds
+
+    def summary(self, top: int = 10) -> dict:
+        """
+        Returns per route the number of profiled requests, their total time and the
+        `top` stacks by time, slowest routes first.
+        """
+        with self._lock:
+            routes = sorted(self._routes.items(), key=lambda item: item[1].seconds, reverse=True)
+            return {
+                route: {
+                    "requests": stats.requests,
+                    "seconds": round(stats.seconds, 6),
+                    "top_stacks": [
+                        {"stack": stack, "seconds": round(seconds, 6)}
+                        for stack, seconds in sorted(stats.stacks.items(), key=lambda item: item[1], reverse=True)[:top]
+                    ]
+                }
+                for route, stats in routes
+            }
+
+    def folded(self, route: str) -> str | None:
+        """
+        Returns the stacks of a route in collapsed-stack format (`stack microseconds` per
+        line), which speedscope and flamegraph.pl read.
+        """
+        with self._lock:
+            stats = self._routes.get(route)
+            if stats is None:
+                return None
+            return "".join(f"{stack} {round(seconds * 1e6)}\n" for stack, seconds in stats.stacks.items())
+
+
+# ===============
+# Profile Store
+# ===============
+
+class ProfileStore:
+    """
+    Stored profiles, one pyinstrument session file per profile ID, newest `max_profiles` kept.
+    """
+
+    def __init__(self, directory: str, max_profiles: int = 200):
+        self.directory = directory
+        self.max_profiles = max_profiles
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, profile_id: str) -> str:
+        return os.path.join(self.directory, profile_id + SESSION_SUFFIX)
+
+    def save(self, profile_id: str, session: Session):
+        session.save(self._path(profile_id))
+        self._prune()
+
+    def _entries(self) -> list[tuple[str, float, int]]:
+        """
+        Returns `(profile_id, mtime, size)` of stored profiles, newest first.
+        """
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(SESSION_SUFFIX):
+                #NOTE: Other workers prune the same directory, so a file can vanish between listing and stat
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((entry.name[:-len(SESSION_SUFFIX)], stat.st_mtime, stat.st_size))
+        return sorted(entries, key=lambda entry: entry[1], reverse=True)
+
+    def _prune(self):
+        for profile_id, _, _ in self._entries()[self.max_profiles:]:
+            try:
+                os.remove(self._path(profile_id))
+            except FileNotFoundError:
+                pass
+
+    def list(self, limit: int = 50) -> list[dict]:
+        return [
+            {"id": profile_id, "created_at": mtime, "size_bytes": size}
+            for profile_id, mtime, size in self._entries()[:limit]
+        ]
+
+    def render(self, profile_id: str, output_format: str) -> str | None:
+        """
+        Returns a stored profile as speedscope JSON or pyinstrument HTML, None if it does not exist.
+        """
+        try:
+            session = Session.load(self._path(profile_id))
+        except FileNotFoundError:
+            return None
+        renderer = HTMLRenderer() if output_format == "html" else SpeedscopeRenderer()
+        return renderer.render(session)
+
+
+# ===============
+# Middleware
+# ===============
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling requests on demand (signed token) or by sampling, and
+    serving stored profiles and hot stacks under `/_profiling`.
+    """
+
+    def __init__(
+        self,
+        app,
+        store: ProfileStore,
+        hot_stacks: HotStacks,
+        secret: str | None = None,
+        sample_rate: float = 0.0,
+        interval: float = 0.001,
+        continuous_rate: float = 0.0,
+        continuous_interval: float = 0.01,
+        path_prefixes: tuple[str, ...] = ("/v1", "/latest")
+    ):
+        self.app = app
+        self.store = store
+        self.hot_stacks = hot_stacks
+        self.secret = secret
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.continuous_rate = continuous_rate
+        self.continuous_interval = continuous_interval
+        self.path_prefixes = path_prefixes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if scope["path"].startswith(ADMIN_PATH_PREFIX + "/"):
+            await self._admin(scope, receive, send)
+            return
+
+        trigger = self._trigger(scope)
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex if trigger != "continuous" else None
+        status_code = 500
+
+        async def send_with_profile_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if trigger == "token":
+                    message["headers"] = [*message.get("headers", []), (PROFILE_ID_HEADER, profile_id.encode("ascii"))]
+            await send(message)
+
+        PROFILED_REQUESTS.inc(trigger=trigger)
+        profiler = Profiler(interval=self.continuous_interval if profile_id is None else self.interval, async_mode="enabled")
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            session = profiler.stop()
+            route = self._route(scope)
+            session.target_description = f"{route} -> {status_code}"
+            if profile_id is None:
+                self.hot_stacks.add(route, session)
+            else:
+                logger.info(f"Profiled {route} -> {status_code} in {session.duration * 1000:.1f} ms as profile {profile_id} ({trigger})")
+                #NOTE: Serializing a 1 ms-interval session can take milliseconds; kept off the event loop
+                await asyncio.to_thread(self._record, route, profile_id, session)
+
+    def _record(self, route: str, profile_id: str, session: Session):
+        self.hot_stacks.add(route, session)
+        try:
+            self.store.save(profile_id, session)
+        except OSError as e:
+            logger.warning(f"Could not store profile {profile_id}: {e}")
+
+    def _trigger(self, scope) -> str | None:
+        if self.secret is not None:
+            token = Headers(scope=scope).get(PROFILE_TOKEN_HEADER)
+            if token is not None:
+                if verify_token(self.secret, token):
+                    return "token"
+                logger.warning(f"Ignored invalid profiling token on {scope['method']} {scope['path']}")
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "sampled"
+        if self.continuous_rate > 0 and random.random() < self.continuous_rate:
+            return "continuous"
+        return None
+
+    def _route(self, scope) -> str:
+        """
+        Returns `METHOD /route/{template}` without the version prefix, so `/v1/x` and `/x`
+        share their hot stacks, or `METHOD [unmatched]` when no route matched.
+        """
+        route = scope.get("route")
+        path = getattr(route, "path", None)
+        if path is None:
+            return f"{scope['method']} [unmatched]"
+        for prefix in self.path_prefixes:
+            if path.startswith(prefix + "/"):
+                path = path[len(prefix):]
+                break
+        return f"{scope['method']} {path}"
+
+    async def _admin(self, scope, receive, send):
+        """
+        Serves, to requests with a valid token:
+        - `GET /_profiling/profiles`: the newest stored profiles
+        - `GET /_profiling/profiles/{id}?format=speedscope|html`: one profile, rendered
+        - `GET /_profiling/hot-stacks`: top stacks per route
+        - `GET /_profiling/hot-stacks/folded?route=GET /path`: all stacks of a route, collapsed
+        """
+        token = Headers(scope=scope).get(PROFILE_TOKEN_HEADER)
+        if self.secret is None or token is None or not verify_token(self.secret, token):
+            response = self._error(403, "PROFILING_FORBIDDEN", "A valid profiling token is required.")
+            await response(scope, receive, send)
+            return
+
+        request = Request(scope)
+        path = scope["path"][len(ADMIN_PATH_PREFIX):]
+        response = self._error(404, "PROFILE_NOT_FOUND", "No such profile.")
+
+        if scope["method"] != "GET":
+            response = self._error(405, "METHOD_NOT_ALLOWED", "Profiling endpoints are read-only.")
+        elif path == "/profiles":
+            response = JSONResponse({"profiles": await asyncio.to_thread(self.store.list)})
+        elif path.startswith("/profiles/"):
+            profile_id = path[len("/profiles/"):]
+            output_format = request.query_params.get("format", "speedscope")
+            if PROFILE_ID.match(profile_id):
+                rendered = await asyncio.to_thread(self.store.render, profile_id, output_format)
+                if rendered is not None and output_format == "html":
+                    response = Response(rendered, media_type="text/html")
+                elif rendered is not None:
+                    response = Response(rendered, media_type="application/json", headers={
+                        "content-disposition": f'attachment; filename="{profile_id}.speedscope.json"'
+                    })
+        elif path == "/hot-stacks":
+            top = request.query_params.get("top", "10")
+            response = JSONResponse({"routes": self.hot_stacks.summary(top=int(top) if top.isascii() and top.isdigit() else 10)})
+        elif path == "/hot-stacks/folded":
+            folded = self.hot_stacks.folded(request.query_params.get("route", ""))
+            if folded is not None:
+                response = PlainTextResponse(folded)
+            else:
+                response = self._error(404, "PROFILE_NOT_FOUND", "No stacks recorded for this route.")
+        await response(scope, receive, send)
+
+    def _error(self, status_code: int, error_type: str, message: str) -> JSONResponse:
+        return JSONResponse({"detail": {"message": message, "error_type": error_type}}, status_code=status_code)
@@ -0,0 +1,91 @@
+"""
+Versioned prompt templates assembled so providers can cache their shared prefix.
+
+Providers cache the longest prefix of a prompt they have seen recently and bill reads
+from it at a fraction of the input price (Anthropic, OpenAI, Gemini). A template is
+laid out from the most shared part to the least:
+
+1. **system**: fixed text, the same for every call of the template (role, design rules)
+2. **prefix**: per-request context shared by related calls, e.g. a deck's source
+   content, sent identically by the outline call and every slide call
+3. **history** (optional): earlier conversation turns, which only grow at the end
+4. **suffix**: the call's own task, never cached
+
+With Anthropic the end of the prefix and the end of the history are marked with
+`cache_control`; OpenAI and Gemini cache prefixes of that length automatically, so
+their prompts are sent as plain text. Changing a template's text invalidates its cached
+prefixes: bump `version`, which labels the prompt cache metrics of its stage.
+"""
+from dataclasses import dataclass
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+CACHE_CONTROL = {"type": "ephemeral"}
+
+#NOTE: Providers whose API takes explicit cache breakpoints; the others cache prefixes automatically
+EXPLICIT_CACHE_PROVIDERS = {"anthropic"}
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    name: str
+    version: int
+    system: str
+    prefix: str = ""
+    suffix: str = ""
+
+    @property
+    def stage(self) -> str:
+        return f"{self.name}.v{self.version}"
+
+    def render(self, provider: str | None, history: list[BaseMessage] | None = None, **values) -> list[BaseMessage]:
+        """
+        Formats the template with `values` into messages, with cache breakpoints for `provider`.
+        """
+        explicit_cache = provider in EXPLICIT_CACHE_PROVIDERS
+        system = self.system.format(**values)
+        prefix = self.prefix.format(**values)
+
+        if not explicit_cache:
+            messages: list[BaseMessage] = [SystemMessage(content=f"{system}\n\n{prefix}" if prefix else system)]
+        else:
+            blocks = [{"type": "text", "text": system}]
+            if prefix:
+                blocks.append({"type": "text", "text": prefix})
+            blocks[-1]["cache_control"] = CACHE_CONTROL
+            messages = [SystemMessage(content=blocks)]
+
+        if history:
+            messages += history[:-1]
+            messages.append(_with_cache_breakpoint(history[-1]) if explicit_cache else history[-1])
+        if self.suffix:
+            messages.append(HumanMessage(content=self.suffix.format(**values)))
+        return messages
+
+
+def _with_cache_breakpoint(message: BaseMessage) -> BaseMessage:
+    content = message.content
+    if isinstance(content, str):
+        content = [{"type": "text", "text": content}]
+    content = [*content[:-1], {**content[-1], "cache_control": CACHE_CONTROL}]
+    return message.model_copy(update={"content": content})
+
+
+def model_provider(model: str) -> str | None:
+    """
+    Returns the provider of a model in `provider:model` form.
+    """
+    provider, separator, _ = model.partition(":")
+    return provider if separator else None
+
+
+PROMPTS: dict[str, PromptTemplate] = {}
+
+
+def register_prompt(template: PromptTemplate) -> PromptTemplate:
+    """
+    Adds a template to the registry; names are unique, so every stage reports its own cache metrics.
+    """
+    if template.name in PROMPTS:
+        raise ValueError(f"Prompt template '{template.name}' is already registered")
+    PROMPTS[template.name] = template
+    return template
@@ -0,0 +1,59 @@
+"""
+Bulk-provision an organization's users from a CSV or NDJSON file. Run from the `src` directory:
+
+```
+python -m api.src.provision_users --organization-id <uuid> users.csv
+python -m api.src.provision_users --organization-id <uuid> --format ndjson - < users.ndjson
+```
+
+Uses the same streaming validation, `COPY` and merge as `POST /organization/users/import`,
+without the upload size and row limits. Prints the import report as JSON.
+"""
+import sys
+import uuid
+import asyncio
+import argparse
+
+from api.src.settings import settings
+
+
+async def provision(args) -> str:
+    import common.database as database
+    from api.src.api_components.user_provisioning.user_provisioning import import_users, read_chunks
+
+    database.init_async_db()
+    file = sys.stdin.buffer if args.path == "-" else open(args.path, "rb")
+    try:
+        async with database.async_session_local() as db:
+            report = await import_users(
+                db,
+                args.organization_id,
+                read_chunks(file),
+                args.format,
+                max_bytes=sys.maxsize,
+                max_rows=sys.maxsize,
+                max_reported_errors=args.max_reported_errors
+            )
+    finally:
+        if file is not sys.stdin.buffer:
+            file.close()
+        await database.close_async_db()
+    return report.model_dump_json(indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="CSV or NDJSON file, or - for stdin")
+    parser.add_argument("--organization-id", type=uuid.UUID, required=True)
+    parser.add_argument("--format", choices=["csv", "ndjson"], help="Defaults to the file extension, or csv for stdin")
+    parser.add_argument("--max-reported-errors", type=int, default=settings.USER_IMPORT_MAX_REPORTED_ERRORS)
+    args = parser.parse_args()
+
+    if args.format is None:
+        args.format = "ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv"
+
+    print(asyncio.run(provision(args)))
+
+
+if __name__ == "__main__":
+    main()
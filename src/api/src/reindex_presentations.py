@@ -0,0 +1,52 @@
+"""
+Build the search index of presentations. Run from the `src` directory once after
+deploying search (or changing `PRESENTATION_SEARCH_CONFIG`), and from cron for decks
+written outside the API:
+
+```
+python -m api.src.reindex_presentations                 # never indexed, or updated in the last 24 h
+python -m api.src.reindex_presentations --all
+```
+
+Saving slides through the API indexes the deck in the same transaction, so this only
+catches up presentations that were created or edited by other means. Prints a summary
+as JSON.
+"""
+import json
+import asyncio
+import argparse
+from datetime import datetime, timedelta, timezone
+
+from api.src.settings import settings
+
+
+async def reindex(args) -> str:
+    import common.database as database
+    from api.src.api_components.presentation_search.presentation_search import reindex_presentations
+
+    database.init_async_db()
+    try:
+        async with database.async_session_local() as db:
+            since = datetime.min.replace(tzinfo=timezone.utc) if args.all else datetime.now(timezone.utc) - timedelta(hours=args.since_hours)
+            indexed = await reindex_presentations(
+                db,
+                config=settings.PRESENTATION_SEARCH_CONFIG,
+                max_chars=settings.PRESENTATION_SEARCH_MAX_TEXT_CHARS,
+                since=since,
+                batch_size=args.batch_size
+            )
+    finally:
+        await database.close_async_db()
+    return json.dumps({"indexed": indexed}, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--since-hours", type=float, default=24.0)
+    parser.add_argument("--all", action="store_true", help="Reindex every presentation")
+    parser.add_argument("--batch-size", type=int, default=500)
+    print(asyncio.run(reindex(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
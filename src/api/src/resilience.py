@@ -0,0 +1,419 @@
+"""
+Circuit breakers and bulkheads for external dependencies: Stripe, LLM providers and SSM.
+
+Every call to a dependency runs inside `get_dependency(name).guard()`:
+
+1. **Circuit breaker**: outcomes are counted over a rolling `window_seconds`. Once the
+   window holds `min_calls` calls and the share of failures reaches `failure_rate` (or the
+   share of calls slower than `slow_call_seconds` reaches `slow_call_rate`), the breaker
+   opens: calls fail at once with 503 `DEPENDENCY_UNAVAILABLE` for `open_seconds`. It then
+   lets `half_open_probes` calls through; if they succeed it closes, if one fails it opens
+   again.
+2. **Bulkhead**: at most `max_concurrent` calls run at once per worker. A call waits up to
+   `max_wait_seconds` for a slot and then fails with 503 `DEPENDENCY_BUSY`, so a dependency
+   that slows down cannot tie up every request, and the database session it holds.
+
+Only errors that say the dependency is unhealthy count as failures: timeouts, connection
+errors, 429 and 5xx. A declined card or an invalid request does not. Policies are
+`DEPENDENCY_POLICIES` in `globals.py` over the `CIRCUIT_*` settings.
+"""
+import math
+import time
+import asyncio
+
+from loguru import logger
+from dataclasses import dataclass, fields
+from contextlib import asynccontextmanager
+
+from api.src.metrics import REGISTRY
+from api.src.settings import settings
+from api.src.globals import DEPENDENCY_POLICIES
+from api.src.utils import ExceptionWithErrorType
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+WINDOW_BUCKETS = 10
+
+CIRCUIT_STATE = REGISTRY.gauge(
+    "circuit_breaker_state",
+    "Circuit breaker state per dependency: 0 closed, 1 half-open, 2 open",
+    ("dependency",)
+)
+DEPENDENCY_CALLS = REGISTRY.counter(
+    "dependency_calls_total",
+    "Calls to external dependencies by outcome",
+    ("dependency", "outcome")
+)
+DEPENDENCY_CALL_SECONDS = REGISTRY.histogram(
+    "dependency_call_seconds",
+    "Latency of calls to external dependencies",
+    ("dependency",),
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+)
+DEPENDENCY_IN_FLIGHT = REGISTRY.gauge(
+    "dependency_in_flight",
+    "Calls to external dependencies running in this worker",
+    ("dependency",)
+)
+
+
+class DependencyUnavailableError(ExceptionWithErrorType):
+    """
+    Raised without calling the dependency while its circuit breaker is open.
+    """
+    def __init__(self, dependency: str, retry_after: float):
+        self.dependency = dependency
+        self.retry_after = retry_after
+        super().__init__(
+            message=f"{dependency} is temporarily unavailable, retry in {math.ceil(retry_after)} s.",
+            error_type="DEPENDENCY_UNAVAILABLE",
+            status_code=503
+        )
+
+
+class DependencyBusyError(ExceptionWithErrorType):
+    """
+    Raised when the dependency's bulkhead has no free slot within `max_wait_seconds`.
+    """
+    def __init__(self, dependency: str):
+        self.dependency = dependency
+        self.retry_after = 1.0
+        super().__init__(
+            message=f"Too many requests are waiting on {dependency}, retry shortly.",
+            error_type="DEPENDENCY_BUSY",
+            status_code=503
+        )
+
+
+def is_dependency_failure(error: BaseException) -> bool:
+    """
+    True for errors that say the dependency itself is unhealthy: timeouts, connection errors,
+    and 429 or 5xx responses. Recognizes the status attributes of the Stripe, OpenAI,
+    Anthropic, Google, botocore and httpx exceptions.
+    """
+    #NOTE: asyncio.TimeoutError is only an alias of TimeoutError from Python 3.11
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    if isinstance(error, ExceptionWithErrorType):
+        return False
+
+    status = getattr(error, "http_status", None) or getattr(error, "status_code", None) or getattr(error, "code", None)
+    response = getattr(error, "response", None)
+    if status is None and isinstance(response, dict):
+        status = response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+    elif status is None:
+        status = getattr(response, "status_code", None)
+    if isinstance(status, int) and 100 <= status < 600:
+        return status == 429 or status >= 500
+
+    #NOTE: httpx, botocore and the provider SDKs name their transport errors this way
+    name = type(error).__name__
+    return "Timeout" in name or "Connection" in name or "Connect" in name
+
+
+# ===============
+# Policy
+# ===============
+
+@dataclass(frozen=True)
+class DependencyPolicy:
+    window_seconds: float = 30.0
+    min_calls: int = 10
+    failure_rate: float = 0.5
+    slow_call_seconds: float = 10.0
+    slow_call_rate: float = 0.8
+    open_seconds: float = 15.0
+    half_open_probes: int = 2
+    max_concurrent: int = 32
+    max_wait_seconds: float = 0.0
+    timeout_seconds: float | None = None
+
+    @classmethod
+    def from_config(cls, config: dict, defaults: dict | None = None) -> "DependencyPolicy":
+        unknown = set(config) - {field.name for field in fields(cls)}
+        if unknown:
+            raise ValueError(f"Unknown dependency policy keys: {sorted(unknown)}")
+        return cls(**{**(defaults or {}), **config})
+
+
+def default_policy_config() -> dict:
+    return {
+        "window_seconds": settings.CIRCUIT_WINDOW_SECONDS,
+        "min_calls": settings.CIRCUIT_MIN_CALLS,
+        "failure_rate": settings.CIRCUIT_FAILURE_RATE,
+        "slow_call_rate": settings.CIRCUIT_SLOW_CALL_RATE,
+        "open_seconds": settings.CIRCUIT_OPEN_SECONDS,
+        "half_open_probes": settings.CIRCUIT_HALF_OPEN_PROBES,
+    }
+
+
+# ===============
+# Circuit Breaker
+# ===============
+
+class CircuitBreaker:
+    """
+    Rolling-window circuit breaker. The window is `WINDOW_BUCKETS` buckets of
+    `window_seconds / WINDOW_BUCKETS`, each counting calls, failures and slow calls.
+    """
+
+    def __init__(self, name: str, policy: DependencyPolicy, clock=time.monotonic):
+        self.name = name
+        self.policy = policy
+        self.clock = clock
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self._bucket_seconds = policy.window_seconds / WINDOW_BUCKETS
+        #NOTE: [bucket number, calls, failures, slow calls]; a slot is reused once its bucket leaves the window
+        self._buckets = [[-1, 0, 0, 0] for _ in range(WINDOW_BUCKETS)]
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        CIRCUIT_STATE.set(STATE_VALUES[CLOSED], dependency=name)
+
+    def acquire(self) -> bool:
+        """
+        Admits a call and returns True if it is a half-open probe.
+
+        Raises:
+            DependencyUnavailableError: while the breaker is open or its probes are in flight.
+        """
+        if self.state == OPEN:
+            remaining = self.opened_at + self.policy.open_seconds - self.clock()
+            if remaining > 0:
+                raise DependencyUnavailableError(self.name, remaining)
+            self._transition(HALF_OPEN)
+
+        if self.state == HALF_OPEN:
+            if self._probes_in_flight + self._probe_successes >= self.policy.half_open_probes:
+                raise DependencyUnavailableError(self.name, self.policy.open_seconds / WINDOW_BUCKETS)
+            self._probes_in_flight += 1
+            return True
+        return False
+
+    def release_probe(self):
+        """
+        Returns the slot of a probe that ended without an outcome (cancelled, or no bulkhead slot).
+        """
+        self._probes_in_flight -= 1
+
+    def record(self, probe: bool, failure: bool, duration: float):
+        bad = failure or duration >= self.policy.slow_call_seconds
+        if probe:
+            self._probes_in_flight -= 1
+            if self.state != HALF_OPEN:
+                return
+            if bad:
+                self._transition(OPEN)
+            else:
+                self._probe_successes += 1
+                if self._probe_successes >= self.policy.half_open_probes:
+                    self._transition(CLOSED)
+            return
+
+        #NOTE: Calls started before the breaker opened finish later; only closed-state outcomes are counted
+        if self.state != CLOSED:
+            return
+        number = int(self.clock() // self._bucket_seconds)
+        bucket = self._buckets[number % WINDOW_BUCKETS]
+        if bucket[0] != number:
+            bucket[:] = [number, 0, 0, 0]
+        bucket[1] += 1
+        bucket[2] += failure
+        bucket[3] += duration >= self.policy.slow_call_seconds
+        if bad:
+            self._evaluate(number)
+
+    def window(self) -> tuple[int, int, int]:
+        """
+        Returns the calls, failures and slow calls in the rolling window.
+        """
+        number = int(self.clock() // self._bucket_seconds)
+        calls = failures = slow = 0
+        for bucket_number, bucket_calls, bucket_failures, bucket_slow in self._buckets:
+            if number - bucket_number < WINDOW_BUCKETS:
+                calls += bucket_calls
+                failures += bucket_failures
+                slow += bucket_slow
+        return calls, failures, slow
+
+    def _evaluate(self, number: int):
+        calls, failures, slow = self.window()
+        if calls < self.policy.min_calls:
+            return
+        if failures / calls >= self.policy.failure_rate or slow / calls >= self.policy.slow_call_rate:
+            logger.warning(
+                f"Circuit breaker {self.name} opened: {failures} failed and {slow} slow of {calls} calls "
+                f"in {self.policy.window_seconds:g}s"
+            )
+            self._transition(OPEN)
+
+    def _transition(self, state: str):
+        if state == OPEN:
+            self.opened_at = self.clock()
+        elif state == CLOSED:
+            self._buckets = [[-1, 0, 0, 0] for _ in range(WINDOW_BUCKETS)]
+            logger.info(f"Circuit breaker {self.name} closed")
+        self._probe_successes = 0
+        self.state = state
+        CIRCUIT_STATE.set(STATE_VALUES[state], dependency=self.name)
+
+
+# ===============
+# Dependency
+# ===============
+
+class Dependency:
+    """
+    An external dependency guarded by a circuit breaker and a bulkhead.
+    """
+
+    def __init__(self, name: str, policy: DependencyPolicy, is_failure=is_dependency_failure):
+        self.name = name
+        self.policy = policy
+        self.is_failure = is_failure
+        self.breaker = CircuitBreaker(name, policy)
+        self._slots = asyncio.Semaphore(policy.max_concurrent)
+
+    @asynccontextmanager
+    async def guard(self):
+        """
+        Runs the body as one call to the dependency, bounded by `timeout_seconds` when set.
+
+        Raises:
+            DependencyUnavailableError: the breaker is open; the body does not run.
+            DependencyBusyError: no bulkhead slot within `max_wait_seconds`; the body does not run.
+        """
+        try:
+            probe = self.breaker.acquire()
+        except DependencyUnavailableError:
+            DEPENDENCY_CALLS.inc(dependency=self.name, outcome="rejected_open")
+            raise
+        try:
+            await self._acquire_slot()
+        except BaseException:
+            if probe:
+                self.breaker.release_probe()
+            raise
+
+        DEPENDENCY_IN_FLIGHT.inc(dependency=self.name)
+        started = time.monotonic()
+        try:
+            async with timeout_after(self.policy.timeout_seconds):
+                yield
+        except asyncio.CancelledError:
+            #NOTE: The caller went away (client disconnect, shutdown); says nothing about the dependency
+            if probe:
+                self.breaker.release_probe()
+            raise
+        except Exception as e:
+            failure = self.is_failure(e)
+            self._record(probe, failure, time.monotonic() - started)
+            raise
+        else:
+            self._record(probe, False, time.monotonic() - started)
+        finally:
+            DEPENDENCY_IN_FLIGHT.dec(dependency=self.name)
+            self._slots.release()
+
+    async def _acquire_slot(self):
+        if self._slots.locked() and self.policy.max_wait_seconds <= 0:
+            DEPENDENCY_CALLS.inc(dependency=self.name, outcome="rejected_busy")
+            raise DependencyBusyError(self.name)
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.policy.max_wait_seconds or None)
+        except asyncio.TimeoutError:
+            DEPENDENCY_CALLS.inc(dependency=self.name, outcome="rejected_busy")
+            raise DependencyBusyError(self.name)
+
+    def _record(self, probe: bool, failure: bool, duration: float):
+        self.breaker.record(probe, failure, duration)
+        DEPENDENCY_CALL_SECONDS.observe(duration, dependency=self.name)
+        DEPENDENCY_CALLS.inc(dependency=self.name, outcome="failure" if failure else "success")
+
+
+@asynccontextmanager
+async def timeout_after(seconds: float | None):
+    """
+    Cancels the body after `seconds` and raises `asyncio.TimeoutError` instead, like
+    `asyncio.timeout` (Python 3.11+) on the Python 3.10 of the Playwright image.
+
+    `asyncio.wait_for` only bounds a single awaitable, not the body of `Dependency.guard`.
+    """
+    if seconds is None:
+        yield
+        return
+
+    task = asyncio.current_task()
+    expired = False
+
+    def expire():
+        nonlocal expired
+        expired = True
+        task.cancel()
+
+    handle = asyncio.get_running_loop().call_later(seconds, expire)
+    try:
+        yield
+    except asyncio.CancelledError:
+        if expired:
+            raise asyncio.TimeoutError() from None
+        raise
+    finally:
+        handle.cancel()
+
+
+class GuardedChatModel:
+    """
+    Wraps a LangChain chat model so every `ainvoke` runs inside the provider's guard.
+    """
+
+    def __init__(self, llm, dependency: Dependency):
+        self.llm = llm
+        self.dependency = dependency
+
+    async def ainvoke(self, *args, **kwargs):
+        async with self.dependency.guard():
+            return await self.llm.ainvoke(*args, **kwargs)
+
+
+class GuardedEmbeddings:
+    """
+    Wraps a LangChain embeddings model so every call runs inside the provider's guard.
+    """
+
+    def __init__(self, embeddings, dependency: Dependency):
+        self.embeddings = embeddings
+        self.dependency = dependency
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        async with self.dependency.guard():
+            return await self.embeddings.aembed_documents(texts)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        async with self.dependency.guard():
+            return await self.embeddings.aembed_query(text)
+
+
+_dependencies: dict[str, Dependency] = {}
+
+
+def get_dependency(name: str) -> Dependency:
+    """
+    Returns the worker's guard for a dependency, creating it on first use. Names of the
+    form `llm:<provider>` fall back to the `llm` policy.
+    """
+    dependency = _dependencies.get(name)
+    if dependency is None:
+        config = DEPENDENCY_POLICIES.get(name, DEPENDENCY_POLICIES.get(name.split(":", 1)[0], {}))
+        dependency = _dependencies[name] = Dependency(name, DependencyPolicy.from_config(config, default_policy_config()))
+    return dependency
+
+
+def llm_dependency_name(model: str) -> str:
+    """
+    Returns `llm:<provider>` for a model in `provider:model` form.
+    """
+    provider, separator, _ = model.partition(":")
+    return f"llm:{provider}" if separator else "llm"
@@ -0,0 +1,35 @@
+"""
+Response classes serializing with orjson instead of the standard library.
+"""
+import uuid
+from typing import Any
+
+import orjson
+from pydantic import BaseModel
+from fastapi.responses import ORJSONResponse
+
+
+def _default(value: Any) -> Any:
+    #NOTE: orjson only encodes exact `uuid.UUID`; asyncpg returns its own subclass
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class PydanticResponse(ORJSONResponse):
+    """
+    Renders a pydantic model with orjson straight from `model_dump()`.
+
+    Returning a model from an endpoint makes FastAPI validate it again, dump it to
+    JSON-compatible values (datetimes and UUIDs become strings) and then encode the
+    result. Returning `PydanticResponse(model)` skips the re-validation and lets orjson
+    encode native values directly, which matters for deck payloads with many long
+    `code` strings. Keep `response_model=` on the route so the OpenAPI schema is
+    unchanged; it is not applied to `Response` return values.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            #NOTE: OPT_UTC_Z matches pydantic's "Z" suffix for UTC datetimes
+            return orjson.dumps(content.model_dump(), default=_default, option=orjson.OPT_UTC_Z)
+        return super().render(content)
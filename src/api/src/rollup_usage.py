@@ -0,0 +1,50 @@
+"""
+Roll up LLM usage per user, model and hour, and charge it against credit balances. Run
+from the `src` directory, hourly (a few minutes past the hour):
+
+```
+python -m api.src.rollup_usage
+python -m api.src.rollup_usage --lookback-hours 72 --skip-prune
+```
+
+Recomputes the closed hours of the last `--lookback-hours` from `usage_events`, charges
+each user the credits not yet charged for them, then deletes events older than
+`USAGE_EVENT_RETENTION_DAYS`. Running it twice charges nothing twice. Prints a summary
+as JSON.
+"""
+import json
+import asyncio
+import argparse
+
+from api.src.settings import settings
+
+
+async def rollup(args) -> str:
+    import common.database as database
+    from api.src.usage_metering import prune_usage_events, rollup_and_charge
+
+    database.init_async_db()
+    try:
+        async with database.async_session_local() as db:
+            summary = await rollup_and_charge(db, lookback_hours=args.lookback_hours)
+            summary["events_pruned"] = 0
+            if not args.skip_prune:
+                summary["events_pruned"] = await prune_usage_events(
+                    db,
+                    retention_days=settings.USAGE_EVENT_RETENTION_DAYS,
+                    lookback_hours=args.lookback_hours
+                )
+    finally:
+        await database.close_async_db()
+    return json.dumps(summary, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lookback-hours", type=int, default=settings.USAGE_ROLLUP_LOOKBACK_HOURS)
+    parser.add_argument("--skip-prune", action="store_true")
+    print(asyncio.run(rollup(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,18 @@ from fastapi import APIRouter
 from api.src.api_components.token_validator import routers as token_validator_router
 from api.src.api_components.billing import routers as billing_router
 from api.src.api_components.update_user_profile import routers as update_user_profile_router
+from api.src.api_components.slide_generation import routers as slide_generation_router
+from api.src.api_components.document_ingestion import routers as document_ingestion_router
+from api.src.api_components.presentation_export import routers as presentation_export_router
+from api.src.api_components.slide_rendering import routers as slide_rendering_router
+from api.src.api_components.conversation import routers as conversation_router
+from api.src.api_components.jobs import routers as jobs_router
+from api.src.api_components.health import routers as health_router
+from api.src.api_components.user_provisioning import routers as user_provisioning_router
+from api.src.api_components.presentation_revisions import routers as presentation_revisions_router
+from api.src.api_components.assets import routers as assets_router
+from api.src.api_components.presentation_search import routers as presentation_search_router
+from api.src.api_components.notifications import routers as notifications_router
 
 
 router = APIRouter()
@@ -11,6 +23,18 @@ router = APIRouter()
 router.include_router(token_validator_router.router)
 router.include_router(billing_router.router)
 router.include_router(update_user_profile_router.router)
+router.include_router(slide_generation_router.router)
+router.include_router(document_ingestion_router.router)
+router.include_router(presentation_export_router.router)
+router.include_router(slide_rendering_router.router)
+router.include_router(conversation_router.router)
+router.include_router(jobs_router.router)
+router.include_router(health_router.router)
+router.include_router(user_provisioning_router.router)
+router.include_router(presentation_revisions_router.router)
+router.include_router(assets_router.router)
+router.include_router(presentation_search_router.router)
+router.include_router(notifications_router.router)
 
 
 # Import endpoint functions from component routers
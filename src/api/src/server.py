@@ -0,0 +1,127 @@
+"""
+Production server. Run from the `src` directory:
+
+```
+python -m api.src.server
+python -m api.src.server --workers 8 --preload
+```
+
+Workers run uvicorn with uvloop and httptools. Worker count, keep-alive, backlog and the
+graceful shutdown timeout come from the `SERVER_*` settings.
+
+Without preload, uvicorn spawns the workers and each one imports the app itself. With
+`--preload` (`SERVER_PRELOAD`), the app is imported once in this process and workers are
+forked from it, so the imported modules are shared copy-on-write instead of loaded once
+per worker. The app opens no connections at import time (see `api.src.lifespan`), which is
+what makes forking it safe. Crashed workers are replaced; SIGTERM/SIGINT are forwarded to
+all workers, which stop accepting, finish in-flight requests and dispose of their pools.
+"""
+import os
+import gc
+import time
+import signal
+import argparse
+
+import uvicorn
+from loguru import logger
+
+from api.src.settings import settings
+
+APP_IMPORT_PATH = "api.src.api_service_layer_main:app"
+
+
+def server_options(args) -> dict:
+    return {
+        "host": args.host,
+        "port": args.port,
+        "loop": "uvloop",
+        "http": "httptools",
+        "lifespan": "on",
+        "timeout_keep_alive": settings.SERVER_KEEP_ALIVE_SECONDS,
+        "timeout_graceful_shutdown": settings.SERVER_GRACEFUL_SHUTDOWN_SECONDS,
+        "backlog": settings.SERVER_BACKLOG,
+        "proxy_headers": True,
+        "access_log": False,
+    }
+
+
+def _run_forked_worker(config: uvicorn.Config, sock):
+    #NOTE: Restore default handlers inherited from the master; uvicorn installs its own
+    for signal_number in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signal_number, signal.SIG_DFL)
+    try:
+        uvicorn.Server(config).run(sockets=[sock])
+        os._exit(0)
+    except BaseException:
+        logger.exception("Worker exited with an error")
+        os._exit(1)
+
+
+def serve_preloaded(args):
+    from api.src.api_service_layer_main import app
+
+    config = uvicorn.Config(app, **server_options(args))
+    sock = config.bind_socket()
+
+    #NOTE: Moves everything imported so far out of the collector's reach, so collections in workers do not touch (and copy) those pages
+    gc.freeze()
+
+    workers: set[int] = set()
+    stopping = False
+
+    def spawn_worker():
+        pid = os.fork()
+        if pid == 0:
+            _run_forked_worker(config, sock)
+        workers.add(pid)
+
+    def stop(signal_number, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for _ in range(args.workers):
+        spawn_worker()
+    logger.info(f"Serving on {args.host}:{args.port} with {args.workers} preloaded workers")
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        workers.discard(pid)
+        if not stopping:
+            logger.warning(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}, starting a replacement")
+            time.sleep(1)
+            spawn_worker()
+
+    sock.close()
+    logger.info("All workers stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=settings.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=settings.SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=settings.SERVER_WORKERS or os.cpu_count())
+    parser.add_argument("--preload", action=argparse.BooleanOptionalAction, default=settings.SERVER_PRELOAD)
+    args = parser.parse_args()
+
+    if args.preload:
+        serve_preloaded(args)
+        return
+
+    uvicorn.run(APP_IMPORT_PATH, workers=args.workers, **server_options(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Write the SSM parameters of the current `ENV` to a JSON file, for serverless deployments.
+Run from the `src` directory when packaging the Lambda function, with SSM access:
+
+```
+python -m api.src.settings_snapshot --output build/settings.json
+```
+
+Deploy the file with the function and point `SETTINGS_SNAPSHOT_PATH` at it. Cold starts
+then read the file instead of creating an SSM client and paging through the parameters.
+The file holds the decrypted secrets, so it is written readable by its owner only; keep
+it out of version control and out of build caches. Changes in SSM apply on the next deploy.
+"""
+import os
+import json
+import argparse
+
+from api.src.settings import Settings, SSMSettingsSource
+
+
+def write_snapshot(path: str) -> int:
+    source = SSMSettingsSource(Settings)
+    parameters = source.fetch_parameters()
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temporary_path = f"{path}.tmp"
+    file_descriptor = os.open(temporary_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(file_descriptor, "w") as snapshot_file:
+        json.dump({"env": source.env, "parameters": parameters}, snapshot_file, indent=2, sort_keys=True)
+    os.replace(temporary_path, path)
+    return len(parameters)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", required=True, help="Path of the snapshot file")
+    args = parser.parse_args()
+    count = write_snapshot(args.output)
+    print(json.dumps({"output": args.output, "parameters": count}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
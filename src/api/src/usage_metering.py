@@ -0,0 +1,346 @@
+"""
+LLM usage metering and credit charging.
+
+1. **Capture**: every chat model built by `create_generation_llm` is wrapped in
+   `MeteredChatModel`, which reads the provider's token counts from each response and
+   prices them with `LLM_CREDIT_RATES`, prompt cache reads and writes at their own rates. Usage is attributed to the user set with
+   `usage_user(...)` around the call (routes and jobs do this), or to nobody.
+2. **Buffer**: recording appends a tuple to the worker's `UsageRecorder`; no database
+   work happens on the request path. The recorder writes its buffer to `usage_events`
+   with one `COPY` every `USAGE_FLUSH_INTERVAL_SECONDS`, or sooner once
+   `USAGE_FLUSH_BATCH_SIZE` events are waiting. A failed write keeps the events for the
+   next attempt, and shutdown writes whatever is left.
+3. **Roll up and charge**: `rollup_and_charge` (run hourly by `api.src.rollup_usage`)
+   sums closed hours into `usage_rollups` per user and model, then takes the credits
+   not yet charged for each row from `users.credits_balance` and pushes the new balance
+   to the user's event streams. Recent hours are recomputed on every run, so events
+   that arrive late are still charged.
+"""
+import time
+import asyncio
+import functools
+
+from loguru import logger
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+import common.database as database
+from api.src.metrics import REGISTRY
+from api.src.settings import settings
+from api.src.globals import LLM_CREDIT_RATES
+from api.src.utils import extract_token_usage
+from api.src.api_components.notifications.notifications import USER_EVENTS_CHANNEL
+
+MICROCREDITS_PER_CREDIT = 1_000_000
+ROLLUP_LOCK_KEY = "usage_rollup"
+
+USAGE_EVENT_COLUMNS = ["user_id", "model", "input_tokens", "output_tokens", "cost_microcredits", "created_at"]
+
+USAGE_TOKENS = REGISTRY.counter(
+    "llm_usage_tokens_total",
+    "Tokens reported by LLM responses by model and direction",
+    ("model", "direction")
+)
+PROMPT_CACHE_TOKENS = REGISTRY.counter(
+    "llm_prompt_cache_tokens_total",
+    "Input tokens by prompt stage and cache outcome: read, write or uncached",
+    ("stage", "outcome")
+)
+USAGE_UNREPORTED = REGISTRY.counter(
+    "llm_usage_unreported_total",
+    "LLM responses without token counts, which are not charged",
+    ("model",)
+)
+USAGE_EVENTS_WRITTEN = REGISTRY.counter(
+    "usage_events_written_total",
+    "Usage events written to the database by this worker"
+)
+USAGE_EVENTS_DROPPED = REGISTRY.counter(
+    "usage_events_dropped_total",
+    "Usage events dropped because the buffer was full or the final write failed"
+)
+USAGE_EVENTS_BUFFERED = REGISTRY.gauge(
+    "usage_events_buffered",
+    "Usage events waiting to be written"
+)
+USAGE_FLUSH_SECONDS = REGISTRY.histogram(
+    "usage_flush_seconds",
+    "Duration of a usage event write"
+)
+
+_usage_user: ContextVar = ContextVar("usage_user", default=None)
+
+#NOTE: Recomputes every closed hour in the window; unchanged rows are left alone
+ROLLUP_USAGE_SQL = text("""
+INSERT INTO usage_rollups AS r (user_id, model, hour, calls, input_tokens, output_tokens, cost_microcredits, credits_charged, updated_at)
+SELECT user_id, model, date_trunc('hour', created_at, 'UTC'), count(*), sum(input_tokens), sum(output_tokens), sum(cost_microcredits), 0, now()
+FROM usage_events
+WHERE user_id IS NOT NULL AND created_at >= :since AND created_at < :until
+GROUP BY 1, 2, 3
+ON CONFLICT (user_id, model, hour) DO UPDATE SET
+    calls = EXCLUDED.calls,
+    input_tokens = EXCLUDED.input_tokens,
+    output_tokens = EXCLUDED.output_tokens,
+    cost_microcredits = EXCLUDED.cost_microcredits,
+    updated_at = EXCLUDED.updated_at
+WHERE (r.calls, r.cost_microcredits) IS DISTINCT FROM (EXCLUDED.calls, EXCLUDED.cost_microcredits)
+""")
+
+#NOTE: Each row is charged whole credits, rounded up, minus what it was already charged;
+# the notification carries the new balance and is delivered on commit
+CHARGE_USAGE_SQL = text("""
+WITH due AS (
+    SELECT user_id, model, hour, ceil(cost_microcredits::numeric / :per_credit)::integer - credits_charged AS credits
+    FROM usage_rollups
+    WHERE hour >= :since AND ceil(cost_microcredits::numeric / :per_credit)::integer > credits_charged
+),
+marked AS (
+    UPDATE usage_rollups r
+    SET credits_charged = r.credits_charged + due.credits
+    FROM due
+    WHERE r.user_id = due.user_id AND r.model = due.model AND r.hour = due.hour
+),
+totals AS (
+    SELECT user_id, sum(credits)::integer AS credits FROM due GROUP BY user_id
+),
+charged AS (
+    UPDATE users u
+    SET credits_balance = coalesce(u.credits_balance, 0) - totals.credits
+    FROM totals
+    WHERE u.id = totals.user_id
+    RETURNING u.id, totals.credits
+)
+SELECT
+    credits,
+    pg_notify(:channel, json_build_object('user_id', id, 'fields', json_build_array('credits_balance'))::text)
+FROM charged
+""")
+
+PRUNE_USAGE_EVENTS_SQL = text("DELETE FROM usage_events WHERE created_at < :before")
+
+
+# ===============
+# Capture
+# ===============
+
+@contextmanager
+def usage_user(user_id):
+    """
+    Attributes LLM usage inside the block, including tasks it starts, to `user_id`.
+    """
+    token = _usage_user.set(user_id)
+    try:
+        yield
+    finally:
+        _usage_user.reset(token)
+
+
+def price_usage(model: str, input_tokens: int, output_tokens: int, cache_read_tokens: int = 0, cache_write_tokens: int = 0) -> int:
+    """
+    Returns the cost in microcredits; rates are credits per million tokens. `input_tokens`
+    includes the cached ones, which are priced at the cache rates instead.
+    """
+    rates = LLM_CREDIT_RATES.get(model, LLM_CREDIT_RATES["default"])
+    uncached_tokens = max(input_tokens - cache_read_tokens - cache_write_tokens, 0)
+    return (
+        uncached_tokens * rates["input"]
+        + cache_read_tokens * rates.get("cache_read", rates["input"])
+        + cache_write_tokens * rates.get("cache_write", rates["input"])
+        + output_tokens * rates["output"]
+    )
+
+
+def record_llm_usage(model: str, response, stage: str = "unknown"):
+    usage = extract_token_usage(response)
+    if usage is None:
+        USAGE_UNREPORTED.inc(model=model)
+        return
+
+    USAGE_TOKENS.inc(usage.input_tokens, model=model, direction="input")
+    USAGE_TOKENS.inc(usage.output_tokens, model=model, direction="output")
+    PROMPT_CACHE_TOKENS.inc(usage.cache_read_tokens, stage=stage, outcome="read")
+    PROMPT_CACHE_TOKENS.inc(usage.cache_write_tokens, stage=stage, outcome="write")
+    PROMPT_CACHE_TOKENS.inc(usage.input_tokens - usage.cache_read_tokens - usage.cache_write_tokens, stage=stage, outcome="uncached")
+    get_usage_recorder().record((
+        _usage_user.get(),
+        model,
+        usage.input_tokens,
+        usage.output_tokens,
+        price_usage(model, *usage),
+        datetime.now(timezone.utc),
+    ))
+
+
+class MeteredChatModel:
+    """
+    Wraps a chat model so the token usage of every `ainvoke` is recorded. Callers name
+    the prompt's `stage` (`PromptTemplate.stage`) to break prompt cache hits down by it.
+    """
+
+    def __init__(self, llm, model: str):
+        self.llm = llm
+        self.model = model
+
+    async def ainvoke(self, *args, stage: str = "unknown", **kwargs):
+        response = await self.llm.ainvoke(*args, **kwargs)
+        record_llm_usage(self.model, response, stage=stage)
+        return response
+
+
+# ===============
+# Buffer
+# ===============
+
+class UsageRecorder:
+    """
+    Buffers usage events in memory and writes them to `usage_events` in batches.
+
+    `record` only appends, so it costs the request nothing. `run` writes the buffer
+    periodically until `stop`; `close` writes what is left. While writes fail, events
+    stay buffered up to `max_buffered`, after which the oldest are dropped. Writes go
+    through `engine`, or the worker's primary engine when it is not given.
+    """
+
+    def __init__(self, flush_interval: float, flush_size: int, max_buffered: int, engine: AsyncEngine | None = None):
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.max_buffered = max_buffered
+        self.engine = engine
+
+        self._buffer: list[tuple] = []
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._stopped = False
+
+    @property
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    def record(self, event: tuple):
+        self._buffer.append(event)
+        if len(self._buffer) > self.max_buffered:
+            self._drop_oldest()
+        USAGE_EVENTS_BUFFERED.set(len(self._buffer))
+        if len(self._buffer) >= self.flush_size:
+            self._wakeup.set()
+
+    async def run(self):
+        while not self._stopped:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def stop(self):
+        self._stopped = True
+        self._wakeup.set()
+
+    async def close(self):
+        """
+        Stops the periodic writes and writes the remaining events.
+        """
+        self.stop()
+        if not await self.flush():
+            USAGE_EVENTS_DROPPED.inc(len(self._buffer))
+            logger.error(f"Lost {len(self._buffer)} usage events at shutdown")
+            self._buffer = []
+
+    async def flush(self) -> bool:
+        """
+        Writes every buffered event with one `COPY`. Returns False if the write failed;
+        the events are then kept for the next attempt.
+        """
+        async with self._flush_lock:
+            if not self._buffer:
+                return True
+
+            batch, self._buffer = self._buffer, []
+            started = time.perf_counter()
+            try:
+                await self._copy(batch)
+            except Exception as e:
+                #NOTE: Events recorded during the failed write are newer, so the batch goes in front
+                self._buffer[:0] = batch
+                if len(self._buffer) > self.max_buffered:
+                    self._drop_oldest()
+                logger.warning(f"Could not write {len(batch)} usage events, keeping them buffered: {e}")
+                return False
+            finally:
+                USAGE_EVENTS_BUFFERED.set(len(self._buffer))
+
+            USAGE_FLUSH_SECONDS.observe(time.perf_counter() - started)
+            USAGE_EVENTS_WRITTEN.inc(len(batch))
+            return True
+
+    async def _copy(self, batch: list[tuple]):
+        async with (self.engine or database.async_engine).connect() as connection:
+            raw_connection = await connection.get_raw_connection()
+            #NOTE: A COPY is atomic on its own: either the whole batch is written or none of it
+            await raw_connection.driver_connection.copy_records_to_table(
+                "usage_events",
+                records=batch,
+                columns=USAGE_EVENT_COLUMNS
+            )
+
+    def _drop_oldest(self):
+        dropped = len(self._buffer) - self.max_buffered
+        del self._buffer[:dropped]
+        USAGE_EVENTS_DROPPED.inc(dropped)
+        logger.error(f"Usage buffer full, dropped the {dropped} oldest events")
+
+
+@functools.lru_cache(maxsize=1)
+def get_usage_recorder() -> UsageRecorder:
+    return UsageRecorder(
+        flush_interval=settings.USAGE_FLUSH_INTERVAL_SECONDS,
+        flush_size=settings.USAGE_FLUSH_BATCH_SIZE,
+        max_buffered=settings.USAGE_MAX_BUFFERED_EVENTS
+    )
+
+
+# ===============
+# Roll Up & Charge
+# ===============
+
+async def rollup_and_charge(db: AsyncSession, lookback_hours: int, now: datetime | None = None) -> dict:
+    """
+    Rolls up the closed hours of the last `lookback_hours` and charges their unpaid credits,
+    in one transaction. Concurrent runs wait for each other instead of charging twice.
+    """
+    now = now or datetime.now(timezone.utc)
+    until = now.replace(minute=0, second=0, microsecond=0)
+    since = until - timedelta(hours=lookback_hours)
+
+    await db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": ROLLUP_LOCK_KEY})
+    rows_updated = (await db.execute(ROLLUP_USAGE_SQL, {"since": since, "until": until})).rowcount
+    charges = (await db.execute(CHARGE_USAGE_SQL, {
+        "since": since,
+        "per_credit": MICROCREDITS_PER_CREDIT,
+        "channel": USER_EVENTS_CHANNEL,
+    })).all()
+    await db.commit()
+
+    return {
+        "since": since.isoformat(),
+        "until": until.isoformat(),
+        "rollup_rows_updated": rows_updated,
+        "users_charged": len(charges),
+        "credits_charged": sum(credits for credits, _ in charges),
+    }
+
+
+async def prune_usage_events(db: AsyncSession, retention_days: int, lookback_hours: int) -> int:
+    """
+    Deletes raw events older than `retention_days`; their hourly rollups are kept.
+    Events the rollup still recomputes are never deleted, or their rows would shrink.
+    """
+    now = datetime.now(timezone.utc)
+    before = min(now - timedelta(days=retention_days), now - timedelta(hours=lookback_hours + 1))
+    deleted = (await db.execute(PRUNE_USAGE_EVENTS_SQL, {"before": before})).rowcount
+    await db.commit()
+    return deleted
@@ -1,9 +1,11 @@
+import os
+import time
 import traceback
 import functools
 import asyncio
 
 from loguru import logger
-from typing import List
+from typing import List, NamedTuple
 from langchain_core.messages import HumanMessage, AIMessage, BaseMessage
 
 
@@ -13,10 +15,12 @@ from langchain_core.messages import HumanMessage, AIMessage, BaseMessage
 
 class ExceptionWithErrorType(Exception):
     """
-    Custom exception class with error type information
+    Custom exception class with error type information.
+    `status_code` is the HTTP status returned when the exception reaches the API exception handler.
     """
-    def __init__(self, message: str, error_type: str):
+    def __init__(self, message: str, error_type: str, status_code: int = 500):
         self.error_type = error_type
+        self.status_code = status_code
         super().__init__(message)
 
 
@@ -112,4 +116,116 @@ def extract_text_from_response(response, context: str = "unknown") -> str:
     except Exception as e:
         error_traceback = traceback.format_exc()
         logger.error(f"Failed to parse model response in '{context}': {e}\n{error_traceback}")
-        raise ValueError(f"Critical failure parsing AI model response in stage: {context}")
\ No newline at end of file
+        raise ValueError(f"Critical failure parsing AI model response in stage: {context}")
+
+
+class TokenUsage(NamedTuple):
+    """Token counts of one model response. `input_tokens` includes the cached ones."""
+    input_tokens: int
+    output_tokens: int
+    cache_read_tokens: int = 0
+    cache_write_tokens: int = 0
+
+
+def extract_token_usage(response) -> TokenUsage | None:
+    """Extract token counts, including prompt cache reads and writes, from a LangChain model response.
+
+    Args:
+        response: The response object from a LangChain model invocation.
+    Returns:
+        TokenUsage | None: The token counts, or None if the provider reported no usage.
+    """
+    usage = getattr(response, "usage_metadata", None)
+    if usage:
+        details = usage.get("input_token_details") or {}
+        return TokenUsage(
+            input_tokens=int(usage.get("input_tokens") or 0),
+            output_tokens=int(usage.get("output_tokens") or 0),
+            cache_read_tokens=int(details.get("cache_read") or 0),
+            cache_write_tokens=int(details.get("cache_creation") or 0)
+        )
+
+    #NOTE: Older provider integrations only report usage in the raw response metadata
+    metadata = getattr(response, "response_metadata", None) or {}
+    usage = metadata.get("usage") or metadata.get("token_usage")
+    if usage:
+        if "prompt_tokens" in usage:
+            #NOTE: OpenAI counts cached tokens within `prompt_tokens`
+            cache_read = (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+            return TokenUsage(int(usage["prompt_tokens"] or 0), int(usage.get("completion_tokens") or 0), int(cache_read))
+
+        #NOTE: Anthropic counts cached tokens apart from `input_tokens`
+        cache_read = int(usage.get("cache_read_input_tokens") or 0)
+        cache_write = int(usage.get("cache_creation_input_tokens") or 0)
+        return TokenUsage(
+            input_tokens=int(usage.get("input_tokens") or 0) + cache_read + cache_write,
+            output_tokens=int(usage.get("output_tokens") or 0),
+            cache_read_tokens=cache_read,
+            cache_write_tokens=cache_write
+        )
+    return None
+
+
+# ===============
+# Disk Cache Pruning
+# ===============
+
+#NOTE: Writes rename their temporary files within seconds; older ones were left by interrupted writes
+STALE_TEMP_FILE_SECONDS = 3600
+
+
+def prune_cache_directory(
+    directory: str,
+    suffix: str,
+    max_bytes: int,
+    max_age_seconds: float,
+    keep: str | None = None
+) -> int:
+    """
+    Removes cache entries, the `*<suffix>` files of `directory`, unused for `max_age_seconds`,
+    then the least recently used ones until the entries take at most `max_bytes`. An entry's
+    mtime is when it was last used, so readers touch entries they serve.
+    The entry named `keep`, just written, stays even if it alone is over `max_bytes`.
+    Also removes `.tmp` files left by interrupted writes. Returns the number of entries removed.
+    """
+    now = time.time()
+    entries, total = [], 0
+    for entry in os.scandir(directory):
+        #NOTE: Other workers prune the same directory, so a file can vanish between listing and stat
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        if entry.name.endswith(".tmp"):
+            if now - stat.st_mtime > STALE_TEMP_FILE_SECONDS:
+                _remove_quietly(entry.path)
+        elif entry.name.endswith(suffix):
+            total += stat.st_size
+            if entry.name != keep:
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    removed = 0
+    for used_at, size, path in sorted(entries):
+        if total <= max_bytes and now - used_at <= max_age_seconds:
+            break
+        _remove_quietly(path)
+        total -= size
+        removed += 1
+    return removed
+
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def touch_file_quietly(path: str):
+    """
+    Marks a cache entry as used. It may already have been pruned by another worker.
+    """
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
@@ -1,11 +1,15 @@
 import os
+from fastapi import Depends
 from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.ext.asyncio import async_sessionmaker
 
+from common.read_replicas import ReplicaRouter
 from api.src.settings import settings
+from api.src.api_components.token_validator.token_validator import validate_token
 
 Base = declarative_base()
 
@@ -15,6 +19,23 @@ sync_session_local = None
 async_engine = None
 async_session_local = None
 
+replica_router = None
+
+def pool_options(pool_size: int, max_overflow: int, pool_timeout: float | None = None) -> dict:
+    """
+    Pool arguments for an engine. In serverless mode every container serves one request at
+    a time, so large pools only multiply connections on scale-out.
+    """
+    if settings.SERVERLESS and settings.SERVERLESS_DATABASE_POOL == "null":
+        return {"poolclass": NullPool}
+
+    options = {"pool_size": pool_size, "max_overflow": max_overflow}
+    if settings.SERVERLESS:
+        options.update(pool_size=1, max_overflow=min(max_overflow, settings.SERVERLESS_DATABASE_MAX_OVERFLOW))
+    if pool_timeout is not None:
+        options["pool_timeout"] = pool_timeout
+    return options
+
 def init_db():
     """
     Initialize the database connection and session factory.
@@ -27,8 +48,7 @@ def init_db():
     sync_engine = create_engine(
         DATABASE_URL, 
         pool_pre_ping=True,
-        pool_size=20,
-        max_overflow=10
+        **pool_options(pool_size=20, max_overflow=10)
     )
 
     sync_session_local = sessionmaker(autocommit=False, autoflush=False, bind=sync_engine)
@@ -38,15 +58,14 @@ def init_async_db():
     Initialize the asynchronous database connection and session factory.
     """
 
-    global async_engine, async_session_local
+    global async_engine, async_session_local, replica_router
 
     ASYNC_DATABASE_URL = settings.ASYNC_DATABASE_URL
 
     async_engine = create_async_engine(
         ASYNC_DATABASE_URL,
         pool_pre_ping=True,
-        pool_size=20,
-        max_overflow=10,
+        **pool_options(pool_size=20, max_overflow=10),
         connect_args={"statement_cache_size": 0}
     )
 
@@ -56,6 +75,52 @@ def init_async_db():
         expire_on_commit=False
     )
 
+    replica_engines = [
+        create_async_engine(
+            url,
+            pool_pre_ping=True,
+            **pool_options(pool_size=settings.DATABASE_REPLICA_POOL_SIZE, max_overflow=settings.DATABASE_REPLICA_MAX_OVERFLOW),
+            connect_args={"statement_cache_size": 0}
+        )
+        for url in settings.ASYNC_DATABASE_REPLICA_URLS
+    ]
+    replica_router = ReplicaRouter(
+        async_engine,
+        replica_engines,
+        listen_dsn=settings.DATABASE_URL,
+        max_lag=settings.DATABASE_REPLICA_MAX_LAG_SECONDS,
+        check_interval=settings.DATABASE_REPLICA_LAG_CHECK_INTERVAL_SECONDS,
+        sticky_seconds=settings.DATABASE_READ_YOUR_WRITES_SECONDS
+    )
+
+def close_db():
+    """
+    Dispose of the synchronous engine's pooled connections.
+    """
+
+    global sync_engine, sync_session_local
+
+    if sync_engine is not None:
+        sync_engine.dispose()
+        sync_engine = None
+        sync_session_local = None
+
+async def close_async_db():
+    """
+    Dispose of the asynchronous engine's pooled connections.
+    """
+
+    global async_engine, async_session_local, replica_router
+
+    if replica_router is not None:
+        await replica_router.close()
+        replica_router = None
+
+    if async_engine is not None:
+        await async_engine.dispose()
+        async_engine = None
+        async_session_local = None
+
 def get_db():
     if sync_session_local is None:
         #NOTE: Fix this error later by adding correct error type
@@ -72,4 +137,27 @@ async def get_async_db():
         #NOTE: Fix this error later by adding correct error type
         raise ValueError("Database not initialized. Call init_async_db() first.")
     async with async_session_local() as db:
-            yield db
\ No newline at end of file
+            yield db
+
+async def get_async_read_db(token_payload: dict = Depends(validate_token)):
+    """
+    Session for read-only routes: a read replica with acceptable lag, or the primary.
+    The caller's own writes marked with `mark_write` are always visible.
+    """
+    if async_session_local is None:
+        #NOTE: Fix this error later by adding correct error type
+        raise ValueError("Database not initialized. Call init_async_db() first.")
+    engine = replica_router.engine_for(token_payload.get("sub"))
+    async with async_session_local(bind=engine) as db:
+        yield db
+
+async def mark_write(db: AsyncSession, user_id):
+    """
+    Call after committing a write the user may read next, so their reads skip lagging replicas.
+    """
+    if replica_router is not None:
+        await replica_router.mark_write(db, str(user_id))
+
+def mark_write_sync(db: Session, user_id):
+    if replica_router is not None:
+        replica_router.mark_write_sync(db, str(user_id))
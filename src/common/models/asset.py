@@ -0,0 +1,38 @@
+import uuid
+from datetime import datetime
+from typing import Any, Optional
+from sqlalchemy import BigInteger, ForeignKey, Integer, String, DateTime, func
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+from common.database import Base
+
+
+class Asset(Base):
+    __tablename__ = "assets"
+
+    id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        default=uuid.uuid4,
+        server_default=func.gen_random_uuid()
+    )
+
+    # SHA-256 of the uploaded file; an identical upload returns the existing asset
+    sha256: Mapped[str] = mapped_column(String(64), unique=True, nullable=False)
+    content_type: Mapped[str] = mapped_column(String, nullable=False)
+    size_bytes: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    width: Mapped[int] = mapped_column(Integer, nullable=False)
+    height: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    # Object key of the original in the asset bucket
+    storage_key: Mapped[str] = mapped_column(String, nullable=False)
+    # Resized copies by name: {"thumbnail": {"key", "content_type", "width", "height", "size_bytes"}}
+    variants: Mapped[dict[str, Any]] = mapped_column(JSONB, nullable=False, default=dict)
+
+    # First uploader; later identical uploads share the asset
+    created_by: Mapped[Optional[uuid.UUID]] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False
+    )
@@ -0,0 +1,28 @@
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import Index, Integer, LargeBinary, String, DateTime, func
+from sqlalchemy.orm import Mapped, mapped_column
+from common.database import Base
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        # Pruning of expired keys
+        Index("ix_idempotency_keys_expires_at", "expires_at"),
+    )
+
+    # SHA-256 of "<scope>:<subject>:<client key>"
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    # SHA-256 of method, path and body; a reused key with a different request is rejected
+    request_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+
+    # Stored response; NULL status_code while the first request is still in progress
+    status_code: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    content_type: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    body: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True)
+
+    # An in-progress claim older than this was abandoned (crashed worker) and can be taken over
+    locked_until: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
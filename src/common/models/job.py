@@ -0,0 +1,66 @@
+import uuid
+from datetime import datetime
+from typing import Any, Optional
+from sqlalchemy import ForeignKey, Index, Integer, String, Text, DateTime, func, text
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+from common.database import Base
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+    __table_args__ = (
+        #NOTE: Claim order; partial so finished jobs do not bloat the index workers scan
+        Index(
+            "ix_jobs_claim_order",
+            text("priority DESC"), "run_after", "created_at",
+            postgresql_where=text("status = 'queued'")
+        ),
+        # Per-user concurrency caps count running jobs per user
+        Index("ix_jobs_running_user", "user_id", postgresql_where=text("status = 'running'")),
+        # Stale-job reclaim scans running jobs by heartbeat
+        Index("ix_jobs_running_heartbeat", "heartbeat_at", postgresql_where=text("status = 'running'")),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        default=uuid.uuid4,
+        server_default=func.gen_random_uuid()
+    )
+    user_id: Mapped[Optional[uuid.UUID]] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("users.id", ondelete="CASCADE"),
+        nullable=True
+    )
+
+    # Handler name, e.g. "slide_generation"
+    kind: Mapped[str] = mapped_column(String, nullable=False)
+    payload: Mapped[dict[str, Any]] = mapped_column(JSONB, nullable=False, default=dict)
+
+    # queued -> running -> succeeded/failed; failed attempts go back to queued until max_attempts
+    status: Mapped[str] = mapped_column(String, nullable=False, default="queued", server_default="queued")
+    # Higher runs first
+    priority: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    max_attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=3, server_default="3")
+
+    result: Mapped[Optional[dict[str, Any]]] = mapped_column(JSONB, nullable=True)
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+
+    # Worker currently holding the job and its last sign of life
+    locked_by: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    heartbeat_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    run_after: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False
+    )
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False
+    )
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,50 @@
+import uuid
+from datetime import datetime
+from typing import Any, Optional
+from sqlalchemy import ForeignKey, Index, String, Text, DateTime, func
+from sqlalchemy.dialects.postgresql import UUID, JSONB, TSVECTOR
+from sqlalchemy.orm import Mapped, mapped_column
+from common.database import Base
+
+
+class Presentation(Base):
+    __tablename__ = "presentations"
+    __table_args__ = (
+        Index("ix_presentations_search_vector", "search_vector", postgresql_using="gin"),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        default=uuid.uuid4,
+        server_default=func.gen_random_uuid()
+    )
+    user_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("users.id"),
+        index=True,
+        nullable=False
+    )
+
+    title: Mapped[str] = mapped_column(String, nullable=False, default="Untitled presentation")
+
+    # Slides in deck order, matching the frontend `SlideData {id, code}` shape
+    slides: Mapped[list[dict[str, Any]]] = mapped_column(JSONB, nullable=False, default=list)
+
+    # Visible slide text and its weighted tsvector (title A, slides B), written with the slides;
+    # deferred so loading a deck does not fetch them
+    search_text: Mapped[Optional[str]] = mapped_column(Text, nullable=True, deferred=True)
+    search_vector: Mapped[Optional[str]] = mapped_column(TSVECTOR, nullable=True, deferred=True)
+
+    # System Timestamps (Timestamptz)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False
+    )
@@ -0,0 +1,58 @@
+import uuid
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import ForeignKey, Index, Integer, LargeBinary, SmallInteger, String, DateTime, func
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
+from sqlalchemy.orm import Mapped, mapped_column
+from common.database import Base
+
+
+class SlideBlob(Base):
+    __tablename__ = "slide_blobs"
+    __table_args__ = (
+        # Garbage collection only deletes blobs no other blob is a delta against
+        Index("ix_slide_blobs_base_hash", "base_hash"),
+    )
+
+    # SHA-256 of the slide code; identical slides in any revision or deck share one row
+    hash: Mapped[bytes] = mapped_column(LargeBinary, primary_key=True)
+
+    # zlib-compressed code, or a compressed line delta against `base_hash`
+    data: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    base_hash: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True)
+    # Deltas to apply to reach this slide from a full copy; 0 for a full copy
+    depth: Mapped[int] = mapped_column(SmallInteger, nullable=False, default=0)
+    # Length of the uncompressed code
+    size: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    # Refreshed (at most every few minutes) whenever a new revision references the blob,
+    # so garbage collection never deletes a blob a revision is being committed with
+    referenced_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class PresentationRevision(Base):
+    __tablename__ = "presentation_revisions"
+    __table_args__ = (
+        # Garbage collection looks up whether any manifest still references a blob
+        Index("ix_presentation_revisions_slide_hashes", "slide_hashes", postgresql_using="gin"),
+    )
+
+    presentation_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("presentations.id", ondelete="CASCADE"),
+        primary_key=True
+    )
+    # 1, 2, 3, ... per presentation; the highest is the head
+    number: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+
+    # Manifest: slide IDs in deck order and the hash of each slide's code
+    title: Mapped[str] = mapped_column(String, nullable=False)
+    slide_ids: Mapped[list[str]] = mapped_column(ARRAY(String), nullable=False)
+    slide_hashes: Mapped[list[bytes]] = mapped_column(ARRAY(LargeBinary), nullable=False)
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False
+    )
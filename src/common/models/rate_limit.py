@@ -0,0 +1,18 @@
+from datetime import datetime
+from sqlalchemy import Boolean, String, DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+from common.database import Base
+
+
+class RateLimitBucket(Base):
+    __tablename__ = "rate_limit_buckets"
+    #NOTE: Unlogged: buckets are cheap to lose on a crash and skip WAL writes on every request
+    __table_args__ = {"prefixes": ["UNLOGGED"]}
+
+    # "<rule>:<subject>", e.g. "checkout:user:<uuid>"
+    key: Mapped[str] = mapped_column(String, primary_key=True)
+
+    # Theoretical arrival time of the next request (GCRA form of a token bucket)
+    tat: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    # Outcome of the last decision, returned by the same atomic upsert
+    admitted: Mapped[bool] = mapped_column(Boolean, nullable=False, default=True)
@@ -0,0 +1,51 @@
+import uuid
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import BigInteger, Identity, Index, Integer, String, DateTime, func
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+from common.database import Base
+
+
+class UsageEvent(Base):
+    __tablename__ = "usage_events"
+    __table_args__ = (
+        # Append-only and written in time order, so a BRIN index stays tiny and serves the hourly rollup's range scans
+        Index("ix_usage_events_created_at", "created_at", postgresql_using="brin"),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, Identity(), primary_key=True)
+
+    #NOTE: No foreign key: events outlive deleted users, and COPY skips a lookup per row
+    user_id: Mapped[Optional[uuid.UUID]] = mapped_column(UUID(as_uuid=True), nullable=True)
+    # Configured model in `provider:model` form
+    model: Mapped[str] = mapped_column(String, nullable=False)
+    input_tokens: Mapped[int] = mapped_column(Integer, nullable=False)
+    output_tokens: Mapped[int] = mapped_column(Integer, nullable=False)
+    # Priced when the call was made, in millionths of a credit
+    cost_microcredits: Mapped[int] = mapped_column(BigInteger, nullable=False)
+
+    # When the response arrived, not when the batch was flushed
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+
+
+class UsageRollup(Base):
+    __tablename__ = "usage_rollups"
+
+    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    model: Mapped[str] = mapped_column(String, primary_key=True)
+    # Start of the UTC hour
+    hour: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+
+    calls: Mapped[int] = mapped_column(Integer, nullable=False)
+    input_tokens: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    output_tokens: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    cost_microcredits: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    # Credits already taken from `users.credits_balance` for this row; late events charge the difference
+    credits_charged: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False
+    )
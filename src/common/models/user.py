@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime
 from typing import Optional, Any
-from sqlalchemy import ForeignKey, Integer, String, Boolean, DateTime, func, Enum as SAEnum
+from sqlalchemy import ForeignKey, Index, Integer, String, Boolean, DateTime, func, text, Enum as SAEnum
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import Mapped, mapped_column
 from common.database import Base
@@ -16,6 +16,10 @@ class UserType(str, enum.Enum):
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        #NOTE: Emails are unique regardless of case; writers store them lowercased and match on lower(email)
+        Index("ix_users_email_lower", text("lower(email)"), unique=True),
+    )
 
     # Primary Key (UUID)
     id: Mapped[uuid.UUID] = mapped_column(
@@ -0,0 +1,280 @@
+"""
+Routing of read-only sessions to Postgres read replicas.
+
+Replicas are used round-robin, but only while their measured replication lag is below
+`max_lag`; a replica that lags, fails its lag check or has not been measured yet gets
+no reads, and with no usable replica every read goes to the primary.
+
+Read-your-writes: after a write, `mark_write` records the primary's WAL position for the
+user and broadcasts it with `NOTIFY`, so every worker (on every host) sends that user's
+reads to the primary until a replica has replayed past that position, or at most
+`sticky_seconds`.
+"""
+import time
+import asyncio
+import itertools
+
+import asyncpg
+from loguru import logger
+from dataclasses import dataclass
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from api.src.metrics import REGISTRY
+
+READ_YOUR_WRITES_CHANNEL = "read_your_writes"
+
+#NOTE: An idle primary writes no WAL, so a replica that has replayed everything it received has no lag
+REPLICA_LAG_SQL = text("""
+SELECT
+    pg_is_in_recovery() AS in_recovery,
+    pg_wal_lsn_diff(pg_last_wal_replay_lsn(), '0/0')::bigint AS replay_lsn,
+    CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END AS lag_seconds
+""")
+
+#NOTE: Runs after the write committed, so the current WAL position is at or past its commit record
+MARK_WRITE_SQL = text("""
+WITH position AS (
+    SELECT CAST(:key AS text) || ' ' || pg_wal_lsn_diff(pg_current_wal_lsn(), '0/0')::bigint AS payload
+)
+SELECT payload, pg_notify(:channel, payload) FROM position
+""")
+
+REPLICA_LAG_SECONDS = REGISTRY.gauge(
+    "database_replica_lag_seconds",
+    "Last measured replication lag of a read replica",
+    ("replica",)
+)
+REPLICA_AVAILABLE = REGISTRY.gauge(
+    "database_replica_available",
+    "1 if a read replica currently receives reads",
+    ("replica",)
+)
+READ_ROUTING = REGISTRY.counter(
+    "database_read_routing_total",
+    "Read sessions by target: `replica`, or `primary` with the reason",
+    ("target",)
+)
+
+
+@dataclass
+class Replica:
+    name: str
+    engine: AsyncEngine
+    lag_seconds: float | None = None
+    replay_lsn: int = 0
+    available: bool = False
+
+
+class ReplicaRouter:
+    """
+    Chooses the engine for read-only sessions and keeps replica lag up to date.
+    """
+
+    def __init__(
+        self,
+        primary: AsyncEngine,
+        replicas: list[AsyncEngine],
+        listen_dsn: str | None = None,
+        max_lag: float = 5.0,
+        check_interval: float = 1.0,
+        check_timeout: float = 1.0,
+        sticky_seconds: float = 30.0,
+        max_sticky_keys: int = 100_000
+    ):
+        self.primary = primary
+        self.replicas = [
+            Replica(name=f"{engine.url.host}:{engine.url.port or 5432}", engine=engine)
+            for engine in replicas
+        ]
+        self.listen_dsn = listen_dsn
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.check_timeout = check_timeout
+        self.sticky_seconds = sticky_seconds
+        self.max_sticky_keys = max_sticky_keys
+
+        self._next = itertools.count()
+        self._sticky: dict[str, tuple[int, float]] = {}
+        self._stopped = asyncio.Event()
+        self.listening = listen_dsn is None
+        self._listener: asyncpg.Connection | None = None
+
+    # ===============
+    # Routing
+    # ===============
+
+    def engine_for(self, sticky_key: str | None = None) -> AsyncEngine:
+        """
+        Returns a replica engine, or the primary if no replica is usable for this key.
+        """
+        if not self.replicas:
+            return self.primary
+
+        required_lsn = 0
+        if sticky_key is not None and (entry := self._sticky.get(sticky_key)) is not None:
+            required_lsn, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._sticky[sticky_key]
+                required_lsn = 0
+
+        #NOTE: Without the write notifications other workers' writes would not be sticky
+        candidates = [replica for replica in self.replicas if replica.available] if self.listening else []
+        if not candidates:
+            READ_ROUTING.inc(target="primary_no_replica")
+            return self.primary
+
+        candidates = [replica for replica in candidates if replica.replay_lsn >= required_lsn]
+        if not candidates:
+            READ_ROUTING.inc(target="primary_read_your_writes")
+            return self.primary
+
+        READ_ROUTING.inc(target="replica")
+        return candidates[next(self._next) % len(candidates)].engine
+
+    def record_write(self, sticky_key: str, lsn: int):
+        """
+        Pins the key to the primary until a replica has replayed `lsn`.
+        """
+        if len(self._sticky) >= self.max_sticky_keys:
+            self._prune()
+        previous = self._sticky.get(sticky_key, (0, 0.0))[0]
+        self._sticky[sticky_key] = (max(previous, lsn), time.monotonic() + self.sticky_seconds)
+
+    async def mark_write(self, db: AsyncSession, sticky_key: str):
+        """
+        Call after committing a write whose effects the same user reads next.
+        Broadcasts the primary's WAL position so every worker pins the user to the primary.
+        """
+        if not self.replicas:
+            return
+        try:
+            payload = (await db.execute(MARK_WRITE_SQL, {"channel": READ_YOUR_WRITES_CHANNEL, "key": sticky_key})).scalar()
+            await db.commit()
+        except Exception as e:
+            #NOTE: The write itself is committed; failing the request now would misreport it
+            logger.warning(f"Could not broadcast write for {sticky_key}, reads may briefly be stale: {e}")
+            return
+        #NOTE: Applied locally right away; this worker's own notification arrives later and is idempotent
+        self._on_payload(payload)
+
+    def mark_write_sync(self, db: Session, sticky_key: str):
+        if not self.replicas:
+            return
+        try:
+            payload = db.execute(MARK_WRITE_SQL, {"channel": READ_YOUR_WRITES_CHANNEL, "key": sticky_key}).scalar()
+            db.commit()
+        except Exception as e:
+            logger.warning(f"Could not broadcast write for {sticky_key}, reads may briefly be stale: {e}")
+            return
+        self._on_payload(payload)
+
+    def _prune(self):
+        now = time.monotonic()
+        self._sticky = {key: entry for key, entry in self._sticky.items() if entry[1] > now}
+        if len(self._sticky) >= self.max_sticky_keys:
+            #NOTE: Still full of live entries; dropping the oldest half only makes a few reads fall back to lag-bounded replicas
+            oldest = sorted(self._sticky.items(), key=lambda item: item[1][1])
+            self._sticky = dict(oldest[len(oldest) // 2:])
+
+    def _on_payload(self, payload: str):
+        sticky_key, _, lsn = payload.rpartition(" ")
+        try:
+            self.record_write(sticky_key, int(lsn))
+        except ValueError:
+            logger.warning(f"Ignoring malformed {READ_YOUR_WRITES_CHANNEL} notification: {payload!r}")
+
+    def _on_notify(self, connection, pid, channel, payload):
+        self._on_payload(payload)
+
+    # ===============
+    # Lag Monitoring
+    # ===============
+
+    async def _measure(self, replica: Replica) -> tuple[bool, int | None, float]:
+        async with replica.engine.connect() as connection:
+            return tuple((await connection.execute(REPLICA_LAG_SQL)).one())
+
+    async def check_replica(self, replica: Replica):
+        try:
+            in_recovery, replay_lsn, lag_seconds = await asyncio.wait_for(self._measure(replica), timeout=self.check_timeout)
+        except Exception as e:
+            if replica.available:
+                logger.warning(f"Read replica {replica.name} failed its lag check, reads go to the primary: {e}")
+            replica.available, replica.lag_seconds = False, None
+        else:
+            if not in_recovery:
+                if replica.lag_seconds is None:
+                    logger.warning(f"Read replica {replica.name} is not in recovery; it is not a replica and gets no reads")
+                replica.available, replica.lag_seconds = False, 0.0
+            else:
+                available = float(lag_seconds) <= self.max_lag
+                if available != replica.available:
+                    state = "back in rotation" if available else "out of rotation, reads go to the primary"
+                    logger.info(f"Read replica {replica.name} {state} (lag {float(lag_seconds):.2f}s)")
+                replica.available, replica.lag_seconds, replica.replay_lsn = available, float(lag_seconds), replay_lsn or 0
+
+        REPLICA_AVAILABLE.set(1.0 if replica.available else 0.0, replica=replica.name)
+        if replica.lag_seconds is not None:
+            REPLICA_LAG_SECONDS.set(replica.lag_seconds, replica=replica.name)
+
+    async def check_replicas(self):
+        await asyncio.gather(*(self.check_replica(replica) for replica in self.replicas))
+
+    async def start(self):
+        """
+        Starts listening for writes and measures every replica once.
+        """
+        self._listener = await self._listen()
+        await self.check_replicas()
+
+    async def run(self):
+        """
+        Re-measures replica lag every `check_interval` and keeps the listener connected until `stop()`.
+        """
+        try:
+            while not self._stopped.is_set():
+                try:
+                    await asyncio.wait_for(self._stopped.wait(), timeout=self.check_interval)
+                except asyncio.TimeoutError:
+                    pass
+                if self._stopped.is_set():
+                    break
+                if self._listener is None or self._listener.is_closed():
+                    self._listener = await self._listen()
+                await self.check_replicas()
+        finally:
+            if self._listener is not None and not self._listener.is_closed():
+                await self._listener.close()
+
+    async def _listen(self) -> asyncpg.Connection | None:
+        if self.listen_dsn is None:
+            return None
+        try:
+            listener = await asyncpg.connect(self.listen_dsn, timeout=self.check_timeout)
+            await listener.add_listener(READ_YOUR_WRITES_CHANNEL, self._on_notify)
+            listener.add_termination_listener(self._on_listener_lost)
+        except Exception as e:
+            if self.listening:
+                logger.warning(f"Could not listen for {READ_YOUR_WRITES_CHANNEL}, reads go to the primary until it reconnects: {e}")
+            self.listening = False
+            return None
+        self.listening = True
+        return listener
+
+    def _on_listener_lost(self, connection):
+        if self._stopped.is_set():
+            return
+        logger.warning(f"Lost the {READ_YOUR_WRITES_CHANNEL} listener, reads go to the primary until it reconnects")
+        self.listening = False
+
+    def stop(self):
+        self._stopped.set()
+
+    async def close(self):
+        self.stop()
+        await asyncio.gather(*(replica.engine.dispose() for replica in self.replicas))
@@ -1,3 +1,7 @@
+import re
+import html
+from urllib.parse import quote
+
 from langchain_core.messages import HumanMessage, AIMessage
 
 def preprocess_messages(messages):
@@ -16,4 +20,154 @@ def preprocess_messages(messages):
             "timestamp": msg.get("created_at", msg.get("timestamp", ""))
         }
         processed.append(processed_msg)
-    return processed
\ No newline at end of file
+    return processed
+
+# ===============
+# Filenames
+# ===============
+
+UNSAFE_FILENAME_CHARACTERS = re.compile(r"[^\w\- ]+")
+
+
+def safe_filename(title: str, extension: str, default: str = "presentation") -> str:
+    """
+    Returns `title` as a download filename with `extension`: letters, digits, `_`, `-` and
+    spaces only, or `default` if nothing is left.
+    """
+    return f"{UNSAFE_FILENAME_CHARACTERS.sub('', title).strip() or default}.{extension}"
+
+
+def content_disposition(filename: str) -> str:
+    """
+    Returns an attachment `Content-Disposition` for `filename`, in RFC 5987 form when it is
+    not plain ASCII (headers are latin-1).
+    """
+    if not filename.isascii():
+        return f"attachment; filename*=utf-8''{quote(filename)}"
+    return f'attachment; filename="{filename}"'
+
+
+# ===============
+# Slide Text Extraction
+# ===============
+
+SLIDE_COMMENT_PATTERN = re.compile(r"/\*.*?\*/|(?<![:\"'])//[^\n]*", re.DOTALL)
+SLIDE_IMPORT_PATTERN = re.compile(r"^\s*(?:import|export)\b[^\n]*\bfrom\b[^\n]*$|^\s*import\s+['\"][^\n]*$", re.MULTILINE)
+SLIDE_TAG_PATTERN = re.compile(r"<([A-Za-z][\w.]*)[^<>]*?(/?)>|</\s*[A-Za-z][\w.]*\s*>")
+#NOTE: `{expression}` bounds JSX text like a tag does, so `<h1>Q3 {year} Results</h1>` yields "Q3" and "Results"
+SLIDE_JSX_TEXT_PATTERN = re.compile(r"([>}])([^<>{}]+)(?=([<{]))")
+SLIDE_STRING_LITERAL_PATTERN = re.compile(r"([\w$-]+)?(\s*[=:]\s*)?(\"(?:\\.|[^\"\\\n])*\"|'(?:\\.|[^'\\\n])*'|`(?:\\.|[^`\\])*`)")
+SLIDE_TEMPLATE_EXPRESSION_PATTERN = re.compile(r"\$\{[^}]*\}")
+SLIDE_CODE_HINT_PATTERN = re.compile(r";|=>|\b(?:return|const|let|function)\b")
+SLIDE_LETTER_PATTERN = re.compile(r"[^\W\d_]")
+SLIDE_CONTROL_PATTERN = re.compile(r"[\x00-\x08\x0b-\x1f\x7f]")
+SLIDE_CLASS_TOKEN_PATTERN = re.compile(r"^[a-z0-9:/\[\]\.#%!&>()_-]*[-:][a-z0-9:/\[\]\.#%!&>()_-]*$")
+SLIDE_HEADING_TAGS = {"h1", "h2", "h3"}
+
+#NOTE: Attributes and object keys whose string values are styling or wiring, not visible text
+SLIDE_NON_TEXT_KEYS = {
+    "className", "class", "style", "id", "key", "ref", "src", "href", "type", "role",
+    "fill", "stroke", "d", "viewBox", "points", "transform", "xmlns", "dataKey", "nameKey",
+    "color", "backgroundColor", "background", "fontFamily", "fontWeight", "layout", "variant",
+    "icon", "size", "align", "justify", "direction", "position", "display", "target", "rel"
+}
+SLIDE_NON_TEXT_PREFIXES = ("#", "http", "/", "./", "../", "rgb", "hsl", "var(", "data:")
+#NOTE: Tailwind utilities without a dash, as passed to `cn()` or in conditional classes
+SLIDE_CLASS_WORDS = {
+    "flex", "grid", "block", "inline", "hidden", "contents", "container", "relative", "absolute",
+    "fixed", "sticky", "italic", "underline", "uppercase", "lowercase", "capitalize", "truncate",
+    "border", "rounded", "shadow", "grow", "shrink", "transition", "antialiased"
+}
+
+
+def _is_class_list(value: str) -> bool:
+    tokens = value.split()
+    return bool(tokens) and all(token in SLIDE_CLASS_WORDS or SLIDE_CLASS_TOKEN_PATTERN.match(token) for token in tokens)
+
+
+def _iter_slide_text(code: str):
+    """
+    Yield `(tag, element_id, text)` for the text a slide shows, in document order, best effort:
+    - JSX text between tags and `{expressions}`, reported with the tag and id of its element,
+      or of the heading it is nested in;
+    - string literals that are not class names, styles, URLs or wiring (`dataKey`, `icon`,
+      ...), such as the labels in a data array the slide maps over. They have an empty tag
+      and an element of their own.
+    """
+    code = SLIDE_IMPORT_PATTERN.sub("", SLIDE_COMMENT_PATTERN.sub("", code))
+    tags = list(SLIDE_TAG_PATTERN.finditer(code))
+    fragments = []
+
+    open_elements = []
+    next_tag = 0
+    masked = list(code)
+    for match in SLIDE_JSX_TEXT_PATTERN.finditer(code):
+        opening, fragment, closing = match.groups()
+        fragment = html.unescape(fragment)
+        if not SLIDE_LETTER_PATTERN.search(fragment) or SLIDE_CODE_HINT_PATTERN.search(fragment):
+            continue
+        while next_tag < len(tags) and tags[next_tag].end() <= match.start(2):
+            tag, self_closing = tags[next_tag].groups()
+            if tag is None:
+                if open_elements:
+                    open_elements.pop()
+            elif not self_closing:
+                open_elements.append((tag.lower(), next_tag))
+            next_tag += 1
+        #NOTE: Between two attribute expressions of a tag (`style={...} className={...}`)
+        if next_tag < len(tags) and tags[next_tag].start() < match.start(2):
+            continue
+        #NOTE: Between braces outside any element is code (`} else {`), not JSX text
+        if opening == "}" and closing == "{" and not open_elements:
+            continue
+        heading = next((element for element in reversed(open_elements) if element[0] in SLIDE_HEADING_TAGS), None)
+        tag, element_id = heading or (open_elements[-1] if open_elements else ("", -1 - match.start(2)))
+        fragments.append((match.start(2), tag, element_id, fragment))
+        #NOTE: Masked so apostrophes in text ("Let's") are not read as string literals
+        masked[match.start(2):match.end(2)] = " " * (match.end(2) - match.start(2))
+
+    for match in SLIDE_STRING_LITERAL_PATTERN.finditer("".join(masked)):
+        key, separator, literal = match.groups()
+        value = SLIDE_TEMPLATE_EXPRESSION_PATTERN.sub(" ", literal[1:-1])
+        if separator and key in SLIDE_NON_TEXT_KEYS:
+            continue
+        if not SLIDE_LETTER_PATTERN.search(value) or value.startswith(SLIDE_NON_TEXT_PREFIXES) or _is_class_list(value):
+            continue
+        value = html.unescape(value.replace("\\n", " ").replace("\\'", "'").replace('\\"', '"'))
+        fragments.append((match.start(3), "", -1 - match.start(3), value))
+
+    for _, tag, element_id, fragment in sorted(fragments):
+        cleaned = " ".join(SLIDE_CONTROL_PATTERN.sub(" ", fragment).split())
+        if cleaned:
+            yield tag, element_id, cleaned
+
+
+def extract_slide_text(code: str) -> list[tuple[str, str]]:
+    """
+    Extract the visible text of a TSX slide as `(tag, text)` pairs in document order.
+    String literals shown by the slide, such as data labels, have an empty tag.
+    """
+    return [(tag, text) for tag, _, text in _iter_slide_text(code)]
+
+
+def extract_slide_title_and_body(code: str) -> tuple[str, list[str]]:
+    """
+    Split the visible text of a slide into a title (highest-level heading) and body lines.
+    Falls back to the first text of the slide when it has no heading.
+    """
+    texts = list(_iter_slide_text(code))
+    if not texts:
+        return "", []
+
+    title_element = texts[0][1]
+    for heading_tag in sorted(SLIDE_HEADING_TAGS):
+        title_element = next((element_id for tag, element_id, _ in texts if tag == heading_tag), None)
+        if title_element is not None:
+            break
+    else:
+        title_element = texts[0][1]
+
+    #NOTE: Headings split with <br /> or nested spans are joined back into one title
+    title = " ".join(text for _, element_id, text in texts if element_id == title_element)
+    body = [text for _, element_id, text in texts if element_id != title_element]
+    return title, body